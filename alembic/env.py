@@ -12,6 +12,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 # Import your SQLAlchemy models
 from models.camera import Base  # Adjust the import path to your project structure
 from config import settings
+from services.partitions import is_partition
 from sqlalchemy import create_engine
 
 # this is the Alembic Config object, which provides
@@ -29,6 +30,13 @@ target_metadata = Base.metadata
 config.set_main_option('sqlalchemy.url', settings.DATABASE_URL)
 
 
+def include_name(name, type_, parent_names):
+    # Partitions are created and dropped at runtime by services/partitions.py
+    if type_ == "table":
+        return not is_partition(name)
+    return True
+
+
 def run_migrations_online():
     """Run migrations in 'online' mode."""
     connectable = create_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
@@ -37,6 +45,7 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
+            include_name=include_name,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,47 @@
+"""Added heatmap cubes
+
+Revision ID: 4e1a9c7b2d05
+Revises: cfea632de4b5
+Create Date: 2026-10-19 09:12:40.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e1a9c7b2d05'
+down_revision: Union[str, None] = 'cfea632de4b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('heatmap_cubes',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('zone_id', sa.String(), nullable=False),
+    sa.Column('camera_id', sa.String(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('bucket_seconds', sa.Integer(), nullable=False),
+    sa.Column('cell_size', sa.Float(), nullable=False),
+    sa.Column('rows', sa.Integer(), nullable=False),
+    sa.Column('cols', sa.Integer(), nullable=False),
+    sa.Column('point_count', sa.Integer(), nullable=False),
+    sa.Column('total_weight', sa.Float(), nullable=False),
+    sa.Column('grid', sa.LargeBinary(), nullable=False),
+    sa.Column('cumulative', sa.LargeBinary(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['zone_id'], ['zones.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('zone_id', 'camera_id', 'bucket_start', name='uq_heatmap_cubes_zone_camera_bucket')
+    )
+    op.create_index(op.f('ix_heatmap_cubes_zone_id'), 'heatmap_cubes', ['zone_id'], unique=False)
+    op.create_index(op.f('ix_heatmap_cubes_bucket_start'), 'heatmap_cubes', ['bucket_start'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_heatmap_cubes_bucket_start'), table_name='heatmap_cubes')
+    op.drop_index(op.f('ix_heatmap_cubes_zone_id'), table_name='heatmap_cubes')
+    op.drop_table('heatmap_cubes')
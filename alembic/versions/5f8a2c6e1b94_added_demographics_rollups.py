@@ -0,0 +1,52 @@
+"""Added demographics rollups
+
+Revision ID: 5f8a2c6e1b94
+Revises: c2d7e9a4f613
+Create Date: 2026-10-19 15:02:17.493861
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f8a2c6e1b94'
+down_revision: Union[str, None] = 'c2d7e9a4f613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('demographics_hourly',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('age_group', sa.String(), nullable=False),
+    sa.Column('gender', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('zone_id', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['zone_id'], ['zones.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('zone_id', 'bucket_start', 'age_group', 'gender', name='uq_demographics_hourly_zone_bucket_group')
+    )
+    op.create_index(op.f('ix_demographics_hourly_bucket_start'), 'demographics_hourly', ['bucket_start'], unique=False)
+    op.create_table('demographics_daily',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('age_group', sa.String(), nullable=False),
+    sa.Column('gender', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('zone_id', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['zone_id'], ['zones.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('zone_id', 'bucket_start', 'age_group', 'gender', name='uq_demographics_daily_zone_bucket_group')
+    )
+    op.create_index(op.f('ix_demographics_daily_bucket_start'), 'demographics_daily', ['bucket_start'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_demographics_daily_bucket_start'), table_name='demographics_daily')
+    op.drop_table('demographics_daily')
+    op.drop_index(op.f('ix_demographics_hourly_bucket_start'), table_name='demographics_hourly')
+    op.drop_table('demographics_hourly')
@@ -0,0 +1,40 @@
+"""Added parking stalls
+
+Revision ID: 8b3f5d1e6a27
+Revises: 4e1a9c7b2d05
+Create Date: 2026-10-19 11:02:17.482611
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b3f5d1e6a27'
+down_revision: Union[str, None] = '4e1a9c7b2d05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('parking_stalls',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('zone_id', sa.String(), nullable=False),
+    sa.Column('camera_id', sa.String(), nullable=False),
+    sa.Column('label', sa.String(), nullable=True),
+    sa.Column('polygon', sa.JSON(), nullable=False),
+    sa.Column('min_overlap', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['zone_id'], ['zones.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_parking_stalls_zone_id'), 'parking_stalls', ['zone_id'], unique=False)
+    op.create_index(op.f('ix_parking_stalls_camera_id'), 'parking_stalls', ['camera_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_parking_stalls_camera_id'), table_name='parking_stalls')
+    op.drop_index(op.f('ix_parking_stalls_zone_id'), table_name='parking_stalls')
+    op.drop_table('parking_stalls')
@@ -0,0 +1,42 @@
+"""Added entry exit hourly
+
+Revision ID: a3e6d0f4c258
+Revises: 5f8a2c6e1b94
+Create Date: 2026-10-19 16:21:08.734512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e6d0f4c258'
+down_revision: Union[str, None] = '5f8a2c6e1b94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('entry_exit_hourly',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('camera_id', sa.String(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('hour', sa.Integer(), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.Column('exit_count', sa.Integer(), nullable=False),
+    sa.Column('entering', sa.Integer(), nullable=False),
+    sa.Column('exiting', sa.Integer(), nullable=False),
+    sa.Column('in_store', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('camera_id', 'bucket_start', name='uq_entry_exit_hourly_camera_bucket')
+    )
+    op.create_index(op.f('ix_entry_exit_hourly_camera_id'), 'entry_exit_hourly', ['camera_id'], unique=False)
+    op.create_index(op.f('ix_entry_exit_hourly_bucket_start'), 'entry_exit_hourly', ['bucket_start'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_entry_exit_hourly_bucket_start'), table_name='entry_exit_hourly')
+    op.drop_index(op.f('ix_entry_exit_hourly_camera_id'), table_name='entry_exit_hourly')
+    op.drop_table('entry_exit_hourly')
@@ -0,0 +1,56 @@
+"""Added time series indexes
+
+Revision ID: b7c41e9d2a63
+Revises: a3e6d0f4c258
+Create Date: 2026-10-19 17:05:44.902176
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c41e9d2a63'
+down_revision: Union[str, None] = 'a3e6d0f4c258'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, postgresql options); the timestamp-only indexes are BRIN on PostgreSQL
+INDEXES = [
+    ('ix_heatmap_data_zone_id_timestamp', 'heatmap_data', ['zone_id', 'timestamp'],
+     {'postgresql_include': ['camera_id', 'x', 'y', 'weight']}),
+    ('ix_heatmap_data_camera_id_timestamp', 'heatmap_data', ['camera_id', 'timestamp'], {}),
+    ('ix_heatmap_data_timestamp', 'heatmap_data', ['timestamp'], {'postgresql_using': 'brin'}),
+    ('ix_demographics_zone_id_timestamp', 'demographics', ['zone_id', 'timestamp'], {}),
+    ('ix_demographics_timestamp', 'demographics', ['timestamp'], {'postgresql_using': 'brin'}),
+    ('ix_footpath_analytics_zone_id_business_id_timestamp', 'footpath_analytics', ['zone_id', 'business_id', 'timestamp'], {}),
+    ('ix_footpath_analytics_property_id_timestamp', 'footpath_analytics', ['property_id', 'timestamp'], {}),
+    ('ix_footpath_analytics_timestamp', 'footpath_analytics', ['timestamp'], {'postgresql_using': 'brin'}),
+    ('ix_footpath_patterns_zone_id_business_id_timestamp', 'footpath_patterns', ['zone_id', 'business_id', 'timestamp'], {}),
+    ('ix_footpath_patterns_property_id_pattern_type_timestamp', 'footpath_patterns', ['property_id', 'pattern_type', 'timestamp'], {}),
+    ('ix_footpath_patterns_timestamp', 'footpath_patterns', ['timestamp'], {'postgresql_using': 'brin'}),
+    ('ix_detections_camera_id_timestamp', 'detections', ['camera_id', 'timestamp'], {}),
+    ('ix_detections_timestamp', 'detections', ['timestamp'], {'postgresql_using': 'brin'}),
+    ('ix_parking_analytics_zone_id_timestamp', 'parking_analytics', ['zone_id', 'timestamp'], {}),
+    ('ix_parking_analytics_timestamp', 'parking_analytics', ['timestamp'], {'postgresql_using': 'brin'}),
+    ('ix_security_events_property_id_timestamp', 'security_events', ['property_id', 'timestamp'], {}),
+    ('ix_security_events_zone_id_timestamp', 'security_events', ['zone_id', 'timestamp'], {}),
+    ('ix_security_events_timestamp', 'security_events', ['timestamp'], {'postgresql_using': 'brin'}),
+    ('ix_incidents_property_id_created_at', 'incidents', ['property_id', 'created_at'], {}),
+    ('ix_incidents_created_at', 'incidents', ['created_at'], {'postgresql_using': 'brin'}),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY on PostgreSQL so ingest isn't blocked while large tables are indexed
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, **options)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,30 @@
+"""Added footpath heatmap grid
+
+Revision ID: c2d7e9a4f613
+Revises: 8b3f5d1e6a27
+Create Date: 2026-10-19 13:40:52.206417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d7e9a4f613'
+down_revision: Union[str, None] = '8b3f5d1e6a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('footpath_analytics', sa.Column('heatmap_grid', sa.LargeBinary(), nullable=True))
+    op.add_column('footpath_analytics', sa.Column('frame_width', sa.Integer(), nullable=True))
+    op.add_column('footpath_analytics', sa.Column('frame_height', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('footpath_analytics', 'frame_height')
+    op.drop_column('footpath_analytics', 'frame_width')
+    op.drop_column('footpath_analytics', 'heatmap_grid')
@@ -0,0 +1,151 @@
+"""Added time partitions
+
+Revision ID: e5a9c2d7f314
+Revises: b7c41e9d2a63
+Create Date: 2026-10-19 19:42:17.310588
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a9c2d7f314'
+down_revision: Union[str, None] = 'b7c41e9d2a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, partition length, primary key on the partitioned table). A primary key
+# there must include the partition key, which is nullable on the log tables.
+PARTITIONED_TABLES = [
+    ('detections', 'month', ['id', 'timestamp']),
+    ('heatmap_data', 'day', ['id', 'timestamp']),
+    ('tracking_logs', 'day', None),
+    ('entry_logs', 'month', None),
+]
+# Partitions created past the current one; the retention job keeps this many ahead
+AHEAD = 3
+
+
+def _period_start(ts, interval):
+    ts = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.replace(day=1) if interval == 'month' else ts
+
+
+def _next_period(start, interval):
+    if interval == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _partition_name(table, start, interval):
+    return f'{table}_p{start:%Y_%m}' if interval == 'month' else f'{table}_p{start:%Y_%m_%d}'
+
+
+def _definitions(bind, table):
+    """DDL needed to recreate a table's secondary indexes, foreign keys and owned sequences on a copy"""
+    indexes = bind.execute(sa.text(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table "
+        "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:table))"
+    ), {'table': table}).scalars().all()
+    foreign_keys = bind.execute(sa.text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(:table) AND contype = 'f'"
+    ), {'table': table}).all()
+    sequences = bind.execute(sa.text(
+        "SELECT s.relname, a.attname FROM pg_depend d "
+        "JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S' "
+        "JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid "
+        "WHERE d.refobjid = to_regclass(:table) AND d.deptype = 'a'"
+    ), {'table': table}).all()
+    return (
+        # Partitioned parents report their indexes as ON ONLY
+        [indexdef.replace(' ON ONLY ', ' ON ') for indexdef in indexes],
+        [f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}' for name, definition in foreign_keys],
+        [f'ALTER SEQUENCE "{sequence}" OWNED BY "{table}"."{column}"' for sequence, column in sequences],
+    )
+
+
+def _rebuild(bind, table, partition_by, primary_key, before_copy=None):
+    """Swap a table for a copy created with `partition_by`, moving rows, sequences, keys and indexes"""
+    indexes, foreign_keys, sequences = _definitions(bind, table)
+    old = f'{table}_old'
+    op.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+    op.execute(f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS){partition_by}')
+    if before_copy:
+        before_copy(old)
+    op.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+    for statement in sequences:
+        op.execute(statement)
+    # Dropping the old table frees its constraint and index names (and its partitions on downgrade)
+    op.execute(f'DROP TABLE "{old}"')
+    if primary_key:
+        columns = ', '.join(f'"{column}"' for column in primary_key)
+        op.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY ({columns})')
+    for statement in foreign_keys + indexes:
+        op.execute(statement)
+
+
+def _create_partitions(bind, table, interval, source):
+    """Partitions from the oldest row in `source` to AHEAD periods from now, plus the default one"""
+    now = datetime.utcnow()
+    oldest = bind.execute(sa.text(f'SELECT min("timestamp") FROM "{source}"')).scalar()
+    start = _period_start(min(oldest, now) if oldest else now, interval)
+    stop = _period_start(now, interval)
+    for _ in range(AHEAD + 1):
+        stop = _next_period(stop, interval)
+    while start < stop:
+        end = _next_period(start, interval)
+        op.execute(
+            f'CREATE TABLE "{_partition_name(table, start, interval)}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{start.isoformat(' ')}') TO ('{end.isoformat(' ')}')"
+        )
+        start = end
+    # Rows without a timestamp, or outside every partition, land here
+    op.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+
+
+def upgrade() -> None:
+    op.create_table('heatmap_archive',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('zone_id', sa.String(), nullable=False),
+    sa.Column('camera_id', sa.String(), nullable=False),
+    sa.Column('day', sa.DateTime(), nullable=False),
+    sa.Column('cell_size', sa.Float(), nullable=False),
+    sa.Column('rows', sa.Integer(), nullable=False),
+    sa.Column('cols', sa.Integer(), nullable=False),
+    sa.Column('point_count', sa.Integer(), nullable=False),
+    sa.Column('total_weight', sa.Float(), nullable=False),
+    sa.Column('grid', sa.LargeBinary(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['zone_id'], ['zones.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('zone_id', 'camera_id', 'day', 'cell_size', name='uq_heatmap_archive_zone_camera_day_cell')
+    )
+    op.create_index(op.f('ix_heatmap_archive_day'), 'heatmap_archive', ['day'], unique=False)
+    op.create_index(op.f('ix_heatmap_archive_zone_id'), 'heatmap_archive', ['zone_id'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # SQLite shards old rows into month files at runtime (services/partitions.py)
+        return
+    # Copies every row once; run during a maintenance window on large databases
+    for table, interval, primary_key in PARTITIONED_TABLES:
+        _rebuild(
+            bind, table, ' PARTITION BY RANGE ("timestamp")', primary_key,
+            before_copy=lambda old, table=table, interval=interval: _create_partitions(bind, table, interval, old)
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for table, interval, primary_key in reversed(PARTITIONED_TABLES):
+            _rebuild(bind, table, '', ['id'])
+
+    op.drop_index(op.f('ix_heatmap_archive_zone_id'), table_name='heatmap_archive')
+    op.drop_index(op.f('ix_heatmap_archive_day'), table_name='heatmap_archive')
+    op.drop_table('heatmap_archive')
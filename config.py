@@ -6,6 +6,20 @@ class Settings(BaseSettings):
     DATABASE_URL: str = os.environ.get("DATABASE_URL")
     RTSP_STREAM_URL: str = ""
     API_KEY: str = os.environ.get("API_KEY")
+    HEATMAP_CELL_SIZE: float = 10.0  # Heatmap cube cell size in input coordinates
+    HEATMAP_BUCKET_SECONDS: int = 3600  # Heatmap cube time bucket length
+    # Retention of the time-partitioned raw tables, in days (0 keeps everything)
+    DETECTIONS_RETENTION_DAYS: int = 90
+    HEATMAP_DATA_RETENTION_DAYS: int = 30  # Older points survive as daily grids in heatmap_archive
+    TRACKING_LOGS_RETENTION_DAYS: int = 30
+    ENTRY_LOGS_RETENTION_DAYS: int = 400
+    HEATMAP_ARCHIVE_CELL_SIZE: float = 50.0  # Cell size of the archived daily heatmap grids
+    RETENTION_INTERVAL_SECONDS: int = 3600  # How often the retention job runs (0 disables it)
+    PARTITIONS_AHEAD: int = 3  # Upcoming partitions kept created on PostgreSQL
+    SQLITE_SHARD_DIR: str = os.path.join("data", "shards")  # Month files for the SQLite fallback
+    # Months kept in the main SQLite database; older rows move to month files the API does not read (0 keeps them all in place)
+    SQLITE_HOT_MONTHS: int = 0
+    DASHBOARD_CACHE_TTL_SECONDS: float = 10.0  # How long a dashboard summary is reused (0 disables caching)
 
     class Config:
         env_file = ".env"
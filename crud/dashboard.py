@@ -1,59 +1,115 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, case
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional
 from models.staff import Staff, WorkSession, Break
-from models.security import ThreatDetection, SleepingDetection
+from models.security import ThreatDetection, SleepingDetection, ThreatSeverity
 from models.environment import SmokeDetection
 from models.vehicle import Vehicle, ParkingSpot, ValetRequest
 from schemas.dashboard import MonitoringSummary
+from services.ttl_cache import TTLCache
+from config import settings
+
+# Sub-aggregates run in parallel, each on its own pooled connection
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dashboard")
+summary_cache = TTLCache(settings.DASHBOARD_CACHE_TTL_SECONDS)
 
-def get_monitoring_summary(db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> MonitoringSummary:
-    query = db.query(
-        func.count(distinct(Staff.id)).label('total_staff'),
-        func.count(WorkSession.id).label('total_work_sessions'),
-        func.count(Break.id).label('total_breaks'),
-        func.avg(WorkSession.total_duration).label('average_work_duration'),
-        func.avg(Break.duration).label('average_break_duration'),
-        func.count(ThreatDetection.id).label('total_threats'),
-        func.sum(case((ThreatDetection.severity == 'HIGH', 1), else_=0)).label('high_severity_threats'),
-        func.sum(case((ThreatDetection.severity == 'MEDIUM', 1), else_=0)).label('medium_severity_threats'),
-        func.sum(case((ThreatDetection.severity == 'LOW', 1), else_=0)).label('low_severity_threats'),
-        func.count(SleepingDetection.id).label('total_sleeping_detections'),
-        func.count(SmokeDetection.id).label('total_smoke_detections'),
-        func.sum(case((SmokeDetection.is_alarm_triggered == True, 1), else_=0)).label('active_smoke_alarms'),
-        func.count(Vehicle.id).label('total_vehicles'),
-        func.count(ParkingSpot.id).label('total_parking_spots'),
-        func.sum(case((ParkingSpot.is_occupied == True, 1), else_=0)).label('occupied_parking_spots'),
-        func.count(ValetRequest.id).label('total_valet_requests'),
-        func.sum(case((ValetRequest.end_time == None, 1), else_=0)).label('active_valet_requests')
-    )
 
+def _in_range(query, start_column, end_column, start_date, end_date):
     if start_date:
-        query = query.filter(WorkSession.start_time >= start_date)
+        query = query.filter(start_column >= start_date)
     if end_date:
-        query = query.filter(WorkSession.end_time <= end_date)
-
-    result = query.first()
-
-    return MonitoringSummary(
-        total_staff=result.total_staff,
-        total_work_sessions=result.total_work_sessions,
-        total_breaks=result.total_breaks,
-        average_work_duration=float(result.average_work_duration or 0),
-        average_break_duration=float(result.average_break_duration or 0),
-        total_threats=result.total_threats,
-        high_severity_threats=result.high_severity_threats,
-        medium_severity_threats=result.medium_severity_threats,
-        low_severity_threats=result.low_severity_threats,
-        total_sleeping_detections=result.total_sleeping_detections,
-        total_smoke_detections=result.total_smoke_detections,
-        active_smoke_alarms=result.active_smoke_alarms,
-        total_vehicles=result.total_vehicles,
-        total_parking_spots=result.total_parking_spots,
-        occupied_parking_spots=result.occupied_parking_spots,
-        total_valet_requests=result.total_valet_requests,
-        active_valet_requests=result.active_valet_requests,
-        start_date=start_date,
-        end_date=end_date
-    )
\ No newline at end of file
+        query = query.filter(end_column <= end_date)
+    return query
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def _staff(db: Session, start_date, end_date):
+    return {"total_staff": db.query(func.count(Staff.id)).scalar()}
+
+def _work_sessions(db: Session, start_date, end_date):
+    query = db.query(func.count(WorkSession.id), func.avg(WorkSession.total_duration))
+    count, average = _in_range(query, WorkSession.start_time, WorkSession.end_time, start_date, end_date).one()
+    return {"total_work_sessions": count, "average_work_duration": float(average or 0)}
+
+def _breaks(db: Session, start_date, end_date):
+    query = db.query(func.count(Break.id), func.avg(Break.duration))
+    count, average = _in_range(query, Break.start_time, Break.end_time, start_date, end_date).one()
+    return {"total_breaks": count, "average_break_duration": float(average or 0)}
+
+def _threats(db: Session, start_date, end_date):
+    total, high, medium, low = db.query(
+        func.count(ThreatDetection.id),
+        _count_where(ThreatDetection.severity == ThreatSeverity.HIGH),
+        _count_where(ThreatDetection.severity == ThreatSeverity.MEDIUM),
+        _count_where(ThreatDetection.severity == ThreatSeverity.LOW)
+    ).one()
+    return {
+        "total_threats": total,
+        "high_severity_threats": high,
+        "medium_severity_threats": medium,
+        "low_severity_threats": low
+    }
+
+def _sleeping(db: Session, start_date, end_date):
+    query = db.query(func.count(SleepingDetection.id))
+    query = _in_range(query, SleepingDetection.timestamp, SleepingDetection.timestamp, start_date, end_date)
+    return {"total_sleeping_detections": query.scalar()}
+
+def _smoke(db: Session, start_date, end_date):
+    total, alarms = db.query(
+        func.count(SmokeDetection.id),
+        _count_where(SmokeDetection.is_alarm_triggered == True)
+    ).one()
+    return {"total_smoke_detections": total, "active_smoke_alarms": alarms}
+
+def _vehicles(db: Session, start_date, end_date):
+    return {"total_vehicles": db.query(func.count(Vehicle.id)).scalar()}
+
+def _parking(db: Session, start_date, end_date):
+    total, occupied = db.query(
+        func.count(ParkingSpot.id),
+        _count_where(ParkingSpot.is_occupied == True)
+    ).one()
+    return {"total_parking_spots": total, "occupied_parking_spots": occupied}
+
+def _valet(db: Session, start_date, end_date):
+    query = db.query(func.count(ValetRequest.id), _count_where(ValetRequest.end_time == None))
+    total, active = _in_range(query, ValetRequest.start_time, ValetRequest.start_time, start_date, end_date).one()
+    return {"total_valet_requests": total, "active_valet_requests": active}
+
+# Independent single-table aggregates; joining the tables in one query would count their cross product
+SUB_AGGREGATES = [_staff, _work_sessions, _breaks, _threats, _sleeping, _smoke, _vehicles, _parking, _valet]
+
+
+def _compute_summary(db: Session, start_date: Optional[datetime], end_date: Optional[datetime]) -> MonitoringSummary:
+    bind = db.get_bind()
+    if bind.dialect.name == "sqlite":
+        # SQLite serialises readers on one file anyway, so run them in turn on the request's session
+        parts = [aggregate(db, start_date, end_date) for aggregate in SUB_AGGREGATES]
+    else:
+        def run(aggregate):
+            with Session(bind=bind) as session:
+                return aggregate(session, start_date, end_date)
+        parts = list(_executor.map(run, SUB_AGGREGATES))
+
+    values = {}
+    for part in parts:
+        values.update(part)
+    return MonitoringSummary(**values, start_date=start_date, end_date=end_date)
+
+
+def get_monitoring_summary(db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> MonitoringSummary:
+    """Counts across staff, security, environment and vehicle tables, cached for DASHBOARD_CACHE_TTL_SECONDS.
+
+    The date range applies to work sessions, breaks, sleeping detections and
+    valet requests; the other counts are current totals.
+    """
+    if start_date and end_date and start_date > end_date:
+        raise ValueError("start_date must be before end_date")
+    return summary_cache.get_or_set(
+        (start_date, end_date),
+        lambda: _compute_summary(db, start_date, end_date)
+    )
@@ -0,0 +1,184 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models.demographics import Demographics
+from models.demographicsRollup import DemographicsHourly, DemographicsDaily, ALL
+from utils.helpers import upsert_increment
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import re
+
+ROLLUP_MODELS = (DemographicsHourly, DemographicsDaily)
+
+
+def rollup_bucket(ts: datetime, model) -> datetime:
+    """Start of the hour or day a record falls in (wall clock, as the raw rows are stored)"""
+    ts = ts.replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    if model.bucket_seconds >= 86400:
+        ts = ts.replace(hour=0)
+    return ts
+
+
+def rollup_cells(age_groups, gender_distribution) -> Counter:
+    """(age_group, gender) -> count for one demographics record"""
+    cells = Counter()
+    for group in age_groups or []:
+        group = group if isinstance(group, dict) else group.dict()
+        cells[(group["age"], ALL)] += group.get("count", 0)
+        cells[(group["age"], "Male")] += group.get("male", 0)
+        cells[(group["age"], "Female")] += group.get("female", 0)
+        cells[(ALL, ALL)] += group.get("count", 0)
+    for gender, count in (gender_distribution or {}).items():
+        cells[(ALL, gender)] += count
+    # Always present, so a bucket with records is never mistaken for an empty one
+    cells[(ALL, ALL)] += 0
+    return cells
+
+
+def _age_sort_key(age: str):
+    match = re.search(r"\d+", age)
+    return (int(match.group()) if match else float("inf"), age)
+
+
+def _summary(totals: Dict[Tuple[str, str], int]) -> Optional[Dict]:
+    if not totals:
+        return None
+    ages = sorted({age for age, _ in totals if age != ALL}, key=_age_sort_key)
+    return {
+        "total_count": totals.get((ALL, ALL), 0),
+        "age_groups": [
+            {
+                "age": age,
+                "count": totals.get((age, ALL), 0),
+                "male": totals.get((age, "Male"), 0),
+                "female": totals.get((age, "Female"), 0)
+            }
+            for age in ages
+        ],
+        "gender_distribution": {
+            "Male": totals.get((ALL, "Male"), 0),
+            "Female": totals.get((ALL, "Female"), 0)
+        }
+    }
+
+
+class DemographicsRollupCRUD:
+    """Hourly and daily demographics counts, kept in step with every new Demographics row"""
+
+    def _apply(self, db: Session, model, zone_id: str, bucket_start: datetime, cells: Counter):
+        upsert_increment(db, model, [
+            {"zone_id": zone_id, "bucket_start": bucket_start, "age_group": age_group, "gender": gender, "count": count}
+            for (age_group, gender), count in cells.items()
+        ], key_columns=["zone_id", "bucket_start", "age_group", "gender"], counter_columns=["count"])
+
+    def add(self, db: Session, demographics: Demographics, commit: bool = True):
+        """Fold one demographics record into its hourly and daily buckets"""
+        cells = rollup_cells(demographics.age_groups, demographics.gender_distribution)
+        for model in ROLLUP_MODELS:
+            self._apply(db, model, demographics.zone_id, rollup_bucket(demographics.timestamp, model), cells)
+        if commit:
+            db.commit()
+
+    def _totals_statements(self, zone_ids: List[str], start: datetime, end: datetime):
+        """Whole days from the daily table, the partial days at either end from the hourly one"""
+        first_day = rollup_bucket(start, DemographicsDaily)
+        if first_day < start:
+            first_day += timedelta(days=1)
+        last_day = rollup_bucket(end, DemographicsDaily)
+
+        ranges = []
+        if first_day < last_day:
+            ranges.append((DemographicsDaily, first_day, last_day, False))
+            ranges.append((DemographicsHourly, start, first_day, False))
+            ranges.append((DemographicsHourly, last_day, end, True))
+        else:
+            ranges.append((DemographicsHourly, start, end, True))
+
+        return [
+            select(
+                model.age_group,
+                model.gender,
+                func.sum(model.count).label("count")
+            ).where(
+                model.zone_id.in_(zone_ids),
+                model.bucket_start >= range_start,
+                model.bucket_start <= range_end if inclusive else model.bucket_start < range_end
+            ).group_by(model.age_group, model.gender)
+            for model, range_start, range_end, inclusive in ranges
+        ]
+
+    def totals(self, db: Session, zone_ids: List[str], start: datetime, end: datetime) -> Dict[Tuple[str, str], int]:
+        """Summed (age_group, gender) counts of the buckets starting in [start, end].
+
+        start is effectively rounded up to an hour.
+        """
+        if not zone_ids:
+            return {}
+        totals = defaultdict(int)
+        for statement in self._totals_statements(zone_ids, start, end):
+            for age_group, gender, count in db.execute(statement):
+                totals[(age_group, gender)] += count or 0
+        return dict(totals)
+
+    async def totals_async(self, db: AsyncSession, zone_ids: List[str], start: datetime, end: datetime) -> Dict[Tuple[str, str], int]:
+        """totals for async routes"""
+        if not zone_ids:
+            return {}
+        totals = defaultdict(int)
+        for statement in self._totals_statements(zone_ids, start, end):
+            for age_group, gender, count in await db.execute(statement):
+                totals[(age_group, gender)] += count or 0
+        return dict(totals)
+
+    def summary(self, db: Session, zone_ids: List[str], start: datetime, end: datetime) -> Optional[Dict]:
+        """total_count, age_groups and gender_distribution in the shape the demographics endpoints return"""
+        return _summary(self.totals(db, zone_ids, start, end))
+
+    async def summary_async(self, db: AsyncSession, zone_ids: List[str], start: datetime, end: datetime) -> Optional[Dict]:
+        """summary for async routes"""
+        return _summary(await self.totals_async(db, zone_ids, start, end))
+
+    def rebuild(self, db: Session, zone_ids: Optional[Iterable[str]] = None, batch_size: int = 1000) -> int:
+        """Recompute the rollups from the raw demographics rows (backfill)"""
+        zone_ids = list(zone_ids) if zone_ids else None
+        for model in ROLLUP_MODELS:
+            query = db.query(model)
+            if zone_ids:
+                query = query.filter(model.zone_id.in_(zone_ids))
+            query.delete(synchronize_session=False)
+
+        source = db.query(
+            Demographics.zone_id,
+            Demographics.timestamp,
+            Demographics.age_groups,
+            Demographics.gender_distribution
+        )
+        if zone_ids:
+            source = source.filter(Demographics.zone_id.in_(zone_ids))
+
+        buckets = {model: defaultdict(Counter) for model in ROLLUP_MODELS}
+        total = 0
+        for zone_id, timestamp, age_groups, gender_distribution in source.yield_per(batch_size):
+            cells = rollup_cells(age_groups, gender_distribution)
+            for model in ROLLUP_MODELS:
+                buckets[model][(zone_id, rollup_bucket(timestamp, model))].update(cells)
+            total += 1
+
+        for model, series in buckets.items():
+            db.bulk_insert_mappings(model, [
+                {
+                    "zone_id": zone_id,
+                    "bucket_start": bucket_start,
+                    "age_group": age_group,
+                    "gender": gender,
+                    "count": count
+                }
+                for (zone_id, bucket_start), cells in series.items()
+                for (age_group, gender), count in cells.items()
+            ])
+        db.commit()
+        return total
+
+
+demographics_rollup_crud = DemographicsRollupCRUD()
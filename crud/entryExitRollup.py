@@ -0,0 +1,213 @@
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models.entry_log import EntryLog
+from models.exit_log import ExitLog
+from models.entryExitRollup import EntryExitHourly
+from services.write_behind import write_queue
+from utils.helpers import upsert_increment
+from config import settings
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+HOUR = timedelta(hours=1)
+ENTRY_FIELDS = ("entering", "exiting", "in_store")
+COUNTER_FIELDS = ("entry_count", "exit_count") + ENTRY_FIELDS
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    """Start of the hour a log falls in (wall clock, as the raw rows are stored)"""
+    return ts.replace(tzinfo=None, minute=0, second=0, microsecond=0)
+
+
+def _field(item, name):
+    """Read a column from an ORM object, a pydantic model or a plain mapping"""
+    if isinstance(item, dict):
+        return item.get(name)
+    return getattr(item, name, None)
+
+
+class EntryExitRollupCRUD:
+    """Hourly entry/exit totals per camera, updated whenever logs are inserted"""
+
+    def _deltas(self, items: Iterable, kind: str) -> Dict[Tuple[str, datetime], Counter]:
+        deltas = defaultdict(Counter)
+        for item in items:
+            timestamp = _field(item, "timestamp")
+            if timestamp is None:
+                continue  # Unbucketable, and never matched by a time range anyway
+            delta = deltas[(_field(item, "camera_id") or "", hour_bucket(timestamp))]
+            if kind == "entry":
+                delta["entry_count"] += 1
+                for name in ENTRY_FIELDS:
+                    delta[name] += _field(item, name) or 0
+            else:
+                delta["exit_count"] += 1
+        return deltas
+
+    def _apply(self, db: Session, deltas: Dict[Tuple[str, datetime], Counter]):
+        upsert_increment(db, EntryExitHourly, [
+            {
+                "camera_id": camera_id,
+                "bucket_start": bucket_start,
+                "hour": bucket_start.hour,
+                **{name: delta[name] for name in COUNTER_FIELDS}
+            }
+            for (camera_id, bucket_start), delta in deltas.items()
+        ], key_columns=["camera_id", "bucket_start"], counter_columns=COUNTER_FIELDS)
+
+    def add_entries(self, db: Session, entries: Iterable, commit: bool = True):
+        """Count entry logs (ORM rows, schemas or mappings) into their hours"""
+        self._apply(db, self._deltas(entries, "entry"))
+        if commit:
+            db.commit()
+
+    def add_exits(self, db: Session, exits: Iterable, commit: bool = True):
+        """Count exit logs (ORM rows, schemas or mappings) into their hours"""
+        self._apply(db, self._deltas(exits, "exit"))
+        if commit:
+            db.commit()
+
+    def _counts_statements(self, start: datetime, end: datetime, camera_id: Optional[str]):
+        """Rollup statement (None if no whole hour is covered) and raw (entry, exit) count statements"""
+        start = start.replace(tzinfo=None)
+        end = end.replace(tzinfo=None)
+        first_hour = hour_bucket(start)
+        if first_hour < start:
+            first_hour += HOUR
+        last_hour = hour_bucket(end)
+
+        if first_hour >= last_hour:
+            return None, self._raw_count_statements([(start, end)], camera_id)
+
+        rollup = select(
+            func.coalesce(func.sum(EntryExitHourly.entry_count), 0),
+            func.coalesce(func.sum(EntryExitHourly.exit_count), 0)
+        ).where(
+            EntryExitHourly.bucket_start >= first_hour,
+            EntryExitHourly.bucket_start < last_hour
+        )
+        if camera_id:
+            rollup = rollup.where(EntryExitHourly.camera_id == camera_id)
+
+        edges = [(start, first_hour - timedelta(microseconds=1))] if start < first_hour else []
+        edges.append((last_hour, end))
+        return rollup, self._raw_count_statements(edges, camera_id)
+
+    def _raw_count_statements(self, ranges: List[Tuple[datetime, datetime]], camera_id: Optional[str]):
+        statements = []
+        for model in (EntryLog, ExitLog):
+            statement = select(func.count(model.id)).where(
+                or_(*[model.timestamp.between(range_start, range_end) for range_start, range_end in ranges])
+            )
+            if camera_id:
+                statement = statement.where(model.camera_id == camera_id)
+            statements.append(statement)
+        return statements
+
+    def counts(self, db: Session, start: datetime, end: datetime, camera_id: Optional[str] = None) -> Tuple[int, int]:
+        """(entries, exits) logged in [start, end].
+
+        Whole hours are read from the rollup; only the partial hours at the
+        edges of the range fall back to counting raw rows.
+        """
+        rollup, raw = self._counts_statements(start, end, camera_id)
+        entries, exits = db.execute(rollup).one() if rollup is not None else (0, 0)
+        edge_entries, edge_exits = (db.execute(statement).scalar() or 0 for statement in raw)
+        return int(entries) + edge_entries, int(exits) + edge_exits
+
+    async def counts_async(self, db: AsyncSession, start: datetime, end: datetime, camera_id: Optional[str] = None) -> Tuple[int, int]:
+        """counts for async routes"""
+        rollup, raw = self._counts_statements(start, end, camera_id)
+        entries, exits = (await db.execute(rollup)).one() if rollup is not None else (0, 0)
+        edge_entries, edge_exits = [(await db.execute(statement)).scalar() or 0 for statement in raw]
+        return int(entries) + edge_entries, int(exits) + edge_exits
+
+    def _hourly_summary_statement(self, start: Optional[datetime], end: Optional[datetime]):
+        statement = select(
+            EntryExitHourly.hour,
+            func.sum(EntryExitHourly.entering).label("entering"),
+            func.sum(EntryExitHourly.exiting).label("exiting"),
+            func.sum(EntryExitHourly.in_store).label("in_store")
+        ).where(EntryExitHourly.entry_count > 0)
+        if start is not None:
+            statement = statement.where(EntryExitHourly.bucket_start >= hour_bucket(start))
+        if end is not None:
+            statement = statement.where(EntryExitHourly.bucket_start < end.replace(tzinfo=None))
+        return statement.group_by(EntryExitHourly.hour).order_by(EntryExitHourly.hour)
+
+    def hourly_summary(self, db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """entering/exiting/in_store summed by hour of day over the hours in [start, end)"""
+        return db.execute(self._hourly_summary_statement(start, end)).all()
+
+    async def hourly_summary_async(self, db: AsyncSession, start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """hourly_summary for async routes"""
+        return (await db.execute(self._hourly_summary_statement(start, end))).all()
+
+    def rebuild(self, db: Session, camera_ids: Optional[Iterable[str]] = None, since: Optional[datetime] = None,
+                batch_size: int = 5000) -> int:
+        """Recompute the rollup from the raw entry and exit logs (backfill).
+
+        Retention drops entry logs long before the rollup, so only the hours
+        from the first whole hour the remaining entry logs cover (or the hour
+        of `since`, if later) are recomputed; earlier hours are kept as they are.
+        """
+        camera_ids = list(camera_ids) if camera_ids else None
+        oldest = db.query(func.min(EntryLog.timestamp)).scalar()
+        if oldest is None and settings.ENTRY_LOGS_RETENTION_DAYS > 0:
+            # No entry logs left; keep every hour retention may have emptied
+            oldest = datetime.utcnow() - timedelta(days=settings.ENTRY_LOGS_RETENTION_DAYS)
+        start = None
+        if oldest is not None:
+            # The oldest log's hour may have lost earlier logs to retention; start at the next whole one
+            start = hour_bucket(oldest)
+            if start < oldest:
+                start += HOUR
+        if since is not None:
+            start = max(start, hour_bucket(since)) if start is not None else hour_bucket(since)
+
+        query = db.query(EntryExitHourly)
+        if camera_ids:
+            query = query.filter(EntryExitHourly.camera_id.in_(camera_ids))
+        if start is not None:
+            query = query.filter(EntryExitHourly.bucket_start >= start)
+        query.delete(synchronize_session=False)
+
+        deltas = defaultdict(Counter)
+        total = 0
+        for model, kind, columns in (
+            (EntryLog, "entry", [EntryLog.camera_id, EntryLog.timestamp] + [getattr(EntryLog, name) for name in ENTRY_FIELDS]),
+            (ExitLog, "exit", [ExitLog.camera_id, ExitLog.timestamp])
+        ):
+            source = db.query(*columns)
+            if camera_ids:
+                source = source.filter(model.camera_id.in_(camera_ids))
+            if start is not None:
+                source = source.filter(model.timestamp >= start)
+            for key, delta in self._deltas((row._asdict() for row in source.yield_per(batch_size)), kind).items():
+                deltas[key].update(delta)
+                total += delta[f"{kind}_count"]
+
+        db.bulk_insert_mappings(EntryExitHourly, [
+            {
+                "camera_id": camera_id,
+                "bucket_start": bucket_start,
+                "hour": bucket_start.hour,
+                "entry_count": delta["entry_count"],
+                "exit_count": delta["exit_count"],
+                "entering": delta["entering"],
+                "exiting": delta["exiting"],
+                "in_store": delta["in_store"]
+            }
+            for (camera_id, bucket_start), delta in deltas.items()
+        ])
+        db.commit()
+        return total
+
+
+entry_exit_rollup_crud = EntryExitRollupCRUD()
+
+# Deferred (write-behind) logs update the rollup in the batch's transaction
+write_queue.after_insert(EntryLog, lambda db, rows: entry_exit_rollup_crud.add_entries(db, rows, commit=False))
+write_queue.after_insert(ExitLog, lambda db, rows: entry_exit_rollup_crud.add_exits(db, rows, commit=False))
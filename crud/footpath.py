@@ -58,6 +58,21 @@ class CRUDFootpath:
 
         return query.order_by(FootpathAnalytics.timestamp.desc()).all()
 
+    def get_analytics_heatmap(
+        self,
+        db: Session,
+        zone_id: str,
+        analytics_id: str
+    ) -> FootpathAnalytics:
+        """Get an analytics row that has a stored heatmap"""
+        analytics = db.query(FootpathAnalytics).filter(
+            FootpathAnalytics.id == analytics_id,
+            FootpathAnalytics.zone_id == zone_id
+        ).first()
+        if not analytics or (analytics.heatmap_grid is None and analytics.heatmap_data is None):
+            raise HTTPException(status_code=404, detail="Heatmap not found")
+        return analytics
+
     def create_pattern(
         self,
         db: Session,
@@ -0,0 +1,103 @@
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import TableClause
+from models.heatmapArchive import HeatmapArchive
+from crud.heatmapCube import EPOCH, MAX_GRID_CELLS, _add_padded, _decode
+from crud.spaceAnalytics import _floor_div, _epoch_bucket
+from services.heatmap_grid import encode_grid
+from config import settings
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+import numpy as np
+
+DAY_SECONDS = 86400
+
+
+class HeatmapArchiveCRUD:
+    """Downsamples raw heatmap points into daily cell_size grids before retention drops them.
+
+    Works on the retention job's connection rather than a session, so the
+    archive is committed in the same transaction that drops the points.
+    """
+
+    def __init__(self, cell_size: float = None):
+        self.cell_size = cell_size or settings.HEATMAP_ARCHIVE_CELL_SIZE
+
+    def archive(self, conn: Connection, source: TableClause, end: Optional[datetime] = None) -> int:
+        """Fold the points of a heatmap_data partition or shard (only those before `end` if given) into
+        the archive; returns the number of points archived"""
+        dialect = conn.dialect.name
+        cell_x = _floor_div(source.c.x, self.cell_size, dialect).label("cell_x")
+        cell_y = _floor_div(source.c.y, self.cell_size, dialect).label("cell_y")
+        day = _epoch_bucket(source.c.timestamp, DAY_SECONDS, dialect).label("day")
+        keys = [source.c.zone_id, source.c.camera_id, day, cell_x, cell_y]
+        query = select(
+            *keys,
+            func.sum(source.c.weight).label("weight"),
+            func.count().label("count")
+        ).where(
+            source.c.timestamp.isnot(None),
+            cell_x >= 0, cell_y >= 0, cell_x < MAX_GRID_CELLS, cell_y < MAX_GRID_CELLS
+        ).group_by(*keys)
+        if end is not None:
+            query = query.where(source.c.timestamp < end)
+
+        cells = defaultdict(list)
+        for row in conn.execute(query):
+            cells[(row.zone_id, row.camera_id, EPOCH + timedelta(days=int(row.day)))].append(
+                (row.cell_y, row.cell_x, row.weight or 0.0, row.count)
+            )
+        if not cells:
+            return 0
+
+        table = HeatmapArchive.__table__
+        existing = {
+            (row.zone_id, row.camera_id, row.day): row
+            for row in conn.execute(
+                select(table).where(
+                    table.c.zone_id.in_({zone_id for zone_id, _, _ in cells}),
+                    table.c.day.in_({day for _, _, day in cells}),
+                    table.c.cell_size == self.cell_size
+                ).with_for_update()
+            )
+        }
+
+        archived = 0
+        inserts = []
+        for (zone_id, camera_id, day), values in cells.items():
+            rows, cols, weights, counts = (np.array(column) for column in zip(*values))
+            grid = np.zeros((int(rows.max()) + 1, int(cols.max()) + 1), dtype=np.float64)
+            grid[rows, cols] = weights
+            point_count = int(counts.sum())
+            archived += point_count
+
+            row = existing.get((zone_id, camera_id, day))
+            if row is None:
+                inserts.append({
+                    "zone_id": zone_id,
+                    "camera_id": camera_id,
+                    "day": day,
+                    "cell_size": self.cell_size,
+                    "rows": grid.shape[0],
+                    "cols": grid.shape[1],
+                    "point_count": point_count,
+                    "total_weight": float(grid.sum()),
+                    "grid": encode_grid(grid)
+                })
+                continue
+            # A day can be archived in parts, e.g. rows that sat in the default partition
+            grid = _add_padded(_decode(row.grid), grid)
+            conn.execute(table.update().where(table.c.id == row.id).values(
+                rows=grid.shape[0],
+                cols=grid.shape[1],
+                point_count=row.point_count + point_count,
+                total_weight=float(grid.sum()),
+                grid=encode_grid(grid)
+            ))
+        if inserts:
+            conn.execute(table.insert(), inserts)
+        return archived
+
+
+heatmap_archive_crud = HeatmapArchiveCRUD()
@@ -0,0 +1,364 @@
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from models.heatmapCube import HeatmapCube
+from models.heatmapData import HeatmapData
+from services.heatmap_grid import encode_grid, decode_grid
+from services.write_behind import write_queue
+from config import settings
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+MAX_GRID_CELLS = 4096  # Per axis; points beyond this are dropped
+
+
+def _naive_utc(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        return ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def bucket_start_for(ts: datetime, bucket_seconds: int) -> datetime:
+    """Floor a timestamp to the start of its time bucket"""
+    ts = _naive_utc(ts)
+    offset = (ts - EPOCH).total_seconds() % bucket_seconds
+    return ts - timedelta(seconds=offset)
+
+
+def _add_padded(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Add two grids that may have different shapes (origin aligned), in float64"""
+    if a.shape == b.shape:
+        return np.add(a, b, dtype=np.float64)
+    shape = (max(a.shape[0], b.shape[0]), max(a.shape[1], b.shape[1]))
+    out = np.zeros(shape, dtype=np.float64)
+    out[:a.shape[0], :a.shape[1]] += a
+    out[:b.shape[0], :b.shape[1]] += b
+    return out
+
+
+def build_windows(
+    start: Optional[datetime],
+    end: Optional[datetime],
+    weekdays: Optional[List[int]] = None,
+    hour_from: Optional[int] = None,
+    hour_to: Optional[int] = None
+) -> List[Tuple[datetime, datetime]]:
+    """Split [start, end) into recurring windows, e.g. Tuesdays 14:00-16:00.
+
+    weekdays uses Monday=0. Without weekday/hour filters the whole range is a
+    single window.
+    """
+    start = _naive_utc(start) if start else datetime.min
+    end = _naive_utc(end) if end else datetime.max
+    if weekdays is None and hour_from is None and hour_to is None:
+        return [(start, end)]
+    if start == datetime.min or end == datetime.max:
+        raise ValueError("Recurring windows need both a start and an end")
+
+    hour_from = hour_from or 0
+    hour_to = hour_to if hour_to is not None else 24
+    windows = []
+    day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < end:
+        if weekdays is None or day.weekday() in weekdays:
+            window_start = max(start, day + timedelta(hours=hour_from))
+            window_end = min(end, day + timedelta(hours=hour_to))
+            if window_start < window_end:
+                windows.append((window_start, window_end))
+        day += timedelta(days=1)
+    return windows
+
+
+def _decode(blob: bytes) -> np.ndarray:
+    """Decode a stored grid as float64; rows written before the switch hold float32"""
+    return decode_grid(blob).astype(np.float64, copy=False)
+
+
+def _blobs_statement(ids):
+    return select(HeatmapCube.id, HeatmapCube.grid, HeatmapCube.cumulative).where(HeatmapCube.id.in_(ids))
+
+
+def grid_to_points(grid: np.ndarray, cell_size: float):
+    """Get (x, y, weight) arrays for the non-empty cells, x/y at cell centres"""
+    rows, cols = np.nonzero(grid)
+    return (cols + 0.5) * cell_size, (rows + 0.5) * cell_size, grid[rows, cols]
+
+
+class HeatmapCubeCRUD:
+    """Time-bucketed heatmap grids with per-series prefix sums.
+
+    Each (zone, camera) series keeps one row per bucket holding that bucket's
+    grid and the running total up to it, so the sum over any bucket range is
+    cumulative(last) - cumulative(first) + grid(first): two rows per range no
+    matter how long the range is. Grids are float64: running totals of a busy
+    cell pass 2**24 within days, where float32 stops counting single points.
+    """
+
+    def __init__(self, cell_size: float = None, bucket_seconds: int = None):
+        self.cell_size = cell_size or settings.HEATMAP_CELL_SIZE
+        self.bucket_seconds = bucket_seconds or settings.HEATMAP_BUCKET_SECONDS
+
+    def _rasterize(self, xs: np.ndarray, ys: np.ndarray, weights: np.ndarray) -> Optional[np.ndarray]:
+        cols = np.floor(xs / self.cell_size).astype(np.int64)
+        rows = np.floor(ys / self.cell_size).astype(np.int64)
+        mask = (cols >= 0) & (rows >= 0) & (cols < MAX_GRID_CELLS) & (rows < MAX_GRID_CELLS)
+        if not np.any(mask):
+            return None
+        rows, cols, weights = rows[mask], cols[mask], weights[mask]
+        shape = (int(rows.max()) + 1, int(cols.max()) + 1)
+        flat = np.bincount(rows * shape[1] + cols, weights=weights, minlength=shape[0] * shape[1])
+        return flat.reshape(shape)
+
+    def _lock_series(self, db: Session, zone_id: str, camera_id: str):
+        """Hold off other writers of the (zone, camera) series until this transaction ends"""
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"heatmap_cubes:{zone_id}:{camera_id}"})
+        elif dialect == "sqlite":
+            # Take the database write lock now, before the predecessor is read
+            db.execute(text("UPDATE heatmap_cubes SET id = id WHERE 0"))
+
+    def _apply_delta(self, db: Session, zone_id: str, camera_id: str, bucket_start: datetime, delta: np.ndarray, point_count: int):
+        """Add a grid to one bucket and carry it into every later prefix sum"""
+        self._lock_series(db, zone_id, camera_id)
+        try:
+            with db.begin_nested():
+                self._merge_delta(db, zone_id, camera_id, bucket_start, delta, point_count)
+        except IntegrityError:
+            # Another writer created the bucket first (only possible without the series lock); add to its row
+            with db.begin_nested():
+                self._merge_delta(db, zone_id, camera_id, bucket_start, delta, point_count)
+
+    def _merge_delta(self, db: Session, zone_id: str, camera_id: str, bucket_start: datetime, delta: np.ndarray, point_count: int):
+        series = db.query(HeatmapCube).filter(
+            HeatmapCube.zone_id == zone_id,
+            HeatmapCube.camera_id == camera_id,
+            HeatmapCube.bucket_start >= bucket_start
+        ).order_by(HeatmapCube.bucket_start).with_for_update().all()
+
+        if series and series[0].bucket_start == bucket_start:
+            cube = series[0]
+            later = series[1:]
+            self._check_series(cube)
+            cube.grid = encode_grid(_add_padded(_decode(cube.grid), delta))
+            cumulative = _add_padded(_decode(cube.cumulative), delta)
+        else:
+            later = series
+            previous = db.query(HeatmapCube).filter(
+                HeatmapCube.zone_id == zone_id,
+                HeatmapCube.camera_id == camera_id,
+                HeatmapCube.bucket_start < bucket_start
+            ).order_by(HeatmapCube.bucket_start.desc()).first()
+            if previous is not None:
+                self._check_series(previous)
+            elif later:
+                self._check_series(later[0])
+            cumulative = _add_padded(_decode(previous.cumulative), delta) if previous else delta
+            cube = HeatmapCube(
+                zone_id=zone_id,
+                camera_id=camera_id,
+                bucket_start=bucket_start,
+                bucket_seconds=self.bucket_seconds,
+                cell_size=self.cell_size,
+                point_count=0,
+                total_weight=0.0,
+                grid=encode_grid(delta)
+            )
+            db.add(cube)
+
+        cube.cumulative = encode_grid(cumulative)
+        cube.rows, cube.cols = cumulative.shape
+        cube.point_count = (cube.point_count or 0) + point_count
+        cube.total_weight = (cube.total_weight or 0.0) + float(delta.sum())
+
+        # Out-of-order writes touch every later bucket; live writes have none
+        for row in later:
+            updated = _add_padded(_decode(row.cumulative), delta)
+            row.cumulative = encode_grid(updated)
+            row.rows, row.cols = updated.shape
+
+        # Sessions don't autoflush; later buckets in the same batch must see this one
+        db.flush()
+
+    def _check_series(self, cube: HeatmapCube):
+        """Prefix sums only add up within one grid resolution and bucket length"""
+        if cube.cell_size != self.cell_size or cube.bucket_seconds != self.bucket_seconds:
+            raise ValueError(
+                f"Heatmap cube series {cube.zone_id}/{cube.camera_id} uses cell size {cube.cell_size} and "
+                f"{cube.bucket_seconds}s buckets, not {self.cell_size} and {self.bucket_seconds}s; rebuild it first"
+            )
+
+    def add_points(self, db: Session, points: Iterable, commit: bool = True) -> int:
+        """Accumulate points with camera_id, zone_id, timestamp, x, y and weight attributes"""
+        grouped = defaultdict(list)
+        for point in points:
+            key = (point.zone_id, point.camera_id, bucket_start_for(point.timestamp, self.bucket_seconds))
+            grouped[key].append((point.x, point.y, point.weight))
+
+        added = 0
+        for (zone_id, camera_id, bucket_start) in sorted(grouped, key=lambda k: (k[0], k[1], k[2])):
+            values = np.asarray(grouped[(zone_id, camera_id, bucket_start)], dtype=np.float64)
+            delta = self._rasterize(values[:, 0], values[:, 1], values[:, 2])
+            if delta is None:
+                continue
+            self._apply_delta(db, zone_id, camera_id, bucket_start, delta, len(values))
+            added += len(values)
+
+        if commit:
+            db.commit()
+        return added
+
+    def add_grid(self, db: Session, zone_id: str, camera_id: str, timestamp: datetime, counts: np.ndarray,
+                 cell_width: float, cell_height: float, commit: bool = True) -> int:
+        """Accumulate an in-memory HeatmapGrid, resampling its cells by their centres"""
+        rows, cols = np.nonzero(counts)
+        if rows.size == 0:
+            return 0
+        delta = self._rasterize(
+            (cols + 0.5) * cell_width,
+            (rows + 0.5) * cell_height,
+            counts[rows, cols].astype(np.float64)
+        )
+        if delta is None:
+            return 0
+        self._apply_delta(db, zone_id, camera_id, bucket_start_for(timestamp, self.bucket_seconds), delta, int(rows.size))
+        if commit:
+            db.commit()
+        return int(rows.size)
+
+    def enqueue_grid(self, zone_id: str, camera_id: str, timestamp: datetime, counts: np.ndarray,
+                     cell_width: float, cell_height: float):
+        """Queue add_grid on the write-behind worker; the grid travels encoded so a failed merge can be dead-lettered"""
+        write_queue.enqueue_call(self._add_queued_grid, {
+            "zone_id": zone_id,
+            "camera_id": camera_id,
+            "timestamp": timestamp,
+            "grid": encode_grid(np.asarray(counts, dtype=np.float64)),
+            "cell_width": cell_width,
+            "cell_height": cell_height
+        })
+
+    def _add_queued_grid(self, db: Session, payload: dict):
+        payload = dict(payload)
+        self.add_grid(db, counts=_decode(payload.pop("grid")), commit=False, **payload)
+
+    def _series_statement(self, zone_ids: List[str], windows: List[Tuple[datetime, datetime]]):
+        """Light query first: only keys and bucket starts, no blobs"""
+        overall_start = min(w[0] for w in windows)
+        overall_end = max(w[1] for w in windows)
+        statement = select(HeatmapCube.id, HeatmapCube.zone_id, HeatmapCube.camera_id, HeatmapCube.bucket_start).where(
+            HeatmapCube.zone_id.in_(zone_ids),
+            HeatmapCube.cell_size == self.cell_size
+        )
+        if overall_start > datetime.min:
+            statement = statement.where(HeatmapCube.bucket_start >= bucket_start_for(overall_start, self.bucket_seconds))
+        if overall_end < datetime.max:
+            statement = statement.where(HeatmapCube.bucket_start < overall_end)
+        return statement.order_by(HeatmapCube.bucket_start)
+
+    def _spans(self, rows, windows: List[Tuple[datetime, datetime]]):
+        """For each series and window, the ids of the first and last bucket inside it"""
+        series = defaultdict(lambda: ([], []))
+        for row_id, zone_id, camera_id, bucket_start in rows:
+            ids, starts = series[(zone_id, camera_id)]
+            ids.append(row_id)
+            starts.append(bucket_start)
+
+        spans = defaultdict(list)
+        needed = set()
+        for key, (ids, starts) in series.items():
+            for window_start, window_end in windows:
+                i = bisect_left(starts, bucket_start_for(window_start, self.bucket_seconds)) if window_start > datetime.min else 0
+                j = bisect_left(starts, window_end) if window_end < datetime.max else len(starts)
+                if i < j:
+                    spans[key].append((ids[i], ids[j - 1]))
+                    needed.update((ids[i], ids[j - 1]))
+        return spans, needed
+
+    def _sum_spans(self, spans, blobs) -> Dict[Tuple[str, str], np.ndarray]:
+        totals = {}
+        for key, key_spans in spans.items():
+            total = np.zeros((0, 0), dtype=np.float64)
+            for first_id, last_id in key_spans:
+                first = blobs[first_id]
+                last = blobs[last_id]
+                before_first = _add_padded(-_decode(first.cumulative), _decode(first.grid))
+                total = _add_padded(total, _add_padded(_decode(last.cumulative), before_first))
+            totals[key] = np.maximum(total, 0)  # Fractional weights can leave -1e-12 style residue
+        return totals
+
+    def range_sums(self, db: Session, zone_ids: List[str], windows: List[Tuple[datetime, datetime]]) -> Dict[Tuple[str, str], np.ndarray]:
+        """Sum every (zone, camera) series over a set of time windows"""
+        if not windows:
+            return {}
+        spans, needed = self._spans(db.execute(self._series_statement(zone_ids, windows)), windows)
+        if not needed:
+            return {}
+        blobs = {row.id: row for row in db.execute(_blobs_statement(needed))}
+        return self._sum_spans(spans, blobs)
+
+    async def range_sums_async(self, db: AsyncSession, zone_ids: List[str],
+                               windows: List[Tuple[datetime, datetime]]) -> Dict[Tuple[str, str], np.ndarray]:
+        """range_sums for async routes; the grids are decoded and summed in the threadpool"""
+        if not windows:
+            return {}
+        spans, needed = self._spans(await db.execute(self._series_statement(zone_ids, windows)), windows)
+        if not needed:
+            return {}
+        blobs = {row.id: row for row in await db.execute(_blobs_statement(needed))}
+        return await run_in_threadpool(self._sum_spans, spans, blobs)
+
+    def rebuild(self, db: Session, zone_ids: Optional[List[str]] = None, since: Optional[datetime] = None,
+                batch_size: int = 50000) -> int:
+        """Backfill cubes from raw HeatmapData rows.
+
+        Retention drops raw points long before their cubes, so each series is
+        only recomputed from the first whole bucket its raw points still cover
+        (or the bucket of `since`, if later). Earlier buckets are kept and the
+        rebuilt prefix sums continue from them. Series without raw points, such as those fed
+        by the footpath processor's grids, are left untouched.
+        """
+        series = db.query(HeatmapData.zone_id, HeatmapData.camera_id, func.min(HeatmapData.timestamp)).filter(
+            HeatmapData.timestamp.isnot(None)
+        )
+        if zone_ids:
+            series = series.filter(HeatmapData.zone_id.in_(zone_ids))
+
+        total = 0
+        for zone_id, camera_id, oldest in series.group_by(HeatmapData.zone_id, HeatmapData.camera_id).all():
+            # The oldest point's bucket may have lost earlier points to retention; start at the next whole one
+            start = bucket_start_for(oldest, self.bucket_seconds)
+            if start < oldest:
+                start += timedelta(seconds=self.bucket_seconds)
+            if since is not None:
+                start = max(start, bucket_start_for(since, self.bucket_seconds))
+            db.query(HeatmapCube).filter(
+                HeatmapCube.zone_id == zone_id,
+                HeatmapCube.camera_id == camera_id,
+                HeatmapCube.bucket_start >= start
+            ).delete(synchronize_session=False)
+
+            # Oldest first so prefix sums are appended rather than rewritten
+            query = db.query(HeatmapData).filter(
+                HeatmapData.zone_id == zone_id,
+                HeatmapData.camera_id == camera_id,
+                HeatmapData.timestamp >= start
+            ).order_by(HeatmapData.timestamp, HeatmapData.id)
+            offset = 0
+            while True:
+                batch = query.offset(offset).limit(batch_size).all()
+                if not batch:
+                    break
+                total += self.add_points(db, batch, commit=False)
+                offset += len(batch)
+        db.commit()
+        return total
+
+
+heatmap_cube_crud = HeatmapCubeCRUD()
@@ -0,0 +1,42 @@
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from models.parkingStall import ParkingStall
+from schemas.parkingStall import ParkingStallImport
+
+
+class CRUDParkingStall:
+    def bulk_import(self, db: Session, zone_id: str, stall_import: ParkingStallImport) -> List[ParkingStall]:
+        """
+        Insert a whole lot's stalls in one transaction, optionally replacing the camera's current layout.
+        """
+        if stall_import.replace:
+            db.query(ParkingStall).filter(
+                ParkingStall.zone_id == zone_id,
+                ParkingStall.camera_id == stall_import.camera_id
+            ).delete(synchronize_session=False)
+
+        stalls = [
+            ParkingStall(
+                zone_id=zone_id,
+                camera_id=stall_import.camera_id,
+                label=stall.label,
+                polygon=stall.polygon,
+                min_overlap=stall.min_overlap
+            )
+            for stall in stall_import.stalls
+        ]
+        db.add_all(stalls)
+        db.commit()
+        return self.get_by_zone(db, zone_id=zone_id, camera_id=stall_import.camera_id)
+
+    def get_by_zone(self, db: Session, zone_id: str, camera_id: Optional[str] = None) -> List[ParkingStall]:
+        """
+        Retrieve the stalls of a zone, optionally for one camera.
+        """
+        query = db.query(ParkingStall).filter(ParkingStall.zone_id == zone_id)
+        if camera_id:
+            query = query.filter(ParkingStall.camera_id == camera_id)
+        return query.order_by(ParkingStall.created_at, ParkingStall.label).all()
+
+
+parking_stall = CRUDParkingStall()
@@ -1,13 +1,17 @@
+from sqlalchemy import Integer, and_, cast, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models.spaceAnalytics import SpaceAnalytics
 from models.demographics import Demographics
 from models.heatmapData import HeatmapData
 from schemas.heatmapData import HeatmapDataCreate
 from schemas.demographics import DemographicsCreate
+from crud.heatmapCube import heatmap_cube_crud
+from crud.demographicsRollup import demographics_rollup_crud
 from models.zone import Zone
 from uuid import UUID
 import datetime
-from typing import List
+from typing import List, Optional, Tuple
 
 class SpaceAnalyticsCRUD:
     def get_by_property(self, db: Session, property_id: UUID):
@@ -28,6 +32,8 @@ class DemographicsCRUD:
         data = demographics_data.dict(exclude_unset=True)
         new_demographics = Demographics(**data)
         db.add(new_demographics)
+        # Keep the hourly/daily rollups in step with the raw rows
+        demographics_rollup_crud.add(db, new_demographics, commit=False)
         db.commit()
         db.refresh(new_demographics)
         return new_demographics
@@ -69,8 +75,102 @@ class HeatmapDataCRUD:
             for point in heatmap_data.points
         ]
         db.add_all(new_points)
+        # Keep the time-bucketed cubes in step with the raw points
+        heatmap_cube_crud.add_points(db, new_points, commit=False)
         db.commit()
         return new_points
 
+    def _grid_statement(
+        self,
+        dialect: str,
+        zone_ids: List[str],
+        windows: List[Tuple[datetime.datetime, datetime.datetime]],
+        cell_size: float,
+        bucket_seconds: Optional[int]
+    ):
+        cell_x = _floor_div(HeatmapData.x, cell_size, dialect).label("cell_x")
+        cell_y = _floor_div(HeatmapData.y, cell_size, dialect).label("cell_y")
+        columns = [HeatmapData.zone_id, HeatmapData.camera_id]
+        if bucket_seconds:
+            columns.append(_epoch_bucket(HeatmapData.timestamp, bucket_seconds, dialect).label("bucket"))
+        columns += [cell_x, cell_y]
+
+        return select(
+            *columns,
+            func.sum(HeatmapData.weight).label("weight"),
+            func.count().label("count")
+        ).where(
+            HeatmapData.zone_id.in_(zone_ids),
+            or_(*[
+                and_(HeatmapData.timestamp >= start, HeatmapData.timestamp < end)
+                for start, end in windows
+            ])
+        ).group_by(*columns).order_by(*columns)
+
+    def _grid_rows(self, result, bucket_seconds: Optional[int]):
+        return [
+            (
+                row.zone_id,
+                row.camera_id,
+                row.bucket if bucket_seconds else None,
+                row.cell_x,
+                row.cell_y,
+                row.weight,
+                row.count
+            )
+            for row in result
+        ]
+
+    def grid_sums(
+        self,
+        db: Session,
+        zone_ids: List[str],
+        windows: List[Tuple[datetime.datetime, datetime.datetime]],
+        cell_size: float,
+        bucket_seconds: Optional[int] = None
+    ):
+        """Bin raw points into cell_size cells (and optional time buckets) with GROUP BY.
+
+        Returns (zone_id, camera_id, bucket, cell_x, cell_y, weight, count)
+        rows; bucket is seconds since the epoch divided by bucket_seconds, or
+        None without time bucketing.
+        """
+        if not windows or not zone_ids:
+            return []
+        statement = self._grid_statement(db.get_bind().dialect.name, zone_ids, windows, cell_size, bucket_seconds)
+        return self._grid_rows(db.execute(statement), bucket_seconds)
+
+    async def grid_sums_async(
+        self,
+        db: AsyncSession,
+        zone_ids: List[str],
+        windows: List[Tuple[datetime.datetime, datetime.datetime]],
+        cell_size: float,
+        bucket_seconds: Optional[int] = None
+    ):
+        """grid_sums for async routes"""
+        if not windows or not zone_ids:
+            return []
+        statement = self._grid_statement(db.get_bind().dialect.name, zone_ids, windows, cell_size, bucket_seconds)
+        return self._grid_rows(await db.execute(statement), bucket_seconds)
+
+
+def _floor_div(column, size: float, dialect: str):
+    """floor(column / size) as an integer; SQLite has no floor() in older builds"""
+    if dialect == "sqlite":
+        truncated = cast(column / size, Integer)
+        # CAST truncates towards zero, step negative non-integers down one more cell
+        return truncated - cast(column < truncated * size, Integer)
+    return cast(func.floor(column / size), Integer)
+
+
+def _epoch_bucket(column, bucket_seconds: int, dialect: str):
+    """Index of the bucket_seconds-long bucket since the epoch a timestamp falls in"""
+    if dialect == "sqlite":
+        seconds = cast(func.strftime("%s", column), Integer)
+    else:
+        seconds = func.extract("epoch", column)
+    return _floor_div(seconds, bucket_seconds, dialect)
+
 
 heatmap_data_crud = HeatmapDataCRUD()
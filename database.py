@@ -1,7 +1,9 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from config import settings
 
 # Check if using SQLite and add appropriate connection settings
@@ -28,6 +30,38 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+def async_database_url(url: str):
+    """The same database through its asyncio driver: asyncpg for PostgreSQL, aiosqlite for SQLite"""
+    url = make_url(url)
+    if url.get_backend_name() == 'postgresql':
+        url = url.set(drivername='postgresql+asyncpg')
+        # asyncpg takes ssl=..., not libpq's sslmode=...
+        if 'sslmode' in url.query:
+            url = url.difference_update_query(['sslmode']).update_query_dict({'ssl': url.query['sslmode']})
+    elif url.get_backend_name() == 'sqlite':
+        url = url.set(drivername='sqlite+aiosqlite')
+    return url
+
+# Used by the async routes (the heatmap, demographics, people-count and entry summary reads and the
+# camera stream endpoints), so slow queries wait on the event loop instead of holding a worker thread
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    connect_args=connect_args,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=5,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=True
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False  # Attribute access after commit would need an await
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -35,4 +69,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,7 +1,11 @@
-from fastapi import FastAPI
+import queue
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from routers import camera,entry_exit,analytics,vehicle_detection,smoking_detection,threat_detection,environment,security,staff,vehicle,activity,dashboard,property,zone,behavior,pattern, spaceAnalytics, securityEvent, incident, parkingEvent, parkingAnalytics, business, business_super_admin,footpath
 from fastapi.staticfiles import StaticFiles
+from services.write_behind import write_queue
+from services.retention import retention_job
 
 
 app = FastAPI(
@@ -48,6 +52,27 @@ app.mount("/streams", StaticFiles(directory="stream_output"), name="streams")
 
 
 
+@app.exception_handler(queue.Full)
+def write_queue_full(request: Request, exc: queue.Full):
+    return JSONResponse(status_code=503, content={"detail": "Write queue is full, retry later"})
+
+@app.on_event("startup")
+def start_write_queue():
+    write_queue.start()
+
+@app.on_event("shutdown")
+def drain_write_queue():
+    # Rows queued by processors and deferred ingest routes must reach the database before exit
+    write_queue.stop()
+
+@app.on_event("startup")
+def start_retention_job():
+    retention_job.start()
+
+@app.on_event("shutdown")
+def stop_retention_job():
+    retention_job.stop()
+
 @app.get("/")
 def read_root():
     return {"message": "VisionTrack API is running"}
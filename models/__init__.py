@@ -1,6 +1,7 @@
 from .camera import Camera
 from .entry_log import EntryLog
 from .exit_log import ExitLog
+from .entryExitRollup import EntryExitHourly
 from .smoking_detection import SmokingDetection
 from .threat_detection import ThreatDetection
 from .vehicle_detection import VehicleDetection
@@ -15,12 +16,16 @@ from .behavior import Behavior
 from .pattern import Pattern
 from .spaceAnalytics import SpaceAnalytics
 from .heatmapData import HeatmapData
+from .heatmapCube import HeatmapCube
+from .heatmapArchive import HeatmapArchive
 from .demographics import Demographics
+from .demographicsRollup import DemographicsHourly, DemographicsDaily
 from .securityEvent import SecurityEvent
 from .detection import Detection
 from .incident import Incident
 from .parkingEvent import ParkingEvent
 from .parkingAnalytics import ParkingAnalytics
+from .parkingStall import ParkingStall
 from .business import Business
 from .footpath import FootpathAnalytics, FootpathPattern
 
@@ -31,6 +36,7 @@ __all__ = [
    "Camera",
    "EntryLog",
    "ExitLog",
+   "EntryExitHourly",
    "SmokingDetection",
    "ThreatDetection",
    "VehicleDetection",
@@ -51,12 +57,17 @@ __all__ = [
    "Pattern",
    "SpaceAnalytics",
    "HeatmapData",
+   "HeatmapCube",
+   "HeatmapArchive",
    "Demographics",
+   "DemographicsHourly",
+   "DemographicsDaily",
    "SecurityEvent",
    "Detection",
    "Incident",
    "ParkingEvent",
    "ParkingAnalytics",
+   "ParkingStall",
    "Floor",
    "Building",
    "Business"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, JSON, ForeignKey, Integer
+from sqlalchemy import Column, String, DateTime, JSON, ForeignKey, Integer, Index
 from datetime import datetime, timezone
 import uuid
 from .base import Base
@@ -6,6 +6,10 @@ from sqlalchemy.orm import relationship
 
 class Demographics(Base):
     __tablename__ = "demographics"
+    __table_args__ = (
+        Index("ix_demographics_zone_id_timestamp", "zone_id", "timestamp"),
+        Index("ix_demographics_timestamp", "timestamp", postgresql_using="brin"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     zone_id = Column(String, ForeignKey("zones.id"), nullable=False)
@@ -0,0 +1,44 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, UniqueConstraint
+from sqlalchemy.orm import declared_attr
+import uuid
+from .base import Base
+
+# Stands for "every age group" / "every gender" in a rollup row
+ALL = "*"
+
+
+class DemographicsRollupMixin:
+    """Counts per (zone, time bucket, age group, gender).
+
+    age_group=ALL rows hold the gender distribution, gender=ALL rows the age
+    group totals, and the (ALL, ALL) row the total count of the bucket.
+    """
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    age_group = Column(String, nullable=False)
+    gender = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    @declared_attr
+    def zone_id(cls):
+        return Column(String, ForeignKey("zones.id"), nullable=False)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (
+            UniqueConstraint("zone_id", "bucket_start", "age_group", "gender", name=f"uq_{cls.__tablename__}_zone_bucket_group"),
+        )
+
+    def __repr__(self):
+        return f"<{type(self).__name__}(zone_id={self.zone_id}, bucket_start={self.bucket_start}, age_group={self.age_group}, gender={self.gender}, count={self.count})>"
+
+
+class DemographicsHourly(DemographicsRollupMixin, Base):
+    __tablename__ = "demographics_hourly"
+    bucket_seconds = 3600
+
+
+class DemographicsDaily(DemographicsRollupMixin, Base):
+    __tablename__ = "demographics_daily"
+    bucket_seconds = 86400
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, JSON, ForeignKey, DateTime
+from sqlalchemy import Column, String, Float, JSON, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 from datetime import datetime, timezone
@@ -7,6 +7,10 @@ import uuid
 
 class Detection(Base):
     __tablename__ = "detections"
+    __table_args__ = (
+        Index("ix_detections_camera_id_timestamp", "camera_id", "timestamp"),
+        Index("ix_detections_timestamp", "timestamp", postgresql_using="brin"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     camera_id = Column(String, ForeignKey("cameras.id"), nullable=False)
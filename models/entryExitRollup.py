@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, DateTime, Integer, UniqueConstraint
+import uuid
+from .base import Base
+
+
+class EntryExitHourly(Base):
+    """Entry and exit log totals per (camera, hour)"""
+    __tablename__ = "entry_exit_hourly"
+    __table_args__ = (
+        UniqueConstraint("camera_id", "bucket_start", name="uq_entry_exit_hourly_camera_bucket"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    camera_id = Column(String, nullable=False, index=True)  # "" for logs without a camera
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    hour = Column(Integer, nullable=False)  # Hour of day of bucket_start, for time-of-day summaries
+    entry_count = Column(Integer, nullable=False, default=0)  # entry_logs rows
+    exit_count = Column(Integer, nullable=False, default=0)  # exit_logs rows
+    entering = Column(Integer, nullable=False, default=0)  # Sums of the entry_logs counters
+    exiting = Column(Integer, nullable=False, default=0)
+    in_store = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<EntryExitHourly(camera_id={self.camera_id}, bucket_start={self.bucket_start}, entries={self.entry_count}, exits={self.exit_count})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, JSON, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .base import Base
@@ -6,6 +6,11 @@ import uuid
 
 class FootpathAnalytics(Base):
     __tablename__ = "footpath_analytics"
+    __table_args__ = (
+        Index("ix_footpath_analytics_zone_id_business_id_timestamp", "zone_id", "business_id", "timestamp"),
+        Index("ix_footpath_analytics_property_id_timestamp", "property_id", "timestamp"),
+        Index("ix_footpath_analytics_timestamp", "timestamp", postgresql_using="brin"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     zone_id = Column(String, ForeignKey("zones.id"), nullable=False)
@@ -17,7 +22,10 @@ class FootpathAnalytics(Base):
     avg_dwell_time = Column(Float, nullable=True)
     max_dwell_time = Column(Float, nullable=True)
     total_dwell_time = Column(Float, nullable=True)
-    heatmap_data = Column(JSON, nullable=True)
+    heatmap_data = Column(JSON, nullable=True)  # Legacy rendered image, only on rows written before heatmap_grid
+    heatmap_grid = Column(LargeBinary, nullable=True)  # zlib-compressed .npy float32 grid counts, rendered on read
+    frame_width = Column(Integer, nullable=True)  # Frame size the grid covers, needed to render it
+    frame_height = Column(Integer, nullable=True)
 
     # Relationships
     zone = relationship("Zone", back_populates="footpath_analytics")
@@ -26,6 +34,11 @@ class FootpathAnalytics(Base):
 
 class FootpathPattern(Base):
     __tablename__ = "footpath_patterns"
+    __table_args__ = (
+        Index("ix_footpath_patterns_zone_id_business_id_timestamp", "zone_id", "business_id", "timestamp"),
+        Index("ix_footpath_patterns_property_id_pattern_type_timestamp", "property_id", "pattern_type", "timestamp"),
+        Index("ix_footpath_patterns_timestamp", "timestamp", postgresql_using="brin"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     zone_id = Column(String, ForeignKey("zones.id"), nullable=False)
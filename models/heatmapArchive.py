@@ -0,0 +1,27 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Float, LargeBinary, UniqueConstraint
+from datetime import datetime
+import uuid
+from .base import Base
+
+
+class HeatmapArchive(Base):
+    """Coarse daily heatmap grid per (zone, camera), kept after retention drops the raw points"""
+    __tablename__ = "heatmap_archive"
+    __table_args__ = (
+        UniqueConstraint("zone_id", "camera_id", "day", "cell_size", name="uq_heatmap_archive_zone_camera_day_cell"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    zone_id = Column(String, ForeignKey("zones.id"), nullable=False, index=True)
+    camera_id = Column(String, nullable=False)
+    day = Column(DateTime, nullable=False, index=True)
+    cell_size = Column(Float, nullable=False)
+    rows = Column(Integer, nullable=False, default=0)
+    cols = Column(Integer, nullable=False, default=0)
+    point_count = Column(Integer, nullable=False, default=0)
+    total_weight = Column(Float, nullable=False, default=0.0)
+    grid = Column(LargeBinary, nullable=False)  # zlib-compressed .npy float64 weights (float32 on older rows), see services.heatmap_grid
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<HeatmapArchive(zone_id={self.zone_id}, camera_id={self.camera_id}, day={self.day}, points={self.point_count})>"
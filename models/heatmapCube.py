@@ -0,0 +1,29 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Float, LargeBinary, UniqueConstraint
+from datetime import datetime
+import uuid
+from .base import Base
+
+
+class HeatmapCube(Base):
+    """One compressed heatmap grid per (zone, camera, time bucket)"""
+    __tablename__ = "heatmap_cubes"
+    __table_args__ = (
+        UniqueConstraint("zone_id", "camera_id", "bucket_start", name="uq_heatmap_cubes_zone_camera_bucket"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    zone_id = Column(String, ForeignKey("zones.id"), nullable=False, index=True)
+    camera_id = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    bucket_seconds = Column(Integer, nullable=False)
+    cell_size = Column(Float, nullable=False)
+    rows = Column(Integer, nullable=False, default=0)
+    cols = Column(Integer, nullable=False, default=0)
+    point_count = Column(Integer, nullable=False, default=0)
+    total_weight = Column(Float, nullable=False, default=0.0)
+    grid = Column(LargeBinary, nullable=False)  # zlib-compressed .npy float64 counts for this bucket (float32 on older rows)
+    cumulative = Column(LargeBinary, nullable=False)  # Prefix sum of all buckets up to and including this one
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<HeatmapCube(zone_id={self.zone_id}, camera_id={self.camera_id}, bucket_start={self.bucket_start}, points={self.point_count})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, JSON, ForeignKey, Integer, Float, Boolean, Enum as SQLAlchemyEnum
+from sqlalchemy import Column, String, DateTime, JSON, ForeignKey, Integer, Float, Boolean, Enum as SQLAlchemyEnum, Index
 from datetime import datetime, timezone
 import uuid
 from .base import Base
@@ -16,6 +16,13 @@ class ZoneActivity(str, enum.Enum):
 
 class HeatmapData(Base):
     __tablename__ = "heatmap_data"
+    __table_args__ = (
+        # Grid/cube reads scan (zone, time range) and only need these columns
+        Index("ix_heatmap_data_zone_id_timestamp", "zone_id", "timestamp",
+              postgresql_include=["camera_id", "x", "y", "weight"]),
+        Index("ix_heatmap_data_camera_id_timestamp", "camera_id", "timestamp"),
+        Index("ix_heatmap_data_timestamp", "timestamp", postgresql_using="brin"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     camera_id = Column(String, nullable=False)
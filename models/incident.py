@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.orm import relationship
 import uuid
 from datetime import datetime, timezone
@@ -7,6 +7,10 @@ from .base import Base
 
 class Incident(Base):
     __tablename__ = "incidents"
+    __table_args__ = (
+        Index("ix_incidents_property_id_created_at", "property_id", "created_at"),
+        Index("ix_incidents_created_at", "created_at", postgresql_using="brin"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     property_id = Column(String, ForeignKey("properties.id"), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, String
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, String, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 from uuid import uuid4
@@ -7,6 +7,10 @@ from datetime import datetime
 
 class ParkingAnalytics(Base):
     __tablename__ = "parking_analytics"
+    __table_args__ = (
+        Index("ix_parking_analytics_zone_id_timestamp", "zone_id", "timestamp"),
+        Index("ix_parking_analytics_timestamp", "timestamp", postgresql_using="brin"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid4()))
     zone_id = Column(String, ForeignKey("zones.id"), nullable=False)
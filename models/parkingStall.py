@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, JSON
+from datetime import datetime
+import uuid
+from .base import Base
+
+
+class ParkingStall(Base):
+    """A polygon parking stall in a camera's image coordinates"""
+    __tablename__ = "parking_stalls"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    zone_id = Column(String, ForeignKey("zones.id"), nullable=False, index=True)
+    camera_id = Column(String, nullable=False, index=True)
+    label = Column(String, nullable=True)
+    polygon = Column(JSON, nullable=False)  # [[x, y], ...] in frame pixels
+    min_overlap = Column(Float, nullable=False, default=0.3)  # Share of the stall a vehicle box must cover
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ParkingStall(zone_id={self.zone_id}, camera_id={self.camera_id}, label={self.label})>"
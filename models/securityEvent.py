@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Enum, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, String, Enum, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 import uuid
@@ -29,6 +29,11 @@ class EventStatus(PyEnum):
 
 class SecurityEvent(Base):
     __tablename__ = "security_events"
+    __table_args__ = (
+        Index("ix_security_events_property_id_timestamp", "property_id", "timestamp"),
+        Index("ix_security_events_zone_id_timestamp", "zone_id", "timestamp"),
+        Index("ix_security_events_timestamp", "timestamp", postgresql_using="brin"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     property_id = Column(String, ForeignKey("properties.id"), nullable=False)
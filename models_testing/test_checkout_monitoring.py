@@ -79,6 +79,7 @@ def test_checkout_monitoring(video_path, model_path, output_path=None):
     if writer:
         writer.release()
     cv2.destroyAllWindows()
+    checkout_service.close_visits()
     
     if output_path:
         analytics_path = output_path.replace('.mp4', '_checkout_analytics.json')
@@ -1,14 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from database import get_db
+from database import get_db, get_async_db
 from models import camera as camera_model
 from schemas import camera as camera_schema
 from models.property import Property
 from models.zone import Zone
 import json
 from models.business import Business
-from utils.auth_middleware import verify_business_auth
+from utils.auth_middleware import verify_business_auth, verify_business_auth_async
 import backoff
 from sqlalchemy.exc import OperationalError
 import logging
@@ -201,16 +203,16 @@ def delete_camera(
 @router.post("/{camera_id}/stream/start")
 async def start_camera_stream(
     camera_id: str,
-    db: Session = Depends(get_db),
-    business: Business = Depends(verify_business_auth)
+    db: AsyncSession = Depends(get_async_db),
+    business: Business = Depends(verify_business_auth_async)
 ):
     """Start streaming for a camera"""
     logger.info(f"Starting stream for camera {camera_id}")
 
-    db_camera = db.query(camera_model.Camera).filter(
+    db_camera = (await db.execute(select(camera_model.Camera).filter(
         camera_model.Camera.camera_id == camera_id,
         camera_model.Camera.business_id == business.id
-    ).first()
+    ))).scalars().first()
 
     if not db_camera:
         logger.error(f"Camera {camera_id} not found")
@@ -242,16 +244,16 @@ async def start_camera_stream(
 @router.post("/{camera_id}/stream/stop")
 async def stop_camera_stream(
     camera_id: str,
-    db: Session = Depends(get_db),
-    business: Business = Depends(verify_business_auth)
+    db: AsyncSession = Depends(get_async_db),
+    business: Business = Depends(verify_business_auth_async)
 ):
     """Stop streaming for a camera"""
     logger.info(f"Stopping stream for camera {camera_id}")
 
-    db_camera = db.query(camera_model.Camera).filter(
+    db_camera = (await db.execute(select(camera_model.Camera).filter(
         camera_model.Camera.camera_id == camera_id,
         camera_model.Camera.business_id == business.id
-    ).first()
+    ))).scalars().first()
 
     if not db_camera:
         logger.error(f"Camera {camera_id} not found")
@@ -273,16 +275,16 @@ async def stop_camera_stream(
 @router.get("/{camera_id}/stream/status")
 async def get_stream_status(
     camera_id: str,
-    db: Session = Depends(get_db),
-    business: Business = Depends(verify_business_auth)
+    db: AsyncSession = Depends(get_async_db),
+    business: Business = Depends(verify_business_auth_async)
 ):
     """Get stream status for a camera"""
     logger.info(f"Getting stream status for camera {camera_id}")
 
-    db_camera = db.query(camera_model.Camera).filter(
+    db_camera = (await db.execute(select(camera_model.Camera).filter(
         camera_model.Camera.camera_id == camera_id,
         camera_model.Camera.business_id == business.id
-    ).first()
+    ))).scalars().first()
 
     if not db_camera:
         logger.error(f"Camera {camera_id} not found")
@@ -10,7 +10,7 @@ import schemas as schemas
 router = APIRouter()
 
 @router.get("/summary", response_model=schemas.dashboard.MonitoringSummary)
-async def get_monitoring_summary(
+def get_monitoring_summary(
     db: Session = Depends(get_db),
     start_date: Optional[datetime] = Query(None, description="Filter by start date"),
     end_date: Optional[datetime] = Query(None, description="Filter by end date")
@@ -1,43 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+from database import get_db, get_async_db
+from fastapi.responses import JSONResponse
+from services.write_behind import write_queue
+from services.batch_ingest import ingest
 from models import entry_log as entry_model, exit_log as exit_model
 from schemas import entry_log as entry_schema, exit_log as exit_schema
-from sqlalchemy.sql import func
+from crud.entryExitRollup import entry_exit_rollup_crud
 
 
 router = APIRouter()
 
 @router.post("/entrylog/", response_model=entry_schema.EntryLog)
-def create_entry_log(entry: entry_schema.EntryLogCreate, db: Session = Depends(get_db)):
+def create_entry_log(entry: entry_schema.EntryLogCreate, defer: bool = False, db: Session = Depends(get_db)):
+    if defer:
+        # Write-behind: queue the row and return without waiting for the database
+        write_queue.enqueue(entry_model.EntryLog, entry.model_dump())
+        return JSONResponse(status_code=202, content={"queued": 1})
     db_entry = entry_model.EntryLog(**entry.model_dump())
     db.add(db_entry)
+    entry_exit_rollup_crud.add_entries(db, [db_entry], commit=False)
     db.commit()
     db.refresh(db_entry)
     return db_entry
 
-@router.get("/entrylog/summary/", response_model=List[entry_schema.EntryLogSummary])
-def get_entry_log_summary(db: Session = Depends(get_db)):
-    # Query to aggregate data grouped by the hour (time)
-    summary_query = (
-        db.query(
-            func.strftime('%H:00', entry_model.EntryLog.timestamp).label("time"),
-            func.sum(entry_model.EntryLog.entering).label("entering"),
-            func.sum(entry_model.EntryLog.exiting).label("exiting"),
-            func.sum(entry_model.EntryLog.in_store).label("inStore"),
-        )
-        .group_by(func.strftime('%H:00', entry_model.EntryLog.timestamp))
-        .all()
+@router.post("/entrylog/batch")
+async def create_entry_logs_batch(request: Request, db: Session = Depends(get_db)):
+    """Store a batch of entry logs sent as NDJSON or a JSON array, reporting invalid records by index"""
+    return await ingest(
+        request, db, entry_model.EntryLog, entry_schema.EntryLogCreate,
+        on_chunk=lambda session, entries: entry_exit_rollup_crud.add_entries(session, entries, commit=False)
     )
 
+@router.get("/entrylog/summary/", response_model=List[entry_schema.EntryLogSummary])
+async def get_entry_log_summary(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Totals by hour of day, summed from the hourly rollup instead of every log row
+    summary_query = await entry_exit_rollup_crud.hourly_summary_async(db, start=start_time, end=end_time)
+
     # Convert query result to the desired response format
     summary = [
         {
-            "time": result.time,
+            "time": f"{result.hour:02d}:00",
             "entering": result.entering,
             "exiting": result.exiting,
-            "inStore": result.inStore,
+            "inStore": result.in_store,
         }
         for result in summary_query
     ]
@@ -45,13 +58,25 @@ def get_entry_log_summary(db: Session = Depends(get_db)):
     return summary
 
 @router.post("/exitlog/", response_model=exit_schema.ExitLog)
-def create_exit_log(exit: exit_schema.ExitLogCreate, db: Session = Depends(get_db)):
+def create_exit_log(exit: exit_schema.ExitLogCreate, defer: bool = False, db: Session = Depends(get_db)):
+    if defer:
+        write_queue.enqueue(exit_model.ExitLog, exit.dict())
+        return JSONResponse(status_code=202, content={"queued": 1})
     db_exit = exit_model.ExitLog(**exit.dict())
     db.add(db_exit)
+    entry_exit_rollup_crud.add_exits(db, [db_exit], commit=False)
     db.commit()
     db.refresh(db_exit)
     return db_exit
 
+@router.post("/exitlog/batch")
+async def create_exit_logs_batch(request: Request, db: Session = Depends(get_db)):
+    """Store a batch of exit logs sent as NDJSON or a JSON array, reporting invalid records by index"""
+    return await ingest(
+        request, db, exit_model.ExitLog, exit_schema.ExitLogCreate,
+        on_chunk=lambda session, exits: entry_exit_rollup_crud.add_exits(session, exits, commit=False)
+    )
+
 @router.get("/exitlog/", response_model=List[exit_schema.ExitLog])
 def read_exit_logs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     exits = db.query(exit_model.ExitLog).offset(skip).limit(limit).all()
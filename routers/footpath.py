@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from database import get_db
-from typing import List, Optional
+from typing import List, Optional, Literal
 from datetime import datetime
-from schemas.footpath import FootpathAnalytics, FootpathPattern
+import cv2
+import numpy as np
+from schemas.footpath import FootpathAnalytics, FootpathPattern, ZoneEvent, ZoneTransitions
 from crud.footpath import footpath_crud
+from models.business import Business
+from models.zone import Zone
+from services.footpath.transitions import transition_graphs, save_snapshot
+from services.heatmap_grid import decode_grid, render_colormap
+from utils.auth_middleware import verify_business_auth
 
 router = APIRouter()
 
@@ -36,6 +43,36 @@ def get_zone_analytics(
         end_time=end_time
     )
 
+@router.get("/vt/api/v1/footpath/analytics/{zone_id}/{analytics_id}/heatmap")
+def get_analytics_heatmap(
+    zone_id: str,
+    analytics_id: str,
+    format: Literal["png", "grid"] = "png",
+    db: Session = Depends(get_db)
+):
+    """Get the heatmap of an analytics row, rendered from the stored grid counts"""
+    analytics = footpath_crud.get_analytics_heatmap(db=db, zone_id=zone_id, analytics_id=analytics_id)
+
+    if analytics.heatmap_grid is None:
+        # Legacy rows only hold the already rendered image
+        if format == "grid":
+            raise HTTPException(status_code=404, detail="No grid counts stored for this heatmap")
+        image = np.asarray(analytics.heatmap_data, dtype=np.uint8)
+    else:
+        counts = decode_grid(analytics.heatmap_grid)
+        if format == "grid":
+            return {
+                "shape": list(counts.shape),
+                "frame_resolution": [analytics.frame_height, analytics.frame_width],
+                "values": counts.tolist()
+            }
+        image = render_colormap(counts, (analytics.frame_height, analytics.frame_width))
+
+    ok, encoded = cv2.imencode(".png", image)
+    if not ok:
+        raise HTTPException(status_code=500, detail="Failed to encode heatmap")
+    return Response(content=encoded.tobytes(), media_type="image/png")
+
 @router.get("/vt/api/v1/footpath/patterns/{zone_id}", response_model=List[FootpathPattern])
 def get_zone_patterns(
     zone_id: str,
@@ -61,3 +98,57 @@ def create_pattern(
         zone_id=zone_id,
         pattern_data=pattern_data.dict()
     )
+
+@router.post("/vt/api/v1/footpath/zone-events")
+def record_zone_events(
+    events: List[ZoneEvent],
+    business: Business = Depends(verify_business_auth),
+    db: Session = Depends(get_db)
+):
+    """Feed zone enter/exit events into the property transition graphs"""
+    property_ids = {event.property_id for event in events}
+    known_zones = set(db.query(Zone.property_id, Zone.id).filter(
+        Zone.property_id.in_(property_ids),
+        Zone.business_id == business.id
+    ).all()) if property_ids else set()
+    unknown = sorted({
+        f"{event.property_id}/{event.zone_id}" for event in events
+        if (event.property_id, event.zone_id) not in known_zones
+    })
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown property or zone: {', '.join(unknown)}")
+
+    graphs = {property_id: transition_graphs.get(property_id, business.id) for property_id in property_ids}
+    for event in events:
+        graph = graphs[event.property_id]
+        if event.event == 'enter':
+            graph.record_enter(event.person_id, event.zone_id, event.timestamp)
+        else:
+            graph.record_exit(event.person_id, event.zone_id, event.timestamp)
+
+    # Properties without a camera processor are persisted here, once per hour
+    for graph in graphs.values():
+        if graph.claim_snapshot(3600):
+            save_snapshot(graph)
+    return {"recorded": len(events)}
+
+@router.get("/vt/api/v1/footpath/transitions/{property_id}", response_model=ZoneTransitions)
+def get_zone_transitions(
+    property_id: str,
+    k: int = 10,
+    start_zone: Optional[str] = None,
+    end_zone: Optional[str] = None,
+    length: Optional[int] = None
+):
+    """Get the live zone transition matrix and top-K zone paths for a property"""
+    graph = transition_graphs.find(property_id)
+    if graph is None:
+        raise HTTPException(status_code=404, detail="No zone transitions recorded for this property")
+    zones, matrix = graph.transition_matrix()
+    return ZoneTransitions(
+        property_id=property_id,
+        window_start=graph.window_start,
+        zones=zones,
+        matrix=matrix.tolist(),
+        top_paths=graph.top_paths(k, start_zone=start_zone, end_zone=end_zone, length=length)
+    )
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 from schemas.parkingAnalytics import ParkingAnalytics as ParkingAnalyticsSchema
+from schemas.parkingStall import ParkingStall as ParkingStallSchema, ParkingStallImport
 from crud.parkingAnalytics import parking_analytics
+from crud.parkingStall import parking_stall
+from models.zone import Zone
 
 router = APIRouter()
 
@@ -34,3 +37,29 @@ def get_vehicle_patterns(
     if not patterns:
         raise HTTPException(status_code=404, detail="No vehicle patterns found for the zone")
     return patterns
+
+
+@router.post("/zones/{zone_id}/parking-stalls/import", response_model=List[ParkingStallSchema])
+def import_parking_stalls(
+    zone_id: str,
+    stall_import: ParkingStallImport,
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk import the polygon stalls of a parking lot as seen by one camera.
+    """
+    if not db.query(Zone.id).filter(Zone.id == zone_id).first():
+        raise HTTPException(status_code=404, detail="Zone not found")
+    return parking_stall.bulk_import(db, zone_id=zone_id, stall_import=stall_import)
+
+
+@router.get("/zones/{zone_id}/parking-stalls", response_model=List[ParkingStallSchema])
+def get_parking_stalls(
+    zone_id: str,
+    camera_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get the polygon stalls of a zone, optionally for one camera.
+    """
+    return parking_stall.get_by_zone(db, zone_id=zone_id, camera_id=camera_id)
@@ -1,20 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
+from services.write_behind import write_queue
+from services.batch_ingest import ingest
 from models import smoking_detection as smoking_model
 from schemas import smoking_detection as smoking_schema
 
 router = APIRouter()
 
 @router.post("/", response_model=smoking_schema.SmokingDetection)
-def create_smoking_detection(detection: smoking_schema.SmokingDetectionCreate, db: Session = Depends(get_db)):
+def create_smoking_detection(detection: smoking_schema.SmokingDetectionCreate, defer: bool = False, db: Session = Depends(get_db)):
+    if defer:
+        # Write-behind: queue the row and return without waiting for the database
+        write_queue.enqueue(smoking_model.SmokingDetection, detection.dict())
+        return JSONResponse(status_code=202, content={"queued": 1})
     db_detection = smoking_model.SmokingDetection(**detection.dict())
     db.add(db_detection)
     db.commit()
     db.refresh(db_detection)
     return db_detection
 
+@router.post("/batch")
+async def create_smoking_detections_batch(request: Request, db: Session = Depends(get_db)):
+    """Store a batch of detections sent as NDJSON or a JSON array, reporting invalid records by index"""
+    return await ingest(request, db, smoking_model.SmokingDetection, smoking_schema.SmokingDetectionCreate)
+
 @router.get("/", response_model=List[smoking_schema.SmokingDetection])
 def read_smoking_detections(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     detections = db.query(smoking_model.SmokingDetection).offset(skip).limit(limit).all()
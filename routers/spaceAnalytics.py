@@ -1,19 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Header
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Request
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import List, Dict, Optional
 from uuid import UUID
 from schemas.spaceAnalytics import SpaceAnalytics
-from schemas.heatmapData import HeatmapDataCreate, HeatmapDataResponse, HeatmapPointResponse
+from schemas.heatmapData import HeatmapDataCreate, HeatmapDataResponse, HeatmapPointResponse, HeatmapPoint
 from schemas.demographics import DemographicsCreate
 from crud.spaceAnalytics import space_analytics_crud, heatmap_data_crud, demographics_crud
-from database import get_db
+from crud.heatmapCube import heatmap_cube_crud, build_windows, grid_to_points
+from crud.demographicsRollup import demographics_rollup_crud
+from database import get_db, get_async_db
+from services.batch_ingest import ingest
 from datetime import datetime, timedelta
 import uuid as uid
-from models.heatmapData import HeatmapData
+from models.heatmapData import HeatmapData, ZoneActivity
 from models.zone import Zone
 from models.business import Business
 from models.property import Property
-from models.demographics import Demographics as DemographicsModel
 from schemas.demographics import DemographicsCreate as DemographicsSchema, DemographicsResponse
 import json
 import logging
@@ -40,25 +45,55 @@ def get_zone_analytics(id: UUID, db: Session = Depends(get_db)):
     return analytics
 
 
-# GET /api/v1/properties/{id}/analytics/heatmaps
-@router.get("/zones/{zone_id}/analytics/heatmaps", response_model=HeatmapDataResponse)
-def get_zone_heatmaps(zone_id: UUID, db: Session = Depends(get_db)):
-    heatmaps = heatmap_data_crud.get_by_zone(db, zone_id=str(zone_id))  # Explicitly convert UUID to str
-    if not heatmaps:
-        raise HTTPException(status_code=404, detail="No heatmaps found for this zone")
+def _cube_points(sums, timestamp: datetime) -> List[HeatmapPointResponse]:
+    """Convert summed heatmap cube grids into cell-centre points"""
+    points = []
+    for (zone_id, camera_id), grid in sums.items():
+        xs, ys, weights = grid_to_points(grid, heatmap_cube_crud.cell_size)
+        points.extend(
+            HeatmapPointResponse(
+                camera_id=camera_id,
+                timestamp=timestamp.isoformat(),
+                x=x,
+                y=y,
+                weight=weight,
+                zone_id=zone_id,
+            )
+            for x, y, weight in zip(xs.tolist(), ys.tolist(), weights.tolist())
+        )
+    return points
+
 
-    points = [
+TIME_BUCKETS = {"hour": 3600, "day": 86400}
+
+def _grid_points(cells, cell_size: float, bucket_seconds: Optional[int], timestamp: datetime) -> List[HeatmapPointResponse]:
+    """Convert SQL-binned cells into cell-centre points, stamped with their time bucket start"""
+    return [
         HeatmapPointResponse(
-            camera_id=point.camera_id,
-            timestamp=point.timestamp.isoformat(),  # Ensure timestamp is serialized correctly
-            x=point.x,
-            y=point.y,
-            weight=point.weight,
-            zone_id=point.zone_id,
+            camera_id=camera_id,
+            timestamp=(datetime.utcfromtimestamp(bucket * bucket_seconds) if bucket_seconds else timestamp).isoformat(),
+            x=(cell_x + 0.5) * cell_size,
+            y=(cell_y + 0.5) * cell_size,
+            weight=weight,
+            zone_id=zone_id,
         )
-        for point in heatmaps
+        for zone_id, camera_id, bucket, cell_x, cell_y, weight, _ in cells
     ]
 
+# GET /api/v1/properties/{id}/analytics/heatmaps
+@router.get("/zones/{zone_id}/analytics/heatmaps", response_model=HeatmapDataResponse)
+async def get_zone_heatmaps(
+    zone_id: UUID,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Served from the heatmap cubes: one summed grid per camera instead of raw rows
+    sums = await heatmap_cube_crud.range_sums_async(db, zone_ids=[str(zone_id)], windows=build_windows(start_time, end_time))
+    if not sums:
+        raise HTTPException(status_code=404, detail="No heatmaps found for this zone")
+
+    points = await run_in_threadpool(_cube_points, sums, end_time or datetime.utcnow())
     return HeatmapDataResponse(points=points)
 
 @router.post("/zones/{zone_id}/analytics/heatmaps", response_model=List[HeatmapDataResponse])
@@ -96,15 +131,36 @@ def create_zone_heatmap(zone_id: UUID, heatmap_data: HeatmapDataCreate, db: Sess
     ]
     return response
 
+@router.post("/zones/{zone_id}/analytics/heatmaps/batch")
+async def create_zone_heatmap_batch(zone_id: UUID, request: Request, db: Session = Depends(get_db)):
+    """Store heatmap points sent as NDJSON or a JSON array of points, reporting invalid records by index"""
+    def check_zone(point: HeatmapPoint):
+        if point.zone_id != str(zone_id):
+            raise ValueError(f"Zone ID in payload ({point.zone_id}) does not match route ID ({zone_id})")
+
+    def to_mapping(point: HeatmapPoint):
+        mapping = point.model_dump()
+        if point.activity_type is not None:
+            mapping["activity_type"] = ZoneActivity(point.activity_type.value)
+        return mapping
+
+    return await ingest(
+        request, db, HeatmapData, HeatmapPoint,
+        to_mapping=to_mapping,
+        check=check_zone,
+        # Keep the time-bucketed cubes in step with the raw points
+        on_chunk=lambda session, points: heatmap_cube_crud.add_points(session, points, commit=False)
+    )
+
 
 
 
 # GET /api/v1/properties/{id}/analytics/demographics
 @router.get("/zones/{zone_id}/analytics/demographics", response_model=DemographicsResponse)
-def get_zone_demographics(
+async def get_zone_demographics(
     zone_id: str,
     filter_by: str = Query(..., description="Filter by: day, week, month, quarter"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     now = datetime.now()
 
@@ -123,50 +179,23 @@ def get_zone_demographics(
     else:
         raise HTTPException(status_code=400, detail="Invalid filter. Use 'day', 'week', 'month', or 'quarter'.")
 
-    # Query and aggregate data
-    demographics = demographics_crud.get_by_zone_and_date_range(db, zone_id=zone_id, start_date=start_date, end_date=now)
-    if not demographics:
+    # Summed from the hourly/daily rollups rather than the raw rows
+    summary = await demographics_rollup_crud.summary_async(db, zone_ids=[zone_id], start=start_date, end=now)
+    if summary is None:
         raise HTTPException(status_code=404, detail="No demographics data found for this zone in the selected period")
 
-    # Initialize aggregations
-    total_count = 0
-    age_groups_data = {}
-    gender_distribution = {"Male": 0, "Female": 0}
-
-    # Aggregate data
-    for d in demographics:
-        for age_group in d.age_groups:
-            if age_group["age"] not in age_groups_data:
-                age_groups_data[age_group["age"]] = {"count": 0, "male": 0, "female": 0}
-
-            age_groups_data[age_group["age"]]["count"] += age_group["count"]
-            age_groups_data[age_group["age"]]["male"] += age_group["male"]
-            age_groups_data[age_group["age"]]["female"] += age_group["female"]
-
-        gender_distribution["Male"] += d.gender_distribution.get("Male", 0)
-        gender_distribution["Female"] += d.gender_distribution.get("Female", 0)
-
-    total_count = sum(data["count"] for data in age_groups_data.values())
-
-    age_groups_list = [
-        {"age": age, "count": data["count"], "male": data["male"], "female": data["female"]}
-        for age, data in age_groups_data.items()
-    ]
-
-    return Demographics(
+    return DemographicsResponse(
         id=uid.uuid4(),
         zone_id=zone_id,
         timestamp=now,
-        total_count=total_count,
-        age_groups=age_groups_list,
-        gender_distribution=gender_distribution
+        **summary
     )
 
 @router.get("/analytics/demographics", response_model=DemographicsSchema)
-def get_zone_demographics(
+async def get_zone_demographics(
     zone_id: Optional[str] = Query(None, description="Zone ID to filter by"),
     filter_by: str = Query(..., description="Filter by: day, week, month, quarter"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     business_id: Optional[str] = Header(None, alias="X-VT-Business-ID")
 ):
     now = datetime.now()
@@ -190,77 +219,42 @@ def get_zone_demographics(
     if zone_id:
         zone_ids = [zone_id]
     elif business_id:
-        business = db.query(Business).filter(Business.id == business_id, Business.is_active == True).first()
+        business = (await db.execute(
+            select(Business).filter(Business.id == business_id, Business.is_active == True)
+        )).scalars().first()
         if not business:
             raise HTTPException(status_code=401, detail="Invalid or unauthorized business")
 
-        properties = db.query(Property).filter(Property.business_id == business_id).all()
+        properties = (await db.execute(select(Property).filter(Property.business_id == business_id))).scalars().all()
         if not properties:
             raise HTTPException(status_code=404, detail="No properties found for the provided business ID")
 
         property_ids = [property.id for property in properties]
-        zones = db.query(Zone).filter(Zone.property_id.in_(property_ids)).all()
+        zones = (await db.execute(select(Zone).filter(Zone.property_id.in_(property_ids)))).scalars().all()
         zone_ids = [zone.id for zone in zones]
     else:
         raise HTTPException(status_code=400, detail="Either zone_id or business_id must be provided")
 
-    # Fetch demographics for all zones in a single query
-    demographics = db.query(DemographicsModel).filter(
-        DemographicsModel.zone_id.in_(zone_ids),
-        DemographicsModel.timestamp >= start_date,
-        DemographicsModel.timestamp <= now
-    ).all()
-
-    if not demographics:
+    # Summed from the hourly/daily rollups rather than the raw rows
+    summary = await demographics_rollup_crud.summary_async(db, zone_ids=zone_ids, start=start_date, end=now)
+    if summary is None:
         raise HTTPException(status_code=404, detail="No demographics data found for the selected criteria")
 
-    # Initialize aggregation containers
-    aggregated_data = {
-        "total_count": 0,
-        "age_groups_data": {},
-        "gender_distribution": {"Male": 0, "Female": 0}
-    }
-
-    for d in demographics:
-        # Aggregate age groups
-        for age_group in d.age_groups:
-            if age_group["age"] not in aggregated_data["age_groups_data"]:
-                aggregated_data["age_groups_data"][age_group["age"]] = {"count": 0, "male": 0, "female": 0}
-
-            aggregated_data["age_groups_data"][age_group["age"]]["count"] += age_group["count"]
-            aggregated_data["age_groups_data"][age_group["age"]]["male"] += age_group["male"]
-            aggregated_data["age_groups_data"][age_group["age"]]["female"] += age_group["female"]
-
-        # Aggregate gender distribution
-        aggregated_data["gender_distribution"]["Male"] += d.gender_distribution.get("Male", 0)
-        aggregated_data["gender_distribution"]["Female"] += d.gender_distribution.get("Female", 0)
-
-        # Increment total count
-        aggregated_data["total_count"] += sum(age_group["count"] for age_group in d.age_groups)
-
-    # Prepare single combined response
-    age_groups_list = [
-        {"age": age, "count": group_data["count"], "male": group_data["male"], "female": group_data["female"]}
-        for age, group_data in aggregated_data["age_groups_data"].items()
-    ]
-
     response = DemographicsSchema(
         id=uid.uuid4(),
         zone_id="aggregated",  # Use a placeholder for aggregated data
         timestamp=now,
-        total_count=aggregated_data["total_count"],
-        age_groups=age_groups_list,
-        gender_distribution=aggregated_data["gender_distribution"]
+        **summary
     )
 
     return response
 
 
 @router.get("/properties/{property_id}/analytics/demographics", response_model=Dict)
-def get_property_demographics(
+async def get_property_demographics(
     property_id: str,
     filter_by: str = Query(..., description="Filter by: day, week, month, quarter"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     now = datetime.now()
 
@@ -279,56 +273,40 @@ def get_property_demographics(
     else:
         raise HTTPException(status_code=400, detail="Invalid filter. Use 'day', 'week', 'month', or 'quarter'.")
 
-    # Query and aggregate data
-    demographics = demographics_crud.get_by_property_id_and_date_range(
-        db, property_id=property_id, start_date=start_date, end_date=now
-    )
-    if not demographics:
+    # Summed over the property's zones from the hourly/daily rollups
+    zone_ids = (await db.execute(select(Zone.id).filter(Zone.property_id == property_id))).scalars().all()
+    summary = await demographics_rollup_crud.summary_async(db, zone_ids=zone_ids, start=start_date, end=now)
+    if summary is None:
         raise HTTPException(status_code=404, detail="No demographics data found for this property in the selected period")
 
-    # Initialize aggregations
-    total_count = 0
-    age_groups_data = {}
-    gender_distribution = {"Male": 0, "Female": 0}
-
-    # Aggregate data across all zones
-    for d in demographics:
-        for age_group in d.age_groups:
-            if age_group["age"] not in age_groups_data:
-                age_groups_data[age_group["age"]] = {"count": 0, "male": 0, "female": 0}
-
-            age_groups_data[age_group["age"]]["count"] += age_group["count"]
-            age_groups_data[age_group["age"]]["male"] += age_group["male"]
-            age_groups_data[age_group["age"]]["female"] += age_group["female"]
-
-        gender_distribution["Male"] += d.gender_distribution.get("Male", 0)
-        gender_distribution["Female"] += d.gender_distribution.get("Female", 0)
-
-    total_count = sum(data["count"] for data in age_groups_data.values())
-
-    age_groups_list = [
-        {"age": age, "count": data["count"], "male": data["male"], "female": data["female"]}
-        for age, data in age_groups_data.items()
-    ]
-
     return {
         "property_id": property_id,
         "timestamp": now,
-        "total_count": total_count,
-        "age_groups": age_groups_list,
-        "gender_distribution": gender_distribution
+        **summary
     }
 
 @router.get("/analytics/heatmaps", response_model=HeatmapDataResponse)
-def get_heatmap_data(
+async def get_heatmap_data(
     zone_id: Optional[str] = Query(None, description="Zone ID to filter by"),
     filter_by: str = Query(..., description="Filter by: last_24_hours, last_week, last_month"),
-    db: Session = Depends(get_db),
+    weekdays: Optional[str] = Query(None, description="Comma separated weekdays to include (Monday=0)"),
+    hour_from: Optional[int] = Query(None, ge=0, le=23, description="Start hour of the daily window (UTC)"),
+    hour_to: Optional[int] = Query(None, ge=1, le=24, description="End hour of the daily window (UTC)"),
+    mode: str = Query("cube", description="cube: pre-aggregated heatmap cubes, grid: raw points binned in SQL"),
+    cell_size: float = Query(50.0, gt=0, description="Grid cell size in pixels (grid mode)"),
+    time_bucket: Optional[str] = Query(None, description="Also bin by time in grid mode: hour or day"),
+    db: AsyncSession = Depends(get_async_db),
     business_id: Optional[str] = Header(None, alias="X-VT-Business-ID")
 ):
     logger.debug(f"Received request with zone_id={zone_id}, filter_by={filter_by}, business_id={business_id}")
 
-    now = datetime.now()
+    if mode not in ("cube", "grid"):
+        raise HTTPException(status_code=400, detail="Invalid mode. Use 'cube' or 'grid'.")
+    if time_bucket is not None and time_bucket not in TIME_BUCKETS:
+        raise HTTPException(status_code=400, detail="Invalid time_bucket. Use 'hour' or 'day'.")
+
+    # Heatmap points and cube buckets are stored in UTC
+    now = datetime.utcnow()
     
     # Calculate the date range based on the filter
     if filter_by == "last_24_hours":
@@ -348,18 +326,20 @@ def get_heatmap_data(
         zone_ids = [zone_id]
     elif business_id:
         logger.debug("Fetching zones for business_id")
-        business = db.query(Business).filter(Business.id == business_id, Business.is_active == True).first()
+        business = (await db.execute(
+            select(Business).filter(Business.id == business_id, Business.is_active == True)
+        )).scalars().first()
         if not business:
             logger.error("Invalid or unauthorized business")
             raise HTTPException(status_code=401, detail="Invalid or unauthorized business")
 
-        properties = db.query(Property).filter(Property.business_id == business_id).all()
+        properties = (await db.execute(select(Property).filter(Property.business_id == business_id))).scalars().all()
         if not properties:
             logger.error("No properties found for the provided business ID")
             raise HTTPException(status_code=404, detail="No properties found for the provided business ID")
 
         property_ids = [property.id for property in properties]
-        zones = db.query(Zone).filter(Zone.property_id.in_(property_ids)).all()
+        zones = (await db.execute(select(Zone).filter(Zone.property_id.in_(property_ids)))).scalars().all()
         zone_ids = [zone.id for zone in zones]
     else:
         logger.error("Neither zone_id nor business_id was provided")
@@ -367,39 +347,38 @@ def get_heatmap_data(
 
     logger.debug(f"Zone IDs to query: {zone_ids}")
 
-    # Query heatmap data
-    logger.debug("Querying heatmap data from the database")
-    heatmap_points = db.query(HeatmapData).filter(
-        HeatmapData.zone_id.in_(zone_ids),
-        HeatmapData.timestamp >= start_date,
-        HeatmapData.timestamp <= now
-    ).all()
+    # Split the period into recurring windows (e.g. Tuesdays 14:00-16:00)
+    try:
+        weekday_list = [int(day) for day in weekdays.split(",")] if weekdays else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid weekdays. Use comma separated numbers, Monday=0.")
+    windows = build_windows(start_date, now, weekdays=weekday_list, hour_from=hour_from, hour_to=hour_to)
+
+    if mode == "grid":
+        bucket_seconds = TIME_BUCKETS[time_bucket] if time_bucket else None
+        logger.debug(f"Binning raw heatmap points into {cell_size}px cells for {len(windows)} window(s)")
+        cells = await heatmap_data_crud.grid_sums_async(
+            db, zone_ids=zone_ids, windows=windows, cell_size=cell_size, bucket_seconds=bucket_seconds
+        )
+        if not cells:
+            raise HTTPException(status_code=404, detail="No heatmap data found for the selected criteria")
+        points = await run_in_threadpool(_grid_points, cells, cell_size, bucket_seconds, now)
+        return HeatmapDataResponse(points=points)
 
-    logger.debug(f"Heatmap points retrieved: {heatmap_points}")
+    # Query the heatmap cubes
+    logger.debug(f"Querying heatmap cubes for {len(windows)} window(s)")
+    sums = await heatmap_cube_crud.range_sums_async(db, zone_ids=zone_ids, windows=windows)
 
-    if not heatmap_points:
+    if not sums:
         logger.error("No heatmap data found for the selected criteria")
         raise HTTPException(status_code=404, detail="No heatmap data found for the selected criteria")
 
-    # Aggregate the heatmap points
-    aggregated_points = [
-        {
-            "camera_id": point.camera_id,
-            "timestamp": point.timestamp.isoformat(),
-            "x": point.x,
-            "y": point.y,
-            "weight": point.weight,
-            "zone_id": point.zone_id,
-        }
-        for point in heatmap_points
-    ]
-
     response = HeatmapDataResponse(
         id=uid.uuid4(),
-        points=aggregated_points,
+        points=await run_in_threadpool(_cube_points, sums, now),
     )
 
-    logger.debug(f"Response prepared: {response}")
+    logger.debug(f"Response prepared with {len(response.points)} points")
 
     return response
 
@@ -1,20 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
+from services.write_behind import write_queue
+from services.batch_ingest import ingest
 from models import threat_detection as threat_model
 from schemas import threat_detection as threat_schema
 
 router = APIRouter()
 
 @router.post("/", response_model=threat_schema.ThreatDetection)
-def create_threat_detection(detection: threat_schema.ThreatDetectionCreate, db: Session = Depends(get_db)):
+def create_threat_detection(detection: threat_schema.ThreatDetectionCreate, defer: bool = False, db: Session = Depends(get_db)):
+    if defer:
+        # Write-behind: queue the row and return without waiting for the database
+        write_queue.enqueue(threat_model.ThreatDetection, detection.dict())
+        return JSONResponse(status_code=202, content={"queued": 1})
     db_detection = threat_model.ThreatDetection(**detection.dict())
     db.add(db_detection)
     db.commit()
     db.refresh(db_detection)
     return db_detection
 
+@router.post("/batch")
+async def create_threat_detections_batch(request: Request, db: Session = Depends(get_db)):
+    """Store a batch of detections sent as NDJSON or a JSON array, reporting invalid records by index"""
+    return await ingest(request, db, threat_model.ThreatDetection, threat_schema.ThreatDetectionCreate)
+
 @router.get("/", response_model=List[threat_schema.ThreatDetection])
 def read_threat_detections(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     detections = db.query(threat_model.ThreatDetection).offset(skip).limit(limit).all()
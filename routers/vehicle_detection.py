@@ -1,20 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
+from services.write_behind import write_queue
+from services.batch_ingest import ingest
 from models import vehicle_detection as vehicle_model
 from schemas import vehicle_detection as vehicle_schema
 
 router = APIRouter()
 
 @router.post("/", response_model=vehicle_schema.VehicleDetection)
-def create_vehicle_detection(detection: vehicle_schema.VehicleDetectionCreate, db: Session = Depends(get_db)):
+def create_vehicle_detection(detection: vehicle_schema.VehicleDetectionCreate, defer: bool = False, db: Session = Depends(get_db)):
+    if defer:
+        # Write-behind: queue the row and return without waiting for the database
+        write_queue.enqueue(vehicle_model.VehicleDetection, detection.dict())
+        return JSONResponse(status_code=202, content={"queued": 1})
     db_detection = vehicle_model.VehicleDetection(**detection.dict())
     db.add(db_detection)
     db.commit()
     db.refresh(db_detection)
     return db_detection
 
+@router.post("/batch")
+async def create_vehicle_detections_batch(request: Request, db: Session = Depends(get_db)):
+    """Store a batch of detections sent as NDJSON or a JSON array, reporting invalid records by index"""
+    return await ingest(request, db, vehicle_model.VehicleDetection, vehicle_schema.VehicleDetectionCreate)
+
 @router.get("/", response_model=List[vehicle_schema.VehicleDetection])
 def read_vehicle_detections(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     detections = db.query(vehicle_model.VehicleDetection).offset(skip).limit(limit).all()
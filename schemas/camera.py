@@ -13,7 +13,7 @@ class CameraBase(BaseModel):
     name: str
     location: Optional[str] = None
     direction: Optional[str] = None
-    coverage_area: Optional[dict] = None  # JSON field for the coverage area
+    coverage_area: Optional[dict] = None  # JSON field for the coverage area, e.g. {"polygon": [[x, y], ...]}
     store_id: Optional[str] = None
 
 class CameraCreate(CameraBase):
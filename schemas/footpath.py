@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal
 from datetime import datetime
 
 class FootpathAnalyticsBase(BaseModel):
@@ -42,4 +42,22 @@ class FootpathPattern(FootpathPatternBase):
     timestamp: datetime
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class ZoneEvent(BaseModel):
+    property_id: str
+    zone_id: str
+    person_id: str  # Track or re-identified person ID, unique within the property
+    event: Literal['enter', 'exit']
+    timestamp: Optional[datetime] = None
+
+class ZonePath(BaseModel):
+    path: List[str]
+    count: int
+
+class ZoneTransitions(BaseModel):
+    property_id: str
+    window_start: datetime
+    zones: List[str]
+    matrix: List[List[int]]
+    top_paths: List[ZonePath]
@@ -0,0 +1,41 @@
+from pydantic import BaseModel, field_validator
+from typing import Optional, List
+from datetime import datetime
+
+
+class ParkingStallBase(BaseModel):
+    label: Optional[str] = None
+    polygon: List[List[float]]  # [[x, y], ...] in frame pixels
+    min_overlap: float = 0.3
+
+    @field_validator("polygon")
+    def check_polygon(cls, v):
+        if len(v) < 3 or any(len(point) != 2 for point in v):
+            raise ValueError("polygon needs at least 3 [x, y] points")
+        return v
+
+    @field_validator("min_overlap")
+    def check_min_overlap(cls, v):
+        if not 0 < v <= 1:
+            raise ValueError("min_overlap must be in (0, 1]")
+        return v
+
+
+class ParkingStallCreate(ParkingStallBase):
+    pass
+
+
+class ParkingStallImport(BaseModel):
+    camera_id: str
+    replace: bool = True  # Drop the camera's existing stalls in this zone first
+    stalls: List[ParkingStallCreate]
+
+
+class ParkingStall(ParkingStallBase):
+    id: str
+    zone_id: str
+    camera_id: str
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,118 @@
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+# Allow running as `python scripts/benchmark_geometry.py` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import geometry
+
+def _random_boxes(rng, n, size=1920):
+    corners = rng.uniform(0, size, (n, 2))
+    extents = rng.uniform(10, 200, (n, 2))
+    return np.hstack([corners, corners + extents])
+
+def _random_polygons(rng, m, vertices=8, size=1920):
+    centres = rng.uniform(0, size, (m, 2))
+    angles = np.sort(rng.uniform(0, 2 * np.pi, (m, vertices)), axis=1)
+    radii = rng.uniform(50, 300, (m, vertices))
+    return [
+        np.stack([c[0] + r * np.cos(a), c[1] + r * np.sin(a)], axis=1)
+        for c, a, r in zip(centres, angles, radii)
+    ]
+
+def _loop_iou(boxes_a, boxes_b):
+    """Reference pairwise loop, as the services used to compute it"""
+    result = np.zeros((len(boxes_a), len(boxes_b)))
+    for i, a in enumerate(boxes_a):
+        for j, b in enumerate(boxes_b):
+            w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+            h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+            inter = w * h
+            union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+            result[i, j] = inter / union if union > 0 else 0.0
+    return result
+
+def _loop_points_in_polygons(points, polygons):
+    result = np.zeros((len(points), len(polygons)), dtype=bool)
+    for i, (x, y) in enumerate(points):
+        for j, polygon in enumerate(polygons):
+            inside = False
+            x1, y1 = polygon[-1]
+            for x2, y2 in polygon:
+                if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                    inside = not inside
+                x1, y1 = x2, y2
+            result[i, j] = inside
+    return result
+
+def _loop_segments(starts, ends, line_starts, line_ends):
+    result = np.zeros((len(starts), len(line_starts)), dtype=bool)
+    for i, (p0, p1) in enumerate(zip(starts, ends)):
+        for j, (p2, p3) in enumerate(zip(line_starts, line_ends)):
+            s1 = p1 - p0
+            s2 = p3 - p2
+            denom = -s2[0] * s1[1] + s1[0] * s2[1]
+            if denom == 0:
+                continue
+            s = (-s1[1] * (p0[0] - p2[0]) + s1[0] * (p0[1] - p2[1])) / denom
+            t = (s2[0] * (p0[1] - p2[1]) - s2[1] * (p0[0] - p2[0])) / denom
+            result[i, j] = 0 <= s <= 1 and 0 <= t <= 1
+    return result
+
+def _time(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+def run_benchmarks(sizes, polygon_count, line_count, repeat, include_loops):
+    """Time the batched kernels (and the pairwise loops they replace) at each size"""
+    rng = np.random.default_rng(0)
+    print(f"numba available: {geometry.NUMBA_AVAILABLE}")
+    print(f"{'kernel':<28}{'n':>8}{'m':>6}{'batched ms':>14}{'loop ms':>12}")
+
+    for n in sizes:
+        boxes = _random_boxes(rng, n)
+        others = _random_boxes(rng, n)
+        points = rng.uniform(0, 1920, (n, 2))
+        polygons = _random_polygons(rng, polygon_count)
+        starts = rng.uniform(0, 1920, (n, 2))
+        ends = starts + rng.uniform(-50, 50, (n, 2))
+        line_starts = rng.uniform(0, 1920, (line_count, 2))
+        line_ends = rng.uniform(0, 1920, (line_count, 2))
+
+        cases = [
+            ('iou_matrix', n, n, lambda: geometry.iou_matrix(boxes, others),
+             lambda: _loop_iou(boxes, others)),
+            ('ioa_matrix', n, n, lambda: geometry.ioa_matrix(boxes, others), None),
+            ('points_in_polygons[numpy]', n, polygon_count,
+             lambda: geometry.points_in_polygons(points, polygons, use_numba=False),
+             lambda: _loop_points_in_polygons(points, polygons)),
+            ('segments_intersect', n, line_count,
+             lambda: geometry.segments_intersect(starts, ends, line_starts, line_ends),
+             lambda: _loop_segments(starts, ends, line_starts, line_ends)),
+            ('polygon_centroids', polygon_count, 0, lambda: geometry.polygon_centroids(polygons), None),
+        ]
+        if geometry.NUMBA_AVAILABLE:
+            geometry.points_in_polygons(points[:1], polygons[:1], use_numba=True)  # Compile outside the timing
+            cases.insert(3, (
+                'points_in_polygons[numba]', n, polygon_count,
+                lambda: geometry.points_in_polygons(points, polygons, use_numba=True), None
+            ))
+
+        for name, rows, cols, batched, loop in cases:
+            batched_ms = _time(batched, repeat)
+            loop_ms = _time(loop, 1) if loop is not None and include_loops else None
+            loop_text = f"{loop_ms:>12.2f}" if loop_ms is not None else f"{'-':>12}"
+            print(f"{name:<28}{rows:>8}{cols:>6}{batched_ms:>14.3f}{loop_text}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the batched geometry kernels")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Numbers of boxes/points to test")
+    parser.add_argument("--polygons", type=int, default=20, help="Number of zone polygons")
+    parser.add_argument("--lines", type=int, default=10, help="Number of counting lines")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    parser.add_argument("--no-loops", action="store_true", help="Skip the slow pairwise reference loops")
+    args = parser.parse_args()
+    run_benchmarks(args.sizes, args.polygons, args.lines, args.repeat, not args.no_loops)
@@ -0,0 +1,187 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+# Allow running as `python scripts/benchmark_indexes.py` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, Index, MetaData, Table, create_engine, func, select, text
+
+import models
+from models.base import Base
+from crud.spaceAnalytics import _floor_div
+
+TABLES = [
+    "heatmap_data", "demographics", "footpath_analytics", "footpath_patterns",
+    "detections", "parking_analytics", "security_events", "incidents"
+]
+PREFIX = "bench_"
+START = datetime(2026, 1, 1)
+DAYS = 90
+
+def _copy_tables(metadata):
+    """Copies of the analytics tables without foreign keys or secondary indexes, plus their indexes"""
+    tables = {}
+    indexes = []
+    for name in TABLES:
+        source = Base.metadata.tables[name]
+        table = Table(
+            PREFIX + name, metadata,
+            *[Column(column.name, column.type, primary_key=column.primary_key) for column in source.columns]
+        )
+        tables[name] = table
+        for index in source.indexes:
+            indexes.append(Index(
+                PREFIX + index.name,
+                *[table.c[column.name] for column in index.columns],
+                **index.dialect_kwargs
+            ))
+    # Indexes are created only for the second run
+    for index in indexes:
+        index.table.indexes.discard(index)
+    return tables, indexes
+
+def _value(column, rng, row, zones, cameras, properties):
+    name = column.name
+    if column.primary_key:
+        return str(row) if column.type.python_type is str else row
+    if name in ("timestamp", "created_at", "updated_at"):
+        return START + timedelta(seconds=rng.uniform(0, DAYS * 86400))
+    if name == "zone_id":
+        return rng.choice(zones)
+    if name == "camera_id":
+        return rng.choice(cameras)
+    if name in ("property_id", "business_id"):
+        return rng.choice(properties)
+    if name == "pattern_type":
+        return rng.choice(["zone_sequence", "movement_clusters"])
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return None
+    if python_type is float:
+        return rng.uniform(0, 1920)
+    if python_type is int:
+        return rng.randint(0, 100)
+    if python_type is bool:
+        return False
+    if python_type in (dict, list):
+        return {} if python_type is dict else []
+    if python_type is str and not column.nullable:
+        return "x"
+    return None
+
+def populate(engine, tables, rows, rng, chunk=10000):
+    zones = [f"zone-{i}" for i in range(50)]
+    cameras = [f"camera-{i}" for i in range(200)]
+    properties = [f"property-{i}" for i in range(10)]
+    for name, table in tables.items():
+        count = rows * 5 if name == "heatmap_data" else rows
+        with engine.begin() as conn:
+            for offset in range(0, count, chunk):
+                conn.execute(table.insert(), [
+                    {column.name: _value(column, rng, row, zones, cameras, properties) for column in table.columns}
+                    for row in range(offset, min(offset + chunk, count))
+                ])
+        print(f"  {table.name}: {count} rows")
+
+def _queries(tables, dialect):
+    """Statements shaped like the main analytics endpoints' queries"""
+    window = (START + timedelta(days=30), START + timedelta(days=37))
+    quarter = (START, START + timedelta(days=DAYS))
+    heatmap = tables["heatmap_data"]
+    footpath = tables["footpath_analytics"]
+    patterns = tables["footpath_patterns"]
+    demographics = tables["demographics"]
+    detections = tables["detections"]
+    parking = tables["parking_analytics"]
+    events = tables["security_events"]
+    incidents = tables["incidents"]
+    cell_x = _floor_div(heatmap.c.x, 50.0, dialect)
+    cell_y = _floor_div(heatmap.c.y, 50.0, dialect)
+    return [
+        ("heatmaps grid (zone, week)", select(
+            heatmap.c.camera_id, cell_x, cell_y, func.sum(heatmap.c.weight)
+        ).where(
+            heatmap.c.zone_id == "zone-7", heatmap.c.timestamp >= window[0], heatmap.c.timestamp < window[1]
+        ).group_by(heatmap.c.camera_id, cell_x, cell_y)),
+        ("demographics (zone, quarter)", select(demographics.c.age_groups, demographics.c.gender_distribution).where(
+            demographics.c.zone_id == "zone-7", demographics.c.timestamp.between(*quarter)
+        )),
+        ("footpath analytics (zone, week)", select(footpath.c.id, footpath.c.traffic_count).where(
+            footpath.c.zone_id == "zone-7", footpath.c.business_id == "property-3",
+            footpath.c.timestamp.between(*window)
+        ).order_by(footpath.c.timestamp.desc())),
+        ("footpath patterns (property, type, week)", select(patterns.c.id, patterns.c.pattern_data).where(
+            patterns.c.property_id == "property-3", patterns.c.pattern_type == "zone_sequence",
+            patterns.c.timestamp.between(*window)
+        )),
+        ("detections (camera, week)", select(func.count()).where(
+            detections.c.camera_id == "camera-42", detections.c.timestamp.between(*window)
+        )),
+        ("parking analytics (zone, week)", select(parking.c.occupied_spots, parking.c.timestamp).where(
+            parking.c.zone_id == "zone-7", parking.c.timestamp.between(*window)
+        ).order_by(parking.c.timestamp)),
+        ("security events (property, week)", select(events.c.id, events.c.timestamp).where(
+            events.c.property_id == "property-3", events.c.timestamp.between(*window)
+        ).order_by(events.c.timestamp.desc())),
+        ("incidents (property, latest 50)", select(incidents.c.id).where(
+            incidents.c.property_id == "property-3"
+        ).order_by(incidents.c.created_at.desc()).limit(50)),
+        ("retention scan (all, day)", select(func.count()).select_from(heatmap).where(
+            heatmap.c.timestamp.between(START + timedelta(days=10), START + timedelta(days=11))
+        )),
+    ]
+
+def _time_queries(engine, queries, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name, statement in queries:
+            rows = len(conn.execute(statement).all())  # Warm the cache outside the timing
+            seconds = min(timeit.repeat(lambda: conn.execute(statement).all(), number=1, repeat=repeat))
+            results[name] = (rows, seconds * 1000)
+    return results
+
+def run_benchmark(url, rows, repeat, keep):
+    """Time the analytics queries on unindexed copies of the tables, then again with the new indexes"""
+    engine = create_engine(url)
+    metadata = MetaData()
+    tables, indexes = _copy_tables(metadata)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    rng = random.Random(0)
+
+    try:
+        print(f"Populating {engine.dialect.name} tables")
+        populate(engine, tables, rows, rng)
+        queries = _queries(tables, engine.dialect.name)
+        before = _time_queries(engine, queries, repeat)
+
+        with engine.begin() as conn:
+            for index in indexes:
+                index.create(conn)
+            conn.execute(text("ANALYZE"))
+        after = _time_queries(engine, queries, repeat)
+
+        print(f"{'query':<42}{'rows':>8}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for name, _ in queries:
+            count, before_ms = before[name]
+            _, after_ms = after[name]
+            print(f"{name:<42}{count:>8}{before_ms:>12.2f}{after_ms:>12.2f}{before_ms / max(after_ms, 1e-6):>9.1f}x")
+    finally:
+        if not keep:
+            metadata.drop_all(engine)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Before/after timings of the analytics queries for the time-series indexes")
+    parser.add_argument("--url", default=None, help="Scratch database URL (default: a temporary SQLite file)")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows per table (heatmap_data gets 5x)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    parser.add_argument("--keep", action="store_true", help="Keep the bench_* tables afterwards")
+    args = parser.parse_args()
+    url = args.url or f"sqlite:///{os.path.join(tempfile.gettempdir(), 'benchmark_indexes.db')}"
+    run_benchmark(url, args.rows, args.repeat, args.keep)
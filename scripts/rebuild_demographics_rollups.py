@@ -0,0 +1,24 @@
+import argparse
+import os
+import sys
+
+# Allow running as `python scripts/rebuild_demographics_rollups.py` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionLocal
+from crud.demographicsRollup import demographics_rollup_crud
+
+def rebuild_demographics_rollups(zone_ids=None):
+    """Backfill the hourly and daily demographics rollups from raw demographics rows"""
+    db = SessionLocal()
+    try:
+        total = demographics_rollup_crud.rebuild(db, zone_ids=zone_ids)
+        print(f"Rebuilt demographics rollups from {total} records")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild demographics_hourly/demographics_daily from demographics rows")
+    parser.add_argument("--zone", action="append", dest="zone_ids", help="Zone ID to rebuild (repeatable, default all)")
+    args = parser.parse_args()
+    rebuild_demographics_rollups(args.zone_ids)
@@ -0,0 +1,27 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# Allow running as `python scripts/rebuild_entry_exit_hourly.py` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionLocal
+from crud.entryExitRollup import entry_exit_rollup_crud
+
+def rebuild_entry_exit_hourly(camera_ids=None, since=None):
+    """Backfill the hourly entry/exit rollup from raw entry and exit logs"""
+    db = SessionLocal()
+    try:
+        total = entry_exit_rollup_crud.rebuild(db, camera_ids=camera_ids, since=since)
+        print(f"Rebuilt entry/exit rollup from {total} logs")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild entry_exit_hourly from entry_logs and exit_logs rows")
+    parser.add_argument("--camera", action="append", dest="camera_ids", help="Camera ID to rebuild (repeatable, default all)")
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="Only rebuild from this time (ISO format); never earlier than the oldest raw row retention kept")
+    args = parser.parse_args()
+    rebuild_entry_exit_hourly(args.camera_ids, args.since)
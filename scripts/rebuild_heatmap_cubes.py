@@ -0,0 +1,27 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# Allow running as `python scripts/rebuild_heatmap_cubes.py` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionLocal
+from crud.heatmapCube import heatmap_cube_crud
+
+def rebuild_heatmap_cubes(zone_ids=None, since=None):
+    """Rebuild the time-bucketed heatmap cubes from raw heatmap points"""
+    db = SessionLocal()
+    try:
+        total = heatmap_cube_crud.rebuild(db, zone_ids=zone_ids, since=since)
+        print(f"Rebuilt heatmap cubes from {total} points")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild heatmap cubes from heatmap_data rows")
+    parser.add_argument("--zone", action="append", dest="zone_ids", help="Zone ID to rebuild (repeatable, default all)")
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="Only rebuild from this time (ISO format); never earlier than the oldest raw row retention kept")
+    args = parser.parse_args()
+    rebuild_heatmap_cubes(args.zone_ids, args.since)
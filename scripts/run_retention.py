@@ -0,0 +1,23 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# Allow running as `python scripts/run_retention.py` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.retention import retention_job
+
+def run_retention(now=None):
+    """Create upcoming partitions and drop expired ones once, e.g. from cron with RETENTION_INTERVAL_SECONDS=0"""
+    results = retention_job.run_once(now)
+    for table_name, result in results.items():
+        print(f"{table_name}: created {len(result['created'])}, dropped {len(result['dropped'])}")
+        for name in result["dropped"]:
+            print(f"  dropped {name}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one pass of the partition retention job")
+    parser.add_argument("--now", type=datetime.fromisoformat, default=None, help="Pretend it is this UTC time (ISO format)")
+    args = parser.parse_args()
+    run_retention(args.now)
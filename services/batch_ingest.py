@@ -0,0 +1,197 @@
+import codecs
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Type
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Rows per bulk insert statement; the whole request is still one transaction
+CHUNK_SIZE = 5000
+
+# Per-record errors returned in the response; later ones are only counted
+MAX_ERRORS = 1000
+
+_WHITESPACE = " \t\r\n"
+
+
+class MalformedBody(ValueError):
+    """The body cannot be split into records (e.g. an unterminated JSON array)"""
+
+
+async def iter_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+    """Yield (index, record) pairs from a byte stream holding NDJSON or a JSON array.
+
+    The format is taken from the first non-whitespace character: `[` starts a
+    JSON array, anything else is read as one JSON document per line. Records
+    are decoded as soon as their bytes arrive, so the body is never held in
+    memory as a whole. An NDJSON line that is not valid JSON is yielded as a
+    `json.JSONDecodeError` so it can be reported against its index; a broken
+    JSON array cannot be resynchronised and raises `MalformedBody`, as does a
+    body that is not UTF-8.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parser = json.JSONDecoder()
+    buffer = ""
+    mode = None
+    index = 0
+    finished = False
+    stream = chunks.__aiter__()
+
+    while not finished:
+        try:
+            chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            chunk = b""
+            finished = True
+        try:
+            buffer += decoder.decode(chunk, final=finished)
+        except UnicodeDecodeError as e:
+            raise MalformedBody(f"Body is not valid UTF-8: {e.reason} at byte {e.start}") from e
+
+        if mode is None:
+            buffer = buffer.lstrip(_WHITESPACE)
+            if not buffer:
+                continue
+            if buffer[0] == "[":
+                mode = "array"
+                buffer = buffer[1:]
+            else:
+                mode = "ndjson"
+
+        if mode == "closed":
+            if buffer.strip(_WHITESPACE):
+                raise MalformedBody("Unexpected data after the closing bracket")
+            buffer = ""
+            continue
+
+        if mode == "ndjson":
+            lines = buffer.split("\n")
+            buffer = "" if finished else lines.pop()
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield index, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield index, e
+                index += 1
+            continue
+
+        # JSON array: decode complete elements and keep the incomplete tail
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE + ",":
+                position += 1
+            if position == len(buffer):
+                break
+            if buffer[position] == "]":
+                if buffer[position + 1:].strip(_WHITESPACE):
+                    raise MalformedBody("Unexpected data after the closing bracket")
+                mode = "closed"
+                position = len(buffer)
+                break
+            try:
+                record, end = parser.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if finished:
+                    raise MalformedBody(f"Invalid JSON in record {index}: {e.msg}") from e
+                break  # Most likely incomplete; wait for more bytes
+            if end == len(buffer) and not finished and not isinstance(record, (dict, list, str)):
+                break  # A bare number may continue in the next chunk
+            yield index, record
+            index += 1
+            position = end
+        buffer = buffer[position:]
+
+    if mode == "array":
+        raise MalformedBody("JSON array is missing its closing bracket")
+
+
+def _errors(e: Exception) -> List[Dict[str, Any]]:
+    if isinstance(e, ValidationError):
+        return json.loads(e.json(include_url=False))
+    if isinstance(e, json.JSONDecodeError):
+        return [{"type": "json_invalid", "msg": str(e)}]
+    return [{"type": "value_error", "msg": str(e)}]
+
+
+async def ingest(
+    request: Request,
+    db: Session,
+    model,
+    schema: Type[BaseModel],
+    to_mapping: Optional[Callable[[BaseModel], Dict[str, Any]]] = None,
+    check: Optional[Callable[[BaseModel], None]] = None,
+    on_chunk: Optional[Callable[[Session, List[BaseModel]], Any]] = None,
+    chunk_size: int = CHUNK_SIZE,
+    max_errors: int = MAX_ERRORS
+) -> Dict[str, Any]:
+    """Validate the records of a batch request one by one and bulk insert the valid ones.
+
+    Valid records are inserted with `bulk_insert_mappings` every `chunk_size`
+    rows and committed once at the end, so a batch is stored completely or
+    not at all. Invalid records, including ones `check(item)` rejects with a
+    ValueError, are skipped and reported by index.
+    `on_chunk(db, items)` runs in the same transaction after each insert.
+    """
+    to_mapping = to_mapping or (lambda item: item.model_dump())
+    received = 0
+    inserted = 0
+    rejected = 0
+    errors = []
+    pending = []
+
+    def write(items):
+        db.bulk_insert_mappings(model, [to_mapping(item) for item in items])
+        if on_chunk is not None:
+            on_chunk(db, items)
+
+    try:
+        async for index, record in iter_records(request.stream()):
+            received += 1
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                if not isinstance(record, dict):
+                    raise ValueError("Record must be a JSON object")
+                item = schema.model_validate(record)
+                if check is not None:
+                    check(item)
+            except (ValueError, ValidationError) as e:
+                rejected += 1
+                if len(errors) < max_errors:
+                    errors.append({"index": index, "errors": _errors(e)})
+                continue
+
+            pending.append(item)
+            if len(pending) >= chunk_size:
+                await run_in_threadpool(write, pending)
+                inserted += len(pending)
+                pending = []
+
+        if pending:
+            await run_in_threadpool(write, pending)
+            inserted += len(pending)
+        await run_in_threadpool(db.commit)
+    except MalformedBody as e:
+        await run_in_threadpool(db.rollback)
+        raise HTTPException(status_code=400, detail=str(e))
+    except SQLAlchemyError:
+        await run_in_threadpool(db.rollback)
+        logger.exception("Batch insert into %s failed", model.__tablename__)
+        raise HTTPException(status_code=500, detail="Failed to store batch")
+
+    return {
+        "received": received,
+        "inserted": inserted,
+        "rejected": rejected,
+        "errors": errors,
+        "errors_truncated": rejected > len(errors)
+    }
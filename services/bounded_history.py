@@ -0,0 +1,205 @@
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import deque
+from itertools import count, islice
+
+import numpy as np
+import psutil
+
+# Root directory for spilled history segments: <root>/<name>/<pid>-<n> per history instance
+DEFAULT_SPILL_DIR = os.environ.get("HISTORY_SPILL_DIR", os.path.join(tempfile.gettempdir(), "history_spill"))
+
+_instance_ids = count()
+_claimed = set()  # Spill directories owned by live histories in this process
+_claimed_lock = threading.Lock()
+
+
+def _sweep_orphans(name_dir):
+    """Remove spill directories no running history can read any more.
+
+    Segments are indexed in memory only, so a directory is dead once its
+    process exits (or its history is closed) and can never be read back.
+    """
+    try:
+        entries = os.listdir(name_dir)
+    except FileNotFoundError:
+        return
+    pid = os.getpid()
+    for entry in entries:
+        path = os.path.join(name_dir, entry)
+        owner = entry.split('-', 1)[0]
+        if not owner.isdigit():
+            continue
+        if int(owner) == pid:
+            orphaned = path not in _claimed  # A previous process that had our pid
+        else:
+            orphaned = not psutil.pid_exists(int(owner))
+        if orphaned:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _json_default(value):
+    """Serialise the numpy, datetime and set values detector records contain"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def _release(spill_dir):
+    shutil.rmtree(spill_dir, ignore_errors=True)
+    with _claimed_lock:
+        _claimed.discard(spill_dir)
+
+
+class BoundedHistory:
+    """Append-only history that keeps the newest items in memory and spills older ones to disk.
+
+    At most `max_items` (plus one spill batch) items stay in memory. Older
+    items are appended in batches to gzip-compressed JSONL segments, one
+    `{"t": <ISO timestamp>, "item": ...}` line per item. The time range of
+    every segment is kept in memory, so `query` only opens segments that
+    overlap the requested range. Items read back from disk are plain JSON
+    values (tuples become lists, datetimes become ISO strings).
+
+    Segments live under `<spill_dir>/<name>/` and are deleted by `close()`,
+    when the history is garbage collected or at interpreter exit; directories
+    left by processes that died without cleaning up are removed the next time
+    a history with the same name starts.
+    """
+
+    def __init__(self, name, max_items=1000, spill_dir=None, segment_items=50000, spill_batch=None):
+        self.name = name
+        self.max_items = max_items
+        self.segment_items = segment_items
+        self.spill_batch = spill_batch or max(1, max_items // 4)
+        name_dir = os.path.join(spill_dir or DEFAULT_SPILL_DIR, name)
+        self.spill_dir = os.path.join(name_dir, f"{os.getpid()}-{next(_instance_ids)}")
+        with _claimed_lock:
+            _claimed.add(self.spill_dir)
+            _sweep_orphans(name_dir)
+        self._finalizer = weakref.finalize(self, _release, self.spill_dir)
+
+        self._memory = deque()  # (timestamp, item), oldest first
+        self._segments = []  # {'path', 'start', 'end', 'count'}, oldest first
+        self._spilled = 0
+        self._lock = threading.RLock()
+
+    def append(self, item, timestamp=None):
+        with self._lock:
+            self._memory.append((timestamp or datetime.datetime.now(), item))
+            if len(self._memory) > self.max_items + self.spill_batch:
+                self._spill(self.spill_batch)
+
+    def extend(self, items, timestamp=None):
+        """Append many items sharing one timestamp"""
+        timestamp = timestamp or datetime.datetime.now()
+        with self._lock:
+            self._memory.extend((timestamp, item) for item in items)
+            overflow = len(self._memory) - self.max_items
+            if overflow > self.spill_batch:
+                self._spill(overflow)
+
+    def _spill(self, count):
+        """Move the `count` oldest in-memory items to the current segment"""
+        os.makedirs(self.spill_dir, exist_ok=True)
+        while count > 0:
+            segment = self._segments[-1] if self._segments else None
+            if segment is None or segment['count'] >= self.segment_items:
+                segment = {
+                    'path': os.path.join(self.spill_dir, f"{len(self._segments):06d}.jsonl.gz"),
+                    'start': None,
+                    'end': None,
+                    'count': 0
+                }
+                self._segments.append(segment)
+
+            batch = [self._memory.popleft() for _ in range(min(count, self.segment_items - segment['count']))]
+            lines = [
+                json.dumps({'t': timestamp.isoformat(), 'item': item}, default=_json_default)
+                for timestamp, item in batch
+            ]
+            # Each append adds a gzip member; readers see one continuous stream
+            with gzip.open(segment['path'], 'at', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+
+            segment['start'] = segment['start'] or batch[0][0]
+            segment['end'] = batch[-1][0]
+            segment['count'] += len(batch)
+            self._spilled += len(batch)
+            count -= len(batch)
+
+    def _read_segment(self, segment, start=None, end=None):
+        with gzip.open(segment['path'], 'rt', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if start is not None or end is not None:
+                    timestamp = datetime.datetime.fromisoformat(record['t'])
+                    if (start is not None and timestamp < start) or (end is not None and timestamp >= end):
+                        continue
+                yield record['item']
+
+    def query(self, start=None, end=None):
+        """Items appended in [start, end), oldest first, from disk and memory"""
+        with self._lock:
+            segments = [
+                segment for segment in self._segments
+                if (start is None or segment['end'] >= start) and (end is None or segment['start'] < end)
+            ]
+            memory = [
+                item for timestamp, item in self._memory
+                if (start is None or timestamp >= start) and (end is None or timestamp < end)
+            ]
+        items = []
+        for segment in segments:
+            items.extend(self._read_segment(segment, start, end))
+        items.extend(memory)
+        return items
+
+    def recent(self, n=None):
+        """The newest in-memory items, oldest first"""
+        with self._lock:
+            n = len(self._memory) if n is None else min(n, len(self._memory))
+            items = [item for _, item in islice(reversed(self._memory), n)]
+        return items[::-1]
+
+    def __iter__(self):
+        """Every item, spilled ones first"""
+        return iter(self.query())
+
+    def __len__(self):
+        return self._spilled + len(self._memory)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    @property
+    def spilled(self):
+        return self._spilled
+
+    def clear(self):
+        """Drop all items, including the spilled segments"""
+        with self._lock:
+            self._memory.clear()
+            self._segments = []
+            self._spilled = 0
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def close(self):
+        """Drop all items and release the spill directory; the history must not be used afterwards"""
+        with self._lock:
+            self._memory.clear()
+            self._segments = []
+            self._spilled = 0
+            self._finalizer()
@@ -1,32 +1,37 @@
 import cv2
 import numpy as np
 from ultralytics import YOLO
-from collections import defaultdict
+from services.detection_results import ResultDecoder
+from utils.geometry import points_in_boxes
+from collections import defaultdict, deque
+from itertools import islice
 import datetime
 import json
 import os
 
 class CheckoutMonitoringService:
-    def __init__(self, model_path, confidence_threshold=0.5):
+    def __init__(self, model_path, confidence_threshold=0.5, visit_timeout=2.0, history_size=500, queue_history_size=100):
         """Initialize the checkout monitoring service"""
         # Load the trained checkout counter detection model
         self.model = YOLO(model_path)
         self.confidence_threshold = confidence_threshold
+        self.decoder = ResultDecoder(confidence_threshold=confidence_threshold)
         
         # Store checkout counter locations
         self.checkout_counters = []
         
         # Track usage statistics
-        self.checkout_usage = defaultdict(lambda: {
-            'total_visits': 0,
-            'average_time': 0,
-            'current_customers': 0,
-            'busy_periods': [],
-            'history': []
-        })
+        self.history_size = history_size
+        self.checkout_usage = defaultdict(self._new_usage)
+        
+        # Visits in progress: checkout_id -> track ID -> visit. A visit is closed
+        # once the person has not been seen at the counter for visit_timeout seconds
+        self.visit_timeout = visit_timeout
+        self.open_visits = defaultdict(dict)
         
-        # Queue monitoring
-        self.queue_lengths = defaultdict(list)
+        # Queue monitoring (fixed-size ring buffer of samples per checkout)
+        self.queue_history_size = queue_history_size
+        self.queue_lengths = defaultdict(lambda: deque(maxlen=self.queue_history_size))
         self.queue_thresholds = {
             'short': 1,     # 1 person
             'normal': 3,    # 2-3 people
@@ -38,6 +43,18 @@ class CheckoutMonitoringService:
         self.last_analysis_time = datetime.datetime.now()
         self.checkout_statuses = {}
 
+    def _new_usage(self):
+        """Empty usage statistics for a checkout"""
+        return {
+            'total_visits': 0,
+            'completed_visits': 0,
+            'total_time': 0.0,
+            'average_time': 0,
+            'current_customers': 0,
+            'busy_periods': [],
+            'history': deque(maxlen=self.history_size)  # Most recent closed visits
+        }
+
     def detect_checkout_counters(self, frame):
         """Detect checkout counters in the frame"""
         # Run model to detect checkout counters
@@ -46,40 +63,30 @@ class CheckoutMonitoringService:
         # Process detections
         self.checkout_counters = []
         
-        if results and len(results) > 0:
-            # Get the first result
-            result = results[0]
+        counters = self.decoder(results)
+        boxes = counters.xyxy.astype(int)
+        timestamp = datetime.datetime.now()
+        
+        # Process each detection
+        for i, ((x1, y1, x2, y2), conf, cls) in enumerate(zip(
+                boxes.tolist(), counters.confidence.tolist(), counters.class_id.tolist())):
+            checkout_id = f"checkout_{i+1}"
             
-            # Process each detection
-            for i, (box, conf, cls) in enumerate(zip(result.boxes.xyxy, result.boxes.conf, result.boxes.cls)):
-                if conf >= self.confidence_threshold:
-                    # Extract bounding box coordinates
-                    x1, y1, x2, y2 = box.tolist()
-                    x1, y1, x2, y2 = map(int, [x1, y1, x2, y2])
-                    
-                    checkout_id = f"checkout_{i+1}"
-                    
-                    # Store checkout counter information
-                    counter_info = {
-                        'id': checkout_id,
-                        'bbox': (x1, y1, x2, y2),
-                        'center': ((x1 + x2) // 2, (y1 + y2) // 2),
-                        'confidence': conf.item(),
-                        'class': int(cls.item()),
-                        'timestamp': datetime.datetime.now()
-                    }
-                    
-                    self.checkout_counters.append(counter_info)
-                    
-                    # Initialize checkout statistics if new
-                    if checkout_id not in self.checkout_usage:
-                        self.checkout_usage[checkout_id] = {
-                            'total_visits': 0,
-                            'average_time': 0,
-                            'current_customers': 0,
-                            'busy_periods': [],
-                            'history': []
-                        }
+            # Store checkout counter information
+            counter_info = {
+                'id': checkout_id,
+                'bbox': (x1, y1, x2, y2),
+                'center': ((x1 + x2) // 2, (y1 + y2) // 2),
+                'confidence': conf,
+                'class': cls,
+                'timestamp': timestamp
+            }
+            
+            self.checkout_counters.append(counter_info)
+            
+            # Initialize checkout statistics if new
+            if checkout_id not in self.checkout_usage:
+                self.checkout_usage[checkout_id] = self._new_usage()
         
         return self.checkout_counters
 
@@ -94,70 +101,93 @@ class CheckoutMonitoringService:
         # Track queue lengths for each checkout
         checkout_queues = defaultdict(int)
         
-        # Check each person against checkout areas
-        if hasattr(person_detections, 'xyxy'):
-            for i, bbox in enumerate(person_detections.xyxy):
-                px1, py1, px2, py2 = map(int, bbox)
-                person_center = ((px1 + px2) // 2, (py1 + py2) // 2)
+        # Check every person against every counter and queue area at once
+        if hasattr(person_detections, 'xyxy') and len(person_detections.xyxy) and self.checkout_counters:
+            boxes = np.asarray(person_detections.xyxy).astype(int)
+            person_centers = (boxes[:, :2] + boxes[:, 2:]) // 2
+            
+            counter_boxes = np.array([counter['bbox'] for counter in self.checkout_counters], dtype=np.float64)
+            widths = counter_boxes[:, 2] - counter_boxes[:, 0]
+            heights = counter_boxes[:, 3] - counter_boxes[:, 1]
+            # Queue area: extend left by the counter width and down by 2x its height
+            queue_boxes = np.stack([
+                counter_boxes[:, 0] - widths, counter_boxes[:, 1],
+                counter_boxes[:, 2], counter_boxes[:, 3] + heights * 2
+            ], axis=1)
+            
+            at_counter = points_in_boxes(person_centers, counter_boxes)
+            in_queue = points_in_boxes(person_centers, queue_boxes) & ~at_counter
+            
+            tracker_ids = getattr(person_detections, 'tracker_id', None)
+            for i, counter_index in np.argwhere(at_counter):
+                checkout_id = self.checkout_counters[counter_index]['id']
+                # Person is at the checkout counter
+                self.checkout_usage[checkout_id]['current_customers'] += 1
+                
+                # Get person ID if available
+                person_id = int(i)
+                if tracker_ids is not None and i < len(tracker_ids) and tracker_ids[i] is not None:
+                    person_id = int(tracker_ids[i])
                 
-                # Check interaction with each checkout counter
-                for counter in self.checkout_counters:
-                    cx1, cy1, cx2, cy2 = counter['bbox']
-                    checkout_id = counter['id']
-                    
-                    # Define an extended area around the checkout (for queue detection)
-                    queue_area_x1 = cx1 - (cx2 - cx1)  # Extend left by counter width
-                    queue_area_y1 = cy1
-                    queue_area_x2 = cx2
-                    queue_area_y2 = cy2 + (cy2 - cy1) * 2  # Extend down by 2x counter height
-                    
-                    # Check if person is at counter
-                    if (cx1 <= person_center[0] <= cx2 and 
-                        cy1 <= person_center[1] <= cy2):
-                        # Person is at the checkout counter
-                        self.checkout_usage[checkout_id]['current_customers'] += 1
-                        
-                        # Get person ID if available
-                        person_id = i
-                        if hasattr(person_detections, 'tracker_id') and person_detections.tracker_id is not None:
-                            if i < len(person_detections.tracker_id) and person_detections.tracker_id[i] is not None:
-                                person_id = int(person_detections.tracker_id[i])
-                        
-                        # Log visit if not already logged
-                        visit_entry = {
-                            'person_id': person_id,
-                            'start_time': current_time.isoformat(),
-                            'end_time': None
-                        }
-                        
-                        # Check if this is a new visit
-                        if not any(v['person_id'] == person_id and v['end_time'] is None 
-                                for v in self.checkout_usage[checkout_id]['history']):
-                            self.checkout_usage[checkout_id]['history'].append(visit_entry)
-                            self.checkout_usage[checkout_id]['total_visits'] += 1
-                    
-                    # Check if person is in queue area
-                    elif (queue_area_x1 <= person_center[0] <= queue_area_x2 and 
-                        queue_area_y1 <= person_center[1] <= queue_area_y2):
-                        # Person is in queue area
-                        checkout_queues[checkout_id] += 1
+                # Open a visit unless one is already in progress
+                visit = self.open_visits[checkout_id].get(person_id)
+                if visit is None:
+                    self.open_visits[checkout_id][person_id] = {
+                        'person_id': person_id,
+                        'start_time': current_time,
+                        'last_seen': current_time
+                    }
+                    self.checkout_usage[checkout_id]['total_visits'] += 1
+                else:
+                    visit['last_seen'] = current_time
+            
+            for counter_index, queued in enumerate(in_queue.sum(axis=0).tolist()):
+                if queued:
+                    checkout_queues[self.checkout_counters[counter_index]['id']] += queued
+        
+        # Close visits of people who left the counters
+        self._close_visits(current_time)
         
-        # Update queue lengths
-        for checkout_id, queue_length in checkout_queues.items():
+        # Update queue lengths (the ring buffer drops the oldest sample)
+        for counter in self.checkout_counters:
+            checkout_id = counter['id']
             self.queue_lengths[checkout_id].append({
                 'timestamp': current_time.isoformat(),
-                'length': queue_length
+                'length': checkout_queues.get(checkout_id, 0)
             })
-            
-            # Keep only last 100 measurements
-            if len(self.queue_lengths[checkout_id]) > 100:
-                self.queue_lengths[checkout_id] = self.queue_lengths[checkout_id][-100:]
         
         # Update checkout statuses
         self._update_checkout_statuses()
         
         return self.checkout_statuses
 
+    def close_visits(self):
+        """Close every visit still in progress, e.g. before saving or shutting down"""
+        self._close_visits(datetime.datetime.now(), force=True)
+
+    def _close_visits(self, current_time, force=False):
+        """Move visits not seen for visit_timeout seconds (or all of them, with force) into the history"""
+        for checkout_id, visits in self.open_visits.items():
+            expired = [
+                person_id for person_id, visit in visits.items()
+                if force or (current_time - visit['last_seen']).total_seconds() > self.visit_timeout
+            ]
+            if not expired:
+                continue
+            usage = self.checkout_usage[checkout_id]
+            for person_id in expired:
+                visit = visits.pop(person_id)
+                duration = (visit['last_seen'] - visit['start_time']).total_seconds()
+                usage['history'].append({
+                    'person_id': person_id,
+                    'start_time': visit['start_time'].isoformat(),
+                    'end_time': visit['last_seen'].isoformat(),
+                    'duration': duration
+                })
+                usage['completed_visits'] += 1
+                usage['total_time'] += duration
+                usage['average_time'] = usage['total_time'] / usage['completed_visits']
+
     def _update_checkout_statuses(self):
         """Update the status of each checkout based on current data"""
         current_time = datetime.datetime.now()
@@ -168,7 +198,7 @@ class CheckoutMonitoringService:
             
             # Calculate average queue length over last 5 measurements
             recent_queue_lengths = [
-                q['length'] for q in self.queue_lengths.get(checkout_id, [])[-5:]
+                q['length'] for q in islice(reversed(self.queue_lengths.get(checkout_id, ())), 5)
             ]
             avg_queue_length = sum(recent_queue_lengths) / max(len(recent_queue_lengths), 1) if recent_queue_lengths else 0
             
@@ -287,15 +317,8 @@ class CheckoutMonitoringService:
             status = self.checkout_statuses.get(checkout_id, {}).get('status', 'UNKNOWN')
             queue_length = self.checkout_statuses.get(checkout_id, {}).get('queue_length', 0)
             
-            # Calculate average wait time from history if available
-            wait_times = []
-            for visit in data['history']:
-                if visit['end_time'] is not None:
-                    start = datetime.datetime.fromisoformat(visit['start_time'])
-                    end = datetime.datetime.fromisoformat(visit['end_time'])
-                    wait_times.append((end - start).total_seconds())
-            
-            avg_wait_time = sum(wait_times) / max(len(wait_times), 1) if wait_times else 0
+            # Running average over every closed visit
+            avg_wait_time = data['average_time']
             
             # Add checkout stats
             analytics['counters'][checkout_id] = {
@@ -303,6 +326,7 @@ class CheckoutMonitoringService:
                 'total_visits': data['total_visits'],
                 'current_queue': queue_length,
                 'current_customers': data['current_customers'],
+                'open_visits': len(self.open_visits.get(checkout_id, ())),
                 'average_wait_time': avg_wait_time,
                 'busy_periods': len(data['busy_periods'])
             }
@@ -336,11 +360,11 @@ class CheckoutMonitoringService:
                         'current_customers': v['current_customers'],
                         'busy_periods': v['busy_periods'],
                         # Limit history to last 10 entries to keep size reasonable
-                        'history': v['history'][-10:] if v['history'] else []
+                        'history': list(islice(reversed(v['history']), 10))[::-1]
                     }
                     for k, v in self.checkout_usage.items()
                 },
-                'queue_lengths': {k: v[-10:] for k, v in self.queue_lengths.items()},
+                'queue_lengths': {k: list(islice(reversed(v), 10))[::-1] for k, v in self.queue_lengths.items()},
                 'checkout_statuses': self.checkout_statuses,
                 'analytics': self.get_analytics()
             }
@@ -350,13 +374,16 @@ class CheckoutMonitoringService:
             raise ValueError(f"Unsupported export format: {format}")
 
     def save_analytics(self, output_path=None):
-        """Save analytics data to file"""
+        """Close the visits still in progress and save analytics data to file"""
         if output_path is None:
             # Create default output directory if it doesn't exist
             os.makedirs('checkout_analytics', exist_ok=True)
             timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
             output_path = f'checkout_analytics/checkout_data_{timestamp}.json'
         
+        # People still at a counter count towards history and average_time
+        self.close_visits()
+        
         # Export data and save to file
         data = self.export_data(format='json')
         with open(output_path, 'w') as f:
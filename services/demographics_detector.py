@@ -6,8 +6,9 @@ import os
 import json
 import time
 from datetime import datetime
-from collections import defaultdict, deque
+from collections import Counter, defaultdict, deque
 import sys
+from services.bounded_history import BoundedHistory
 
 class DemographicsDetector:
     """
@@ -69,7 +70,9 @@ class DemographicsDetector:
         self.person_histories = defaultdict(lambda: deque(maxlen=30))  # Store history of demographic classifications
         
         # Analytics variables
-        self.demographics_history = []
+        self.demographics_history = BoundedHistory("demographics_history")  # Older records spill to disk
+        self.history_gender_counts = Counter()  # Running tallies over demographics_history
+        self.history_age_counts = Counter()
         self.session_start_time = datetime.now()
         self.frame_count = 0
         self.total_detections = 0
@@ -88,7 +91,7 @@ class DemographicsDetector:
         }
         
         # Time periods (store counts for every 5 minute interval)
-        self.time_period_stats = []
+        self.time_period_stats = BoundedHistory("demographics_periods", max_items=288)
         self.current_period_start = self.session_start_time
         self.period_demographics = self._create_empty_demographics_stats()
         self.PERIOD_LENGTH_SECONDS = 300  # 5 minutes
@@ -286,6 +289,8 @@ class DemographicsDetector:
                 "gender": person["final_gender"]
             }
             self.demographics_history.append(person_data)
+            self.history_gender_counts[person_data["gender"]] += 1
+            self.history_age_counts[person_data["age_group"]] += 1
             
             # Remove tracking data
             del self.tracked_persons[person_id]
@@ -446,19 +451,17 @@ class DemographicsDetector:
         historical_age = {age: 0 for age in self.AGE_GROUPS.values()}
         historical_age["unknown"] = 0
         
-        for person in self.demographics_history:
-            gender = person["gender"]
-            age = person["age_group"]
-            
+        for gender, count in self.history_gender_counts.items():
             if gender in historical_gender:
-                historical_gender[gender] += 1
+                historical_gender[gender] += count
             else:
-                historical_gender["unknown"] += 1
-                
+                historical_gender["unknown"] += count
+        
+        for age, count in self.history_age_counts.items():
             if age in historical_age:
-                historical_age[age] += 1
+                historical_age[age] += count
             else:
-                historical_age["unknown"] += 1
+                historical_age["unknown"] += count
         
         # Calculate historical percentages
         historical_gender_distribution = {}
@@ -493,7 +496,7 @@ class DemographicsDetector:
                 "gender_distribution": historical_gender_distribution,
                 "age_distribution": historical_age_distribution
             },
-            "time_period_stats": self.time_period_stats
+            "time_period_stats": self.time_period_stats.recent()
         }
         
         return stats
@@ -502,7 +505,9 @@ class DemographicsDetector:
         """Save analytics data to a JSON file"""
         stats = self.get_statistics()
         
-        # Add any currently tracked people to historical data for complete stats
+        # Recent completed people plus everyone still tracked; older records stay
+        # on disk (demographics_history.query reads a time window back)
+        stats["demographics_detail"] = self.demographics_history.recent()
         for person_id, person in self.tracked_persons.items():
             person_data = {
                 "person_id": person_id,
@@ -512,7 +517,7 @@ class DemographicsDetector:
                 "age_group": person["final_age_group"],
                 "gender": person["final_gender"]
             }
-            stats["demographics_detail"] = self.demographics_history + [person_data]
+            stats["demographics_detail"].append(person_data)
         
         # Save to file
         try:
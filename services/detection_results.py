@@ -0,0 +1,165 @@
+import numpy as np
+import supervision as sv
+from collections import deque
+
+
+def _to_numpy(tensor):
+    """Copy a (possibly GPU) tensor to host memory once"""
+    if hasattr(tensor, 'cpu'):
+        tensor = tensor.cpu()
+    if hasattr(tensor, 'numpy'):
+        return tensor.numpy()
+    return np.asarray(tensor)
+
+
+def empty_detections():
+    """Detections with no rows but every column present"""
+    return sv.Detections(
+        xyxy=np.empty((0, 4), dtype=np.float32),
+        confidence=np.empty(0, dtype=np.float32),
+        class_id=np.empty(0, dtype=int),
+        data={'class_name': np.empty(0, dtype=object)}
+    )
+
+
+class ResultDecoder:
+    """Turn ultralytics results into columnar sv.Detections.
+
+    The whole `boxes.data` block (x1, y1, x2, y2, [track id], conf, cls) is
+    copied to the host in a single transfer, then confidence/class filtering
+    and class-name mapping are done on the NumPy columns instead of per
+    tensor element.
+    """
+
+    def __init__(self, class_names=None, confidence_threshold=None, classes=None):
+        self.confidence_threshold = confidence_threshold
+        self.classes = None if classes is None else np.asarray(classes, dtype=int)
+
+        # Lookup table from class id to name; model.names is a dict, services use lists
+        if isinstance(class_names, dict):
+            table = [None] * (max(class_names) + 1 if class_names else 0)
+            for class_id, name in class_names.items():
+                table[class_id] = name
+        else:
+            table = list(class_names or [])
+        self.class_table = np.array(
+            [name if name is not None else f"class_{i}" for i, name in enumerate(table)],
+            dtype=object
+        )
+
+    def class_names_for(self, class_ids):
+        """Vectorized class id -> name mapping ('class_<id>' for unknown ids)"""
+        class_ids = np.asarray(class_ids, dtype=int)
+        known = (class_ids >= 0) & (class_ids < len(self.class_table))
+        names = np.empty(len(class_ids), dtype=object)
+        names[known] = self.class_table[class_ids[known]]
+        for i in np.flatnonzero(~known):
+            names[i] = f"class_{class_ids[i]}"
+        return names
+
+    def decode(self, result):
+        """Decode one result; returns sv.Detections with a 'class_name' data column"""
+        boxes = getattr(result, 'boxes', None)
+        if boxes is None or len(boxes) == 0:
+            return empty_detections()
+
+        data = _to_numpy(boxes.data)
+        mask = np.ones(len(data), dtype=bool)
+        if self.confidence_threshold is not None:
+            mask &= data[:, -2] >= self.confidence_threshold
+        if self.classes is not None:
+            mask &= np.isin(data[:, -1].astype(int), self.classes)
+        data = data[mask]
+
+        class_ids = data[:, -1].astype(int)
+        return sv.Detections(
+            xyxy=data[:, :4].astype(np.float32),
+            confidence=data[:, -2].astype(np.float32),
+            class_id=class_ids,
+            tracker_id=data[:, 4].astype(int) if data.shape[1] == 7 else None,
+            data={'class_name': self.class_names_for(class_ids)}
+        )
+
+    def __call__(self, results):
+        """Decode the first result of a model call (empty detections if there is none)"""
+        if not results:
+            return empty_detections()
+        return self.decode(results[0])
+
+
+def to_records(detections, timestamp=None, frame_id=None):
+    """Expand columnar detections into row dicts, only for export and persistence.
+
+    Every service uses the same keys: bbox ([x1, y1, x2, y2] ints),
+    confidence, class_id, class_name, track_id, any extra data columns, and
+    timestamp (ISO string) / frame_id when given.
+    """
+    columns = {
+        'bbox': detections.xyxy.astype(int).tolist(),
+        'confidence': detections.confidence.tolist() if detections.confidence is not None else [None] * len(detections),
+        'class_id': detections.class_id.tolist() if detections.class_id is not None else [None] * len(detections),
+        'track_id': detections.tracker_id.tolist() if detections.tracker_id is not None else [None] * len(detections),
+    }
+    for name, values in detections.data.items():
+        columns[name] = np.asarray(values).tolist()
+    if timestamp is not None:
+        columns['timestamp'] = [timestamp.isoformat()] * len(detections)
+    if frame_id is not None:
+        columns['frame_id'] = [frame_id] * len(detections)
+
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*(columns[key] for key in keys))]
+
+
+class DetectionHistory:
+    """Recent detections kept per frame as columnar blocks, bounded by row count"""
+
+    def __init__(self, max_rows=1000):
+        self.max_rows = max_rows
+        self.frames = deque()  # (timestamp, frame_id, detections)
+        self.rows = 0
+        self.total = 0  # All-time row count
+
+    def append(self, detections, timestamp, frame_id):
+        if len(detections) == 0:
+            return
+        self.frames.append((timestamp, frame_id, detections))
+        self.rows += len(detections)
+        self.total += len(detections)
+        while self.rows - len(self.frames[0][2]) >= self.max_rows:
+            self.rows -= len(self.frames.popleft()[2])
+
+    def __len__(self):
+        return min(self.rows, self.max_rows)
+
+    def _latest_frames(self, n):
+        """Newest frames holding at least n rows, oldest first"""
+        frames = []
+        rows = 0
+        for frame in reversed(self.frames):
+            if rows >= n:
+                break
+            frames.append(frame)
+            rows += len(frame[2])
+        return frames[::-1]
+
+    def recent(self, n=50):
+        """Row dicts for the n most recent detections"""
+        records = []
+        for timestamp, frame_id, detections in self._latest_frames(n):
+            records.extend(to_records(detections, timestamp, frame_id))
+        return records[-n:] if n else []
+
+    def recent_class_counts(self, n=30):
+        """Class name counts over the n most recent detections"""
+        frames = self._latest_frames(n)
+        if not frames or not n:
+            return {}
+        names = np.concatenate([detections.data['class_name'] for _, _, detections in frames])[-n:]
+        values, counts = np.unique(names.astype(str), return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+
+    def clear(self):
+        self.frames.clear()
+        self.rows = 0
+        self.total = 0
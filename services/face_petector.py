@@ -8,6 +8,7 @@ import time
 from datetime import datetime
 from collections import defaultdict, deque
 import sys
+from services.bounded_history import BoundedHistory
 
 class FaceDetector:
     """
@@ -56,13 +57,15 @@ class FaceDetector:
         self.face_histories = defaultdict(lambda: deque(maxlen=30))  # Store history of face positions
         
         # Analytics variables
-        self.face_history = []
+        self.face_history = BoundedHistory("face_history")  # Older records spill to disk
+        self.history_duration_total = 0  # Running sums over face_history for statistics
+        self.history_size_total = 0.0
         self.session_start_time = datetime.now()
         self.frame_count = 0
         self.total_detections = 0
         
         # Time periods (store counts for every 5 minute interval)
-        self.time_period_stats = []
+        self.time_period_stats = BoundedHistory("face_periods", max_items=288)
         self.current_period_start = self.session_start_time
         self.period_face_count = 0
         self.PERIOD_LENGTH_SECONDS = 300  # 5 minutes
@@ -230,6 +233,8 @@ class FaceDetector:
                 "movement_pixels": movement
             }
             self.face_history.append(face_data)
+            self.history_duration_total += duration_frames
+            self.history_size_total += avg_size
             
             # Remove tracking data
             del self.tracked_faces[face_id]
@@ -343,13 +348,9 @@ class FaceDetector:
         avg_duration = 0
         
         if total_unique_faces > 0:
-            # Calculate from historical data
-            total_size = 0
-            total_duration = 0
-            
-            for face in self.face_history:
-                total_duration += face["duration_frames"]
-                total_size += face["avg_size"]
+            # Historical data from the running sums
+            total_size = self.history_size_total
+            total_duration = self.history_duration_total
             
             # Add current active faces
             for face in self.tracked_faces.values():
@@ -378,7 +379,7 @@ class FaceDetector:
                 "completed_tracks": historical_faces,
                 "total_unique_faces": total_unique_faces
             },
-            "time_period_stats": self.time_period_stats
+            "time_period_stats": self.time_period_stats.recent()
         }
         
         return stats
@@ -390,8 +391,8 @@ class FaceDetector:
         # Add face tracking data
         all_face_data = []
         
-        # Add historical faces (completed tracks)
-        all_face_data.extend(self.face_history)
+        # Add recent historical faces (completed tracks); older ones stay spilled on disk
+        all_face_data.extend(self.face_history.recent())
         
         # Add current faces in privacy-friendly way
         for face_id, face in self.tracked_faces.items():
@@ -1,21 +1,23 @@
 import numpy as np
 from scipy.spatial import distance
-from sklearn.cluster import DBSCAN
 from collections import defaultdict
 import datetime
-import cv2
 import json
+from services.heatmap_grid import HeatmapGrid, render_colormap
+from utils.geometry import points_in_polygons
+from .patterns import TrajectoryPatternEngine
 
 class FootpathAnalyzer:
-    def __init__(self, frame_resolution, zone_polygon=None):
+    def __init__(self, frame_resolution, zone_polygon=None, grid_shape=(108, 192), pattern_cell_size=50.0):
         self.frame_resolution = frame_resolution
         self.zone_polygon = np.array(json.loads(zone_polygon)) if zone_polygon else None
 
         # Initialize analytics containers
-        self.heatmap = np.zeros(frame_resolution, dtype=np.float32)
+        self.heatmap_grid = HeatmapGrid(frame_resolution, grid_shape)
         self.zone_visitors = set()
         self.dwell_times = defaultdict(float)
-        self.path_segments = []
+        self.path_segments = {}  # Latest segment per track
+        self.pattern_engine = TrajectoryPatternEngine(cell_size=pattern_cell_size)
 
     def analyze_tracks(self, tracks):
         """Analyze a set of tracks to generate insights"""
@@ -35,60 +37,61 @@ class FootpathAnalyzer:
             # Record path segment
             self._record_path_segment(track_id, positions)
 
+        self.pattern_engine.forget_tracks(tracks)
+
     def _update_heatmap(self, positions):
         """Update heatmap with track positions"""
-        for point in positions:
-            x, y = point['position']
-            y = int(y)
-            x = int(x)
-            if 0 <= y < self.frame_resolution[0] and 0 <= x < self.frame_resolution[1]:
-                self.heatmap[y, x] += 1
+        points = np.array([point['position'] for point in positions], dtype=np.float64)
+        self.heatmap_grid.add_points(points[:, 0].astype(np.int64), points[:, 1].astype(np.int64))
 
     def _analyze_dwell_time(self, track_id, positions):
         """Analyze time spent in zone"""
-        in_zone = False
-        zone_entry_time = None
-
-        for point in positions:
-            position = point['position']
-            timestamp = point['timestamp']
-
-            # Check if point is in zone
-            if self._point_in_zone(position):
-                self.zone_visitors.add(track_id)
-                if not in_zone:
-                    # Just entered zone
-                    in_zone = True
-                    zone_entry_time = timestamp
-            elif in_zone:
-                # Just exited zone
-                in_zone = False
-                if zone_entry_time:
-                    dwell_time = (timestamp - zone_entry_time).total_seconds()
-                    self.dwell_times[track_id] += dwell_time
+        in_zone = self._points_in_zone([point['position'] for point in positions])
+        if not in_zone.any():
+            return
+        self.zone_visitors.add(track_id)
+
+        # Entries are False -> True steps, exits True -> False; a visit still open at the end doesn't count yet
+        was_in_zone = np.concatenate(([False], in_zone[:-1]))
+        entries = np.flatnonzero(in_zone & ~was_in_zone)
+        exits = np.flatnonzero(~in_zone & was_in_zone)
+        for entry, exit_ in zip(entries, exits):
+            dwell_time = (positions[exit_]['timestamp'] - positions[entry]['timestamp']).total_seconds()
+            self.dwell_times[track_id] += dwell_time
 
     def _record_path_segment(self, track_id, positions):
         """Record path segment for pattern analysis"""
-        segment = {
+        # The engine only consumes positions it hasn't seen for this track
+        self.pattern_engine.add_track(track_id, [p['position'] for p in positions])
+        self.path_segments[track_id] = {
             'track_id': track_id,
-            'points': [(p['position'][0], p['position'][1]) for p in positions],
-            'timestamps': [p['timestamp'] for p in positions],
+            'point_count': len(positions),
+            'start_time': positions[0]['timestamp'],
             'duration': (positions[-1]['timestamp'] - positions[0]['timestamp']).total_seconds()
         }
-        self.path_segments.append(segment)
 
     def _point_in_zone(self, point):
         """Check if point is inside zone polygon"""
+        return bool(self._points_in_zone([point])[0])
+
+    def _points_in_zone(self, points):
+        """Zone membership of many points in one batched test"""
         if self.zone_polygon is None:
-            return True
-        return cv2.pointPolygonTest(self.zone_polygon, tuple(point), False) >= 0
+            return np.ones(len(points), dtype=bool)
+        return points_in_polygons(points, [self.zone_polygon])[:, 0]
+
+    @property
+    def heatmap(self):
+        """Grid-resolution heatmap counts"""
+        return self.heatmap_grid.counts
 
     def get_heatmap(self):
         """Get normalized heatmap"""
-        if np.max(self.heatmap) > 0:
-            normalized = (self.heatmap * 255 / np.max(self.heatmap)).astype(np.uint8)
-            return cv2.applyColorMap(normalized, cv2.COLORMAP_JET)
-        return np.zeros((*self.frame_resolution, 3), dtype=np.uint8)
+        return render_colormap(self.heatmap, self.frame_resolution)
+
+    def get_heatmap_level(self, level=0):
+        """Get one level of the heatmap pyramid (0 is the finest grid)"""
+        return self.heatmap_grid.get_level(level)
 
     def get_analytics(self):
         """Get current analytics data"""
@@ -102,36 +105,16 @@ class FootpathAnalyzer:
 
     def find_patterns(self, min_frequency=2):
         """Find common movement patterns"""
-        if len(self.path_segments) < min_frequency:
-            return []
-
-        # Extract path points for clustering
-        all_points = []
-        for segment in self.path_segments:
-            all_points.extend(segment['points'])
-
-        # Perform clustering
-        clustering = DBSCAN(eps=50, min_samples=min_frequency).fit(np.array(all_points))
-
-        # Analyze clusters
-        patterns = []
-        for label in set(clustering.labels_):
-            if label >= 0:  # Ignore noise (-1)
-                cluster_points = np.array([p for p, l in zip(all_points, clustering.labels_) if l == label])
-                center = np.mean(cluster_points, axis=0)
-
-                pattern = {
-                    'center': center.tolist(),
-                    'point_count': len(cluster_points),
-                    'frequency': len(set(clustering.labels_ == label))
-                }
-                patterns.append(pattern)
+        return self.pattern_engine.find_patterns(min_frequency)
 
-        return patterns
+    def pattern_snapshot(self):
+        """Snapshot of pattern state that can be clustered in a background thread"""
+        return self.pattern_engine.snapshot()
 
     def reset(self):
         """Reset analytics state"""
-        self.heatmap.fill(0)
+        self.heatmap_grid.reset()
         self.zone_visitors.clear()
         self.dwell_times.clear()
-        self.path_segments.clear()
\ No newline at end of file
+        self.path_segments.clear()
+        self.pattern_engine.reset()
\ No newline at end of file
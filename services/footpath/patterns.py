@@ -0,0 +1,195 @@
+import numpy as np
+from collections import deque
+
+
+def simplify_track(points, epsilon=5.0):
+    """Ramer-Douglas-Peucker simplification, returns the kept points"""
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 3:
+        return points
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        p, q = points[start], points[end]
+        interior = points[start + 1:end]
+        direction = q - p
+        length = np.hypot(direction[0], direction[1])
+        if length == 0:
+            distances = np.hypot(interior[:, 0] - p[0], interior[:, 1] - p[1])
+        else:
+            # Perpendicular distance of every interior point to the chord
+            distances = np.abs(direction[0] * (interior[:, 1] - p[1]) - direction[1] * (interior[:, 0] - p[0])) / length
+        index = int(np.argmax(distances))
+        if distances[index] > epsilon:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+def sample_segments(vertices, spacing):
+    """Sample points every `spacing` pixels along a polyline (segment midpoints of each step)"""
+    vertices = np.asarray(vertices, dtype=np.float64)
+    if len(vertices) < 2:
+        return vertices
+    starts = vertices[:-1]
+    deltas = vertices[1:] - starts
+    lengths = np.hypot(deltas[:, 0], deltas[:, 1])
+    steps = np.maximum(1, np.ceil(lengths / spacing)).astype(np.int64)
+
+    segment_index = np.repeat(np.arange(len(starts)), steps)
+    # Position of each sample within its segment, 0..steps-1
+    offsets = np.arange(segment_index.size) - np.repeat(np.cumsum(steps) - steps, steps)
+    t = (offsets + 0.5) / steps[segment_index]
+    return starts[segment_index] + deltas[segment_index] * t[:, None]
+
+
+class PatternSnapshot:
+    """Immutable copy of the engine's cell statistics, safe to cluster off-thread"""
+
+    def __init__(self, cells, cell_size, track_count):
+        self.cells = cells
+        self.cell_size = cell_size
+        self.track_count = track_count
+
+    def find_patterns(self, min_frequency=2):
+        """Group dense neighbouring cells (8-connected) into movement clusters"""
+        if self.track_count < min_frequency:
+            return []
+
+        dense = {key for key, (count, _, _, _, _) in self.cells.items() if count >= min_frequency}
+        patterns = []
+        visited = set()
+        for seed in dense:
+            if seed in visited:
+                continue
+            visited.add(seed)
+            queue = deque([seed])
+            count = 0
+            sum_x = 0.0
+            sum_y = 0.0
+            tracks = set()
+            raw_count = 0
+            while queue:
+                cx, cy = queue.popleft()
+                cell_count, cell_x, cell_y, cell_tracks, cell_raw = self.cells[(cx, cy)]
+                count += cell_count
+                sum_x += cell_x
+                sum_y += cell_y
+                tracks.update(cell_tracks)
+                raw_count += cell_raw
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        neighbour = (cx + dx, cy + dy)
+                        if neighbour in dense and neighbour not in visited:
+                            visited.add(neighbour)
+                            queue.append(neighbour)
+
+            patterns.append({
+                'center': [sum_x / count, sum_y / count],
+                'point_count': int(raw_count),
+                'frequency': len(tracks)
+            })
+
+        patterns.sort(key=lambda p: p['point_count'], reverse=True)
+        return patterns
+
+
+class TrajectoryPatternEngine:
+    """Incremental movement-pattern clustering over simplified tracks.
+
+    Tracks are simplified with RDP as they grow, their segments are sampled
+    into a uniform grid index of `cell_size` pixels, and clusters are the
+    connected dense cells of that grid, so the cost of finding patterns
+    depends on the occupied area rather than on how many points were seen.
+    """
+
+    def __init__(self, cell_size=50.0, simplify_epsilon=5.0):
+        self.cell_size = float(cell_size)
+        self.simplify_epsilon = simplify_epsilon
+        # (cx, cy) -> [sample count, sum_x, sum_y, track_ids, raw point count]; clusters are
+        # found on the samples, point_count reports the raw points as seen
+        self.cells = {}
+        self._track_state = {}  # track_id -> (positions consumed, last kept vertex)
+        self.track_count = 0
+
+    def add_track(self, track_id, points):
+        """Feed the full (growing) point list of a track; only new points are processed"""
+        consumed, last_vertex = self._track_state.get(track_id, (0, None))
+        if len(points) <= consumed:
+            return 0
+        if last_vertex is None:
+            self.track_count += 1
+
+        new_points = np.asarray(points[consumed:], dtype=np.float64).reshape(-1, 2)
+        self._add_raw(new_points)
+        if last_vertex is not None:
+            new_points = np.vstack([last_vertex, new_points])
+        self._track_state[track_id] = (len(points), new_points[-1])
+
+        vertices = simplify_track(new_points, self.simplify_epsilon)
+        if last_vertex is None and len(vertices) == 1:
+            samples = vertices
+        elif len(vertices) < 2:
+            return 0
+        else:
+            samples = sample_segments(vertices, self.cell_size / 2)
+
+        cells = np.floor(samples / self.cell_size).astype(np.int64)
+        unique, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        counts = np.bincount(inverse, minlength=len(unique))
+        sums_x = np.bincount(inverse, weights=samples[:, 0], minlength=len(unique))
+        sums_y = np.bincount(inverse, weights=samples[:, 1], minlength=len(unique))
+
+        for (cx, cy), count, sum_x, sum_y in zip(unique.tolist(), counts.tolist(), sums_x.tolist(), sums_y.tolist()):
+            cell = self.cells.get((cx, cy))
+            if cell is None:
+                self.cells[(cx, cy)] = [count, sum_x, sum_y, {track_id}, 0]
+            else:
+                cell[0] += count
+                cell[1] += sum_x
+                cell[2] += sum_y
+                cell[3].add(track_id)
+        return len(samples)
+
+    def _add_raw(self, points):
+        cells, counts = np.unique(np.floor(points / self.cell_size).astype(np.int64), axis=0, return_counts=True)
+        for (cx, cy), count in zip(cells.tolist(), counts.tolist()):
+            cell = self.cells.get((cx, cy))
+            if cell is None:
+                self.cells[(cx, cy)] = [0, 0.0, 0.0, set(), count]
+            else:
+                cell[4] += count
+
+    def forget_tracks(self, active_track_ids):
+        """Drop incremental state of tracks that are no longer tracked"""
+        for track_id in list(self._track_state):
+            if track_id not in active_track_ids:
+                del self._track_state[track_id]
+
+    def snapshot(self):
+        """Copy cell statistics so clustering can run in another thread"""
+        cells = {
+            key: (count, sum_x, sum_y, frozenset(tracks), raw_count)
+            for key, (count, sum_x, sum_y, tracks, raw_count) in self.cells.items()
+        }
+        return PatternSnapshot(cells, self.cell_size, self.track_count)
+
+    def find_patterns(self, min_frequency=2):
+        return self.snapshot().find_patterns(min_frequency)
+
+    def reset(self):
+        """Clear accumulated cells; in-flight tracks continue from where they are"""
+        self.cells.clear()
+        self.track_count = 0
+        self._track_state = {
+            track_id: (consumed, None)
+            for track_id, (consumed, _) in self._track_state.items()
+        }
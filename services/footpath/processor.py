@@ -1,15 +1,24 @@
 import cv2
 import numpy as np
+import json
+import os
 from sqlalchemy.orm import Session
 import datetime
 import time
 import traceback
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
 from models.camera import Camera
+from models.zone import Zone
 from models.footpath import FootpathAnalytics, FootpathPattern
+from crud.heatmapCube import heatmap_cube_crud
+from services.heatmap_grid import encode_grid
+from services.write_behind import write_queue
 from services.monitoring.logger import monitor
+from utils.geometry import polygons_overlap
 from .tracker import PersonTracker
 from .analyzer import FootpathAnalyzer
+from .transitions import transition_graphs, save_snapshot
 
 class CameraProcessor:
     def __init__(self, camera: Camera, db: Session):
@@ -18,11 +27,15 @@ class CameraProcessor:
         self.db = db
         self.frame_resolution = None
 
+        # Zone transitions are aggregated per property across all its cameras
+        self.transition_graph = transition_graphs.get(camera.property_id, camera.business_id)
+
         # Initialize tracker and analyzer
         self.tracker = PersonTracker(
             self.frame_resolution, 
             confidence_threshold=0.5,
-            zones={self.camera.zone.id: json.loads(self.camera.zone.polygon)} if self.camera.zone else None
+            zones=self._tracked_zones(),
+            zone_event_callback=self._on_zone_event
         )
         self.analyzer = FootpathAnalyzer(
             self.frame_resolution,
@@ -37,6 +50,10 @@ class CameraProcessor:
         self.total_frames_processed = 0
         self.processing_times = []
 
+        # Pattern clustering runs off the frame loop, on an executor that lives for one processing run
+        self._pattern_executor = None
+        self._pattern_future = None
+
         # Initialize monitoring
         self.monitor = monitor
         self.monitor.log_camera_status(
@@ -67,7 +84,8 @@ class CameraProcessor:
             self.tracker = PersonTracker(
                 self.frame_resolution,
                 confidence_threshold=0.5,
-                zones={self.camera.zone.id: json.loads(self.camera.zone.polygon)} if self.camera.zone else None
+                zones=self._tracked_zones(),
+                zone_event_callback=self._on_zone_event
             )
             self.analyzer = FootpathAnalyzer(
                 self.frame_resolution,
@@ -108,6 +126,10 @@ class CameraProcessor:
                     self.analyze_patterns()
                     self.last_pattern_analysis = current_time
 
+                # Persist the property's zone transitions once an hour (one camera claims it)
+                if self.transition_graph.claim_snapshot(3600, current_time):
+                    self._background().submit(self._save_transition_snapshot)
+
                 # Cleanup every hour
                 if (current_time - self.last_cleanup).total_seconds() >= 3600:
                     self.cleanup()
@@ -124,6 +146,7 @@ class CameraProcessor:
         finally:
             cap.release()
             self.is_processing = False
+            self._shutdown_background()
             self.monitor.log_camera_status(
                 camera_id=self.camera.id,
                 business_id=self.camera.business_id,
@@ -131,62 +154,23 @@ class CameraProcessor:
             )
 
     def stop_processing(self):
-        """Stop camera processing"""
+        """Stop camera processing; the frame loop shuts the pattern executor down as it exits"""
         self.is_processing = False
 
-    def process_frame(self, frame) -> dict:
-    """Process a single frame"""
-    start_time = time.time()
-
-    try:
-        # Update tracking
-        detections = self.tracker.update(frame)
-
-        # Get current tracks
-        tracks = self.tracker.get_tracks()
-
-        # Update analytics
-        self.analyzer.analyze_tracks(tracks)
-        
-        # Generate annotated frame for visualization
-        annotated_frame = self.tracker.annotate_frame(frame, detections)
-        
-        # Save the annotated frame periodically (e.g., every 30 frames)
-        if self.total_frames_processed % 30 == 0:
-            frame_dir = f"stream_output/{self.camera.id}"
-            os.makedirs(frame_dir, exist_ok=True)
-            cv2.imwrite(f"{frame_dir}/latest.jpg", annotated_frame)
-
-        # Calculate and log processing time
-        processing_time = time.time() - start_time
-        self.processing_times.append(processing_time)
-        self.monitor.log_processing_time(self.camera.id, processing_time)
-
-        # Log analytics data
-        if tracks:
-            analytics_data = self.analyzer.get_analytics()
-            self.monitor.log_analytics(
-                camera_id=self.camera.id,
-                zone_id=self.camera.zone.id if self.camera.zone else "no_zone",
-                analytics_data=analytics_data
-            )
-
-        return {
-            "detections": detections,
-            "tracks": len(tracks),
-            "processing_time": processing_time,
-            "annotated_frame": annotated_frame  # Return the annotated frame
-        }
+    def _background(self):
+        """The pattern executor, created on first use"""
+        if self._pattern_executor is None:
+            self._pattern_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"patterns-{self.camera.id}")
+        return self._pattern_executor
 
-    except Exception as e:
-        self.monitor.log_error(
-            camera_id=self.camera.id,
-            error_type="frame_processing_error",
-            error_msg=str(e),
-            stack_trace=traceback.format_exc()
-        )
-        raise
+    def _shutdown_background(self):
+        """Let queued pattern and snapshot saves finish, then release the executor thread"""
+        executor, self._pattern_executor = self._pattern_executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self._pattern_future = None
 
+    def process_frame(self, frame) -> dict:
         """Process a single frame"""
         start_time = time.time()
 
@@ -199,6 +183,15 @@ class CameraProcessor:
 
             # Update analytics
             self.analyzer.analyze_tracks(tracks)
+        
+            # Generate annotated frame for visualization
+            annotated_frame = self.tracker.annotate_frame(frame, detections)
+        
+            # Save the annotated frame periodically (e.g., every 30 frames)
+            if self.total_frames_processed % 30 == 0:
+                frame_dir = f"stream_output/{self.camera.id}"
+                os.makedirs(frame_dir, exist_ok=True)
+                cv2.imwrite(f"{frame_dir}/latest.jpg", annotated_frame)
 
             # Calculate and log processing time
             processing_time = time.time() - start_time
@@ -217,7 +210,8 @@ class CameraProcessor:
             return {
                 "detections": detections,
                 "tracks": len(tracks),
-                "processing_time": processing_time
+                "processing_time": processing_time,
+                "annotated_frame": annotated_frame  # Return the annotated frame
             }
 
         except Exception as e:
@@ -234,66 +228,35 @@ class CameraProcessor:
         if not self.camera.zone:
             return
 
-    try:
-        # Get analytics data
-        analytics_data = self.analyzer.get_analytics()
-        
-        # Export tracking data
-        tracking_data = self.tracker.export_tracking_data(format='json')
-
-        # Create analytics entry
-        analytics = FootpathAnalytics(
-            zone_id=self.camera.zone.id,
-            business_id=self.camera.business_id,
-            property_id=self.camera.property_id,
-            traffic_count=self.tracker.total_detections,
-            unique_visitors=analytics_data['unique_visitors'],
-            avg_dwell_time=analytics_data['avg_dwell_time'],
-            max_dwell_time=analytics_data['max_dwell_time'],
-            total_dwell_time=analytics_data['total_dwell_time'],
-            heatmap_data=self.analyzer.get_heatmap().tolist(),
-            tracking_data=tracking_data  # Add the tracking data
-        )
-
-        self.db.add(analytics)
-        self.db.commit()
-
-        # Reset analytics state
-        self.analyzer.reset()
-        self.tracker.reset_statistics()
-
-    except Exception as e:
-        self.monitor.log_error(
-            camera_id=self.camera.id,
-            error_type="analytics_save_error",
-            error_msg=str(e),
-            stack_trace=traceback.format_exc()
-        )
-        self.db.rollback()
-        """Save current analytics to database"""
-        if not self.camera.zone:
-            return
-
         try:
             # Get analytics data
             analytics_data = self.analyzer.get_analytics()
 
-            # Create analytics entry
-            analytics = FootpathAnalytics(
+            # Queue the analytics entry; the write-behind worker inserts it off the frame loop
+            write_queue.enqueue(FootpathAnalytics, {
+                'zone_id': self.camera.zone.id,
+                'business_id': self.camera.business_id,
+                'property_id': self.camera.property_id,
+                'traffic_count': self.tracker.total_detections,
+                'unique_visitors': analytics_data['unique_visitors'],
+                'avg_dwell_time': float(analytics_data['avg_dwell_time']),
+                'max_dwell_time': float(analytics_data['max_dwell_time']),
+                'total_dwell_time': float(analytics_data['total_dwell_time']),
+                'heatmap_grid': encode_grid(self.analyzer.heatmap.astype(np.float32)),
+                'frame_width': self.analyzer.frame_resolution[1],
+                'frame_height': self.analyzer.frame_resolution[0]
+            })
+
+            # Fold the interval's grid into the time-bucketed heatmap cube, also on the write-behind worker
+            heatmap_cube_crud.enqueue_grid(
                 zone_id=self.camera.zone.id,
-                business_id=self.camera.business_id,
-                property_id=self.camera.property_id,
-                traffic_count=self.tracker.total_detections,
-                unique_visitors=analytics_data['unique_visitors'],
-                avg_dwell_time=analytics_data['avg_dwell_time'],
-                max_dwell_time=analytics_data['max_dwell_time'],
-                total_dwell_time=analytics_data['total_dwell_time'],
-                heatmap_data=self.analyzer.get_heatmap().tolist()
+                camera_id=self.camera.id,
+                timestamp=datetime.datetime.utcnow(),
+                counts=self.analyzer.heatmap,
+                cell_width=self.analyzer.heatmap_grid.cell_width,
+                cell_height=self.analyzer.heatmap_grid.cell_height
             )
 
-            self.db.add(analytics)
-            self.db.commit()
-
             # Reset analytics state
             self.analyzer.reset()
             self.tracker.reset_statistics()
@@ -305,31 +268,37 @@ class CameraProcessor:
                 error_msg=str(e),
                 stack_trace=traceback.format_exc()
             )
-            self.db.rollback()
 
     def analyze_patterns(self):
-        """Analyze and save movement patterns"""
+        """Analyze and save movement patterns in the background"""
         if not self.camera.zone:
             return
 
+        # Don't queue a second run while the previous one is still clustering
+        if self._pattern_future is not None and not self._pattern_future.done():
+            return
+
+        # Snapshot on the frame thread, cluster and persist off it
+        snapshot = self.analyzer.pattern_snapshot()
+        self._pattern_future = self._background().submit(self._save_patterns, snapshot)
+
+    def _save_patterns(self, snapshot):
+        """Cluster a pattern snapshot and queue it for persistence (runs in the pattern executor)"""
         try:
             # Find patterns
-            patterns = self.analyzer.find_patterns()
+            patterns = snapshot.find_patterns()
 
             if patterns:
-                # Create pattern entry
-                pattern = FootpathPattern(
-                    zone_id=self.camera.zone.id,
-                    business_id=self.camera.business_id,
-                    property_id=self.camera.property_id,
-                    pattern_type='movement_clusters',
-                    pattern_data={'patterns': patterns},
-                    frequency=len(patterns),
-                    confidence=0.8  # Could be calculated based on cluster metrics
-                )
-
-                self.db.add(pattern)
-                self.db.commit()
+                # Queue pattern entry
+                write_queue.enqueue(FootpathPattern, {
+                    'zone_id': self.camera.zone.id,
+                    'business_id': self.camera.business_id,
+                    'property_id': self.camera.property_id,
+                    'pattern_type': 'movement_clusters',
+                    'pattern_data': {'patterns': patterns},
+                    'frequency': len(patterns),
+                    'confidence': 0.8  # Could be calculated based on cluster metrics
+                })
 
         except Exception as e:
             self.monitor.log_error(
@@ -338,7 +307,51 @@ class CameraProcessor:
                 error_msg=str(e),
                 stack_trace=traceback.format_exc()
             )
-            self.db.rollback()
+
+    def _tracked_zones(self):
+        """The camera's zone plus the property's other zones overlapping its coverage area.
+
+        `coverage_area` is {"polygon": [[x, y], ...]} in the zone polygons'
+        coordinates; without it only the camera's own zone is tracked.
+        """
+        zones = {}
+        if self.camera.zone and self.camera.zone.polygon:
+            zones[self.camera.zone.id] = json.loads(self.camera.zone.polygon)
+
+        coverage = (self.camera.coverage_area or {}).get('polygon')
+        if coverage and self.camera.property_id:
+            candidates = [
+                zone for zone in self.db.query(Zone).filter(
+                    Zone.property_id == self.camera.property_id,
+                    Zone.polygon.isnot(None)
+                ).all()
+                if zone.id not in zones
+            ]
+            polygons = [json.loads(zone.polygon) for zone in candidates]
+            for zone, polygon, overlaps in zip(candidates, polygons, polygons_overlap([coverage], polygons)[0]):
+                if overlaps:
+                    zones[zone.id] = polygon
+        return zones or None
+
+    def _on_zone_event(self, track_id, zone_id, event, timestamp):
+        """Forward tracker zone enter/exit events to the property transition graph"""
+        visitor_id = f"{self.camera.id}:{track_id}"
+        if event == 'enter':
+            self.transition_graph.record_enter(visitor_id, zone_id, timestamp)
+        else:
+            self.transition_graph.record_exit(visitor_id, zone_id, timestamp)
+
+    def _save_transition_snapshot(self):
+        """Persist one zone_sequence pattern per source zone and start a new window"""
+        try:
+            save_snapshot(self.transition_graph)
+        except Exception as e:
+            self.monitor.log_error(
+                camera_id=self.camera.id,
+                error_type="transition_snapshot_error",
+                error_msg=str(e),
+                stack_trace=traceback.format_exc()
+            )
 
     def cleanup(self):
         """Clean up resources and old data"""
@@ -386,4 +399,5 @@ class CameraProcessor:
         """Context manager exit"""
         self.stop_processing()
         if self.tracker:
-            self.cleanup()
\ No newline at end of file
+            self.cleanup()
+        self._shutdown_background()
\ No newline at end of file
@@ -7,8 +7,10 @@ import datetime
 from ultralytics import YOLO
 import supervision as sv
 
+from utils.geometry import box_centers, points_in_polygons
+
 class PersonTracker:
-    def __init__(self, frame_resolution=(1920, 1080), confidence_threshold=0.5, zones=None):
+    def __init__(self, frame_resolution=(1920, 1080), confidence_threshold=0.5, zones=None, zone_event_callback=None):
         # Set up a central models directory, two levels up from the current file
         current_dir = os.path.dirname(os.path.abspath(__file__))
         models_dir = os.path.join(os.path.dirname(os.path.dirname(current_dir)), 'training_models') # two levels up
@@ -36,6 +38,8 @@ class PersonTracker:
         self.zones = zones or {}  # Format: {'zone_name': polygon_coordinates}
         self.zone_counts = defaultdict(int)
         self.zone_visits = defaultdict(set)  # Track unique visitors per zone
+        self.track_zones = {}  # Zones each track is currently inside
+        self.zone_event_callback = zone_event_callback  # Called as (track_id, zone_id, 'enter'|'exit', timestamp)
 
         # Initialize statistics
         self.reset_statistics()
@@ -97,41 +101,33 @@ class PersonTracker:
         """Update zone-based analysis"""
         if not self.zones:
             return
-            
-        for det, track_id in zip(detections.xyxy, detections.tracker_id):
+
+        timestamp = datetime.datetime.now()
+        if detections.tracker_id is None or len(detections) == 0:
+            return
+
+        # Test every tracked centre against every zone in one call
+        zone_names = list(self.zones)
+        inside = points_in_polygons(box_centers(detections.xyxy), list(self.zones.values()))
+        for row, track_id in zip(inside, detections.tracker_id):
             if track_id < 0:
                 continue
-                
-            # Calculate center point
-            center_x = (det[0] + det[2]) / 2
-            center_y = (det[1] + det[3]) / 2
-            point = (center_x, center_y)
-            
-            # Check which zone the point is in
-            for zone_name, polygon in self.zones.items():
-                if self._point_in_polygon(point, polygon):
-                    self.zone_counts[zone_name] += 1
-                    self.zone_visits[zone_name].add(track_id)  # Track unique visits
 
-    def _point_in_polygon(self, point, polygon):
-        """Check if a point is inside a polygon using ray casting algorithm"""
-        x, y = point
-        n = len(polygon)
-        inside = False
-        
-        p1x, p1y = polygon[0]
-        for i in range(1, n + 1):
-            p2x, p2y = polygon[i % n]
-            if y > min(p1y, p2y):
-                if y <= max(p1y, p2y):
-                    if x <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or x <= xinters:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-        
-        return inside
+            current_zones = set()
+            for zone_index in np.flatnonzero(row):
+                zone_name = zone_names[zone_index]
+                self.zone_counts[zone_name] += 1
+                self.zone_visits[zone_name].add(track_id)  # Track unique visits
+                current_zones.add(zone_name)
+
+            # Emit enter/exit events when the set of zones changes
+            previous_zones = self.track_zones.get(track_id, set())
+            if self.zone_event_callback and current_zones != previous_zones:
+                for zone_name in previous_zones - current_zones:
+                    self.zone_event_callback(track_id, zone_name, 'exit', timestamp)
+                for zone_name in current_zones - previous_zones:
+                    self.zone_event_callback(track_id, zone_name, 'enter', timestamp)
+            self.track_zones[track_id] = current_zones
 
     def get_tracks(self, min_length=5):
         """Get all tracks with minimum length"""
@@ -162,6 +158,7 @@ class PersonTracker:
                 age = (current_time - self.tracks[track_id][-1]['timestamp']).total_seconds()
                 if age > max_age_seconds:
                     del self.tracks[track_id]
+                    self.track_zones.pop(track_id, None)
                     if track_id in self.active_tracks:
                         self.active_tracks.remove(track_id)
 
@@ -258,18 +255,19 @@ class PersonTracker:
             rows = []
             header = ['track_id', 'timestamp', 'x', 'y', 'zone']
             
+            zone_names = np.array(list(self.zones) + ["unknown"], dtype=object)
             for track_id, positions in self.tracks.items():
-                for pos in positions:
-                    x, y = pos['position']
-                    timestamp = pos['timestamp'].isoformat()
-                    
-                    # Determine zone
-                    current_zone = "unknown"
-                    for zone_name, polygon in self.zones.items():
-                        if self._point_in_polygon((x, y), polygon):
-                            current_zone = zone_name
-                            break
-                    
-                    rows.append([track_id, timestamp, x, y, current_zone])
+                if not positions:
+                    continue
+                points = [pos['position'] for pos in positions]
+
+                # First zone containing each position, all positions at once
+                inside = points_in_polygons(points, list(self.zones.values()))
+                first = np.full(len(points), len(self.zones))
+                if self.zones:
+                    first = np.where(inside.any(axis=1), inside.argmax(axis=1), first)
+
+                for pos, (x, y), current_zone in zip(positions, points, zone_names[first]):
+                    rows.append([track_id, pos['timestamp'].isoformat(), x, y, current_zone])
             
             return header, rows
\ No newline at end of file
@@ -0,0 +1,245 @@
+import datetime
+import logging
+import threading
+from collections import Counter, OrderedDict, defaultdict, deque
+
+import numpy as np
+
+from models.footpath import FootpathPattern
+from services.write_behind import write_queue
+
+logger = logging.getLogger(__name__)
+
+
+class ZoneTransitionGraph:
+    """Incremental zone-to-zone transition counters for one property.
+
+    Fed with zone enter/exit events keyed by a visitor id (a camera-scoped
+    track id moving between the zones one camera sees, or a re-identified
+    person id when the edge provides one). Keeps
+    transition counts, transition times and counts of recent zone sequences up
+    to `max_path_length`, so top-K path queries never touch raw tracks.
+    """
+
+    def __init__(self, property_id, business_id=None, max_path_length=4, visitor_timeout=300, max_paths=50000):
+        self.property_id = property_id
+        self.business_id = business_id
+        self.max_path_length = max_path_length
+        self.visitor_timeout = visitor_timeout  # Seconds before a visitor's path is forgotten
+        self.max_paths = max_paths
+
+        self.transitions = Counter()  # (from_zone, to_zone) -> count
+        self.transition_time = defaultdict(float)  # (from_zone, to_zone) -> summed seconds
+        self.entries = Counter()  # zone -> enter count
+        self.paths = Counter()  # (zone, zone, ...) -> count
+        self._visitors = {}  # visitor_id -> {'path': deque, 'last_exit': (zone, ts), 'last_seen': ts}
+        self._lock = threading.RLock()
+        self.window_start = datetime.datetime.now()  # Start of the counting window
+        self._claimed = False
+
+    def record_enter(self, visitor_id, zone_id, timestamp=None):
+        """Record a visitor entering a zone"""
+        timestamp = timestamp or datetime.datetime.now()
+        with self._lock:
+            visitor = self._visitors.get(visitor_id)
+            if visitor is None or (timestamp - visitor['last_seen']).total_seconds() > self.visitor_timeout:
+                visitor = {'path': deque(maxlen=self.max_path_length), 'last_exit': None, 'last_seen': timestamp}
+                self._visitors[visitor_id] = visitor
+
+            path = visitor['path']
+            if path and path[-1] == zone_id:
+                # Re-entering the zone we just left is not a transition
+                visitor['last_seen'] = timestamp
+                return
+
+            self.entries[zone_id] += 1
+            if path:
+                previous = path[-1]
+                self.transitions[(previous, zone_id)] += 1
+                last_exit = visitor['last_exit']
+                left_at = last_exit[1] if last_exit and last_exit[0] == previous else visitor['last_seen']
+                self.transition_time[(previous, zone_id)] += max(0.0, (timestamp - left_at).total_seconds())
+
+            path.append(zone_id)
+            # Count every sequence of two or more zones that ends here
+            sequence = tuple(path)
+            for start in range(len(sequence) - 1):
+                self.paths[sequence[start:]] += 1
+
+            visitor['last_seen'] = timestamp
+            if len(self.paths) > self.max_paths:
+                self._prune_paths()
+
+    def record_exit(self, visitor_id, zone_id, timestamp=None):
+        """Record a visitor leaving a zone"""
+        timestamp = timestamp or datetime.datetime.now()
+        with self._lock:
+            visitor = self._visitors.get(visitor_id)
+            if visitor is not None:
+                visitor['last_exit'] = (zone_id, timestamp)
+                visitor['last_seen'] = timestamp
+
+    def expire_visitors(self, now=None):
+        """Forget visitors not seen for longer than the timeout"""
+        now = now or datetime.datetime.now()
+        with self._lock:
+            for visitor_id in [
+                vid for vid, visitor in self._visitors.items()
+                if (now - visitor['last_seen']).total_seconds() > self.visitor_timeout
+            ]:
+                del self._visitors[visitor_id]
+
+    def _prune_paths(self):
+        """Keep the counter bounded by dropping the rarest half of the sequences"""
+        keep = self.paths.most_common(self.max_paths // 2)
+        self.paths = Counter(dict(keep))
+
+    def top_paths(self, k=10, start_zone=None, end_zone=None, length=None):
+        """Most frequent zone sequences, optionally anchored at a start/end zone"""
+        with self._lock:
+            candidates = [
+                (path, count) for path, count in self.paths.items()
+                if (start_zone is None or path[0] == start_zone)
+                and (end_zone is None or path[-1] == end_zone)
+                and (length is None or len(path) == length)
+            ]
+        candidates.sort(key=lambda item: (item[1], len(item[0])), reverse=True)
+        return [{'path': list(path), 'count': count} for path, count in candidates[:k]]
+
+    def next_zones(self, zone_id):
+        """Transition probabilities out of a zone"""
+        with self._lock:
+            outgoing = {to: count for (frm, to), count in self.transitions.items() if frm == zone_id}
+        total = sum(outgoing.values())
+        return {
+            to: {
+                'count': count,
+                'probability': count / total,
+                'avg_duration': self.transition_time[(zone_id, to)] / count
+            }
+            for to, count in outgoing.items()
+        } if total else {}
+
+    def transition_matrix(self):
+        """Dense (zones, matrix) view of the transition counts"""
+        with self._lock:
+            zones = sorted({zone for pair in self.transitions for zone in pair} | set(self.entries))
+            index = {zone: i for i, zone in enumerate(zones)}
+            matrix = np.zeros((len(zones), len(zones)), dtype=np.int64)
+            for (frm, to), count in self.transitions.items():
+                matrix[index[frm], index[to]] = count
+        return zones, matrix
+
+    def snapshot(self, top_k=20):
+        """Per source zone pattern data, as stored in footpath_patterns"""
+        with self._lock:
+            source_zones = {frm for frm, _ in self.transitions}
+        snapshot = {}
+        for zone_id in source_zones:
+            outgoing = self.next_zones(zone_id)
+            snapshot[zone_id] = {
+                'transitions': outgoing,
+                'paths': self.top_paths(top_k, start_zone=zone_id),
+                'entries': self.entries[zone_id],
+                'frequency': sum(item['count'] for item in outgoing.values()),
+                'avg_duration': (
+                    sum(self.transition_time[(zone_id, to)] for to in outgoing) /
+                    sum(item['count'] for item in outgoing.values())
+                ) if outgoing else None
+            }
+        return snapshot
+
+    def claim_snapshot(self, interval_seconds=3600, now=None):
+        """Return True once per interval so only one of the property's cameras persists it"""
+        now = now or datetime.datetime.now()
+        with self._lock:
+            if (now - self.window_start).total_seconds() < interval_seconds or self._claimed:
+                return False
+            self._claimed = True
+            return True
+
+    def drain(self, top_k=20, now=None):
+        """Atomically take the window's snapshot and start a new window.
+
+        Returns (window_start, window_end, snapshot).
+        """
+        now = now or datetime.datetime.now()
+        with self._lock:
+            window_start = self.window_start
+            snapshot = self.snapshot(top_k)
+            self.reset()
+            self.window_start = now
+            self._claimed = False
+        self.expire_visitors(now)
+        return window_start, now, snapshot
+
+    def reset(self):
+        """Clear the counters; visitors in progress keep their recent path"""
+        with self._lock:
+            self.transitions.clear()
+            self.transition_time.clear()
+            self.entries.clear()
+            self.paths.clear()
+
+
+def save_snapshot(graph, now=None):
+    """Queue the graph's window as one zone_sequence FootpathPattern per source zone and start a new window"""
+    window_start, window_end, snapshot = graph.drain(now=now)
+    if graph.business_id is None:
+        logger.warning("Dropping zone transitions of property %s: no business recorded", graph.property_id)
+        return 0
+    return write_queue.enqueue_many(FootpathPattern, (
+        {
+            'zone_id': zone_id,
+            'business_id': graph.business_id,
+            'property_id': graph.property_id,
+            'pattern_type': 'zone_sequence',
+            'timestamp': window_end,
+            'pattern_data': {'transitions': data['transitions'], 'paths': data['paths']},
+            'frequency': data['frequency'],
+            'avg_duration': data['avg_duration'],
+            'footpath_metadata': {
+                'entries': data['entries'],
+                'window_start': window_start.isoformat(),
+                'window_end': window_end.isoformat()
+            }
+        }
+        for zone_id, data in snapshot.items()
+    ))
+
+
+class ZoneTransitionRegistry:
+    """Process-wide transition graphs, one per property, shared by all cameras.
+
+    Holds at most `max_graphs`; the least recently used graph is persisted
+    and dropped when a new property would exceed that.
+    """
+
+    def __init__(self, max_graphs=1000):
+        self.max_graphs = max_graphs
+        self._graphs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, property_id, business_id=None):
+        evicted = []
+        with self._lock:
+            graph = self._graphs.get(property_id)
+            if graph is None:
+                graph = ZoneTransitionGraph(property_id, business_id)
+                self._graphs[property_id] = graph
+                while len(self._graphs) > self.max_graphs:
+                    evicted.append(self._graphs.popitem(last=False)[1])
+            else:
+                self._graphs.move_to_end(property_id)
+                if graph.business_id is None:
+                    graph.business_id = business_id
+        for old in evicted:
+            save_snapshot(old)
+        return graph
+
+    def find(self, property_id):
+        with self._lock:
+            return self._graphs.get(property_id)
+
+
+transition_graphs = ZoneTransitionRegistry()
@@ -1,12 +1,14 @@
 import cv2
 import numpy as np
 from ultralytics import YOLO
+import supervision as sv
+from services.detection_results import ResultDecoder, DetectionHistory, empty_detections
 import datetime
 import os
 import json
 
 class GeneralObjectDetector:
-    def __init__(self, model_path=None, confidence_threshold=0.5):
+    def __init__(self, model_path=None, confidence_threshold=0.5, track_max_age=60):
         """Initialize the general object detection service"""
         # Set up model path
         if model_path is None:
@@ -20,10 +22,14 @@ class GeneralObjectDetector:
         self.confidence_threshold = confidence_threshold
         
         # Store detection history
-        self.detections = []
+        self.detections = DetectionHistory(max_rows=1000)
         self.detection_counts = {}
         self.tracked_objects = {}
         
+        # One ByteTrack per class so track IDs never jump between classes
+        self.trackers = {}  # class_id -> sv.ByteTrack
+        self.track_max_age = track_max_age  # Seconds before an unseen object is dropped
+        
         # Analysis
         self.total_frames_processed = 0
         self.last_analysis_time = datetime.datetime.now()
@@ -39,6 +45,7 @@ class GeneralObjectDetector:
                            'couch', 'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse', 
                            'remote', 'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink', 'refrigerator', 
                            'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier', 'toothbrush']
+        self.decoder = ResultDecoder(self.class_names)
     
     def _get_project_root(self):
         """Get project root directory"""
@@ -56,92 +63,72 @@ class GeneralObjectDetector:
             classes=classes  # Filter for specific classes if provided
         )
         
-        # Process detections
-        current_detections = []
         current_time = datetime.datetime.now()
+        detections = self.decoder(results)
         
-        if results and len(results) > 0:
-            result = results[0]
-            
-            for i, (box, conf, cls) in enumerate(zip(result.boxes.xyxy, result.boxes.conf, result.boxes.cls)):
-                # Extract coordinates
-                x1, y1, x2, y2 = map(int, box.tolist())
-                
-                # Get class information
-                class_id = int(cls.item())
-                class_name = self.class_names[class_id] if class_id < len(self.class_names) else f"class_{class_id}"
-                
-                # Update class counts
-                if class_name not in self.detection_counts:
-                    self.detection_counts[class_name] = 0
-                self.detection_counts[class_name] += 1
-                
-                # Create detection object
-                detection = {
-                    'id': f"detection_{len(self.detections) + i + 1}",
-                    'bbox': (x1, y1, x2, y2),
-                    'center': ((x1 + x2) // 2, (y1 + y2) // 2),
-                    'area': (x2 - x1) * (y2 - y1),
-                    'confidence': conf.item(),
-                    'class_id': class_id,
+        # Update class counts
+        class_names, counts = np.unique(detections.data['class_name'].astype(str), return_counts=True)
+        for class_name, count in zip(class_names.tolist(), counts.tolist()):
+            self.detection_counts[class_name] = self.detection_counts.get(class_name, 0) + count
+        
+        detections = self._track(detections)
+        boxes = detections.xyxy.astype(int)
+        centers = (boxes[:, :2] + boxes[:, 2:]) // 2
+        
+        # Object-level state is the only per-row Python work left
+        for center, conf, class_name, tracker_id in zip(
+                centers.tolist(), detections.confidence.tolist(),
+                detections.data['class_name'].tolist(), detections.tracker_id.tolist()):
+            object_id = f"{class_name}_{tracker_id}"
+            tracked = self.tracked_objects.get(object_id)
+            if tracked is None:
+                self.tracked_objects[object_id] = {
                     'class_name': class_name,
-                    'timestamp': current_time.isoformat(),
-                    'frame_id': self.total_frames_processed
+                    'first_seen': current_time,
+                    'last_seen': current_time,
+                    'last_position': tuple(center),
+                    'detection_count': 1,
+                    'confidence': conf
                 }
-                
-                current_detections.append(detection)
-                self.detections.append(detection)
-                
-                # Simple object tracking based on class and position
-                object_key = f"{class_name}_{len(self.tracked_objects)}"
-                if class_name in self.tracked_objects:
-                    # Check if this detection matches any existing tracked object
-                    matched = False
-                    for obj_id, obj in self.tracked_objects.items():
-                        if obj['class_name'] == class_name:
-                            prev_x, prev_y = obj['last_position']
-                            curr_x, curr_y = detection['center']
-                            # Calculate distance between current and last position
-                            distance = np.sqrt((curr_x - prev_x)**2 + (curr_y - prev_y)**2)
-                            # If close enough, consider it the same object
-                            if distance < 100:  # Threshold in pixels
-                                self.tracked_objects[obj_id]['detection_count'] += 1
-                                self.tracked_objects[obj_id]['last_position'] = detection['center']
-                                self.tracked_objects[obj_id]['last_seen'] = current_time
-                                detection['track_id'] = obj_id
-                                matched = True
-                                break
-                    
-                    if not matched:
-                        # New object
-                        object_key = f"{class_name}_{len(self.tracked_objects)}"
-                        self.tracked_objects[object_key] = {
-                            'class_name': class_name,
-                            'first_seen': current_time,
-                            'last_seen': current_time,
-                            'last_position': detection['center'],
-                            'detection_count': 1,
-                            'confidence': conf.item()
-                        }
-                        detection['track_id'] = object_key
-                else:
-                    # First instance of this class
-                    self.tracked_objects[object_key] = {
-                        'class_name': class_name,
-                        'first_seen': current_time,
-                        'last_seen': current_time,
-                        'last_position': detection['center'],
-                        'detection_count': 1,
-                        'confidence': conf.item()
-                    }
-                    detection['track_id'] = object_key
+            else:
+                tracked['detection_count'] += 1
+                tracked['last_position'] = tuple(center)
+                tracked['last_seen'] = current_time
         
-        # Limit detection history
-        if len(self.detections) > 1000:
-            self.detections = self.detections[-1000:]
+        self._prune_tracks(current_time)
+        self.detections.append(detections, current_time, self.total_frames_processed)
             
         self.total_frames_processed += 1
-        return current_detections
+        return detections
+    
+    def _track(self, detections):
+        """Update the per-class trackers; classes absent this frame still age their tracks"""
+        parts = []
+        for class_id in set(detections.class_id.tolist()) | set(self.trackers):
+            tracker = self.trackers.get(class_id)
+            if tracker is None:
+                tracker = self.trackers[class_id] = sv.ByteTrack()
+            tracked = tracker.update_with_detections(detections[detections.class_id == class_id])
+            # ByteTrack hands back empty slices without their data columns, which merge() rejects
+            if len(tracked) > 0:
+                parts.append(tracked)
+        if not parts:
+            detections = empty_detections()
+            detections.tracker_id = np.empty(0, dtype=int)
+            return detections
+        return sv.Detections.merge(parts)
+    
+    def _prune_tracks(self, current_time):
+        """Drop objects not seen for track_max_age seconds, and trackers left without objects"""
+        for obj_id in [
+            obj_id for obj_id, obj in self.tracked_objects.items()
+            if (current_time - obj['last_seen']).total_seconds() > self.track_max_age
+        ]:
+            del self.tracked_objects[obj_id]
+        
+        active_classes = {obj['class_name'] for obj in self.tracked_objects.values()}
+        for class_id in [c for c in self.trackers if self.decoder.class_names_for([c])[0] not in active_classes]:
+            del self.trackers[class_id]
     
     def annotate_frame(self, frame, detections=None):
         """Annotate frame with detection results"""
@@ -154,10 +141,10 @@ class GeneralObjectDetector:
         color_map = {}
         
         # Draw detections
-        for detection in detections:
-            x1, y1, x2, y2 = detection['bbox']
-            class_name = detection['class_name']
-            confidence = detection['confidence']
+        tracker_ids = detections.tracker_id.tolist() if detections.tracker_id is not None else [None] * len(detections)
+        for (x1, y1, x2, y2), class_name, confidence, tracker_id in zip(
+                detections.xyxy.astype(int).tolist(), detections.data['class_name'].tolist(),
+                detections.confidence.tolist(), tracker_ids):
             
             # Generate a consistent color for each class
             if class_name not in color_map:
@@ -211,20 +198,16 @@ class GeneralObjectDetector:
             cv2.putText(annotated_frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
             
             # Add tracking ID if available
-            if 'track_id' in detection:
-                track_label = f"ID: {detection['track_id'].split('_')[-1]}"
+            if tracker_id is not None:
+                track_label = f"ID: {tracker_id}"
                 cv2.putText(annotated_frame, track_label, (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
         
         # Add summary stats
         total_objects = len(detections)
         if total_objects > 0:
             # Get top 3 most common objects
-            class_count = {}
-            for det in detections:
-                cls = det['class_name']
-                if cls not in class_count:
-                    class_count[cls] = 0
-                class_count[cls] += 1
+            names, counts = np.unique(detections.data['class_name'].astype(str), return_counts=True)
+            class_count = dict(zip(names.tolist(), counts.tolist()))
                 
             # Sort by count
             sorted_classes = sorted(class_count.items(), key=lambda x: x[1], reverse=True)
@@ -243,12 +226,7 @@ class GeneralObjectDetector:
     def get_statistics(self):
         """Get detection statistics"""
         # Cleanup old tracked objects
-        current_time = datetime.datetime.now()
-        for obj_id in list(self.tracked_objects.keys()):
-            obj = self.tracked_objects[obj_id]
-            last_seen = datetime.datetime.fromisoformat(obj['last_seen'].isoformat())
-            if (current_time - last_seen).total_seconds() > 60:  # Remove if not seen for 60 seconds
-                self.tracked_objects.pop(obj_id, None)
+        self._prune_tracks(datetime.datetime.now())
         
         # Calculate statistics
         class_counts = {}
@@ -256,17 +234,12 @@ class GeneralObjectDetector:
             if count > 0:
                 class_counts[cls] = count
                 
-        # Calculate currently visible objects
-        visible_objects = {}
-        for det in self.detections[-30:]:  # Consider last 30 detections as "currently visible"
-            cls = det['class_name']
-            if cls not in visible_objects:
-                visible_objects[cls] = 0
-            visible_objects[cls] += 1
+        # Consider last 30 detections as "currently visible"
+        visible_objects = self.detections.recent_class_counts(30)
         
         return {
             'total_frames_processed': self.total_frames_processed,
-            'total_detections': len(self.detections),
+            'total_detections': self.detections.total,
             'detection_counts': class_counts,
             'tracked_objects': len(self.tracked_objects),
             'currently_visible': visible_objects
@@ -278,15 +251,14 @@ class GeneralObjectDetector:
             data = {
                 'timestamp': datetime.datetime.now().isoformat(),
                 'statistics': self.get_statistics(),
-                'recent_detections': self.detections[-50:] if self.detections else [],
-                'object_tracks': {k: v for k, v in self.tracked_objects.items() if isinstance(v.get('last_seen'), datetime.datetime)},
+                'recent_detections': self.detections.recent(50),
+                # Copies with datetimes as strings for JSON serialization
+                'object_tracks': {
+                    k: {**v, 'first_seen': v['first_seen'].isoformat(), 'last_seen': v['last_seen'].isoformat()}
+                    for k, v in self.tracked_objects.items()
+                },
             }
             
-            # Convert datetime objects to strings for JSON serialization
-            for obj_id, obj in data['object_tracks'].items():
-                obj['first_seen'] = obj['first_seen'].isoformat()
-                obj['last_seen'] = obj['last_seen'].isoformat()
-            
             return data
         else:
             raise ValueError(f"Unsupported export format: {format}")
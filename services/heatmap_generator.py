@@ -3,79 +3,92 @@ import numpy as np
 import os
 import json
 import datetime
+from services.heatmap_grid import HeatmapGrid, to_coo, to_png16, to_rle
+from services.bounded_history import BoundedHistory
 
 class HeatmapGenerator:
-    def __init__(self, frame_resolution=(1920, 1080), decay_factor=0.95, blur_size=15):
+    def __init__(self, frame_resolution=(1920, 1080), decay_factor=0.95, blur_size=15, grid_shape=(108, 192)):
         """Initialize the heatmap generator service"""
         self.frame_resolution = frame_resolution
-        self.heatmap = np.zeros(frame_resolution, dtype=np.float32)
+        # Accumulate into a coarse grid; full resolution is only produced when rendering
+        self.grid = HeatmapGrid(frame_resolution, grid_shape)
         self.decay_factor = decay_factor  # Factor for historical data decay
-        self.blur_size = blur_size  # Size of Gaussian blur for smoothing
-        self.position_history = []  # Track positions for historical analysis
+        self.blur_size = blur_size  # Size of Gaussian blur for smoothing (pixels), applied when rendering
+        self._smoothed = None
+        self.position_history = BoundedHistory("heatmap_positions", max_items=10000)  # Older positions spill to disk
         self.last_update = datetime.datetime.now()
+
+    @property
+    def heatmap(self):
+        """Smoothed grid-resolution heatmap, blurred once per change rather than on every update"""
+        if self._smoothed is None:
+            self._smoothed = self.grid.smoothed(self.blur_size)
+        return self._smoothed
+
+    def _max(self):
+        return float(self.heatmap.max()) if self.heatmap.size else 0.0
         
     def update(self, detections=None, positions=None, tracks=None):
-        """Update heatmap with new detection data"""
+        """Update heatmap with new detection data; returns the raw grid counts"""
         current_time = datetime.datetime.now()
         time_diff = (current_time - self.last_update).total_seconds()
         
         # Apply decay to historical data based on time difference
         decay = self.decay_factor ** max(1, time_diff)
-        self.heatmap *= decay
+        self.grid.scale(decay)
         
         # Add new data from detections
-        if detections is not None and hasattr(detections, 'xyxy'):
-            for bbox in detections.xyxy:
-                x1, y1, x2, y2 = map(int, bbox)
-                # Use the center point of each detection
-                center_x = (x1 + x2) // 2
-                center_y = (y1 + y2) // 2
-                
-                # Ensure coordinates are within frame bounds
-                if 0 <= center_y < self.frame_resolution[0] and 0 <= center_x < self.frame_resolution[1]:
-                    # Add intensity to the heatmap at this point
-                    self.heatmap[center_y, center_x] += 1.0
-                    self.position_history.append({
-                        'position': (center_x, center_y),
-                        'timestamp': current_time.isoformat()
-                    })
+        if detections is not None and hasattr(detections, 'xyxy') and len(detections.xyxy) > 0:
+            boxes = np.asarray(detections.xyxy, dtype=np.float64).astype(np.int64)
+            # Use the center point of each detection
+            centers_x = (boxes[:, 0] + boxes[:, 2]) // 2
+            centers_y = (boxes[:, 1] + boxes[:, 3]) // 2
+            self._add_positions(centers_x, centers_y, current_time)
         
         # Add data from explicit positions
-        if positions is not None:
-            for pos in positions:
-                x, y = pos
-                x, y = int(x), int(y)
-                if 0 <= y < self.frame_resolution[0] and 0 <= x < self.frame_resolution[1]:
-                    self.heatmap[y, x] += 1.0
-                    self.position_history.append({
-                        'position': (x, y),
-                        'timestamp': current_time.isoformat()
-                    })
-        
-        # Add data from tracks
+        if positions is not None and len(positions) > 0:
+            points = np.asarray(positions, dtype=np.float64).reshape(-1, 2).astype(np.int64)
+            self._add_positions(points[:, 0], points[:, 1], current_time)
+        
+        # Add data from tracks (most recent position of each track)
         if tracks is not None:
-            for track_id, track_data in tracks.items():
-                if len(track_data) > 0:
-                    # Get the most recent position
-                    latest_pos = track_data[-1].get('position')
-                    if latest_pos:
-                        x, y = latest_pos
-                        x, y = int(x), int(y)
-                        if 0 <= y < self.frame_resolution[0] and 0 <= x < self.frame_resolution[1]:
-                            self.heatmap[y, x] += 1.0
-        
-        # Apply Gaussian blur to smooth the heatmap
-        if np.max(self.heatmap) > 0:  # Only blur if there's data
-            self.heatmap = cv2.GaussianBlur(self.heatmap, (self.blur_size, self.blur_size), 0)
+            latest = [
+                track_data[-1].get('position')
+                for track_data in tracks.values()
+                if len(track_data) > 0 and track_data[-1].get('position')
+            ]
+            if latest:
+                points = np.asarray(latest, dtype=np.float64).astype(np.int64)
+                self.grid.add_points(points[:, 0], points[:, 1])
+        
+        # Smoothing happens when the heatmap is next rendered or exported
+        self._smoothed = None
         
         self.last_update = current_time
-        return self.heatmap
+        return self.grid.counts
+
+    def _add_positions(self, xs, ys, timestamp):
+        """Add pixel positions to the grid and record the in-frame ones"""
+        self.grid.add_points(xs, ys)
+        in_frame = (ys >= 0) & (ys < self.frame_resolution[0]) & (xs >= 0) & (xs < self.frame_resolution[1])
+        iso_timestamp = timestamp.isoformat()
+        self.position_history.extend(
+            ({'position': (x, y), 'timestamp': iso_timestamp}
+             for x, y in zip(xs[in_frame].tolist(), ys[in_frame].tolist())),
+            timestamp
+        )
     
     def get_colored_heatmap(self, alpha=0.7):
         """Get a colored visualization of the heatmap"""
-        if np.max(self.heatmap) > 0:
-            # Normalize to 0-255 range
-            normalized = (self.heatmap * 255 / np.max(self.heatmap)).astype(np.uint8)
+        max_value = self._max()
+        if max_value > 0:
+            # Normalize to 0-255 range at grid resolution, then upsample for display
+            normalized = (self.heatmap * 255 / max_value).astype(np.uint8)
+            normalized = cv2.resize(
+                normalized,
+                (self.frame_resolution[1], self.frame_resolution[0]),
+                interpolation=cv2.INTER_LINEAR
+            )
             
             # Apply colormap (JET, INFERNO, PLASMA, etc.)
             colored = cv2.applyColorMap(normalized, cv2.COLORMAP_JET)
@@ -90,7 +103,7 @@ class HeatmapGenerator:
         heatmap_colored = self.get_colored_heatmap()
         
         # Resize frame if needed
-        if frame.shape[:2] != self.frame_resolution:
+        if frame.shape[:2] != tuple(self.frame_resolution):
             frame = cv2.resize(frame, (self.frame_resolution[1], self.frame_resolution[0]))
         
         # Create overlay
@@ -98,41 +111,55 @@ class HeatmapGenerator:
         return overlay
     
     def get_hotspots(self, threshold=0.7, min_area=100):
-        """Get hotspot regions from the heatmap"""
-        if np.max(self.heatmap) == 0:
+        """Get hotspot regions from the heatmap (bboxes and areas in pixels)"""
+        max_value = self._max()
+        if max_value == 0:
             return []
         
         # Normalize heatmap
-        normalized = self.heatmap / np.max(self.heatmap)
+        normalized = self.heatmap / max_value
         
         # Threshold to create binary image
         binary = (normalized > threshold).astype(np.uint8) * 255
         
-        # Find contours
+        # Find contours on the grid; cells are scaled back to pixels below
         contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        cell_area = self.grid.cell_width * self.grid.cell_height
         
         # Filter by area and extract bounding boxes
         hotspots = []
         for contour in contours:
-            area = cv2.contourArea(contour)
+            x, y, w, h = cv2.boundingRect(contour)
+            # A single cell has zero contour area, so measure the covered cells instead
+            area = float(np.count_nonzero(binary[y:y+h, x:x+w])) * cell_area
             if area >= min_area:
-                x, y, w, h = cv2.boundingRect(contour)
                 avg_intensity = np.mean(self.heatmap[y:y+h, x:x+w])
+                x1, y1, _, _ = self.grid.cell_to_pixels(y, x)
+                _, _, x2, y2 = self.grid.cell_to_pixels(y + h - 1, x + w - 1)
                 hotspots.append({
-                    'bbox': (x, y, x+w, y+h),
+                    'bbox': (x1, y1, x2, y2),
                     'area': area,
                     'intensity': float(avg_intensity),
-                    'normalized_intensity': float(avg_intensity / np.max(self.heatmap))
+                    'normalized_intensity': float(avg_intensity / max_value)
                 })
         
         # Sort by intensity (highest first)
         hotspots.sort(key=lambda x: x['intensity'], reverse=True)
         return hotspots
+
+    def get_pyramid_level(self, level=0):
+        """Get one level of the raw count pyramid (0 is the finest grid)"""
+        return self.grid.get_level(level)
+
+    def get_tile(self, level, x1, y1, x2, y2):
+        """Get the pyramid cells covering a pixel-space window"""
+        return self.grid.get_tile(level, x1, y1, x2, y2)
     
     def reset(self):
         """Reset the heatmap"""
-        self.heatmap = np.zeros(self.frame_resolution, dtype=np.float32)
-        self.position_history = []
+        self.grid.reset()
+        self._smoothed = None
+        self.position_history.clear()
         self.last_update = datetime.datetime.now()
     
     def save(self, output_path):
@@ -150,20 +177,28 @@ class HeatmapGenerator:
         if format == 'numpy':
             return self.heatmap
         elif format == 'normalized':
-            if np.max(self.heatmap) > 0:
-                return self.heatmap / np.max(self.heatmap)
+            max_value = self._max()
+            if max_value > 0:
+                return self.heatmap / max_value
             return self.heatmap
-        elif format == 'json':
-            # Convert to a more JSON-friendly format
-            # (sparse representation to save space)
-            sparse_data = []
-            y_indices, x_indices = np.where(self.heatmap > 0.1)  # Threshold to ignore near-zero values
-            for y, x in zip(y_indices, x_indices):
-                sparse_data.append({
-                    'x': int(x),
-                    'y': int(y),
-                    'value': float(self.heatmap[y, x])
-                })
+        elif format == 'pyramid':
+            return self.grid.pyramid()
+        elif format == 'coo':
+            return to_coo(self.heatmap, threshold=0.1)
+        elif format == 'png16':
+            return to_png16(self.heatmap)
+        elif format in ('json', 'rle'):
+            # JSON-friendly formats, built column-wise rather than one dict per cell
+            if format == 'json':
+                # Sparse columns; x/y are grid cells, near-zero values are dropped
+                coo = to_coo(self.heatmap, threshold=0.1)
+                data = {
+                    'x': coo['cols'].tolist(),
+                    'y': coo['rows'].tolist(),
+                    'value': coo['values'].tolist()
+                }
+            else:
+                data = to_rle(self.heatmap)
             
             # Add hotspots
             hotspots = self.get_hotspots()
@@ -171,28 +206,50 @@ class HeatmapGenerator:
             return {
                 'timestamp': datetime.datetime.now().isoformat(),
                 'resolution': self.frame_resolution,
-                'max_value': float(np.max(self.heatmap)),
-                'data': sparse_data,
+                'grid_shape': self.grid.grid_shape,
+                'cell_size': (self.grid.cell_width, self.grid.cell_height),
+                'max_value': self._max(),
+                'encoding': 'sparse' if format == 'json' else 'rle',
+                'data': data,
                 'hotspots': hotspots
             }
         else:
             raise ValueError(f"Unsupported export format: {format}")
     
-    def save_export_data(self, output_path=None):
-        """Save exported data to a JSON file"""
+    def save_export_data(self, output_path=None, format='json'):
+        """Save exported data to a file (json/rle as JSON, coo as .npz, png16 as .png)"""
+        extensions = {'json': 'json', 'rle': 'json', 'coo': 'npz', 'png16': 'png'}
+        if format not in extensions:
+            raise ValueError(f"Unsupported export format: {format}")
+
         if output_path is None:
             # Create default output directory
             os.makedirs('heatmap_data', exist_ok=True)
             timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_path = f'heatmap_data/heatmap_{timestamp}.json'
-        
-        # Export data and save to file
-        data = self.export_data(format='json')
+            output_path = f'heatmap_data/heatmap_{timestamp}.{extensions[format]}'
         
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
         
-        with open(output_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        # Export data and save to file
+        if format == 'coo':
+            coo = self.export_data(format='coo')
+            with open(output_path, 'wb') as f:
+                np.savez_compressed(
+                    f,
+                    frame_resolution=np.asarray(self.frame_resolution, dtype=np.int32),
+                    **coo
+                )
+        elif format == 'png16':
+            png, scale = self.export_data(format='png16')
+            with open(output_path, 'wb') as f:
+                f.write(png)
+            # The PNG holds quantized values; keep the scale next to it
+            with open(f"{os.path.splitext(output_path)[0]}.scale.json", 'w') as f:
+                json.dump({'scale': scale, 'resolution': list(self.frame_resolution)}, f)
+        else:
+            data = self.export_data(format=format)
+            with open(output_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
         
-        return output_path
\ No newline at end of file
+        return output_path
@@ -0,0 +1,200 @@
+import io
+import zlib
+import cv2
+import numpy as np
+
+
+class HeatmapGrid:
+    def __init__(self, frame_resolution=(1080, 1920), grid_shape=(108, 192), dtype=np.float32):
+        """Accumulate positions into a coarse grid instead of a per-pixel map.
+
+        `frame_resolution` and `grid_shape` are both (height, width). The default
+        grid gives roughly 10 pixel cells on a 1080p frame.
+        """
+        self.frame_resolution = tuple(int(v) for v in frame_resolution)
+        self.grid_shape = tuple(int(v) for v in grid_shape)
+        self.cell_height = self.frame_resolution[0] / self.grid_shape[0]
+        self.cell_width = self.frame_resolution[1] / self.grid_shape[1]
+        self.counts = np.zeros(self.grid_shape, dtype=dtype)
+        self._pyramid = None
+
+    def add_points(self, xs, ys, weights=None):
+        """Add a batch of pixel positions to the grid"""
+        xs = np.asarray(xs, dtype=np.float64).ravel()
+        ys = np.asarray(ys, dtype=np.float64).ravel()
+        if xs.size == 0:
+            return 0
+
+        # Keep only positions that fall inside the frame
+        mask = (xs >= 0) & (xs < self.frame_resolution[1]) & (ys >= 0) & (ys < self.frame_resolution[0])
+        if not np.any(mask):
+            return 0
+
+        cols = np.minimum((xs[mask] / self.cell_width).astype(np.intp), self.grid_shape[1] - 1)
+        rows = np.minimum((ys[mask] / self.cell_height).astype(np.intp), self.grid_shape[0] - 1)
+
+        if weights is None:
+            values = np.ones(rows.size, dtype=self.counts.dtype)
+        else:
+            values = np.broadcast_to(np.asarray(weights, dtype=self.counts.dtype), xs.shape)[mask]
+
+        # bincount handles repeated cells in one pass (unlike fancy-index +=)
+        flat = np.bincount(rows * self.grid_shape[1] + cols, weights=values, minlength=self.counts.size)
+        self.counts += flat.reshape(self.grid_shape).astype(self.counts.dtype)
+        self._pyramid = None
+        return int(rows.size)
+
+    def scale(self, factor):
+        """Multiply all cells by a factor (used for time decay)"""
+        self.counts *= factor
+        self._pyramid = None
+
+    def smoothed(self, kernel_size):
+        """Copy of the grid smoothed with a Gaussian kernel given in pixels; the counts stay raw"""
+        cells = int(round(kernel_size / max(self.cell_width, self.cell_height)))
+        if cells < 2:
+            return self.counts.copy()
+        if cells % 2 == 0:
+            cells += 1
+        return cv2.GaussianBlur(self.counts, (cells, cells), 0)
+
+    def max(self):
+        return float(self.counts.max()) if self.counts.size else 0.0
+
+    def reset(self):
+        self.counts.fill(0)
+        self._pyramid = None
+
+    def pyramid(self):
+        """Get the mip pyramid, finest level (the grid itself) first.
+
+        Each level sums 2x2 blocks of the previous one, so totals are preserved
+        and coarse overviews can be served without touching the base grid.
+        """
+        if self._pyramid is None:
+            levels = [self.counts]
+            current = self.counts
+            while current.shape[0] > 1 or current.shape[1] > 1:
+                rows, cols = current.shape
+                padded = np.zeros((rows + rows % 2, cols + cols % 2), dtype=current.dtype)
+                padded[:rows, :cols] = current
+                current = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).sum(axis=(1, 3))
+                levels.append(current)
+            self._pyramid = levels
+        return self._pyramid
+
+    def get_level(self, level=0):
+        """Get a single pyramid level (0 is the base grid)"""
+        levels = self.pyramid()
+        if not 0 <= level < len(levels):
+            raise ValueError(f"Invalid pyramid level {level}, expected 0-{len(levels) - 1}")
+        return levels[level]
+
+    def get_tile(self, level, x1, y1, x2, y2):
+        """Get the cells of a pyramid level covering a pixel-space window"""
+        data = self.get_level(level)
+        scale = 2 ** level
+        cell_w = self.cell_width * scale
+        cell_h = self.cell_height * scale
+        c1 = max(0, int(x1 // cell_w))
+        r1 = max(0, int(y1 // cell_h))
+        c2 = min(data.shape[1], int(np.ceil(x2 / cell_w)))
+        r2 = min(data.shape[0], int(np.ceil(y2 / cell_h)))
+        return data[r1:r2, c1:c2]
+
+    def cell_to_pixels(self, row, col, level=0):
+        """Get the pixel-space (x1, y1, x2, y2) box of a cell"""
+        scale = 2 ** level
+        return (
+            int(col * self.cell_width * scale),
+            int(row * self.cell_height * scale),
+            int((col + 1) * self.cell_width * scale),
+            int((row + 1) * self.cell_height * scale),
+        )
+
+    def to_frame(self, interpolation=cv2.INTER_LINEAR):
+        """Upsample the grid to frame resolution for rendering only"""
+        return cv2.resize(
+            self.counts,
+            (self.frame_resolution[1], self.frame_resolution[0]),
+            interpolation=interpolation
+        )
+
+    def to_dict(self, level=0):
+        """Get a JSON-friendly description of a pyramid level"""
+        data = self.get_level(level)
+        return {
+            'level': level,
+            'shape': list(data.shape),
+            'cell_size': [self.cell_width * 2 ** level, self.cell_height * 2 ** level],
+            'frame_resolution': list(self.frame_resolution),
+            'max_value': float(data.max()) if data.size else 0.0,
+            'values': data.tolist()
+        }
+
+
+def render_colormap(counts, frame_resolution):
+    """Render grid counts as a JET-coloured BGR image at frame resolution (height, width)"""
+    max_value = float(counts.max()) if counts.size else 0.0
+    if max_value <= 0:
+        return np.zeros((*frame_resolution, 3), dtype=np.uint8)
+    normalized = (counts * 255 / max_value).astype(np.uint8)
+    normalized = cv2.resize(normalized, (frame_resolution[1], frame_resolution[0]))
+    return cv2.applyColorMap(normalized, cv2.COLORMAP_JET)
+
+
+def encode_grid(counts, level=6):
+    """Serialise a grid as a zlib-compressed .npy blob"""
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(counts), allow_pickle=False)
+    return zlib.compress(buffer.getvalue(), level)
+
+
+def decode_grid(blob):
+    """Inverse of encode_grid"""
+    return np.load(io.BytesIO(zlib.decompress(blob)), allow_pickle=False)
+
+
+def to_coo(counts, threshold=0.0):
+    """Sparse COO representation: row, col and value arrays of cells above threshold"""
+    rows, cols = np.nonzero(counts > threshold)
+    return {
+        'shape': np.asarray(counts.shape, dtype=np.int32),
+        'rows': rows.astype(np.uint16 if max(counts.shape) <= np.iinfo(np.uint16).max else np.int32),
+        'cols': cols.astype(np.uint16 if max(counts.shape) <= np.iinfo(np.uint16).max else np.int32),
+        'values': counts[rows, cols].astype(np.float32)
+    }
+
+
+def quantize_uint16(counts):
+    """Scale a grid to uint16; returns (quantized, scale) with value = quantized * scale"""
+    max_value = float(counts.max()) if counts.size else 0.0
+    if max_value <= 0:
+        return np.zeros(counts.shape, dtype=np.uint16), 0.0
+    scale = max_value / np.iinfo(np.uint16).max
+    return np.rint(counts / scale).astype(np.uint16), scale
+
+
+def to_png16(counts):
+    """Encode a grid as a 16-bit grayscale PNG; returns (png bytes, scale)"""
+    quantized, scale = quantize_uint16(counts)
+    ok, encoded = cv2.imencode('.png', quantized)
+    if not ok:
+        raise ValueError("Failed to encode heatmap as PNG")
+    return encoded.tobytes(), scale
+
+
+def to_rle(counts):
+    """Run-length encode the row-major uint16-quantized grid"""
+    quantized, scale = quantize_uint16(counts)
+    flat = quantized.ravel()
+    if flat.size == 0:
+        return {'shape': list(counts.shape), 'scale': scale, 'values': [], 'lengths': []}
+    starts = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+    lengths = np.diff(np.append(starts, flat.size))
+    return {
+        'shape': list(counts.shape),
+        'scale': scale,
+        'values': flat[starts].tolist(),
+        'lengths': lengths.tolist()
+    }
@@ -0,0 +1,279 @@
+import glob
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import column, delete, distinct, func, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import TableClause
+
+import models  # noqa: F401  (registers the tables whose columns are copied below)
+from models.base import Base
+from database import engine as default_engine
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Raw high-volume tables and the length of their time partitions (by the timestamp column)
+PARTITIONED_TABLES = {
+    "detections": "month",
+    "heatmap_data": "day",
+    "tracking_logs": "day",
+    "entry_logs": "month",
+}
+PARTITION_KEY = "timestamp"
+
+_PARTITION_NAME = re.compile(
+    r"^(?:%s)_(?:p\d{4}_\d{2}(?:_\d{2})?|default)$" % "|".join(PARTITIONED_TABLES)
+)
+_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+# Called before rows are dropped: (connection, source table, only rows before this time or None for all)
+BeforeDrop = Callable[[Connection, TableClause, Optional[datetime]], object]
+
+
+def period_start(ts: datetime, interval: str) -> datetime:
+    """Start of the day or month a timestamp falls in (wall clock, as the raw rows are stored)"""
+    ts = ts.replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    return ts.replace(day=1) if interval == "month" else ts
+
+
+def next_period(start: datetime, interval: str) -> datetime:
+    if interval == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(table_name: str, start: datetime, interval: str) -> str:
+    return f"{table_name}_p{start:%Y_%m}" if interval == "month" else f"{table_name}_p{start:%Y_%m_%d}"
+
+
+def is_partition(name: str) -> bool:
+    """Whether a table name is a partition (or SQLite month shard) of a partitioned table"""
+    return bool(_PARTITION_NAME.match(name))
+
+
+def _source(table_name: str, name: Optional[str] = None, schema: Optional[str] = None):
+    """Lightweight table construct with the model's columns, for a partition, shard or the table itself"""
+    columns = Base.metadata.tables[table_name].columns
+    return table(name or table_name, *[column(c.name, c.type) for c in columns], schema=schema)
+
+
+class PostgresPartitions:
+    """Native range partitions on PostgreSQL (see the time partitions migration).
+
+    Partitions are named `<table>_pYYYY_MM` or `<table>_pYYYY_MM_DD`; rows
+    outside every partition (and rows without a timestamp) land in
+    `<table>_default`. Each table is handled under an advisory lock so
+    several workers running the retention job don't race.
+    """
+
+    def __init__(self, engine=default_engine, ahead: Optional[int] = None):
+        self.engine = engine
+        self.ahead = settings.PARTITIONS_AHEAD if ahead is None else ahead
+
+    def _lock(self, conn, table_name: str):
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": f"partitions:{table_name}"})
+
+    def is_partitioned(self, conn, table_name: str) -> bool:
+        relkind = conn.execute(
+            text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {"name": table_name}
+        ).scalar()
+        return relkind == "p"
+
+    def partitions(self, conn, table_name: str) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+        """(name, start, end) of each partition; the default partition has no bounds"""
+        rows = conn.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:name) ORDER BY c.relname"
+        ), {"name": table_name})
+        result = []
+        for name, bound in rows:
+            match = _BOUNDS.search(bound or "")
+            if match:
+                result.append((name, datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))))
+            else:
+                result.append((name, None, None))
+        return result
+
+    def ensure(self, table_name: str, now: Optional[datetime] = None) -> List[str]:
+        """Create the partitions for the current period and the next `ahead` ones"""
+        interval = PARTITIONED_TABLES[table_name]
+        now = now or datetime.utcnow()
+        created = []
+        with self.engine.begin() as conn:
+            if not self.is_partitioned(conn, table_name):
+                logger.warning("%s is not partitioned, run the migrations", table_name)
+                return created
+            self._lock(conn, table_name)
+            existing = [(start, end) for _, start, end in self.partitions(conn, table_name) if start is not None]
+            start = period_start(now, interval)
+            for _ in range(self.ahead + 1):
+                end = next_period(start, interval)
+                if not any(start < other_end and other_start < end for other_start, other_end in existing):
+                    name = partition_name(table_name, start, interval)
+                    self._create(conn, table_name, name, start, end)
+                    created.append(name)
+                start = end
+        return created
+
+    def _create(self, conn, table_name: str, name: str, start: datetime, end: datetime):
+        # Built standalone and attached, so rows already in the default partition for
+        # this range can be moved in first (attaching would fail otherwise)
+        bounds = {"start": start, "end": end}
+        conn.execute(text(f'CREATE TABLE "{name}" (LIKE "{table_name}" INCLUDING DEFAULTS)'))
+        conn.execute(text(
+            f'WITH moved AS (DELETE FROM "{table_name}_default" '
+            f'WHERE "{PARTITION_KEY}" >= :start AND "{PARTITION_KEY}" < :end RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved'
+        ), bounds)
+        conn.execute(text(
+            f"""ALTER TABLE "{table_name}" ATTACH PARTITION "{name}" """
+            f"""FOR VALUES FROM ('{start.isoformat(" ")}') TO ('{end.isoformat(" ")}')"""
+        ))
+
+    def drop_before(self, table_name: str, cutoff: datetime, before_drop: Optional[BeforeDrop] = None) -> List[str]:
+        """Drop the partitions that end by `cutoff` and delete older rows from the default partition.
+
+        `before_drop` runs in the same transaction as each drop, so e.g. an
+        archive of the rows is committed only together with their removal.
+        """
+        dropped = []
+        with self.engine.connect() as conn:
+            if not self.is_partitioned(conn, table_name):
+                logger.warning("%s is not partitioned, run the migrations", table_name)
+                return dropped
+            partitions = self.partitions(conn, table_name)
+
+        for name, start, end in partitions:
+            if end is not None and end > cutoff:
+                continue
+            with self.engine.begin() as conn:
+                self._lock(conn, table_name)
+                if end is None:
+                    source = _source(table_name, name)
+                    if before_drop:
+                        before_drop(conn, source, cutoff)
+                    conn.execute(delete(source).where(source.c[PARTITION_KEY] < cutoff))
+                else:
+                    if before_drop:
+                        before_drop(conn, _source(table_name, name), None)
+                    conn.execute(text(f'DROP TABLE "{name}"'))
+                    dropped.append(name)
+        return dropped
+
+
+class SqliteMonthShards:
+    """SQLite fallback: closed months are moved out of the main database into one file per table and month.
+
+    Opt-in through `hot_months` (SQLITE_HOT_MONTHS, 0 by default). When set,
+    the current and previous `hot_months - 1` months stay in the main
+    database, where the API reads them; older rows live in
+    `<shard_dir>/<table>_pYYYY_MM.sqlite` until retention deletes the file,
+    so the API no longer sees them. When 0, rows stay in the main database
+    and retention deletes them there.
+    """
+
+    def __init__(self, engine=default_engine, directory: Optional[str] = None, hot_months: Optional[int] = None):
+        self.engine = engine
+        self.directory = directory or settings.SQLITE_SHARD_DIR
+        self.hot_months = max(0, settings.SQLITE_HOT_MONTHS if hot_months is None else hot_months)
+
+    def path(self, table_name: str, month: datetime) -> str:
+        return os.path.join(self.directory, f"{partition_name(table_name, month, 'month')}.sqlite")
+
+    def shards(self, table_name: str) -> List[Tuple[str, datetime, datetime]]:
+        """(path, start, end) of each month file of a table"""
+        result = []
+        for path in sorted(glob.glob(os.path.join(self.directory, f"{table_name}_p*.sqlite"))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            if not is_partition(name) or not name.startswith(f"{table_name}_p"):
+                continue
+            start = datetime.strptime(name[len(table_name) + 2:], "%Y_%m")
+            result.append((path, start, next_period(start, "month")))
+        return result
+
+    def _attach(self, conn, path: str):
+        # ATTACH is not allowed inside a transaction, so it's the first statement on the connection
+        conn.exec_driver_sql("ATTACH DATABASE ? AS shard", (path,))
+
+    def _detach(self, conn):
+        conn.rollback()
+        conn.exec_driver_sql("DETACH DATABASE shard")
+
+    def ensure(self, table_name: str, now: Optional[datetime] = None) -> List[str]:
+        """Move rows of the months before the hot window into their month files"""
+        if not self.hot_months:
+            return []
+        boundary = period_start(now or datetime.utcnow(), "month")
+        for _ in range(self.hot_months - 1):
+            boundary = period_start(boundary - timedelta(days=1), "month")
+
+        source = _source(table_name)
+        timestamp = source.c[PARTITION_KEY]
+        with self.engine.connect() as conn:
+            months = [
+                datetime.strptime(month, "%Y-%m")
+                for month in conn.execute(
+                    select(distinct(func.strftime("%Y-%m", timestamp))).where(timestamp < boundary)
+                ).scalars()
+                if month
+            ]
+        if not months:
+            return []
+
+        os.makedirs(self.directory, exist_ok=True)
+        moved = []
+        for start in sorted(months):
+            end = next_period(start, "month")
+            path = self.path(table_name, start)
+            with self.engine.connect() as conn:
+                self._attach(conn, path)
+                try:
+                    conn.exec_driver_sql(
+                        f'CREATE TABLE IF NOT EXISTS shard."{table_name}" AS SELECT * FROM main."{table_name}" WHERE 0'
+                    )
+                    shard = _source(table_name, schema="shard")
+                    in_month = (timestamp >= start) & (timestamp < end)
+                    conn.execute(shard.insert().from_select(list(source.c.keys()), select(source).where(in_month)))
+                    conn.execute(delete(source).where(in_month))
+                    conn.commit()
+                finally:
+                    self._detach(conn)
+            moved.append(os.path.basename(path))
+        return moved
+
+    def drop_before(self, table_name: str, cutoff: datetime, before_drop: Optional[BeforeDrop] = None) -> List[str]:
+        """Delete the month files that end by `cutoff` and older rows still in the main database"""
+        dropped = []
+        for path, start, end in self.shards(table_name):
+            if end > cutoff:
+                continue
+            if before_drop:
+                with self.engine.connect() as conn:
+                    self._attach(conn, path)
+                    try:
+                        before_drop(conn, _source(table_name, schema="shard"), None)
+                        conn.commit()
+                    finally:
+                        self._detach(conn)
+            os.remove(path)
+            dropped.append(os.path.basename(path))
+
+        source = _source(table_name)
+        with self.engine.begin() as conn:
+            if before_drop:
+                before_drop(conn, source, cutoff)
+            conn.execute(delete(source).where(source.c[PARTITION_KEY] < cutoff))
+        return dropped
+
+
+def partition_manager(engine=default_engine):
+    """The partition manager for the engine's database, or None where partitioning isn't supported"""
+    if engine.dialect.name == "postgresql":
+        return PostgresPartitions(engine)
+    if engine.dialect.name == "sqlite":
+        return SqliteMonthShards(engine)
+    return None
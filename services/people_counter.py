@@ -3,6 +3,7 @@ import cv2
 import os
 import datetime
 from ultralytics import YOLO
+from services.detection_results import ResultDecoder
 
 class PeopleCounter:
     def __init__(self, model_path=None, confidence_threshold=0.5):
@@ -14,18 +15,12 @@ class PeopleCounter:
         self.confidence_threshold = confidence_threshold
         self.total_people_detected = 0
         self.detections = []
+        self.decoder = ResultDecoder(classes=[0])  # class 0 is 'person' in COCO
 
     def detect(self, frame):
         results = self.model(frame, conf=self.confidence_threshold)
-        count = 0
-        detections = []
-
-        if results:
-            for box, conf, cls in zip(results[0].boxes.xyxy, results[0].boxes.conf, results[0].boxes.cls):
-                if int(cls.item()) == 0:  # class 0 is 'person' in COCO
-                    x1, y1, x2, y2 = map(int, box.tolist())
-                    detections.append({'bbox': (x1, y1, x2, y2), 'confidence': conf.item()})
-                    count += 1
+        detections = self.decoder(results)
+        count = len(detections)
 
         self.total_people_detected += count
         self.detections.append({'timestamp': datetime.datetime.now().isoformat(), 'count': count})
@@ -33,9 +28,7 @@ class PeopleCounter:
 
     def annotate_frame(self, frame, detections):
         annotated = frame.copy()
-        for det in detections:
-            x1, y1, x2, y2 = det['bbox']
-            conf = det['confidence']
+        for (x1, y1, x2, y2), conf in zip(detections.xyxy.astype(int).tolist(), detections.confidence.tolist()):
             cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
             cv2.putText(annotated, f"Person: {conf:.2f}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
@@ -6,9 +6,13 @@ import os
 import json
 import time
 from datetime import datetime
-from collections import defaultdict, deque
+from collections import Counter, defaultdict, deque
+from scipy.optimize import linear_sum_assignment
 import sys
 
+from services.bounded_history import BoundedHistory
+from utils.geometry import box_centers, boxes_overlap
+
 class PPEDetector:
     """
     A class to detect and analyze Personal Protective Equipment (PPE) in video frames
@@ -27,7 +31,10 @@ class PPEDetector:
         'Person': (192, 192, 192),  # Silver/Gray
     }
     
-    def __init__(self, model_path=None, confidence_threshold=0.35, min_tracking_confidence=0.4):
+    # Cost of person/PPE pairs that fail every association test
+    UNASSIGNABLE_COST = 1e6
+    
+    def __init__(self, model_path=None, confidence_threshold=0.35, min_tracking_confidence=0.4, one_to_one_ppe=False):
         """
         Initialize the PPE detector.
         
@@ -35,6 +42,8 @@ class PPEDetector:
             model_path: Path to the YOLO model trained for PPE detection
             confidence_threshold: Minimum confidence for detection
             min_tracking_confidence: Minimum confidence to maintain tracking
+            one_to_one_ppe: Credit each PPE item to at most one person (off: an item
+                counts for every person it is associated with)
         """
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
         
@@ -59,6 +68,7 @@ class PPEDetector:
         self.model = YOLO(model_path)
         self.confidence_threshold = confidence_threshold
         self.min_tracking_confidence = min_tracking_confidence
+        self.one_to_one_ppe = one_to_one_ppe
         
         # Get class names from the model
         self.class_names = self.model.names
@@ -69,7 +79,7 @@ class PPEDetector:
         self.person_histories = defaultdict(lambda: deque(maxlen=30))  # Store history of PPE for each person
         
         # Analytics variables
-        self.detection_history = []
+        self.detection_history = BoundedHistory("ppe_history")  # Older records spill to disk
         self.session_start_time = datetime.now()
         self.frame_count = 0
         self.total_detections = 0
@@ -79,7 +89,7 @@ class PPEDetector:
         self.person_count = 0
         
         # Time periods (store counts for every 5 minute interval)
-        self.time_period_stats = []
+        self.time_period_stats = BoundedHistory("ppe_periods", max_items=288)
         self.current_period_start = self.session_start_time
         self.period_detections = {ppe_type: 0 for ppe_type in self.PPE_COLORS.keys()}
         self.PERIOD_LENGTH_SECONDS = 300  # 5 minutes
@@ -95,6 +105,12 @@ class PPEDetector:
         
         # Active compliance rule
         self.active_rule = 'default'
+        
+        # Running compliance tallies, updated per person so statistics never rescan persons or history
+        self.active_compliant = 0  # Active persons currently compliant
+        self.active_missing = Counter()  # PPE type -> active persons missing it
+        self.history_compliant = 0
+        self.history_missing = Counter()
     
     def detect(self, frame):
         """
@@ -184,30 +200,26 @@ class PPEDetector:
         Associate detected PPE items with person detections.
         This helps track which person has which PPE items.
         """
-        # First, group detections by class name (excluding persons)
-        ppe_detections = {}
-        for detection in all_detections:
-            if detection["class_name"] != "Person":
-                if detection["class_name"] not in ppe_detections:
-                    ppe_detections[detection["class_name"]] = []
-                ppe_detections[detection["class_name"]].append(detection)
-        
-        # For each person, find associated PPE items
+        ppe_items = [detection for detection in all_detections if detection["class_name"] != "Person"]
+        # Grouped by class in first-seen order, the order the per-class loops credited them in
+        class_order = {}
+        for ppe in ppe_items:
+            class_order.setdefault(ppe["class_name"], len(class_order))
+        ppe_items.sort(key=lambda ppe: class_order[ppe["class_name"]])
+        
+        # Initialize or update person tracking entries
         for person in persons:
-            person_bbox = person["bbox"]
             person_id = person["tracking_id"]
-            
-            # Initialize or update person tracking entry
             if person_id not in self.tracked_persons:
                 # New person
-                person_data = {
+                self.tracked_persons[person_id] = {
                     "first_seen": self.frame_count,
                     "last_seen": self.frame_count,
                     "detection_count": 1,
                     "current_ppe": {},
-                    "ppe_history": {ppe_type: 0 for ppe_type in self.PPE_COLORS.keys()}
+                    "ppe_history": {ppe_type: 0 for ppe_type in self.PPE_COLORS.keys()},
+                    "compliance": None
                 }
-                self.tracked_persons[person_id] = person_data
             else:
                 # Update existing person
                 self.tracked_persons[person_id]["last_seen"] = self.frame_count
@@ -215,97 +227,98 @@ class PPEDetector:
             
             # Clear current PPE for this update
             self.tracked_persons[person_id]["current_ppe"] = {}
-            
-            # Check for each PPE type
-            for ppe_type, detections in ppe_detections.items():
-                for ppe in detections:
-                    ppe_bbox = ppe["bbox"]
-                    
-                    # Check if PPE is associated with this person
-                    # Simple heuristic: Check for overlap or proximity
-                    if self._is_ppe_associated_with_person(person_bbox, ppe_bbox):
-                        # Associate PPE with person
-                        if ppe_type not in self.tracked_persons[person_id]["current_ppe"]:
-                            self.tracked_persons[person_id]["current_ppe"][ppe_type] = []
-                        
-                        self.tracked_persons[person_id]["current_ppe"][ppe_type].append({
-                            "confidence": ppe["confidence"],
-                            "bbox": ppe["bbox"]
-                        })
-                        
-                        # Update PPE history for this person
-                        self.tracked_persons[person_id]["ppe_history"][ppe_type] += 1
-            
-            # Update history record for this person
+        
+        if persons and ppe_items:
+            person_boxes = np.array([person["bbox"] for person in persons], dtype=np.float64)
+            ppe_boxes = np.array([ppe["bbox"] for ppe in ppe_items], dtype=np.float64)
+            associated, distance = self._ppe_association_matrices(person_boxes, ppe_boxes)
+            
+            if self.one_to_one_ppe:
+                associated = self._assign_ppe_one_to_one(associated, distance, [ppe["class_name"] for ppe in ppe_items])
+            
+            # Pairs come back person-major, matching the old loop order
+            for person_index, ppe_index in np.argwhere(associated):
+                person_data = self.tracked_persons[persons[person_index]["tracking_id"]]
+                ppe = ppe_items[ppe_index]
+                ppe_type = ppe["class_name"]
+                person_data["current_ppe"].setdefault(ppe_type, []).append({
+                    "confidence": ppe["confidence"],
+                    "bbox": ppe["bbox"]
+                })
+                
+                # Update PPE history for this person
+                person_data["ppe_history"][ppe_type] = person_data["ppe_history"].get(ppe_type, 0) + 1
+        
+        # Update history record and compliance for each person
+        for person in persons:
+            person_id = person["tracking_id"]
+            self._refresh_compliance(person_id)
             self.person_histories[person_id].append({
                 "frame": self.frame_count,
                 "current_ppe": dict(self.tracked_persons[person_id]["current_ppe"])
             })
     
-    def _is_ppe_associated_with_person(self, person_bbox, ppe_bbox):
+    def _ppe_association_matrices(self, person_boxes, ppe_boxes, margin=0.2, proximity_threshold=1.5):
         """
-        Determine if a PPE item is associated with a person based on bbox proximity.
+        Evaluate every person/PPE pair at once.
+        
+        A PPE item is associated with a person if the boxes overlap, if it is
+        contained in the person box expanded by `margin`, or if the centre
+        distance normalised by person size is below `proximity_threshold`.
         
         Args:
-            person_bbox: Person bounding box [x1, y1, x2, y2]
-            ppe_bbox: PPE item bounding box [x1, y1, x2, y2]
+            person_boxes: (P, 4) array of person boxes [x1, y1, x2, y2]
+            ppe_boxes: (Q, 4) array of PPE boxes [x1, y1, x2, y2]
             
         Returns:
-            Boolean indicating if the PPE is likely associated with the person
+            (associated, distance): (P, Q) boolean matrix and (P, Q) normalised centre distances
         """
-        # Check for overlap
-        def overlap(box1, box2):
-            x1_max = max(box1[0], box2[0])
-            y1_max = max(box1[1], box2[1])
-            x2_min = min(box1[2], box2[2])
-            y2_min = min(box1[3], box2[3])
-            
-            if x1_max < x2_min and y1_max < y2_min:
-                return True
-            return False
-        
-        # Check if PPE is contained within person bbox with some margin
-        def is_contained(person, ppe, margin=0.2):
-            # Calculate expanded person bbox
-            p_width = person[2] - person[0]
-            p_height = person[3] - person[1]
-            
-            expanded_person = [
-                person[0] - int(p_width * margin),
-                person[1] - int(p_height * margin),
-                person[2] + int(p_width * margin),
-                person[3] + int(p_height * margin)
-            ]
-            
-            return (ppe[0] >= expanded_person[0] and ppe[1] >= expanded_person[1] and
-                    ppe[2] <= expanded_person[2] and ppe[3] <= expanded_person[3])
-        
-        # Check proximity if not contained
-        def is_proximate(person, ppe, threshold=1.5):
-            # Calculate centers
-            p_center_x = (person[0] + person[2]) / 2
-            p_center_y = (person[1] + person[3]) / 2
-            
-            ppe_center_x = (ppe[0] + ppe[2]) / 2
-            ppe_center_y = (ppe[1] + ppe[3]) / 2
-            
-            # Calculate normalized distance
-            p_size = max(person[2] - person[0], person[3] - person[1])
-            distance = np.sqrt((p_center_x - ppe_center_x)**2 + (p_center_y - ppe_center_y)**2) / p_size
-            
-            return distance < threshold
-        
-        # Check various association methods
-        if overlap(person_bbox, ppe_bbox):
-            return True
-        
-        if is_contained(person_bbox, ppe_bbox):
-            return True
-        
-        if is_proximate(person_bbox, ppe_bbox):
-            return True
-        
-        return False
+        p = person_boxes[:, None, :]
+        q = ppe_boxes[None, :, :]
+        
+        # Strict overlap
+        overlap = boxes_overlap(person_boxes, ppe_boxes)
+        
+        # Containment in the expanded person box
+        widths = person_boxes[:, 2] - person_boxes[:, 0]
+        heights = person_boxes[:, 3] - person_boxes[:, 1]
+        pad_x = np.trunc(widths * margin)[:, None]
+        pad_y = np.trunc(heights * margin)[:, None]
+        contained = (
+            (q[..., 0] >= p[..., 0] - pad_x) & (q[..., 1] >= p[..., 1] - pad_y) &
+            (q[..., 2] <= p[..., 2] + pad_x) & (q[..., 3] <= p[..., 3] + pad_y)
+        )
+        
+        # Proximity of centres, normalised by person size
+        person_centers = box_centers(person_boxes)
+        ppe_centers = box_centers(ppe_boxes)
+        sizes = np.maximum(widths, heights)[:, None]
+        deltas = person_centers[:, None, :] - ppe_centers[None, :, :]
+        # Degenerate person boxes give inf/nan distances, which never count as proximate
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distance = np.hypot(deltas[..., 0], deltas[..., 1]) / sizes
+        
+        return overlap | contained | (distance < proximity_threshold), distance
+    
+    def _assign_ppe_one_to_one(self, associated, distance, ppe_classes):
+        """
+        Restrict associations so each PPE item goes to at most one person and
+        each person gets at most one item per PPE class (Hungarian matching on
+        normalised centre distance within each class).
+        """
+        assigned = np.zeros_like(associated)
+        ppe_classes = np.asarray(ppe_classes)
+        for ppe_class in np.unique(ppe_classes):
+            columns = np.flatnonzero(ppe_classes == ppe_class)
+            candidates = associated[:, columns]
+            if not candidates.any():
+                continue
+            cost = np.where(candidates, distance[:, columns], self.UNASSIGNABLE_COST)
+            cost = np.nan_to_num(cost, nan=self.UNASSIGNABLE_COST, posinf=self.UNASSIGNABLE_COST)
+            rows, cols = linear_sum_assignment(cost)
+            valid = candidates[rows, cols]
+            assigned[rows[valid], columns[cols[valid]]] = True
+        return assigned
     
     def cleanup_tracking(self, max_frames_missing=30):
         """Remove tracked persons that haven't been seen for a while"""
@@ -315,32 +328,15 @@ class PPEDetector:
                 to_remove.append(person_id)
                 
         for person_id in to_remove:
-            # Log data before removing
+            # Log data before removing; the person moves from the active to the history tallies
             person = self.tracked_persons[person_id]
-            
-            # Calculate PPE compliance
-            compliance_status = self.check_compliance(person["current_ppe"], self.active_rule)
-            
-            # Calculate PPE statistics
-            ppe_stats = {}
-            for ppe_type, count in person["ppe_history"].items():
-                if count > 0:
-                    # Calculate percentage of frames this PPE was detected
-                    detection_frames = person["last_seen"] - person["first_seen"] + 1
-                    percentage = (count / detection_frames) * 100 if detection_frames > 0 else 0
-                    ppe_stats[ppe_type] = {
-                        "count": count, 
-                        "percentage": percentage
-                    }
-            
-            person_data = {
-                "person_id": person_id,
-                "first_seen": person["first_seen"],
-                "last_seen": person["last_seen"],
-                "duration_frames": person["last_seen"] - person["first_seen"],
-                "ppe_stats": ppe_stats,
-                "compliance": compliance_status
-            }
+            person_data = self._person_summary(person_id, person)
+            compliance = person_data["compliance"]
+            if person["compliance"] is not None:
+                self._tally_compliance(compliance, -1)
+            if compliance["status"]:
+                self.history_compliant += 1
+            self.history_missing.update(compliance["missing"])
             self.detection_history.append(person_data)
             
             # Remove tracking data
@@ -348,6 +344,54 @@ class PPEDetector:
             if person_id in self.person_histories:
                 del self.person_histories[person_id]
     
+    def _person_summary(self, person_id, person):
+        """Per-person record as stored in the detection history"""
+        compliance = person["compliance"] or self.check_compliance(person["current_ppe"], self.active_rule)
+        
+        # Calculate PPE statistics
+        ppe_stats = {}
+        detection_frames = person["last_seen"] - person["first_seen"] + 1
+        for ppe_type, count in person["ppe_history"].items():
+            if count > 0:
+                # Calculate percentage of frames this PPE was detected
+                percentage = (count / detection_frames) * 100 if detection_frames > 0 else 0
+                ppe_stats[ppe_type] = {
+                    "count": count, 
+                    "percentage": percentage
+                }
+        
+        return {
+            "person_id": person_id,
+            "first_seen": person["first_seen"],
+            "last_seen": person["last_seen"],
+            "duration_frames": person["last_seen"] - person["first_seen"],
+            "ppe_stats": ppe_stats,
+            "compliance": compliance
+        }
+    
+    def _tally_compliance(self, compliance, sign):
+        """Add (sign=1) or remove (sign=-1) an active person's compliance from the running tallies"""
+        if compliance["status"]:
+            self.active_compliant += sign
+        for ppe_type in compliance["missing"]:
+            self.active_missing[ppe_type] += sign
+    
+    def _refresh_compliance(self, person_id):
+        """Re-check one person after their current PPE changed"""
+        person = self.tracked_persons[person_id]
+        if person["compliance"] is not None:
+            self._tally_compliance(person["compliance"], -1)
+        person["compliance"] = self.check_compliance(person["current_ppe"], self.active_rule)
+        self._tally_compliance(person["compliance"], 1)
+    
+    def _recompute_active_compliance(self):
+        """Re-check every active person, needed only when the active rule changes"""
+        self.active_compliant = 0
+        self.active_missing = Counter()
+        for person_id, person in self.tracked_persons.items():
+            person["compliance"] = None
+            self._refresh_compliance(person_id)
+    
     def check_compliance(self, current_ppe, rule_key='default'):
         """
         Check if a person complies with PPE requirements.
@@ -389,12 +433,15 @@ class PPEDetector:
         """Set the active compliance rule"""
         if rule_key in self.compliance_rules:
             self.active_rule = rule_key
+            self._recompute_active_compliance()
             return True
         return False
     
     def add_compliance_rule(self, rule_key, required_ppe):
         """Add a new compliance rule"""
         self.compliance_rules[rule_key] = required_ppe
+        if rule_key == self.active_rule:
+            self._recompute_active_compliance()
         return True
     
     def annotate_frame(self, frame, detections=None, show_compliance=True, show_labels=True, show_confidence=False):
@@ -463,8 +510,8 @@ class PPEDetector:
                     person = self.tracked_persons[tracking_id]
                     current_ppe = person["current_ppe"]
                     
-                    # Check compliance
-                    compliance = self.check_compliance(current_ppe, self.active_rule)
+                    # Compliance is kept up to date as PPE is associated
+                    compliance = person["compliance"] or self.check_compliance(current_ppe, self.active_rule)
                     
                     # Set color based on compliance
                     if compliance["status"]:
@@ -592,24 +639,9 @@ class PPEDetector:
         historical_persons = len(self.detection_history)
         total_persons = total_active_persons + historical_persons
         
-        # Calculate compliance rate
-        compliant_count = 0
-        non_compliant_count = 0
-        
-        # Count from active persons
-        for person in self.tracked_persons.values():
-            compliance = self.check_compliance(person["current_ppe"], self.active_rule)
-            if compliance["status"]:
-                compliant_count += 1
-            else:
-                non_compliant_count += 1
-        
-        # Count from history
-        for person in self.detection_history:
-            if person["compliance"]["status"]:
-                compliant_count += 1
-            else:
-                non_compliant_count += 1
+        # Compliance counts from the running tallies
+        compliant_count = self.active_compliant + self.history_compliant
+        non_compliant_count = total_persons - compliant_count
         
         # Calculate compliance rate
         compliance_rate = 0
@@ -635,17 +667,7 @@ class PPEDetector:
         required_ppe = self.compliance_rules[self.active_rule]
         
         for ppe_type in required_ppe:
-            missing_count = 0
-            
-            # Check active persons
-            for person in self.tracked_persons.values():
-                if ppe_type not in person["current_ppe"] or not person["current_ppe"][ppe_type]:
-                    missing_count += 1
-            
-            # Check history
-            for person in self.detection_history:
-                if ppe_type in person["compliance"]["missing"]:
-                    missing_count += 1
+            missing_count = self.active_missing[ppe_type] + self.history_missing[ppe_type]
             
             missing_percentage = (missing_count / total_persons) * 100 if total_persons > 0 else 0
             
@@ -675,7 +697,7 @@ class PPEDetector:
                 "compliant_persons": compliant_count,
                 "non_compliant_persons": non_compliant_count
             },
-            "time_period_stats": self.time_period_stats,
+            "time_period_stats": self.time_period_stats.recent(),
             "compliance_rate": compliance_rate
         }
         
@@ -688,34 +710,12 @@ class PPEDetector:
         # Add person tracking data
         all_person_data = []
         
-        # Add historical persons (completed tracks)
-        all_person_data.extend(self.detection_history)
+        # Add recent historical persons (completed tracks); older ones stay spilled on disk
+        all_person_data.extend(self.detection_history.recent())
         
         # Add current active persons
         for person_id, person in self.tracked_persons.items():
-            compliance = self.check_compliance(person["current_ppe"], self.active_rule)
-            
-            # Calculate PPE statistics
-            ppe_stats = {}
-            for ppe_type, count in person["ppe_history"].items():
-                if count > 0:
-                    # Calculate percentage of frames this PPE was detected
-                    detection_frames = person["last_seen"] - person["first_seen"] + 1
-                    percentage = (count / detection_frames) * 100 if detection_frames > 0 else 0
-                    ppe_stats[ppe_type] = {
-                        "count": count, 
-                        "percentage": percentage
-                    }
-            
-            person_data = {
-                "person_id": person_id,
-                "first_seen": person["first_seen"],
-                "last_seen": person["last_seen"],
-                "duration_frames": person["last_seen"] - person["first_seen"],
-                "ppe_stats": ppe_stats,
-                "compliance": compliance
-            }
-            all_person_data.append(person_data)
+            all_person_data.append(self._person_summary(person_id, person))
         
         stats["person_details"] = all_person_data
         
@@ -0,0 +1,86 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from database import engine as default_engine
+from config import settings
+from crud.heatmapArchive import heatmap_archive_crud
+from services.partitions import PARTITIONED_TABLES, partition_manager
+
+logger = logging.getLogger(__name__)
+
+# Setting holding each partitioned table's retention in days
+RETENTION_SETTINGS = {
+    "detections": "DETECTIONS_RETENTION_DAYS",
+    "heatmap_data": "HEATMAP_DATA_RETENTION_DAYS",
+    "tracking_logs": "TRACKING_LOGS_RETENTION_DAYS",
+    "entry_logs": "ENTRY_LOGS_RETENTION_DAYS",
+}
+
+
+class RetentionJob:
+    """Background thread that keeps the time partitions ahead of ingest and drops expired ones.
+
+    Every `interval` seconds it creates the upcoming PostgreSQL partitions
+    (or moves closed months into their SQLite month files), then drops the
+    partitions that lie wholly before each table's retention window.
+    Heatmap points are downsampled into heatmap_archive before their
+    partition goes.
+    """
+
+    def __init__(self, engine=default_engine, interval: Optional[int] = None):
+        self.engine = engine
+        self.interval = settings.RETENTION_INTERVAL_SECONDS if interval is None else interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker thread (idempotent; does nothing when the interval is 0)"""
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def stop(self, timeout: float = 30.0):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Retention run failed")
+            self._stop.wait(self.interval)
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, Dict[str, List[str]]]:
+        """One pass over every partitioned table; returns the partitions created and dropped per table"""
+        manager = partition_manager(self.engine)
+        if manager is None:
+            logger.info("Time partitioning is not supported on %s", self.engine.dialect.name)
+            return {}
+        now = now or datetime.utcnow()
+        results = {}
+        for table_name in PARTITIONED_TABLES:
+            created = manager.ensure(table_name, now)
+            dropped = []
+            days = getattr(settings, RETENTION_SETTINGS[table_name])
+            if days > 0:
+                before_drop = heatmap_archive_crud.archive if table_name == "heatmap_data" else None
+                dropped = manager.drop_before(table_name, now - timedelta(days=days), before_drop)
+            if created or dropped:
+                logger.info("%s: created %s, dropped %s", table_name, created, dropped)
+            results[table_name] = {"created": created, "dropped": dropped}
+        return results
+
+
+retention_job = RetentionJob()
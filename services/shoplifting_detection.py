@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 from ultralytics import YOLO
+from services.detection_results import ResultDecoder, DetectionHistory
 import datetime
 import json
 import os
@@ -24,11 +25,12 @@ class ShopliftingDetector:
         self.confidence_threshold = confidence_threshold
         
         # Store detection history
-        self.detections = []
+        self.detections = DetectionHistory(max_rows=1000)
         self.alerts = []
         
         # Class mapping
         self.class_names = ['normal', 'shoplifting']
+        self.decoder = ResultDecoder(self.class_names, confidence_threshold)
         
         # Initialize analytics
         self.last_analysis_time = datetime.datetime.now()
@@ -51,64 +53,37 @@ class ShopliftingDetector:
         # Run model on frame
         results = self.model(frame, conf=self.confidence_threshold)
         
-        # Process detections
-        current_detections = []
         current_time = datetime.datetime.now()
         
-        if results and len(results) > 0:
-            # Get the first result
-            result = results[0]
-            
-            # Process each detection
-            for i, (box, conf, cls) in enumerate(zip(result.boxes.xyxy, result.boxes.conf, result.boxes.cls)):
-                if conf >= self.confidence_threshold:
-                    # Extract bounding box coordinates
-                    x1, y1, x2, y2 = box.tolist()
-                    x1, y1, x2, y2 = map(int, [x1, y1, x2, y2])
-                    
-                    # Get class information
-                    class_id = int(cls.item())
-                    class_name = self.class_names[class_id] if class_id < len(self.class_names) else f"class_{class_id}"
-                    
-                    # Create detection record
-                    detection = {
-                        'id': f"detection_{len(self.detections) + i + 1}",
-                        'bbox': (x1, y1, x2, y2),
-                        'center': ((x1 + x2) // 2, (y1 + y2) // 2),
-                        'confidence': conf.item(),
-                        'class_id': class_id,
-                        'class_name': class_name,
-                        'timestamp': current_time.isoformat(),
-                        'frame_id': self.total_frames_processed
-                    }
-                    
-                    current_detections.append(detection)
-                    self.detections.append(detection)
-                    self.detection_counts[class_name] += 1
-                    
-                    # Create alert for shoplifting behaviors
-                    if class_name == 'shoplifting' and conf.item() >= self.confidence_threshold:
-                        # Check if we're in cooldown period
-                        if self.last_alert_time is None or \
-                           (current_time - self.last_alert_time).total_seconds() > self.alert_cooldown:
-                            alert = {
-                                'id': f"alert_{len(self.alerts) + 1}",
-                                'type': 'SHOPLIFTING_DETECTED',
-                                'confidence': conf.item(),
-                                'bbox': (x1, y1, x2, y2),
-                                'timestamp': current_time.isoformat(),
-                                'frame_id': self.total_frames_processed,
-                                'severity': 'HIGH' if conf.item() > 0.75 else 'MEDIUM'
-                            }
-                            self.alerts.append(alert)
-                            self.last_alert_time = current_time
-        
-        # Limit history to recent items only
-        if len(self.detections) > 1000:
-            self.detections = self.detections[-1000:]
-            
+        # One host copy of the boxes, filtered and named as arrays
+        detections = self.decoder(results)
+        class_names = detections.data['class_name']
+        
+        names, counts = np.unique(class_names.astype(str), return_counts=True)
+        for class_name, count in zip(names.tolist(), counts.tolist()):
+            self.detection_counts[class_name] = self.detection_counts.get(class_name, 0) + count
+        
+        # Create alert for shoplifting behaviors unless we're in the cooldown period
+        shoplifting = np.flatnonzero(class_names == 'shoplifting')
+        if shoplifting.size and (self.last_alert_time is None or
+                                 (current_time - self.last_alert_time).total_seconds() > self.alert_cooldown):
+            first = shoplifting[0]
+            confidence = float(detections.confidence[first])
+            alert = {
+                'id': f"alert_{len(self.alerts) + 1}",
+                'type': 'SHOPLIFTING_DETECTED',
+                'confidence': confidence,
+                'bbox': detections.xyxy[first].astype(int).tolist(),
+                'timestamp': current_time.isoformat(),
+                'frame_id': self.total_frames_processed,
+                'severity': 'HIGH' if confidence > 0.75 else 'MEDIUM'
+            }
+            self.alerts.append(alert)
+            self.last_alert_time = current_time
+        
+        self.detections.append(detections, current_time, self.total_frames_processed)
         self.total_frames_processed += 1
-        return current_detections
+        return detections
         
     def annotate_frame(self, frame, detections=None):
         """Annotate frame with detection results"""
@@ -119,11 +94,9 @@ class ShopliftingDetector:
         annotated_frame = frame.copy()
         
         # Draw detections
-        for detection in detections:
-            x1, y1, x2, y2 = detection['bbox']
-            class_name = detection['class_name']
-            confidence = detection['confidence']
-            
+        for (x1, y1, x2, y2), class_name, confidence in zip(
+                detections.xyxy.astype(int).tolist(), detections.data['class_name'].tolist(),
+                detections.confidence.tolist()):
             # Choose color based on class (red for shoplifting, green for normal)
             if class_name == 'shoplifting':
                 color = (0, 0, 255)  # Red for shoplifting
@@ -171,7 +144,7 @@ class ShopliftingDetector:
         """Get detection statistics"""
         return {
             'total_frames_processed': self.total_frames_processed,
-            'total_detections': len(self.detections),
+            'total_detections': self.detections.total,
             'detection_counts': self.detection_counts,
             'total_alerts': len(self.alerts),
             'recent_alerts': len(self.get_recent_alerts(max_age_seconds=300))  # Alerts in last 5 minutes
@@ -183,10 +156,10 @@ class ShopliftingDetector:
             data = {
                 'timestamp': datetime.datetime.now().isoformat(),
                 'statistics': self.get_statistics(),
-                'recent_detections': self.detections[-50:] if self.detections else [],
+                'recent_detections': self.detections.recent(50),
                 'alerts': self.get_recent_alerts(),
                 'class_distribution': {
-                    class_name: count / max(1, len(self.detections)) 
+                    class_name: count / max(1, self.detections.total) 
                     for class_name, count in self.detection_counts.items()
                 }
             }
@@ -196,7 +169,7 @@ class ShopliftingDetector:
             raise ValueError(f"Unsupported export format: {format}")
     
     def save_analytics(self, output_path=None):
-        """Save analytics data to file"""save_analytics
+        """Save analytics data to file"""
         if output_path is None:
             # Create default output directory if it doesn't exist
             os.makedirs('shoplifting_analytics', exist_ok=True)
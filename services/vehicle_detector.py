@@ -6,8 +6,10 @@ import os
 import json
 import time
 from datetime import datetime
-from collections import defaultdict, deque
+from collections import Counter, defaultdict, deque
 import sys
+from services.vehicle_geometry import VehicleGeometry
+from services.bounded_history import BoundedHistory
 
 class VehicleDetector:
     """
@@ -80,7 +82,7 @@ class VehicleDetector:
         self.vehicle_histories = defaultdict(lambda: deque(maxlen=30))  # Store history of vehicle positions
         
         # Analytics variables
-        self.detection_history = []
+        self.detection_history = BoundedHistory("vehicle_history")  # Older records spill to disk
         self.session_start_time = datetime.now()
         self.frame_count = 0
         self.total_detections = 0
@@ -89,7 +91,7 @@ class VehicleDetector:
         self.vehicle_counts = {vehicle_type: 0 for vehicle_type in self.VEHICLE_COLORS.keys()}
         
         # Time periods (store counts for every 5 minute interval)
-        self.time_period_stats = []
+        self.time_period_stats = BoundedHistory("vehicle_periods", max_items=288)
         self.current_period_start = self.session_start_time
         self.period_detections = {vehicle_type: 0 for vehicle_type in self.VEHICLE_COLORS.keys()}
         self.PERIOD_LENGTH_SECONDS = 300  # 5 minutes
@@ -100,6 +102,14 @@ class VehicleDetector:
         # Traffic counting
         self.counting_lines = []  # List of [[x1, y1], [x2, y2], "name"] lines
         self.line_counts = defaultdict(lambda: defaultdict(int))  # line_name -> vehicle_type -> count
+        
+        # Array-backed areas and lines, tested for all vehicles at once each frame
+        self.geometry = VehicleGeometry()
+        
+        # Running aggregates over active vehicles, updated per detection so statistics never rescan positions
+        self.active_type_counts = Counter()  # vehicle type -> active vehicles
+        self.speed_sums = defaultdict(float)  # vehicle type -> summed avg speed of active vehicles that moved
+        self.speed_counts = Counter()  # vehicle type -> active vehicles contributing to speed_sums
     
     def add_parking_area(self, x1, y1, x2, y2, name=None):
         """Add a parking area region to monitor"""
@@ -112,8 +122,39 @@ class VehicleDetector:
             "occupied": 0
         }
         self.parking_areas.append(area)
+        self.geometry.add_area(area_id, area["bbox"])
+        return area_id
+    
+    def add_parking_stall(self, polygon, name=None, min_overlap=0.3):
+        """Add a single polygon parking stall (e.g. an angled bay)"""
+        area_id = len(self.parking_areas)
+        polygon = [[float(x), float(y)] for x, y in polygon]
+        self.geometry.add_stall(area_id, polygon, min_overlap)
+        xs = [p[0] for p in polygon]
+        ys = [p[1] for p in polygon]
+        area = {
+            "id": area_id,
+            "name": name if name else f"Stall {area_id+1}",
+            "bbox": [int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))],
+            "polygon": polygon,
+            "min_overlap": min_overlap,
+            "capacity": 1,
+            "occupied": 0
+        }
+        self.parking_areas.append(area)
         return area_id
     
+    def load_parking_stalls(self, stalls):
+        """Bulk add stalls given as dicts with polygon and optional label/min_overlap"""
+        return [
+            self.add_parking_stall(
+                stall["polygon"],
+                stall.get("label") or stall.get("name"),
+                stall.get("min_overlap") or 0.3
+            )
+            for stall in stalls
+        ]
+    
     def add_counting_line(self, x1, y1, x2, y2, name=None):
         """Add a line for counting vehicles crossing it"""
         line_id = len(self.counting_lines)
@@ -125,6 +166,7 @@ class VehicleDetector:
             "total": 0
         }
         self.counting_lines.append(line)
+        self.geometry.add_line(line_id, line["points"][0], line["points"][1])
         return line_id
     
     def detect(self, frame):
@@ -181,13 +223,20 @@ class VehicleDetector:
                 
                 detection["size"] = width * height
                 detection["position"] = (center_x, center_y)
-                
-                # Check if in any parking area
-                detection["in_parking"] = self._check_in_parking_areas(detection)
+                detections.append(detection)
+            
+            # Locate all vehicles in the parking areas and stalls in one pass
+            area_ids = self.geometry.locate(
+                [d["position"] for d in detections],
+                [d["bbox"] for d in detections]
+            )
+            for detection, area_id in zip(detections, area_ids):
+                detection["in_parking"] = area_id
                 
                 # Update tracking
                 self._update_tracking(detection)
-                detections.append(detection)
+                
+                class_name = detection["class_name"]
                 
                 # Update vehicle count by type
                 if class_name in self.vehicle_counts:
@@ -221,20 +270,14 @@ class VehicleDetector:
             
         return detections
     
-    def _check_in_parking_areas(self, detection):
-        """Check if a vehicle is within any defined parking area"""
-        vehicle_bbox = detection["bbox"]
-        vehicle_center = detection["position"]
-        
-        for area in self.parking_areas:
-            area_bbox = area["bbox"]
-            
-            # Check if vehicle center is within parking area
-            if (area_bbox[0] <= vehicle_center[0] <= area_bbox[2] and 
-                area_bbox[1] <= vehicle_center[1] <= area_bbox[3]):
-                return area["id"]
-        
-        return None
+    def _set_vehicle_area(self, previous_area, area_id):
+        """Move a vehicle's contribution to the area occupancy counters"""
+        if previous_area == area_id:
+            return
+        if previous_area is not None:
+            self.parking_areas[previous_area]["occupied"] -= 1
+        if area_id is not None:
+            self.parking_areas[area_id]["occupied"] += 1
     
     def _update_tracking(self, detection):
         """Update vehicle tracking with new detection information"""
@@ -257,14 +300,34 @@ class VehicleDetector:
                 "sizes": [detection["size"]],
                 "confidences": [detection["confidence"]],
                 "in_parking_history": [detection["in_parking"]],
-                "crossed_lines": set()
+                "crossed_lines": set(),
+                "total_distance": 0.0,
+                "avg_speed": None,  # Set once the vehicle has moved between two detections
+                "parking_counts": Counter()  # parking area id -> detections in it
             }
             
             self.tracked_vehicles[tracking_id] = vehicle_data
+            self.active_type_counts[vehicle_data["class_name"]] += 1
+            self._set_vehicle_area(None, detection["in_parking"])
+            if detection["in_parking"] is not None:
+                vehicle_data["parking_counts"][detection["in_parking"]] += 1
         else:
             vehicle = self.tracked_vehicles[tracking_id]
+            self._set_vehicle_area(vehicle["in_parking_history"][-1], detection["in_parking"])
+            
+            # Extend the running distance by the last step only
+            prev_pos = vehicle["positions"][-1]
+            curr_pos = detection["position"]
+            vehicle["total_distance"] += float(np.hypot(curr_pos[0] - prev_pos[0], curr_pos[1] - prev_pos[1]))
+            
             vehicle["last_seen"] = self.frame_count
             vehicle["detection_count"] += 1
+            if detection["in_parking"] is not None:
+                vehicle["parking_counts"][detection["in_parking"]] += 1
+            
+            # Simple speed estimation (distance per frame)
+            detection_frames = vehicle["last_seen"] - vehicle["first_seen"] + 1
+            self._set_vehicle_speed(vehicle, vehicle["total_distance"] / detection_frames)
             vehicle["positions"].append(detection["position"])
             vehicle["sizes"].append(detection["size"])
             vehicle["confidences"].append(detection["confidence"])
@@ -284,12 +347,49 @@ class VehicleDetector:
             "in_parking": detection["in_parking"]
         })
     
+    def _set_vehicle_speed(self, vehicle, avg_speed):
+        """Replace a vehicle's contribution to the per-type speed sums (None removes it)"""
+        vehicle_type = vehicle["class_name"]
+        if vehicle["avg_speed"] is not None:
+            self.speed_sums[vehicle_type] -= vehicle["avg_speed"]
+            self.speed_counts[vehicle_type] -= 1
+        vehicle["avg_speed"] = avg_speed
+        if avg_speed is not None:
+            self.speed_sums[vehicle_type] += avg_speed
+            self.speed_counts[vehicle_type] += 1
+        if self.speed_counts[vehicle_type] <= 0:
+            # Drop accumulated rounding once no vehicle of this type contributes
+            del self.speed_counts[vehicle_type]
+            self.speed_sums.pop(vehicle_type, None)
+    
+    def _vehicle_summary(self, vehicle_id, vehicle):
+        """Per-vehicle record as stored in the detection history, built from the running totals"""
+        # Parked if in a parking area for the majority of detections, in the most frequent one
+        parking_frames = sum(vehicle["parking_counts"].values())
+        parked = parking_frames / vehicle["detection_count"] > 0.5
+        parking_area_id = max(vehicle["parking_counts"], key=vehicle["parking_counts"].get) if parked else None
+        
+        return {
+            "vehicle_id": vehicle_id,
+            "class_name": vehicle["class_name"],
+            "first_seen": vehicle["first_seen"],
+            "last_seen": vehicle["last_seen"],
+            "duration_frames": vehicle["last_seen"] - vehicle["first_seen"],
+            "total_distance": vehicle["total_distance"],
+            "avg_speed": vehicle["avg_speed"] or 0,
+            "parked": parked,
+            "parking_area_id": parking_area_id,
+            "crossed_lines": list(vehicle["crossed_lines"])
+        }
+    
     def _update_line_crossings(self, detections):
         """Update line crossing counts for vehicles"""
         if not self.counting_lines:
             return
             
-        # Process each vehicle
+        # Collect the last displacement of every vehicle seen this frame
+        vehicles = []
+        seen = set()
         for detection in detections:
             tracking_id = detection.get("tracking_id")
             
@@ -299,68 +399,47 @@ class VehicleDetector:
             vehicle = self.tracked_vehicles[tracking_id]
             
             # Need at least two positions to detect crossing
-            if len(vehicle["positions"]) < 2:
+            if len(vehicle["positions"]) < 2 or tracking_id in seen:
                 continue
-                
-            # Get current and previous positions
-            current_pos = vehicle["positions"][-1]
-            prev_pos = vehicle["positions"][-2]
-            
-            # Check for each counting line
-            for line in self.counting_lines:
-                # Skip if already counted for this line
-                if line["id"] in vehicle["crossed_lines"]:
-                    continue
-                    
-                # Check if vehicle crossed this line
-                line_points = line["points"]
-                if self._line_crossing_check(prev_pos, current_pos, line_points[0], line_points[1]):
-                    # Vehicle crossed the line!
-                    vehicle["crossed_lines"].add(line["id"])
-                    
-                    # Update counts
-                    vehicle_type = vehicle["class_name"]
-                    if vehicle_type in line["counts"]:
-                        line["counts"][vehicle_type] += 1
-                    else:
-                        line["counts"][vehicle_type] = 1
-                        
-                    line["total"] += 1
-    
-    def _line_crossing_check(self, p1, p2, line_p1, line_p2):
-        """
-        Check if line segment p1->p2 crosses line segment line_p1->line_p2
-        Using line segment intersection formula
-        """
-        # Convert to numpy arrays for easier calculation
-        p1 = np.array(p1)
-        p2 = np.array(p2)
-        line_p1 = np.array(line_p1)
-        line_p2 = np.array(line_p2)
+            seen.add(tracking_id)
+            vehicles.append(vehicle)
         
-        # Line segment intersection check
-        s1 = p2 - p1
-        s2 = line_p2 - line_p1
+        if not vehicles:
+            return
         
-        s = (-s1[1] * (p1[0] - line_p1[0]) + s1[0] * (p1[1] - line_p1[1])) / (-s2[0] * s1[1] + s1[0] * s2[1])
-        t = ( s2[0] * (p1[1] - line_p1[1]) - s2[1] * (p1[0] - line_p1[0])) / (-s2[0] * s1[1] + s1[0] * s2[1])
+        # All vehicles against all lines in one pass
+        crossed = self.geometry.crossings(
+            [vehicle["positions"][-2] for vehicle in vehicles],
+            [vehicle["positions"][-1] for vehicle in vehicles]
+        )
         
-        return (s >= 0 and s <= 1 and t >= 0 and t <= 1)
+        for vehicle_index, line_index in zip(*np.nonzero(crossed)):
+            vehicle = vehicles[vehicle_index]
+            line = self.counting_lines[int(self.geometry.line_ids[line_index])]
+            
+            # Skip if already counted for this line
+            if line["id"] in vehicle["crossed_lines"]:
+                continue
+            
+            # Vehicle crossed the line!
+            vehicle["crossed_lines"].add(line["id"])
+            
+            # Update counts
+            vehicle_type = vehicle["class_name"]
+            if vehicle_type in line["counts"]:
+                line["counts"][vehicle_type] += 1
+            else:
+                line["counts"][vehicle_type] = 1
+                
+            line["total"] += 1
     
     def _get_parking_occupancy(self):
         """Get the current occupancy status of all parking areas"""
         parking_status = []
         
         for area in self.parking_areas:
-            # Count vehicles in this parking area
-            occupied = 0
-            for vehicle in self.tracked_vehicles.values():
-                # Check if vehicle's latest position is in this parking area
-                if vehicle["in_parking_history"] and vehicle["in_parking_history"][-1] == area["id"]:
-                    occupied += 1
-            
-            # Update area's occupied count
-            area["occupied"] = occupied
+            # Maintained incrementally as vehicles move between areas
+            occupied = area["occupied"]
             
             # Add status to result
             parking_status.append({
@@ -383,60 +462,17 @@ class VehicleDetector:
         for vehicle_id in to_remove:
             # Log data before removing
             vehicle = self.tracked_vehicles[vehicle_id]
+            self.detection_history.append(self._vehicle_summary(vehicle_id, vehicle))
             
-            # Calculate movement stats
-            total_distance = 0
-            avg_speed = 0
-            
-            if len(vehicle["positions"]) >= 2:
-                for i in range(1, len(vehicle["positions"])):
-                    prev_pos = vehicle["positions"][i-1]
-                    curr_pos = vehicle["positions"][i]
-                    distance = np.sqrt((curr_pos[0] - prev_pos[0])**2 + (curr_pos[1] - prev_pos[1])**2)
-                    total_distance += distance
-                
-                # Simple speed estimation (distance per frame)
-                detection_frames = vehicle["last_seen"] - vehicle["first_seen"] + 1
-                avg_speed = total_distance / detection_frames if detection_frames > 0 else 0
-            
-            # Determine parking status
-            parked = False
-            parking_area_id = None
-            
-            # If in parking for majority of detections
-            parking_history = vehicle["in_parking_history"]
-            if parking_history and any(p is not None for p in parking_history):
-                # Count frames in parking
-                parking_frames = sum(1 for p in parking_history if p is not None)
-                parking_ratio = parking_frames / len(parking_history)
-                
-                if parking_ratio > 0.5:  # If in parking more than 50% of the time
-                    parked = True
-                    # Get most frequent parking area
-                    parking_counts = {}
-                    for p in parking_history:
-                        if p is not None:
-                            parking_counts[p] = parking_counts.get(p, 0) + 1
-                    
-                    # Find most common parking area
-                    if parking_counts:
-                        parking_area_id = max(parking_counts, key=parking_counts.get)
-            
-            vehicle_data = {
-                "vehicle_id": vehicle_id,
-                "class_name": vehicle["class_name"],
-                "first_seen": vehicle["first_seen"],
-                "last_seen": vehicle["last_seen"],
-                "duration_frames": vehicle["last_seen"] - vehicle["first_seen"],
-                "total_distance": total_distance,
-                "avg_speed": avg_speed,
-                "parked": parked,
-                "parking_area_id": parking_area_id,
-                "crossed_lines": list(vehicle["crossed_lines"])
-            }
-            self.detection_history.append(vehicle_data)
+            # Take the vehicle out of the running aggregates
+            self._set_vehicle_speed(vehicle, None)
+            self.active_type_counts[vehicle["class_name"]] -= 1
+            if self.active_type_counts[vehicle["class_name"]] <= 0:
+                del self.active_type_counts[vehicle["class_name"]]
             
             # Remove tracking data
+            parking_history = vehicle["in_parking_history"]
+            self._set_vehicle_area(parking_history[-1] if parking_history else None, None)
             del self.tracked_vehicles[vehicle_id]
             if vehicle_id in self.vehicle_histories:
                 del self.vehicle_histories[vehicle_id]
@@ -478,8 +514,11 @@ class VehicleDetector:
                 else:
                     color = (128, 128, 128)  # Gray for undefined capacity
                 
-                # Draw area rectangle
-                cv2.rectangle(annotated, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
+                # Draw area outline
+                if "polygon" in area:
+                    cv2.polylines(annotated, [np.array(area["polygon"], dtype=np.int32)], True, color, 2)
+                else:
+                    cv2.rectangle(annotated, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
                 
                 # Draw label with occupancy
                 label = f"{area['name']}: {area['occupied']}"
@@ -608,10 +647,7 @@ class VehicleDetector:
         total_vehicles = total_active_vehicles + historical_vehicles
         
         # Count vehicles by type
-        vehicle_type_counts = defaultdict(int)
-        for vehicle in self.tracked_vehicles.values():
-            vehicle_type = vehicle["class_name"]
-            vehicle_type_counts[vehicle_type] += 1
+        vehicle_type_counts = dict(self.active_type_counts)
         
         # Calculate vehicle type distribution
         vehicle_distribution = {}
@@ -633,38 +669,11 @@ class VehicleDetector:
             }
             line_stats.append(line_data)
         
-        # Calculate speed statistics
-        avg_speeds = {}
-        speed_distributions = {}
-        
-        # Process tracked vehicles
-        for vehicle in self.tracked_vehicles.values():
-            if len(vehicle["positions"]) >= 2:
-                # Calculate total distance and speed
-                total_distance = 0
-                for i in range(1, len(vehicle["positions"])):
-                    prev_pos = vehicle["positions"][i-1]
-                    curr_pos = vehicle["positions"][i]
-                    distance = np.sqrt((curr_pos[0] - prev_pos[0])**2 + (curr_pos[1] - prev_pos[1])**2)
-                    total_distance += distance
-                
-                # Simple speed estimation (distance per frame)
-                detection_frames = vehicle["last_seen"] - vehicle["first_seen"] + 1
-                avg_speed = total_distance / detection_frames if detection_frames > 0 else 0
-                
-                # Update average speed for this vehicle type
-                vehicle_type = vehicle["class_name"]
-                if vehicle_type not in avg_speeds:
-                    avg_speeds[vehicle_type] = []
-                avg_speeds[vehicle_type].append(avg_speed)
-        
-        # Calculate average speeds by vehicle type
-        avg_speed_by_type = {}
-        for vehicle_type, speeds in avg_speeds.items():
-            if speeds:
-                avg_speed_by_type[vehicle_type] = sum(speeds) / len(speeds)
-            else:
-                avg_speed_by_type[vehicle_type] = 0
+        # Average speed of the active vehicles that moved, by vehicle type
+        avg_speed_by_type = {
+            vehicle_type: self.speed_sums[vehicle_type] / count
+            for vehicle_type, count in self.speed_counts.items()
+        }
         
         # Generate statistics object
         stats = {
@@ -686,7 +695,7 @@ class VehicleDetector:
                 "total_vehicles": total_vehicles,
                 "historical_vehicles": historical_vehicles
             },
-            "time_period_stats": self.time_period_stats
+            "time_period_stats": self.time_period_stats.recent()
         }
         
         return stats
@@ -698,62 +707,12 @@ class VehicleDetector:
         # Add vehicle tracking data
         all_vehicle_data = []
         
-        # Add historical vehicles
-        all_vehicle_data.extend(self.detection_history)
+        # Add recent historical vehicles; older ones stay spilled on disk
+        all_vehicle_data.extend(self.detection_history.recent())
         
         # Add current active vehicles
         for vehicle_id, vehicle in self.tracked_vehicles.items():
-            # Calculate movement stats
-            total_distance = 0
-            avg_speed = 0
-            
-            if len(vehicle["positions"]) >= 2:
-                for i in range(1, len(vehicle["positions"])):
-                    prev_pos = vehicle["positions"][i-1]
-                    curr_pos = vehicle["positions"][i]
-                    distance = np.sqrt((curr_pos[0] - prev_pos[0])**2 + (curr_pos[1] - prev_pos[1])**2)
-                    total_distance += distance
-                
-                # Simple speed estimation
-                detection_frames = vehicle["last_seen"] - vehicle["first_seen"] + 1
-                avg_speed = total_distance / detection_frames if detection_frames > 0 else 0
-            
-            # Determine parking status
-            parked = False
-            parking_area_id = None
-            
-            # If in parking for majority of detections
-            parking_history = vehicle["in_parking_history"]
-            if parking_history and any(p is not None for p in parking_history):
-                # Count frames in parking
-                parking_frames = sum(1 for p in parking_history if p is not None)
-                parking_ratio = parking_frames / len(parking_history)
-                
-                if parking_ratio > 0.5:  # If in parking more than 50% of the time
-                    parked = True
-                    # Get most frequent parking area
-                    parking_counts = {}
-                    for p in parking_history:
-                        if p is not None:
-                            parking_counts[p] = parking_counts.get(p, 0) + 1
-                    
-                    # Find most common parking area
-                    if parking_counts:
-                        parking_area_id = max(parking_counts, key=parking_counts.get)
-            
-            vehicle_data = {
-                "vehicle_id": vehicle_id,
-                "class_name": vehicle["class_name"],
-                "first_seen": vehicle["first_seen"],
-                "last_seen": vehicle["last_seen"],
-                "duration_frames": vehicle["last_seen"] - vehicle["first_seen"],
-                "total_distance": total_distance,
-                "avg_speed": avg_speed,
-                "parked": parked,
-                "parking_area_id": parking_area_id,
-                "crossed_lines": list(vehicle["crossed_lines"])
-            }
-            all_vehicle_data.append(vehicle_data)
+            all_vehicle_data.append(self._vehicle_summary(vehicle_id, vehicle))
         
         stats["vehicle_details"] = all_vehicle_data
         
@@ -788,6 +747,9 @@ class VehicleDetector:
         
         # Estimate capacity for each parking area
         for area in self.parking_areas:
+            if "polygon" in area:
+                continue  # Stalls hold exactly one vehicle
+            
             bbox = area["bbox"]
             area_width = bbox[2] - bbox[0]
             area_height = bbox[3] - bbox[1]
@@ -0,0 +1,152 @@
+import numpy as np
+from collections import defaultdict
+from scipy.optimize import linear_sum_assignment
+
+from utils.geometry import clip_polygon_to_box, points_in_boxes, polygon_area, segments_intersect
+
+
+class SpatialGridIndex:
+    """Uniform grid over item bounding boxes.
+
+    Items are registered in every cell their box touches, so a query only
+    visits the cells under the query box and its cost does not depend on how
+    many items the index holds.
+    """
+
+    def __init__(self, cell_size=64.0):
+        self.cell_size = float(cell_size)
+        self.cells = defaultdict(list)
+
+    def _cell_range(self, bbox):
+        x1, y1, x2, y2 = bbox
+        return (
+            range(int(np.floor(x1 / self.cell_size)), int(np.floor(x2 / self.cell_size)) + 1),
+            range(int(np.floor(y1 / self.cell_size)), int(np.floor(y2 / self.cell_size)) + 1)
+        )
+
+    def insert(self, item, bbox):
+        cols, rows = self._cell_range(bbox)
+        for col in cols:
+            for row in rows:
+                self.cells[(col, row)].append(item)
+
+    def query(self, bbox):
+        """Items whose boxes share a cell with `bbox` (a superset of the overlapping ones)"""
+        cols, rows = self._cell_range(bbox)
+        found = set()
+        for col in cols:
+            for row in rows:
+                found.update(self.cells.get((col, row), ()))
+        return found
+
+    def clear(self):
+        self.cells.clear()
+
+
+class VehicleGeometry:
+    """Parking areas, stalls and counting lines kept ready for per-frame batch tests.
+
+    Every frame the detector asks two questions: which area each vehicle
+    centre is in, and which lines each vehicle's last displacement crossed.
+    Both are answered for all vehicles at once instead of pair by pair.
+    """
+
+    # Cost of vehicle/stall pairs below the stall's minimum overlap
+    UNASSIGNABLE_COST = 1e6
+
+    def __init__(self, stall_cell_size=64.0):
+        self.area_ids = np.empty(0, dtype=np.int64)
+        self.area_boxes = np.empty((0, 4), dtype=np.float64)
+        self.line_ids = np.empty(0, dtype=np.int64)
+        self.line_starts = np.empty((0, 2), dtype=np.float64)
+        self.line_ends = np.empty((0, 2), dtype=np.float64)
+
+        # Polygon stalls, looked up through the grid index by vehicle box
+        self.stalls = {}  # area_id -> (polygon, stall area, min overlap, bbox)
+        self.stall_index = SpatialGridIndex(stall_cell_size)
+
+    def add_area(self, area_id, bbox):
+        self.area_ids = np.append(self.area_ids, area_id)
+        self.area_boxes = np.vstack([self.area_boxes, np.asarray(bbox, dtype=np.float64).reshape(1, 4)])
+
+    def add_stall(self, area_id, polygon, min_overlap=0.3):
+        """Add a polygon stall; it is occupied by a vehicle box covering `min_overlap` of it"""
+        polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        area = polygon_area(polygon)
+        if area <= 0:
+            raise ValueError("Parking stall polygon must have at least 3 points and a non-zero area")
+        bbox = (*polygon.min(axis=0).tolist(), *polygon.max(axis=0).tolist())
+        self.stalls[area_id] = (polygon, area, min_overlap, bbox)
+        self.stall_index.insert(area_id, bbox)
+
+    def stall_overlaps(self, box):
+        """Overlap ratio (intersection / stall area) of a vehicle box with every nearby stall"""
+        overlaps = {}
+        for area_id in self.stall_index.query(box):
+            polygon, area, _, (x1, y1, x2, y2) = self.stalls[area_id]
+            if x1 >= box[2] or x2 <= box[0] or y1 >= box[3] or y2 <= box[1]:
+                continue
+            if x1 >= box[0] and y1 >= box[1] and x2 <= box[2] and y2 <= box[3]:
+                overlaps[area_id] = 1.0  # Stall entirely under the vehicle box
+                continue
+            clipped = clip_polygon_to_box(polygon, box)
+            if len(clipped) >= 3:
+                overlaps[area_id] = polygon_area(clipped) / area
+        return overlaps
+
+    def add_line(self, line_id, start, end):
+        self.line_ids = np.append(self.line_ids, line_id)
+        self.line_starts = np.vstack([self.line_starts, np.asarray(start, dtype=np.float64).reshape(1, 2)])
+        self.line_ends = np.vstack([self.line_ends, np.asarray(end, dtype=np.float64).reshape(1, 2)])
+
+    def locate(self, points, boxes=None):
+        """Get the area id of each vehicle, or None.
+
+        A vehicle is in the first rectangular area containing its centre,
+        unless it is assigned a polygon stall its box covers enough. Stalls
+        are assigned one-to-one (Hungarian matching on overlap), so two
+        vehicles over the same stall don't both occupy it.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(points) == 0 or len(self.area_ids) == 0:
+            located = [None] * len(points)
+        else:
+            inside = points_in_boxes(points, self.area_boxes)
+            first = np.argmax(inside, axis=1)
+            hit = inside[np.arange(len(points)), first]
+            located = [int(self.area_ids[i]) if h else None for i, h in zip(first.tolist(), hit.tolist())]
+
+        if self.stalls and boxes is not None:
+            for i, area_id in self.assign_stalls(boxes).items():
+                located[i] = area_id
+        return located
+
+    def assign_stalls(self, boxes):
+        """Map vehicle index -> stall id, each stall going to at most one vehicle"""
+        eligible = {}
+        for i, box in enumerate(boxes):
+            for area_id, overlap in self.stall_overlaps(box).items():
+                if overlap >= self.stalls[area_id][2]:
+                    eligible[(i, area_id)] = overlap
+        if not eligible:
+            return {}
+
+        vehicles = sorted({i for i, _ in eligible})
+        stall_ids = sorted({area_id for _, area_id in eligible})
+        cost = np.full((len(vehicles), len(stall_ids)), self.UNASSIGNABLE_COST)
+        rows = {i: r for r, i in enumerate(vehicles)}
+        cols = {area_id: c for c, area_id in enumerate(stall_ids)}
+        for (i, area_id), overlap in eligible.items():
+            cost[rows[i], cols[area_id]] = -overlap
+        assigned_rows, assigned_cols = linear_sum_assignment(cost)
+        return {
+            vehicles[r]: stall_ids[c]
+            for r, c in zip(assigned_rows.tolist(), assigned_cols.tolist())
+            if cost[r, c] < self.UNASSIGNABLE_COST
+        }
+
+    def crossings(self, starts, ends):
+        """N x M mask of displacement segments crossing each counting line"""
+        if len(self.line_ids) == 0:
+            return np.zeros((len(starts), 0), dtype=bool)
+        return segments_intersect(starts, ends, self.line_starts, self.line_ends)
@@ -0,0 +1,265 @@
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _Call:
+    """Queue entry for work that is not a plain insert, see WriteBehindQueue.enqueue_call"""
+
+    def __init__(self, fn):
+        self.fn = fn
+
+
+class WriteBehindQueue:
+    """Bounded in-memory queue of rows written to the database in batches by a background thread.
+
+    Producers enqueue plain column mappings for a model and return at once.
+    The worker groups rows by model and writes each group with
+    `bulk_insert_mappings` (one executemany per table). A batch is flushed
+    when it reaches `batch_size` rows or `flush_interval` seconds after its
+    first row. When the queue is full, `enqueue` blocks for up to
+    `block_timeout` seconds and then raises `queue.Full`, so producers feel
+    back-pressure instead of growing memory. Batches that still fail after
+    `max_retries` are split until the failing rows are isolated, and those
+    rows are appended to a JSONL dead-letter file rather than lost; when the
+    database itself is unreachable the whole batch is dead-lettered.
+    Callbacks registered with `after_insert` run in the same transaction as
+    the insert, e.g. to keep rollup tables in step with the raw rows.
+    Writes that are not inserts, such as merging into an aggregate row, are
+    queued with `enqueue_call` and each run in a transaction of their own.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_size=100000,
+        batch_size=5000,
+        flush_interval=1.0,
+        block_timeout=5.0,
+        max_retries=3,
+        dead_letter_path=None
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path or os.environ.get(
+            "WRITE_BEHIND_DEAD_LETTER", os.path.join("logs", "write_behind_failed.jsonl")
+        )
+
+        self._queue = queue.Queue(maxsize=max_size)
+        self._after_insert = defaultdict(list)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the worker thread (idempotent)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def after_insert(self, model, callback):
+        """Call `callback(db, mappings)` after each batch of `model` rows is inserted"""
+        self._after_insert[model].append(callback)
+
+    def enqueue(self, model, mapping):
+        """Queue one row, given as a dict of column values, for insertion into `model`'s table"""
+        self.start()
+        self._queue.put((model, mapping), timeout=self.block_timeout)
+        self.enqueued += 1
+
+    def enqueue_many(self, model, mappings):
+        count = 0
+        for mapping in mappings:
+            self.enqueue(model, mapping)
+            count += 1
+        return count
+
+    def enqueue_call(self, fn, payload):
+        """Queue `fn(db, payload)` for the worker; it commits on its own, so a failure only dead-letters that call"""
+        self.start()
+        self._queue.put((_Call(fn), payload), timeout=self.block_timeout)
+        self.enqueued += 1
+
+    def flush(self, timeout=None):
+        """Block until every row queued before this call has been written (or dead-lettered)"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put((None, done))
+        return done.wait(timeout)
+
+    def stop(self, timeout=30.0):
+        """Write everything still queued and stop the worker; called on shutdown"""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put((_STOP, None))
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.error("Write-behind worker did not finish within %.1fs, %d rows pending", timeout, self._queue.qsize())
+
+    def stats(self):
+        return {
+            "pending": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed
+        }
+
+    def _run(self):
+        batch = []
+        waiters = []
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                model, mapping = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                model = None
+                mapping = None
+
+            if model is _STOP:
+                stopping = True
+            elif model is None and mapping is not None:
+                waiters.append(mapping)  # flush() marker
+            elif model is not None:
+                batch.append((model, mapping))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            # Drain what is already queued without waiting, up to one batch
+            while len(batch) < self.batch_size and not stopping:
+                try:
+                    model, mapping = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if model is _STOP:
+                    stopping = True
+                elif model is None:
+                    waiters.append(mapping)
+                else:
+                    batch.append((model, mapping))
+
+            due = deadline is not None and time.monotonic() >= deadline
+            if batch and (len(batch) >= self.batch_size or due or waiters or stopping):
+                self._write(batch)
+                batch = []
+                deadline = None
+            if not batch:
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+
+    def _write(self, batch):
+        """Insert a batch, one executemany per table, then run the queued calls"""
+        groups = defaultdict(list)
+        calls = []
+        for model, mapping in batch:
+            if isinstance(model, _Call):
+                calls.append((model.fn, mapping))
+            else:
+                groups[model].append(mapping)
+
+        if groups:
+            self._write_rows([(model, mapping) for model, mappings in groups.items() for mapping in mappings])
+
+        for fn, payload in calls:
+            if self._commit(lambda db: fn(db, payload), f"call {fn.__qualname__}") is None:
+                self.written += 1
+            else:
+                self.failed += 1
+                self._dead_letter([{"call": f"{fn.__module__}.{fn.__qualname__}", "payload": payload}])
+
+    def _write_rows(self, rows, attempts=None):
+        """Insert (model, mapping) rows in one transaction.
+
+        When the rows themselves are at fault (a constraint violation, a bad
+        value) the batch is bisected and each half written on its own, so
+        only the offending rows end up in the dead-letter file. Rows arrive
+        grouped by model, so the first splits separate the tables.
+        """
+        groups = defaultdict(list)
+        for model, mapping in rows:
+            groups[model].append(mapping)
+        error = self._commit(lambda db: self._insert(db, groups), f"batch of {len(rows)} rows", attempts)
+        if error is None:
+            self.written += len(rows)
+        elif len(rows) > 1 and not isinstance(error, (OperationalError, InterfaceError)):
+            # The full batch already had its retries; the halves get one attempt each
+            middle = len(rows) // 2
+            self._write_rows(rows[:middle], attempts=1)
+            self._write_rows(rows[middle:], attempts=1)
+        else:
+            self.failed += len(rows)
+            self._dead_letter([{"table": model.__tablename__, "row": mapping} for model, mapping in rows])
+
+    def _insert(self, db, groups):
+        for model, mappings in groups.items():
+            db.bulk_insert_mappings(model, mappings)
+            for callback in self._after_insert.get(model, ()):
+                callback(db, mappings)
+
+    def _commit(self, work, description, attempts=None):
+        """Run `work(db)` and commit, retrying up to `attempts` (default max_retries) times; returns
+        None on success, else the last error"""
+        attempts = attempts or self.max_retries
+        for attempt in range(1, attempts + 1):
+            db = self.session_factory()
+            try:
+                work(db)
+                db.commit()
+                return None
+            except Exception as e:
+                db.rollback()
+                logger.exception("Write-behind %s failed (attempt %d/%d)", description, attempt, attempts)
+                if attempt == attempts:
+                    return e
+                time.sleep(min(0.1 * 2 ** attempt, 2.0))
+            finally:
+                db.close()
+
+    def _dead_letter(self, entries):
+        try:
+            directory = os.path.dirname(self.dead_letter_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.dead_letter_path, "a") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, default=_json_default) + "\n")
+        except Exception:
+            logger.exception("Could not write %d failed entries to %s", len(entries), self.dead_letter_path)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+# Process-wide queue shared by the processors and the ingest routes
+write_queue = WriteBehindQueue()
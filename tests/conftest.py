@@ -0,0 +1,5 @@
+import os
+
+# config.Settings reads these at import time; tests that need a database bind their own engine
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("API_KEY", "test")
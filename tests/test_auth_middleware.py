@@ -0,0 +1,76 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401
+from database import get_async_db, get_db
+from models.business import Business
+from utils.auth_middleware import verify_business_auth, verify_business_auth_async
+
+HEADERS = {"X-VT-Platform-ID": "platform", "X-VT-API-Key": "key", "X-VT-Business-ID": "b1"}
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "auth.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Business.__table__.create(engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add(Business(id="b1", name="Shop", vt_platform_id="platform", api_key="key"))
+        db.commit()
+    yield path
+    engine.dispose()
+
+
+@pytest.fixture
+def client(database):
+    engine = create_engine(f"sqlite:///{database}", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{database}")
+    Session = sessionmaker(bind=engine)
+    AsyncSession = async_sessionmaker(async_engine)
+    opened = []
+
+    def override_get_db():
+        with Session() as db:
+            opened.append(db)
+            yield db
+
+    async def override_get_async_db():
+        async with AsyncSession() as db:
+            opened.append(db)
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    def sync_route(db=Depends(get_db), business=Depends(verify_business_auth)):
+        return {"business": business.id, "shared": opened == [db]}
+
+    @app.get("/async")
+    async def async_route(db=Depends(get_async_db), business=Depends(verify_business_auth_async)):
+        return {"business": business.id, "shared": opened == [db]}
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    with TestClient(app) as client:
+        client.opened = opened
+        yield client
+    engine.dispose()
+
+
+@pytest.mark.parametrize("path", ["/sync", "/async"])
+def test_auth_shares_the_route_session(client, path):
+    response = client.get(path, headers=HEADERS)
+
+    assert response.status_code == 200
+    assert response.json() == {"business": "b1", "shared": True}
+
+
+@pytest.mark.parametrize("path", ["/sync", "/async"])
+def test_auth_rejects_wrong_key(client, path):
+    response = client.get(path, headers={**HEADERS, "X-VT-API-Key": "wrong"})
+
+    assert response.status_code == 401
@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401
+from database import get_db
+from models.exit_log import ExitLog
+from schemas.exit_log import ExitLogCreate
+from services.batch_ingest import MalformedBody, ingest, iter_records
+
+RECORDS = [{"camera_id": "c", "timestamp": f"2024-01-01T00:00:0{i}", "person_id": f"p{i}"} for i in range(5)]
+
+
+def read(body, chunk_size):
+    async def chunks():
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    async def collect():
+        return [item async for item in iter_records(chunks())]
+
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 10000])
+@pytest.mark.parametrize("body", [
+    json.dumps(RECORDS).encode(),
+    b"  \n" + json.dumps(RECORDS, indent=2).encode() + b"\n",
+    "\n".join(json.dumps(record) for record in RECORDS).encode(),
+    ("\r\n".join(json.dumps(record) for record in RECORDS) + "\r\n").encode(),
+])
+def test_records_survive_any_chunking(body, chunk_size):
+    assert read(body, chunk_size) == list(enumerate(RECORDS))
+
+
+def test_multibyte_characters_split_across_chunks():
+    body = json.dumps([{"name": "café ☕"}], ensure_ascii=False).encode()
+    assert read(body, 1) == [(0, {"name": "café ☕"})]
+
+
+def test_numbers_split_across_chunks():
+    assert read(b"[12345, 6]", 3) == [(0, 12345), (1, 6)]
+
+
+def test_bad_ndjson_line_is_reported_in_place():
+    records = read(b'{"a": 1}\n{broken\n{"a": 2}\n', 4)
+    assert [index for index, _ in records] == [0, 1, 2]
+    assert isinstance(records[1][1], json.JSONDecodeError)
+
+
+@pytest.mark.parametrize("body", [
+    b'[{"a": 1}, {"a": 2}', b'[{"a": 1}] trailing', b'[{"a": 1}, {broken}]',
+    b'{"name": "caf\xe9"}\n',  # Latin-1, not UTF-8
+    b'{"name": "caf\xc3',  # Truncated multibyte sequence
+])
+def test_broken_arrays_raise(body):
+    with pytest.raises(MalformedBody):
+        read(body, 5)
+
+
+@pytest.fixture
+def client(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}", connect_args={"check_same_thread": False})
+    ExitLog.__table__.create(engine)
+    Session = sessionmaker(bind=engine)
+
+    def override_get_db():
+        with Session() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.post("/batch")
+    async def batch(request: Request, db=Depends(get_db)):
+        def check(item):
+            if item.person_id == "banned":
+                raise ValueError("banned person")
+        return await ingest(request, db, ExitLog, ExitLogCreate, check=check, chunk_size=2, max_errors=1)
+
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as client:
+        client.Session = Session
+        yield client
+    engine.dispose()
+
+
+def test_ingest_inserts_valid_records_and_reports_the_rest(client):
+    body = RECORDS[:3] + [{"camera_id": "c"}, {**RECORDS[0], "person_id": "banned"}, "not an object"]
+
+    response = client.post("/batch", content=json.dumps(body))
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["received"], result["inserted"], result["rejected"]) == (6, 3, 3)
+    assert [error["index"] for error in result["errors"]] == [3]
+    assert result["errors_truncated"]
+    with client.Session() as db:
+        assert sorted(row.person_id for row in db.query(ExitLog)) == ["p0", "p1", "p2"]
+
+
+def test_malformed_body_stores_nothing(client):
+    body = json.dumps(RECORDS)[:-1]  # Missing the closing bracket, after two chunks were inserted
+
+    response = client.post("/batch", content=body)
+
+    assert response.status_code == 400
+    with client.Session() as db:
+        assert db.query(ExitLog).count() == 0
+
+
+def test_non_utf8_body_is_rejected(client):
+    body = "\n".join(json.dumps(record) for record in RECORDS[:3]).encode() + '\n{"person_id": "café"}'.encode("latin-1")
+
+    response = client.post("/batch", content=body)
+
+    assert response.status_code == 400
+    assert "UTF-8" in response.json()["detail"]
+    with client.Session() as db:
+        assert db.query(ExitLog).count() == 0
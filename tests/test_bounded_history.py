@@ -0,0 +1,91 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from services import bounded_history
+from services.bounded_history import BoundedHistory
+
+T0 = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = BoundedHistory("test", max_items=4, spill_dir=str(tmp_path), segment_items=5, spill_batch=2)
+    for i in range(20):
+        history.append({"i": i}, timestamp=T0 + timedelta(minutes=i))
+    yield history
+    history.close()
+
+
+def test_older_items_spill_and_stay_countable(history):
+    assert len(history) == 20
+    assert history.spilled == 14
+    assert len(os.listdir(history.spill_dir)) == 3  # Five items per segment
+    assert [item["i"] for item in history] == list(range(20))
+
+
+def test_query_reads_only_the_window(history, monkeypatch):
+    opened = []
+    read = BoundedHistory._read_segment
+    monkeypatch.setattr(BoundedHistory, "_read_segment", lambda self, segment, *args: opened.append(segment["path"]) or read(self, segment, *args))
+
+    items = history.query(T0 + timedelta(minutes=6), T0 + timedelta(minutes=17))
+
+    assert [item["i"] for item in items] == list(range(6, 17))
+    assert len(opened) == 2  # Segments 5-9 and 10-13; 0-4 is skipped
+    assert history.query(T0 + timedelta(hours=1)) == []
+
+
+def test_recent_returns_the_newest_in_memory_items(history):
+    assert [item["i"] for item in history.recent(3)] == [17, 18, 19]
+    assert [item["i"] for item in history.recent()] == list(range(14, 20))
+    assert history.recent(100) == history.recent()
+
+
+def test_extend_and_spilled_values_round_trip_as_json(tmp_path):
+    history = BoundedHistory("json", max_items=1, spill_dir=str(tmp_path), spill_batch=1)
+    history.extend([(np.float32(1.5), T0, {"a"}), (np.arange(2), None, None), ("last", None, None)], timestamp=T0)
+
+    assert history.query() == [[1.5, T0.isoformat(), ["a"]], [[0, 1], None, None], ("last", None, None)]
+    history.close()
+
+
+def test_clear_drops_everything(history):
+    spill_dir = history.spill_dir
+    history.clear()
+
+    assert len(history) == 0 and not history
+    assert not os.path.exists(spill_dir)
+    history.append({"i": 0})
+    assert [item["i"] for item in history] == [0]
+
+
+def test_close_and_collection_remove_the_spill_directory(tmp_path):
+    closed = BoundedHistory("gone", max_items=1, spill_dir=str(tmp_path), spill_batch=1)
+    collected = BoundedHistory("gone", max_items=1, spill_dir=str(tmp_path), spill_batch=1)
+    for history in (closed, collected):
+        history.extend(range(5))
+        assert os.path.isdir(history.spill_dir)
+
+    closed.close()
+    spill_dir = collected.spill_dir
+    del history, collected
+
+    assert not os.path.exists(closed.spill_dir)
+    assert not os.path.exists(spill_dir)
+    assert os.listdir(tmp_path / "gone") == []
+
+
+def test_startup_sweeps_directories_of_dead_processes(tmp_path, monkeypatch):
+    name_dir = tmp_path / "swept"
+    for entry in ("111-0", "222-3", f"{os.getpid()}-999", "notes"):
+        (name_dir / entry).mkdir(parents=True)
+    monkeypatch.setattr(bounded_history.psutil, "pid_exists", lambda pid: pid == 222)
+
+    history = BoundedHistory("swept", spill_dir=str(tmp_path))
+
+    # Dead pid and an unclaimed directory with our own (reused) pid go; a live process and foreign entries stay
+    assert sorted(os.listdir(name_dir)) == ["222-3", "notes"]
+    history.close()
@@ -0,0 +1,119 @@
+import datetime
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import services.checkout_monitoring as checkout_monitoring
+
+T0 = datetime.datetime(2024, 1, 1, 12, 0)
+
+
+class FakeBoxes:
+    def __init__(self, rows):
+        self.data = np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class FakeYOLO:
+    """Detects the counters in `rows` as (x1, y1, x2, y2, conf, cls) on every frame"""
+
+    def __init__(self, model_path):
+        self.rows = []
+
+    def __call__(self, frame, conf=None):
+        return [SimpleNamespace(boxes=FakeBoxes(self.rows))]
+
+
+COUNTER = [100, 100, 200, 150, 0.9, 0]  # Queue area: x 0-200, y 100-250
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [T0]
+
+    class FakeDatetime(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now[0]
+
+    monkeypatch.setattr(checkout_monitoring, "datetime", SimpleNamespace(datetime=FakeDatetime))
+    return now
+
+
+@pytest.fixture
+def service(monkeypatch, clock):
+    monkeypatch.setattr(checkout_monitoring, "YOLO", FakeYOLO)
+    service = checkout_monitoring.CheckoutMonitoringService(model_path="fake.pt", visit_timeout=2.0, queue_history_size=3)
+    service.model.rows = [COUNTER]
+    service.detect_checkout_counters(np.zeros((300, 300, 3), dtype=np.uint8))
+    return service
+
+
+def people(*boxes, ids=None):
+    return SimpleNamespace(
+        xyxy=np.array(boxes, dtype=np.float32).reshape(-1, 4),
+        tracker_id=None if ids is None else np.array(ids)
+    )
+
+
+AT_COUNTER = (140, 110, 160, 140)
+IN_QUEUE = (40, 180, 60, 220)
+
+
+def frame(service, clock, seconds, detections):
+    clock[0] = T0 + datetime.timedelta(seconds=seconds)
+    return service.analyze_customer_interactions(detections)
+
+
+def test_visit_stays_open_while_seen_and_closes_after_timeout(service, clock):
+    for seconds in (0, 1, 2.5):
+        frame(service, clock, seconds, people(AT_COUNTER, ids=[7]))
+    usage = service.checkout_usage["checkout_1"]
+    assert usage["total_visits"] == 1
+    assert list(service.open_visits["checkout_1"]) == [7]
+
+    frame(service, clock, 4, people())  # Gone for 1.5s: still open
+    assert usage["completed_visits"] == 0
+    frame(service, clock, 5, people())
+
+    assert service.open_visits["checkout_1"] == {}
+    assert usage["completed_visits"] == 1
+    assert usage["average_time"] == 2.5
+    assert [visit["duration"] for visit in usage["history"]] == [2.5]
+
+
+def test_returning_person_opens_a_new_visit(service, clock):
+    frame(service, clock, 0, people(AT_COUNTER, ids=[7]))
+    frame(service, clock, 3, people())
+    frame(service, clock, 4, people(AT_COUNTER, IN_QUEUE, ids=[7, 8]))
+    frame(service, clock, 6, people(AT_COUNTER, ids=[7]))
+
+    usage = service.checkout_usage["checkout_1"]
+    assert usage["total_visits"] == 2
+    assert usage["completed_visits"] == 1
+    assert service.get_analytics()["counters"]["checkout_1"]["open_visits"] == 1
+
+
+def test_save_analytics_closes_visits_in_progress(service, clock, tmp_path):
+    frame(service, clock, 0, people(AT_COUNTER, ids=[7]))
+    frame(service, clock, 4, people(AT_COUNTER, ids=[7]))
+
+    path = service.save_analytics(str(tmp_path / "checkout.json"))
+
+    assert service.open_visits["checkout_1"] == {}
+    with open(path) as f:
+        saved = json.load(f)
+    assert [visit["duration"] for visit in saved["checkout_usage"]["checkout_1"]["history"]] == [4.0]
+    assert saved["analytics"]["counters"]["checkout_1"]["average_wait_time"] == 4.0
+
+
+def test_queue_samples_are_a_ring_buffer_including_empty_queues(service, clock):
+    for seconds, detections in enumerate([people(IN_QUEUE), people(IN_QUEUE, IN_QUEUE), people(), people(IN_QUEUE)]):
+        frame(service, clock, seconds, detections)
+
+    assert [sample["length"] for sample in service.queue_lengths["checkout_1"]] == [2, 0, 1]
+    assert service.checkout_statuses["checkout_1"]["queue_length"] == 1
@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401
+from crud.demographicsRollup import demographics_rollup_crud
+from models.demographicsRollup import DemographicsDaily, DemographicsHourly, ALL
+
+T0 = datetime(2024, 3, 1)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'demographics.db'}")
+    for model in (DemographicsHourly, DemographicsDaily):
+        model.__table__.create(engine)
+    with sessionmaker(bind=engine)() as session:
+        yield session
+    engine.dispose()
+
+
+def read_async(path, read):
+    """Run `await read(db)` on an aiosqlite session over the same database file"""
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        try:
+            async with async_sessionmaker(engine)() as db:
+                return await read(db)
+        finally:
+            await engine.dispose()
+    return asyncio.run(run())
+
+
+def record(timestamp, young=1, old=0, zone_id="z"):
+    return SimpleNamespace(
+        zone_id=zone_id,
+        timestamp=timestamp,
+        age_groups=[
+            {"age": "18-25", "count": young, "male": young, "female": 0},
+            {"age": "60+", "count": old, "male": 0, "female": old},
+        ],
+        gender_distribution={"Male": young, "Female": old}
+    )
+
+
+def test_records_accumulate_in_hour_and_day_buckets(db):
+    for minutes in (5, 20, 50):
+        demographics_rollup_crud.add(db, record(T0 + timedelta(hours=9, minutes=minutes), young=1, old=2))
+
+    hourly = db.query(DemographicsHourly).filter_by(age_group=ALL, gender=ALL).one()
+    daily = db.query(DemographicsDaily).filter_by(age_group=ALL, gender=ALL).one()
+    assert (hourly.bucket_start, hourly.count) == (T0 + timedelta(hours=9), 9)
+    assert (daily.bucket_start, daily.count) == (T0, 9)
+    assert db.query(DemographicsHourly).filter_by(age_group="60+", gender="Female").one().count == 6
+
+
+def test_summary_combines_daily_and_hourly_edges(db):
+    demographics_rollup_crud.add(db, record(T0 + timedelta(hours=22), young=1))  # Partial first day
+    demographics_rollup_crud.add(db, record(T0 + timedelta(days=1, hours=3), young=2))  # Whole day
+    demographics_rollup_crud.add(db, record(T0 + timedelta(days=2, hours=1), young=0, old=4))  # Partial last day
+    demographics_rollup_crud.add(db, record(T0 + timedelta(days=2, hours=8), young=8))  # After the range
+
+    summary = demographics_rollup_crud.summary(db, ["z"], T0 + timedelta(hours=20), T0 + timedelta(days=2, hours=2))
+
+    assert summary["total_count"] == 7
+    assert summary["gender_distribution"] == {"Male": 3, "Female": 4}
+    assert [group["age"] for group in summary["age_groups"]] == ["18-25", "60+"]
+
+
+def test_summary_of_empty_range_is_none(db):
+    demographics_rollup_crud.add(db, record(T0))
+    assert demographics_rollup_crud.summary(db, ["z"], T0 + timedelta(days=1), T0 + timedelta(days=2)) is None
+    assert demographics_rollup_crud.summary(db, ["other"], T0, T0 + timedelta(days=1)) is None
+
+
+def test_async_summary_matches_sync(db, tmp_path):
+    for hours in (2, 22, 27, 49, 56):
+        demographics_rollup_crud.add(db, record(T0 + timedelta(hours=hours), young=hours % 3, old=hours % 5))
+    ranges = [(T0, T0 + timedelta(days=3)), (T0 + timedelta(hours=20), T0 + timedelta(days=2, hours=2)), (T0 + timedelta(days=5), T0 + timedelta(days=6))]
+    expected = [demographics_rollup_crud.summary(db, ["z"], start, end) for start, end in ranges]
+
+    async def read(session):
+        return [await demographics_rollup_crud.summary_async(session, ["z"], start, end) for start, end in ranges]
+
+    assert read_async(tmp_path / "demographics.db", read) == expected
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import numpy as np
+import supervision as sv
+
+from services.detection_results import DetectionHistory
+
+T0 = datetime(2024, 1, 1)
+
+
+def detections(*class_names):
+    return sv.Detections(
+        xyxy=np.zeros((len(class_names), 4), dtype=np.float32),
+        confidence=np.ones(len(class_names), dtype=np.float32),
+        class_id=np.arange(len(class_names)),
+        data={'class_name': np.array(class_names, dtype=object)}
+    )
+
+
+def test_history_is_bounded_but_total_counts_every_row():
+    history = DetectionHistory(max_rows=5)
+    for frame_id in range(4):
+        history.append(detections("person", "car"), T0, frame_id)
+    history.append(detections(), T0, 4)  # Empty frames are not stored
+
+    assert len(history) == 5
+    assert history.total == 8
+    assert len(history.frames) == 3
+
+
+def test_recent_returns_newest_rows_oldest_first():
+    history = DetectionHistory(max_rows=10)
+    history.append(detections("person"), T0, 1)
+    history.append(detections("car", "dog"), T0, 2)
+
+    records = history.recent(2)
+    assert [(record['class_name'], record['frame_id']) for record in records] == [("car", 2), ("dog", 2)]
+    assert history.recent(0) == []
+
+
+def test_recent_class_counts():
+    history = DetectionHistory(max_rows=10)
+    history.append(detections("person", "person"), T0, 1)
+    history.append(detections("car", "person"), T0, 2)
+
+    assert history.recent_class_counts(3) == {"car": 1, "person": 2}
+    assert history.recent_class_counts(0) == {}
+
+
+def test_clear_resets_rows_and_total():
+    history = DetectionHistory(max_rows=10)
+    history.append(detections("person"), T0, 1)
+    history.clear()
+
+    assert len(history) == 0
+    assert history.total == 0
+    assert history.recent(5) == []
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401
+from crud.entryExitRollup import entry_exit_rollup_crud
+from models.entry_log import EntryLog
+from models.entryExitRollup import EntryExitHourly
+from models.exit_log import ExitLog
+
+T0 = datetime(2024, 3, 1)
+
+
+@pytest.fixture
+def Session(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'rollup.db'}", connect_args={"timeout": 30, "check_same_thread": False}
+    )
+    for model in (EntryLog, ExitLog, EntryExitHourly):
+        model.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def add_logs(db, entry_times, exit_times, camera_id="c1"):
+    entries = [EntryLog(camera_id=camera_id, timestamp=ts, entering=1, exiting=0, in_store=2) for ts in entry_times]
+    exits = [ExitLog(camera_id=camera_id, timestamp=ts) for ts in exit_times]
+    db.add_all(entries + exits)
+    db.flush()
+    entry_exit_rollup_crud.add_entries(db, entries, commit=False)
+    entry_exit_rollup_crud.add_exits(db, exits, commit=False)
+    db.commit()
+
+
+def read_async(path, read):
+    """Run `await read(db)` on an aiosqlite session over the same database file"""
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        try:
+            async with async_sessionmaker(engine)() as db:
+                return await read(db)
+        finally:
+            await engine.dispose()
+    return asyncio.run(run())
+
+
+def brute_force(times, start, end):
+    return sum(1 for ts in times if start <= ts <= end)
+
+
+@pytest.fixture
+def logged(Session):
+    rng = np.random.default_rng(1)
+    entry_times = [T0 + timedelta(seconds=int(s)) for s in rng.integers(0, 3 * 86400, 400)]
+    exit_times = [T0 + timedelta(seconds=int(s)) for s in rng.integers(0, 3 * 86400, 300)]
+    # Logs exactly on hour boundaries, where an off-by-one would show
+    entry_times += [T0 + timedelta(hours=h) for h in (0, 5, 6, 24)]
+    exit_times += [T0 + timedelta(hours=h) for h in (5, 6)]
+    with Session() as db:
+        add_logs(db, entry_times, exit_times)
+    return entry_times, exit_times
+
+
+@pytest.mark.parametrize("start_offset, end_offset", [
+    (timedelta(0), timedelta(days=3)),  # Whole hours only
+    (timedelta(hours=5), timedelta(hours=6)),  # End exactly on the next hour
+    (timedelta(hours=5, minutes=10), timedelta(hours=5, minutes=50)),  # Inside one hour
+    (timedelta(hours=4, minutes=59, seconds=59), timedelta(hours=6, seconds=1)),  # Partial hours at both edges
+    (timedelta(hours=5, minutes=30), timedelta(hours=30, minutes=15)),
+    (timedelta(hours=6), timedelta(hours=6)),  # Empty range on a boundary
+])
+def test_counts_match_raw_logs(Session, logged, start_offset, end_offset):
+    entry_times, exit_times = logged
+    start, end = T0 + start_offset, T0 + end_offset
+    with Session() as db:
+        assert entry_exit_rollup_crud.counts(db, start, end) == (
+            brute_force(entry_times, start, end), brute_force(exit_times, start, end)
+        )
+
+
+def test_async_reads_match_sync(Session, logged, tmp_path):
+    ranges = [(T0, T0 + timedelta(days=3)), (T0 + timedelta(hours=5, minutes=30), T0 + timedelta(hours=30, minutes=15))]
+    with Session() as db:
+        expected = [entry_exit_rollup_crud.counts(db, start, end, camera_id=camera_id)
+                    for start, end in ranges for camera_id in (None, "c1", "c2")]
+        summary = entry_exit_rollup_crud.hourly_summary(db, start=T0 + timedelta(hours=3), end=T0 + timedelta(days=2))
+
+    async def read(db):
+        counts = [await entry_exit_rollup_crud.counts_async(db, start, end, camera_id=camera_id)
+                  for start, end in ranges for camera_id in (None, "c1", "c2")]
+        return counts, await entry_exit_rollup_crud.hourly_summary_async(db, start=T0 + timedelta(hours=3), end=T0 + timedelta(days=2))
+
+    assert read_async(tmp_path / "rollup.db", read) == (expected, summary)
+
+
+def test_counts_filter_by_camera(Session):
+    with Session() as db:
+        add_logs(db, [T0 + timedelta(minutes=10), T0 + timedelta(hours=2)], [T0 + timedelta(hours=1)], camera_id="c1")
+        add_logs(db, [T0 + timedelta(hours=1, minutes=5)], [], camera_id="c2")
+
+        assert entry_exit_rollup_crud.counts(db, T0, T0 + timedelta(hours=3), camera_id="c1") == (2, 1)
+        assert entry_exit_rollup_crud.counts(db, T0, T0 + timedelta(hours=3), camera_id="c2") == (1, 0)
+        assert entry_exit_rollup_crud.counts(db, T0, T0 + timedelta(hours=3)) == (3, 1)
+
+
+def test_repeated_inserts_accumulate_into_one_row(Session):
+    with Session() as db:
+        add_logs(db, [T0 + timedelta(minutes=1)], [])
+        add_logs(db, [T0 + timedelta(minutes=2), T0 + timedelta(minutes=3)], [T0 + timedelta(minutes=4)])
+
+        row = db.query(EntryExitHourly).one()
+        assert (row.entry_count, row.exit_count, row.entering, row.in_store, row.hour) == (3, 1, 3, 6, 0)
+
+
+def test_hourly_summary_groups_by_hour_of_day(Session):
+    with Session() as db:
+        add_logs(db, [T0 + timedelta(hours=9), T0 + timedelta(days=1, hours=9), T0 + timedelta(hours=17)], [])
+
+        summary = {row.hour: (row.entering, row.in_store) for row in entry_exit_rollup_crud.hourly_summary(db)}
+        assert summary == {9: (2, 4), 17: (1, 2)}
+
+
+def test_rebuild_matches_incremental_rollup(Session, logged):
+    with Session() as db:
+        before = sorted(
+            (row.camera_id, row.bucket_start, row.entry_count, row.exit_count, row.in_store)
+            for row in db.query(EntryExitHourly)
+        )
+        entry_exit_rollup_crud.rebuild(db)
+        after = sorted(
+            (row.camera_id, row.bucket_start, row.entry_count, row.exit_count, row.in_store)
+            for row in db.query(EntryExitHourly)
+        )
+    assert before == after
+
+
+def test_rebuild_keeps_hours_whose_logs_retention_dropped(Session, logged):
+    def rollup(db):
+        return sorted(
+            (row.camera_id, row.bucket_start, row.entry_count, row.exit_count, row.in_store)
+            for row in db.query(EntryExitHourly)
+        )
+
+    with Session() as db:
+        before = rollup(db)
+        db.query(EntryLog).filter(EntryLog.timestamp < T0 + timedelta(days=1, minutes=30)).delete()
+        db.query(EntryExitHourly).filter(EntryExitHourly.bucket_start >= T0 + timedelta(days=2)).delete()  # Lost, recomputable
+        db.commit()
+
+        entry_exit_rollup_crud.rebuild(db)
+        assert rollup(db) == before
+        entry_exit_rollup_crud.rebuild(db, since=T0 - timedelta(days=30))  # Never earlier than the raw rows
+        assert rollup(db) == before
+        entry_exit_rollup_crud.rebuild(db, since=T0 + timedelta(days=2, minutes=20))
+        assert rollup(db) == before
+
+
+def test_concurrent_first_logs_of_an_hour(Session):
+    errors = []
+    barrier = threading.Barrier(6)
+
+    def writer(i):
+        barrier.wait()
+        for j in range(10):
+            with Session() as db:
+                try:
+                    add_logs(db, [T0 + timedelta(hours=j % 2, minutes=i)], [])
+                except Exception as e:  # Collected so the assertion reports it
+                    errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with Session() as db:
+        assert db.query(EntryLog).count() == 60
+        assert sorted(row.entry_count for row in db.query(EntryExitHourly)) == [30, 30]
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from services.footpath.patterns import TrajectoryPatternEngine, simplify_track
+from services.footpath.processor import CameraProcessor
+
+
+def straight_track(y, n=40):
+    return [[float(x), float(y)] for x in np.linspace(10, 190, n)]
+
+
+def test_simplify_keeps_corners_only():
+    points = [[0, 0], [5, 0.5], [10, 0], [10, 5], [10, 10]]
+    assert simplify_track(points, epsilon=1.0).tolist() == [[0, 0], [10, 0], [10, 10]]
+
+
+def test_point_count_is_the_raw_point_count():
+    engine = TrajectoryPatternEngine(cell_size=50.0)
+    for track_id, y in enumerate((20, 25, 30)):
+        engine.add_track(track_id, straight_track(y))
+
+    patterns = engine.find_patterns(min_frequency=2)
+
+    assert len(patterns) == 1
+    assert patterns[0]['point_count'] == 120
+    assert patterns[0]['frequency'] == 3
+
+
+def test_growing_tracks_count_each_point_once():
+    engine = TrajectoryPatternEngine(cell_size=50.0)
+    points = straight_track(20)
+    for end in (10, 25, 40):
+        for track_id in (1, 2):
+            engine.add_track(track_id, points[:end])
+
+    assert engine.find_patterns(min_frequency=2)[0]['point_count'] == 80
+
+
+def test_processing_run_shuts_its_pattern_executor_down():
+    processor = CameraProcessor.__new__(CameraProcessor)
+    processor.camera = SimpleNamespace(id="cam")
+    processor._pattern_executor = None
+    processor._pattern_future = None
+
+    executor = processor._background()
+    assert processor._background() is executor
+    done = executor.submit(lambda: "saved")
+
+    processor._shutdown_background()
+    assert done.result() == "saved"
+    assert executor._shutdown
+    assert processor._background() is not executor  # A new run gets a fresh executor
+    processor._shutdown_background()
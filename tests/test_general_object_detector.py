@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+import services.general_object_detector as general_object_detector
+
+
+class FakeBoxes:
+    def __init__(self, rows):
+        self.data = np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.boxes = FakeBoxes(rows)
+
+
+class FakeYOLO:
+    """Returns the queued frames' boxes as (x1, y1, x2, y2, conf, cls) rows"""
+
+    def __init__(self, model_path):
+        self.frames = []
+
+    def __call__(self, frame, conf=None, classes=None):
+        return [FakeResult(self.frames.pop(0))]
+
+
+PERSON = [10, 10, 50, 120, 0.9, 0]
+CAR = [200, 40, 320, 110, 0.9, 2]
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    monkeypatch.setattr(general_object_detector, "YOLO", FakeYOLO)
+    return general_object_detector.GeneralObjectDetector(model_path="fake.pt")
+
+
+def run(detector, *frames):
+    detector.model.frames.extend(frames)
+    frame = np.zeros((240, 360, 3), dtype=np.uint8)
+    return [detector.detect(frame) for _ in frames]
+
+
+def test_class_missing_from_frame_keeps_tracking(detector):
+    results = run(detector, [PERSON, CAR], [PERSON, CAR], [PERSON])
+
+    last = results[-1]
+    assert len(last) == 1
+    assert last.data["class_name"].tolist() == ["person"]
+    assert last.tracker_id is not None and len(last.tracker_id) == 1
+
+
+def test_frame_without_detections_has_empty_tracker_ids(detector):
+    results = run(detector, [PERSON], [])
+
+    last = results[-1]
+    assert len(last) == 0
+    assert last.tracker_id is not None and len(last.tracker_id) == 0
+    assert "class_name" in last.data
+
+
+def test_track_ids_stay_stable_per_class(detector):
+    results = run(detector, [PERSON, CAR], [PERSON, CAR], [PERSON, CAR], [PERSON])
+
+    ids = {
+        name: tracker_id
+        for name, tracker_id in zip(results[2].data["class_name"].tolist(), results[2].tracker_id.tolist())
+    }
+    assert results[3].tracker_id.tolist() == [ids["person"]]
+    assert set(detector.tracked_objects) >= {f"person_{ids['person']}", f"car_{ids['car']}"}
+
+
+def test_statistics_count_every_detection_not_just_the_kept_history(detector):
+    detector.detections.max_rows = 2
+    run(detector, [PERSON, CAR], [PERSON, CAR], [PERSON])
+
+    assert len(detector.detections) == 2
+    assert detector.get_statistics()['total_detections'] == 5
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from utils import geometry
+from utils.geometry import (
+    iou_matrix, points_in_boxes, points_in_polygons, polygon_areas, polygon_centroids,
+    polygons_overlap, segments_intersect, clip_polygon_to_box
+)
+
+SQUARE = [[0, 0], [10, 0], [10, 10], [0, 10]]
+TRIANGLE = [[20, 0], [30, 0], [25, 10]]
+# Concave "U": the notch between x=4 and x=6 above y=3 is outside
+U_SHAPE = [[0, 0], [10, 0], [10, 10], [6, 10], [6, 3], [4, 3], [4, 10], [0, 10]]
+
+
+def ray_casting(point, polygon):
+    """Reference per-point crossing-number test"""
+    x, y = point
+    inside = False
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+    return inside
+
+
+def kernels():
+    yield False
+    if geometry.NUMBA_AVAILABLE:
+        yield True
+
+
+@pytest.mark.parametrize("use_numba", list(kernels()))
+def test_points_in_polygons_matches_ray_casting(use_numba):
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-2, 32, (300, 2))
+    polygons = [SQUARE, TRIANGLE, U_SHAPE]
+
+    inside = points_in_polygons(points, polygons, use_numba=use_numba)
+
+    expected = [[ray_casting(point, polygon) for polygon in polygons] for point in points.tolist()]
+    assert inside.tolist() == expected
+    assert points_in_polygons([[5, 8]], [U_SHAPE], use_numba=use_numba).tolist() == [[False]]
+
+
+def test_points_in_polygons_empty_inputs():
+    assert points_in_polygons([], [SQUARE]).shape == (0, 1)
+    assert points_in_polygons([[1, 1]], []).shape == (1, 0)
+
+
+def test_points_in_boxes_includes_edges():
+    assert points_in_boxes([[0, 0], [5, 10], [11, 5]], [[0, 0, 10, 10]]).ravel().tolist() == [True, True, False]
+
+
+def test_segments_intersect():
+    mask = segments_intersect([[0, 0], [0, 0], [0, 5]], [[10, 10], [1, 1], [10, 5]], [[0, 10]], [[10, 0]])
+    assert mask.ravel().tolist() == [True, False, True]
+    # Parallel segments never count
+    assert not segments_intersect([[0, 0]], [[10, 0]], [[0, 1]], [[10, 1]]).any()
+
+
+def test_polygons_overlap():
+    inner = [[2, 2], [4, 2], [4, 4]]  # Fully inside the square, no vertex of the square inside it
+    crossing = [[5, -5], [6, -5], [6, 20], [5, 20]]  # Edges cross, no vertices inside
+    far = [[50, 50], [60, 50], [60, 60]]
+
+    assert polygons_overlap([SQUARE], [inner, crossing, far, TRIANGLE]).tolist() == [[True, True, False, False]]
+    assert polygons_overlap([], [SQUARE]).shape == (0, 1)
+
+
+def test_areas_centroids_and_clipping():
+    np.testing.assert_allclose(polygon_areas([SQUARE, TRIANGLE, U_SHAPE, [[0, 0], [1, 1]]]), [100, 50, 86, 0])
+    np.testing.assert_allclose(polygon_centroids([SQUARE, TRIANGLE]), [[5, 5], [25, 10 / 3]])
+
+    clipped = clip_polygon_to_box(SQUARE, (5, 5, 20, 20))
+    assert polygon_areas([clipped])[0] == pytest.approx(25)
+
+
+def test_iou_matrix():
+    iou = iou_matrix([[0, 0, 10, 10]], [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+    np.testing.assert_allclose(iou, [[1.0, 1 / 3, 0.0]])
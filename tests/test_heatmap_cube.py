@@ -0,0 +1,231 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401
+from crud.heatmapCube import HeatmapCubeCRUD, build_windows, bucket_start_for
+from models.heatmapCube import HeatmapCube
+from models.heatmapData import HeatmapData
+from services.heatmap_grid import decode_grid
+
+T0 = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def Session(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'cubes.db'}", connect_args={"timeout": 30, "check_same_thread": False}
+    )
+    for model in (HeatmapCube, HeatmapData):
+        model.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def crud():
+    return HeatmapCubeCRUD(cell_size=10.0, bucket_seconds=3600)
+
+
+def point(hour, x, y, weight=1.0, zone_id="z", camera_id="c", minute=0):
+    return SimpleNamespace(
+        zone_id=zone_id, camera_id=camera_id, timestamp=T0 + timedelta(hours=hour, minutes=minute),
+        x=x, y=y, weight=weight
+    )
+
+
+def assert_prefix_sums(db):
+    running = None
+    for cube in db.query(HeatmapCube).order_by(HeatmapCube.zone_id, HeatmapCube.camera_id, HeatmapCube.bucket_start):
+        grid = decode_grid(cube.grid)
+        running = grid if running is None else _padded_sum(running, grid)
+        np.testing.assert_allclose(_padded_sum(decode_grid(cube.cumulative), np.zeros_like(running)), running)
+
+
+def _padded_sum(a, b):
+    shape = (max(a.shape[0], b.shape[0]), max(a.shape[1], b.shape[1]))
+    out = np.zeros(shape)
+    out[:a.shape[0], :a.shape[1]] += a
+    out[:b.shape[0], :b.shape[1]] += b
+    return out
+
+
+def total(crud, db, start, end, **kwargs):
+    sums = crud.range_sums(db, ["z"], build_windows(start, end, **kwargs))
+    return float(sums[("z", "c")].sum()) if sums else 0.0
+
+
+def read_async(path, read):
+    """Run `await read(db)` on an aiosqlite session over the same database file"""
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        try:
+            async with async_sessionmaker(engine)() as db:
+                return await read(db)
+        finally:
+            await engine.dispose()
+    return asyncio.run(run())
+
+
+def test_bucket_start_floors_and_converts_to_utc():
+    from datetime import timezone
+    local = datetime(2024, 1, 1, 12, 30, tzinfo=timezone(timedelta(hours=2)))
+    assert bucket_start_for(local, 3600) == datetime(2024, 1, 1, 10, 0)
+
+
+def test_range_sums_match_raw_points(Session, crud):
+    rng = np.random.default_rng(0)
+    points = [point(int(h), float(x), float(y)) for h, x, y in zip(rng.integers(0, 48, 500), rng.uniform(0, 200, 500), rng.uniform(0, 100, 500))]
+    with Session() as db:
+        crud.add_points(db, points)
+
+        for start_hour, end_hour in [(0, 48), (5, 6), (10, 30), (47, 48), (48, 60)]:
+            expected = sum(1 for p in points if start_hour <= (p.timestamp - T0).total_seconds() / 3600 < end_hour)
+            assert total(crud, db, T0 + timedelta(hours=start_hour), T0 + timedelta(hours=end_hour)) == expected
+
+        assert total(crud, db, None, None) == len(points)
+        assert_prefix_sums(db)
+
+
+def test_out_of_order_writes_update_later_prefix_sums(Session, crud):
+    with Session() as db:
+        crud.add_points(db, [point(5, 15, 15), point(9, 25, 5)])
+        crud.add_points(db, [point(1, 5, 5, weight=2), point(7, 300, 300)])  # Older bucket, larger grid
+        crud.add_points(db, [point(5, 15, 15, minute=30)])  # Existing bucket
+
+        assert_prefix_sums(db)
+        assert total(crud, db, T0, T0 + timedelta(hours=24)) == 6
+        assert total(crud, db, T0 + timedelta(hours=5), T0 + timedelta(hours=6)) == 2
+        assert total(crud, db, T0 + timedelta(hours=6), T0 + timedelta(hours=10)) == 2
+
+
+def test_recurring_windows(Session, crud):
+    with Session() as db:
+        # Monday 2024-01-01 and Tuesday 2024-01-02, 14:00 and 18:00
+        crud.add_points(db, [point(14, 5, 5), point(18, 5, 5), point(24 + 14, 5, 5), point(24 + 18, 5, 5)])
+
+        assert total(crud, db, T0, T0 + timedelta(days=7), weekdays=[1]) == 2
+        assert total(crud, db, T0, T0 + timedelta(days=7), hour_from=14, hour_to=16) == 2
+        assert total(crud, db, T0, T0 + timedelta(days=7), weekdays=[1], hour_from=14, hour_to=16) == 1
+
+
+def test_rejects_series_with_another_cell_size(Session, crud):
+    with Session() as db:
+        crud.add_points(db, [point(1, 5, 5)])
+
+        coarse = HeatmapCubeCRUD(cell_size=50.0, bucket_seconds=3600)
+        for hour in (0, 1, 2):  # Before, on and after the existing bucket
+            with pytest.raises(ValueError, match="cell size"):
+                coarse.add_points(db, [point(hour, 5, 5)])
+            db.rollback()
+
+        assert db.query(HeatmapCube).count() == 1
+        assert total(crud, db, None, None) == 1
+
+
+def test_concurrent_writers_keep_exact_prefix_sums(Session, crud):
+    errors = []
+
+    def writer(seed):
+        rng = np.random.default_rng(seed)
+        for hour in rng.integers(0, 6, 10):
+            with Session() as db:
+                try:
+                    crud.add_grid(db, "z", "c", T0 + timedelta(hours=int(hour)), np.ones((3, 3)), 10, 10)
+                except Exception as e:  # Collected so the assertion reports it
+                    errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with Session() as db:
+        assert_prefix_sums(db)
+        assert total(crud, db, None, None) == 6 * 10 * 9
+
+
+def test_long_series_keeps_counting_past_float32_precision(Session, crud):
+    busy = np.full((1, 1), 2.0 ** 24)  # A week of one busy cell at 30 fps
+    with Session() as db:
+        crud.add_grid(db, "z", "c", T0, busy, 10, 10)
+        for hour in range(1, 25):
+            crud.add_grid(db, "z", "c", T0 + timedelta(hours=hour), np.ones((1, 1)), 10, 10)
+        crud.add_grid(db, "z", "c", T0 + timedelta(minutes=30), np.ones((1, 1)), 10, 10)  # Out of order
+
+        assert total(crud, db, T0 + timedelta(hours=1), T0 + timedelta(hours=3)) == 2
+        assert total(crud, db, T0 + timedelta(hours=12), T0 + timedelta(hours=25)) == 13
+        assert total(crud, db, None, None) == 2 ** 24 + 25
+        last = db.query(HeatmapCube).order_by(HeatmapCube.bucket_start.desc()).first()
+        assert decode_grid(last.cumulative)[0, 0] == 2 ** 24 + 25
+
+
+def test_rebuild_keeps_buckets_retention_dropped_and_grid_series(Session, crud):
+    def cubes(db):
+        return {
+            (cube.camera_id, cube.bucket_start): (decode_grid(cube.grid).tolist(), decode_grid(cube.cumulative).tolist())
+            for cube in db.query(HeatmapCube)
+        }
+
+    rng = np.random.default_rng(2)
+    with Session() as db:
+        raw = [
+            HeatmapData(zone_id="z", camera_id="c", timestamp=T0 + timedelta(minutes=int(m)), x=float(x), y=float(y), weight=1.0)
+            for m, x, y in zip(rng.integers(0, 3 * 1440, 300), rng.uniform(0, 100, 300), rng.uniform(0, 50, 300))
+        ]
+        db.add_all(raw)
+        crud.add_points(db, raw)
+        crud.add_grid(db, "z", "footpath", T0, np.ones((2, 2)), 10, 10)  # Never in heatmap_data
+        before = cubes(db)
+
+        # Retention drops the first day of raw points; the cubes must keep it
+        db.query(HeatmapData).filter(HeatmapData.timestamp < T0 + timedelta(days=1)).delete()
+        db.query(HeatmapCube).filter(HeatmapCube.bucket_start >= T0 + timedelta(days=2)).delete()  # Lost, recomputable
+        db.commit()
+        crud.rebuild(db)
+        assert cubes(db) == before
+        crud.rebuild(db, since=T0 + timedelta(days=2, minutes=10))
+        assert cubes(db) == before
+        assert_prefix_sums_per_series(db)
+
+
+def assert_prefix_sums_per_series(db):
+    for camera_id, in db.query(HeatmapCube.camera_id).distinct():
+        running = None
+        for cube in db.query(HeatmapCube).filter(HeatmapCube.camera_id == camera_id).order_by(HeatmapCube.bucket_start):
+            grid = decode_grid(cube.grid)
+            running = grid if running is None else _padded_sum(running, grid)
+            np.testing.assert_allclose(_padded_sum(decode_grid(cube.cumulative), np.zeros_like(running)), running)
+
+
+def test_async_range_sums_match_sync(Session, crud, tmp_path):
+    rng = np.random.default_rng(2)
+    points = [point(int(h), float(x), float(y), zone_id=str(z)) for h, x, y, z in zip(
+        rng.integers(0, 72, 300), rng.uniform(0, 200, 300), rng.uniform(0, 100, 300), rng.choice(["z", "y"], 300)
+    )]
+    windows = [
+        build_windows(None, None),
+        build_windows(T0 + timedelta(hours=5), T0 + timedelta(hours=50)),
+        build_windows(T0, T0 + timedelta(days=3), weekdays=[1, 2], hour_from=6, hour_to=20),
+        build_windows(T0 + timedelta(days=10), T0 + timedelta(days=11)),
+    ]
+    with Session() as db:
+        crud.add_points(db, points)
+        expected = [crud.range_sums(db, ["z", "y"], w) for w in windows]
+
+    async def read(db):
+        return [await crud.range_sums_async(db, ["z", "y"], w) for w in windows]
+
+    for sync_sums, async_sums in zip(expected, read_async(tmp_path / "cubes.db", read)):
+        assert sync_sums.keys() == async_sums.keys()
+        for key in sync_sums:
+            np.testing.assert_array_equal(sync_sums[key], async_sums[key])
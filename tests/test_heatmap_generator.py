@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from services import bounded_history
+from services.heatmap_generator import HeatmapGenerator
+from services.heatmap_grid import HeatmapGrid
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    monkeypatch.setattr(bounded_history, "DEFAULT_SPILL_DIR", str(tmp_path))  # Where the position history spills
+    return HeatmapGenerator(frame_resolution=(100, 200), decay_factor=1.0, blur_size=30, grid_shape=(10, 20))
+
+
+def test_updates_keep_raw_counts(generator):
+    for _ in range(5):
+        counts = generator.update(positions=[[55, 55]])
+
+    assert counts is generator.grid.counts
+    assert counts[5, 5] == 5
+    assert counts.sum() == 5
+
+
+def test_blur_is_applied_once_when_rendering(generator, monkeypatch):
+    calls = []
+    original = HeatmapGrid.smoothed
+    monkeypatch.setattr(HeatmapGrid, "smoothed", lambda self, size: calls.append(size) or original(self, size))
+
+    for _ in range(5):
+        generator.update(positions=[[55, 55]])
+    assert calls == []
+
+    smoothed = generator.heatmap
+    generator.get_colored_heatmap()
+    generator.export_data('json')
+    assert calls == [30]
+
+    # One blur of the raw counts: mass is spread but preserved, and the peak stays put
+    assert smoothed.sum() == pytest.approx(5, rel=1e-3)
+    assert smoothed[5, 5] < 5
+    assert np.unravel_index(np.argmax(smoothed), smoothed.shape) == (5, 5)
+
+    generator.update(positions=[[155, 55]])
+    generator.get_colored_heatmap()
+    assert calls == [30, 30]
+
+
+def test_smoothed_leaves_the_grid_untouched():
+    grid = HeatmapGrid((100, 200), (10, 20))
+    grid.add_points([55], [55])
+
+    smoothed = grid.smoothed(30)
+
+    assert grid.counts[5, 5] == 1 and grid.counts.sum() == 1
+    assert smoothed is not grid.counts and smoothed[5, 5] < 1
+    assert grid.smoothed(5).tolist() == grid.counts.tolist()  # Kernel under two cells: no blur
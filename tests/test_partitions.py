@@ -0,0 +1,98 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401
+from config import settings
+from models.detection import Detection
+from models.entry_log import EntryLog
+from models.heatmapArchive import HeatmapArchive
+from models.heatmapData import HeatmapData
+from models.tracking_log import TrackingLog
+from services.partitions import SqliteMonthShards, next_period, partition_name, period_start
+from services.retention import RetentionJob
+
+NOW = datetime(2024, 6, 15, 12, 0)
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SQLITE_SHARD_DIR", str(tmp_path / "shards"))
+    engine = create_engine(f"sqlite:///{tmp_path / 'main.db'}")
+    for model in (Detection, EntryLog, HeatmapData, TrackingLog, HeatmapArchive):
+        model.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+def add_entries(engine, *timestamps):
+    with sessionmaker(bind=engine)() as db:
+        db.add_all(EntryLog(camera_id="c", timestamp=ts, entering=1, exiting=0, in_store=1) for ts in timestamps)
+        db.commit()
+
+
+def entry_timestamps(engine):
+    with engine.connect() as conn:
+        return sorted(conn.execute(select(EntryLog.timestamp)).scalars())
+
+
+def test_period_helpers():
+    assert period_start(datetime(2024, 12, 31, 23, 59), "month") == datetime(2024, 12, 1)
+    assert next_period(datetime(2024, 12, 1), "month") == datetime(2025, 1, 1)
+    assert next_period(datetime(2024, 2, 28), "day") == datetime(2024, 2, 29)
+    assert partition_name("heatmap_data", datetime(2024, 3, 5), "day") == "heatmap_data_p2024_03_05"
+
+
+def test_shards_are_opt_in(engine):
+    old = datetime(2024, 1, 10)
+    add_entries(engine, old, NOW)
+
+    assert SqliteMonthShards(engine).ensure("entry_logs", NOW) == []
+    assert entry_timestamps(engine) == [old, NOW]
+    assert not os.path.exists(settings.SQLITE_SHARD_DIR)
+
+
+def test_months_before_the_hot_window_move_to_shards(engine):
+    shards = SqliteMonthShards(engine, hot_months=2)
+    add_entries(engine, datetime(2024, 3, 31, 23), datetime(2024, 4, 30), datetime(2024, 5, 1), NOW)
+
+    assert shards.ensure("entry_logs", NOW) == ["entry_logs_p2024_03.sqlite", "entry_logs_p2024_04.sqlite"]
+    assert entry_timestamps(engine) == [datetime(2024, 5, 1), NOW]
+    assert [start for _, start, _ in shards.shards("entry_logs")] == [datetime(2024, 3, 1), datetime(2024, 4, 1)]
+
+    # Only files that end by the cutoff are deleted
+    assert shards.drop_before("entry_logs", datetime(2024, 4, 15)) == ["entry_logs_p2024_03.sqlite"]
+    assert [start for _, start, _ in shards.shards("entry_logs")] == [datetime(2024, 4, 1)]
+
+
+def test_retention_deletes_expired_rows_in_place(engine, monkeypatch):
+    monkeypatch.setattr(settings, "ENTRY_LOGS_RETENTION_DAYS", 30)
+    expired, kept = NOW - timedelta(days=31), NOW - timedelta(days=29)
+    add_entries(engine, expired, kept, NOW)
+
+    results = RetentionJob(engine, interval=0).run_once(NOW)
+
+    assert results["entry_logs"] == {"created": [], "dropped": []}
+    assert entry_timestamps(engine) == [kept, NOW]
+
+
+def test_heatmap_points_are_archived_before_they_are_dropped(engine, monkeypatch):
+    monkeypatch.setattr(settings, "HEATMAP_DATA_RETENTION_DAYS", 30)
+    monkeypatch.setattr(settings, "ENTRY_LOGS_RETENTION_DAYS", 0)
+    expired = NOW - timedelta(days=40)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all(
+            HeatmapData(zone_id="z", camera_id="c", timestamp=ts, x=x, y=5.0, weight=1.0)
+            for ts, x in [(expired, 5.0), (expired + timedelta(hours=1), 60.0), (NOW, 5.0)]
+        )
+        db.commit()
+
+    RetentionJob(engine, interval=0).run_once(NOW)
+
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(HeatmapData)).scalar() == 1
+        archive = conn.execute(select(HeatmapArchive)).one()
+    assert (archive.day, archive.point_count, archive.total_weight) == (period_start(expired, "day"), 2, 2.0)
@@ -0,0 +1,160 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import services.ppe_detector as ppe_detector
+from services import bounded_history
+
+CLASS_NAMES = {0: "Person", 1: "Helmet", 2: "Vest", 3: "Glove"}
+
+
+class FakeYOLO:
+    def __init__(self, model_path):
+        self.names = CLASS_NAMES
+
+
+@pytest.fixture
+def make_detector(monkeypatch, tmp_path):
+    monkeypatch.setattr(ppe_detector, "YOLO", FakeYOLO)
+    monkeypatch.setattr(bounded_history, "DEFAULT_SPILL_DIR", str(tmp_path))
+    return lambda **kwargs: ppe_detector.PPEDetector(model_path="fake.pt", **kwargs)
+
+
+def detection(box, class_name, tracking_id=None, confidence=0.9):
+    return {"bbox": [int(v) for v in box], "confidence": confidence, "class_name": class_name, "tracking_id": tracking_id}
+
+
+def legacy_is_associated(person, ppe, margin=0.2, threshold=1.5):
+    """The per-pair test the vectorized association replaced"""
+    if max(person[0], ppe[0]) < min(person[2], ppe[2]) and max(person[1], ppe[1]) < min(person[3], ppe[3]):
+        return True
+    p_width = person[2] - person[0]
+    p_height = person[3] - person[1]
+    expanded = [
+        person[0] - int(p_width * margin), person[1] - int(p_height * margin),
+        person[2] + int(p_width * margin), person[3] + int(p_height * margin)
+    ]
+    if ppe[0] >= expanded[0] and ppe[1] >= expanded[1] and ppe[2] <= expanded[2] and ppe[3] <= expanded[3]:
+        return True
+    p_size = max(p_width, p_height)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distance = np.sqrt(((person[0] + person[2]) / 2 - (ppe[0] + ppe[2]) / 2) ** 2 +
+                           ((person[1] + person[3]) / 2 - (ppe[1] + ppe[3]) / 2) ** 2) / np.float64(p_size)
+    return distance < threshold
+
+
+def legacy_current_ppe(persons, detections):
+    by_class = {}
+    for item in detections:
+        if item["class_name"] != "Person":
+            by_class.setdefault(item["class_name"], []).append(item)
+    result = {}
+    for person in persons:
+        current = {}
+        for ppe_type, items in by_class.items():
+            for item in items:
+                if legacy_is_associated(person["bbox"], item["bbox"]):
+                    current.setdefault(ppe_type, []).append({"confidence": item["confidence"], "bbox": item["bbox"]})
+        result[person["tracking_id"]] = current
+    return result
+
+
+def random_frame(rng):
+    persons = []
+    for tracking_id in range(int(rng.integers(1, 5))):
+        x, y = rng.integers(0, 600, 2)
+        w, h = (0, 0) if rng.random() < 0.05 else rng.integers(20, 120, 2)  # Some degenerate boxes
+        persons.append(detection((x, y, x + w, y + h), "Person", tracking_id))
+    items = []
+    for _ in range(int(rng.integers(0, 10))):
+        x, y = rng.integers(0, 700, 2)
+        w, h = rng.integers(5, 40, 2)
+        items.append(detection((x, y, x + w, y + h), str(rng.choice(["Helmet", "Vest", "Glove"])), confidence=float(rng.random())))
+    # Detections arrive interleaved by class, as the model returns them
+    detections = persons + items
+    order = rng.permutation(len(detections))
+    return persons, [detections[i] for i in order]
+
+
+def test_default_association_matches_the_per_pair_test(make_detector):
+    detector = make_detector()
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        persons, detections = random_frame(rng)
+        detector._associate_ppe_with_persons(persons, detections)
+
+        expected = legacy_current_ppe(persons, detections)
+        assert {pid: detector.tracked_persons[pid]["current_ppe"] for pid in expected} == expected
+
+
+def test_one_to_one_credits_each_item_once(make_detector):
+    detector = make_detector(one_to_one_ppe=True)
+    persons = [detection((0, 0, 100, 200), "Person", 1), detection((60, 0, 160, 200), "Person", 2)]
+    helmets = [detection((10, 0, 40, 20), "Helmet"), detection((110, 0, 140, 20), "Helmet")]
+    vest = detection((20, 60, 80, 120), "Vest")
+
+    detector._associate_ppe_with_persons(persons, persons + helmets + [vest])
+
+    first, second = (detector.tracked_persons[pid]["current_ppe"] for pid in (1, 2))
+    assert [item["bbox"] for item in first["Helmet"]] == [helmets[0]["bbox"]]
+    assert [item["bbox"] for item in second["Helmet"]] == [helmets[1]["bbox"]]
+    # The single vest goes to the person whose centre is closest
+    assert "Vest" in first and "Vest" not in second
+
+
+def test_one_to_one_leaves_unassociated_pairs_alone(make_detector):
+    detector = make_detector(one_to_one_ppe=True)
+    associated = np.array([[True, False], [False, False]])
+    distance = np.array([[0.5, np.inf], [np.nan, 9.0]])
+
+    assigned = detector._assign_ppe_one_to_one(associated, distance, ["Helmet", "Helmet"])
+
+    assert assigned.tolist() == [[True, False], [False, False]]
+
+
+def test_association_matrices(make_detector):
+    detector = make_detector()
+    person = np.array([[100, 100, 200, 300]], dtype=np.float64)
+    ppe = np.array([
+        [150, 150, 160, 160],  # Overlapping
+        [80, 70, 100, 100],  # Touching the corner only, inside the 20% margin
+        [350, 195, 360, 205],  # Centre distance 205 / 200
+        [500, 500, 510, 510],  # Far away
+    ], dtype=np.float64)
+
+    associated, distance = detector._ppe_association_matrices(person, ppe)
+
+    assert associated.tolist() == [[True, True, True, False]]
+    assert distance[0, 2] == pytest.approx(205 / 200)
+
+
+def test_running_compliance_tallies_match_a_recount(make_detector):
+    detector = make_detector()
+    rng = np.random.default_rng(1)
+
+    def recount():
+        active = [detector.check_compliance(person["current_ppe"], detector.active_rule) for person in detector.tracked_persons.values()]
+        history = [record["compliance"] for record in detector.detection_history]
+        compliant = sum(compliance["status"] for compliance in active + history)
+        missing = Counter(ppe for compliance in active + history for ppe in compliance["missing"])
+        return compliant, {ppe: missing[ppe] for ppe in detector.compliance_rules[detector.active_rule]}
+
+    for frame in range(120):
+        detector.frame_count += 1
+        persons, detections = random_frame(rng)
+        # Ids drift so people leave and get cleaned up
+        for person in persons:
+            person["tracking_id"] += frame // 40 * 10
+        detector._associate_ppe_with_persons(persons, detections)
+        if frame == 60:
+            detector.set_compliance_rule("construction")
+        if frame == 80:
+            detector.add_compliance_rule("construction", ["Helmet", "Glove"])
+
+        stats = detector.get_statistics()
+        compliant, missing = recount()
+        assert stats["historical_stats"]["compliant_persons"] == compliant
+        assert {ppe: entry["count"] for ppe, entry in stats["current_stats"]["missing_ppe"].items()} == missing
+
+    assert len(detector.detection_history) > 0
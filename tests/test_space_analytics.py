@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401
+from crud.spaceAnalytics import heatmap_data_crud
+from database import get_async_db
+from models.heatmapData import HeatmapData
+from routers.spaceAnalytics import router
+
+T0 = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def Session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'heatmap.db'}")
+    HeatmapData.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def add_points(Session, points):
+    with Session() as db:
+        db.add_all(
+            HeatmapData(zone_id=zone_id, camera_id="c", timestamp=timestamp, x=x, y=y, weight=weight)
+            for zone_id, timestamp, x, y, weight in points
+        )
+        db.commit()
+
+
+def grid(Session, windows, cell_size=10.0, bucket_seconds=None, zone_ids=("z",)):
+    with Session() as db:
+        return heatmap_data_crud.grid_sums(db, list(zone_ids), windows, cell_size, bucket_seconds)
+
+
+def test_cells_floor_negative_and_boundary_coordinates(Session):
+    coordinates = [
+        (0.0, 0.0), (9.999, 9.999), (10.0, 20.0),  # Lower edges belong to their cell
+        (-0.5, -0.001), (-10.0, -20.0), (-10.5, -20.5),
+    ]
+    add_points(Session, [("z", T0, x, y, 1.0) for x, y in coordinates])
+
+    cells = grid(Session, [(T0, T0 + timedelta(hours=1))])
+
+    assert [(cell_x, cell_y, count) for _, _, _, cell_x, cell_y, _, count in cells] == [
+        (-2, -3, 1), (-1, -2, 1), (-1, -1, 1), (0, 0, 2), (1, 2, 1)
+    ]
+
+
+def test_cells_match_numpy_floor(Session):
+    rng = np.random.default_rng(0)
+    xs = rng.uniform(-200, 200, 300).round(1)  # Plenty of exact multiples of the cell size
+    ys = rng.uniform(-100, 100, 300).round(1)
+    weights = rng.uniform(0, 2, 300)
+    add_points(Session, [("z", T0, float(x), float(y), float(w)) for x, y, w in zip(xs, ys, weights)])
+
+    cells = grid(Session, [(T0, T0 + timedelta(hours=1))], cell_size=2.5)
+
+    expected = {}
+    for x, y, w in zip(xs, ys, weights):
+        key = (int(np.floor(x / 2.5)), int(np.floor(y / 2.5)))
+        expected[key] = expected.get(key, 0.0) + w
+    assert {(cell_x, cell_y): weight for _, _, _, cell_x, cell_y, weight, _ in cells} == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("bucket_seconds, offsets, expected", [
+    (3600, [timedelta(minutes=59, seconds=59), timedelta(hours=1), timedelta(hours=1, minutes=30)], [0, 1, 1]),
+    (86400, [timedelta(hours=23, minutes=59, seconds=59), timedelta(days=1), timedelta(days=1, hours=12)], [0, 1, 1]),
+])
+def test_time_buckets_split_on_the_boundary(Session, bucket_seconds, offsets, expected):
+    add_points(Session, [("z", T0 + offset, 5.0, 5.0, 1.0) for offset in offsets])
+
+    cells = grid(Session, [(T0, T0 + timedelta(days=2))], bucket_seconds=bucket_seconds)
+
+    first = int((T0 - datetime(1970, 1, 1)).total_seconds()) // bucket_seconds  # Bucket index of T0
+    counts = {bucket - first: count for _, _, bucket, _, _, _, count in cells}
+    assert counts == {bucket: expected.count(bucket) for bucket in set(expected)}
+
+
+def test_windows_and_zones_filter_points(Session):
+    add_points(Session, [
+        ("z", T0, 1.0, 1.0, 1.0),
+        ("z", T0 + timedelta(hours=2), 1.0, 1.0, 1.0),  # Between the windows
+        ("z", T0 + timedelta(hours=4), 1.0, 1.0, 1.0),  # End of the second window is exclusive
+        ("other", T0, 1.0, 1.0, 1.0),
+    ])
+
+    cells = grid(Session, [(T0, T0 + timedelta(hours=1)), (T0 + timedelta(hours=3), T0 + timedelta(hours=4))])
+
+    assert [(zone_id, count) for zone_id, _, _, _, _, _, count in cells] == [("z", 1)]
+    assert grid(Session, [], zone_ids=["z"]) == [] and grid(Session, [(T0, T0)], zone_ids=[]) == []
+
+
+@pytest.fixture
+def client(Session, tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'heatmap.db'}")
+    AsyncSession = async_sessionmaker(engine)
+
+    async def override_get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    with TestClient(app) as client:
+        yield client
+
+
+def test_grid_mode_bins_raw_points_by_cell_and_hour(client, Session):
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+    add_points(Session, [
+        ("z", hour + timedelta(minutes=5), 12.0, 3.0, 1.0),
+        ("z", hour + timedelta(minutes=50), 18.0, 9.0, 2.0),
+        ("z", hour + timedelta(hours=1, minutes=5), -1.0, 3.0, 4.0),
+    ])
+
+    response = client.get("/analytics/heatmaps", params={
+        "zone_id": "z", "filter_by": "last_24_hours", "mode": "grid", "cell_size": 10, "time_bucket": "hour"
+    })
+
+    assert response.status_code == 200
+    points = [(p["timestamp"], p["x"], p["y"], p["weight"]) for p in response.json()["points"]]
+    assert points == [
+        (hour.isoformat(), 15.0, 5.0, 3.0),
+        ((hour + timedelta(hours=1)).isoformat(), -5.0, 5.0, 4.0),
+    ]
+
+
+@pytest.mark.parametrize("params, status", [
+    ({"mode": "grid", "time_bucket": "week"}, 400),
+    ({"mode": "raw"}, 400),
+    ({"mode": "grid", "cell_size": 0}, 422),
+    ({"mode": "grid"}, 404),
+])
+def test_grid_mode_rejects_bad_parameters(client, params, status):
+    response = client.get("/analytics/heatmaps", params={"zone_id": "z", "filter_by": "last_week", **params})
+    assert response.status_code == status
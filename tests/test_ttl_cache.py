@@ -0,0 +1,80 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import ttl_cache
+from services.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("k", 1)
+
+    clock[0] += 9.9
+    assert cache.get("k") == 1
+    clock[0] += 0.1
+    assert cache.get("k") is None
+
+
+def test_get_or_set_recomputes_only_after_expiry(clock):
+    cache = TTLCache(ttl=10)
+    calls = []
+
+    def factory():
+        calls.append(clock[0])
+        return len(calls)
+
+    assert cache.get_or_set("k", factory) == 1
+    assert cache.get_or_set("k", factory) == 1
+    clock[0] += 10
+    assert cache.get_or_set("k", factory) == 2
+
+
+def test_zero_ttl_disables_caching():
+    cache = TTLCache(ttl=0)
+    cache.set("k", 1)
+    assert cache.get("k") is None
+    assert cache.get_or_set("k", lambda: 2) == 2
+
+
+def test_least_recently_stored_entries_are_evicted():
+    cache = TTLCache(ttl=60, max_entries=2)
+    for key in "abc":
+        cache.set(key, key)
+
+    assert cache.get("a") is None
+    assert (cache.get("b"), cache.get("c")) == ("b", "c")
+
+
+def test_concurrent_misses_compute_once():
+    cache = TTLCache(ttl=60)
+    calls = []
+    barrier = threading.Barrier(8)
+    results = []
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return "summary"
+
+    def reader():
+        barrier.wait()
+        results.append(cache.get_or_set(("start", "end"), factory))
+
+    threads = [threading.Thread(target=reader) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["summary"] * 8
+    assert len(calls) == 1
@@ -0,0 +1,138 @@
+from collections import Counter, defaultdict
+
+import numpy as np
+import pytest
+
+import services.vehicle_detector as vehicle_detector
+from services import bounded_history
+
+
+class FakeTensor:
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+    def int(self):
+        return FakeTensor(self.values.astype(int))
+
+
+class FakeBoxes:
+    def __init__(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, 7)  # x1, y1, x2, y2, id, conf, cls
+        self.xyxy = FakeTensor(rows[:, :4])
+        self.id = FakeTensor(rows[:, 4])
+        self.conf = FakeTensor(rows[:, 5])
+        self.cls = FakeTensor(rows[:, 6])
+        self.count = len(rows)
+
+    def __len__(self):
+        return self.count
+
+
+class FakeYOLO:
+    """Replays the queued frames' rows from track()"""
+
+    names = {0: "car", 1: "truck"}
+
+    def __init__(self, model_path):
+        self.frames = []
+
+    def track(self, frame, persist=True, conf=None):
+        return [type("Result", (), {"boxes": FakeBoxes(self.frames.pop(0))})()]
+
+
+@pytest.fixture
+def detector(monkeypatch, tmp_path):
+    monkeypatch.setattr(vehicle_detector, "YOLO", FakeYOLO)
+    monkeypatch.setattr(bounded_history, "DEFAULT_SPILL_DIR", str(tmp_path))
+    detector = vehicle_detector.VehicleDetector(model_path="fake.pt")
+    detector.add_parking_area(0, 0, 300, 300, "A")
+    detector.add_parking_area(300, 0, 600, 300, "B")
+    return detector
+
+
+def random_frames(rng, count=140):
+    """Random walks for a few vehicles that come and go"""
+    positions = {vehicle_id: rng.uniform(50, 550, 2) for vehicle_id in range(1, 7)}
+    classes = {vehicle_id: vehicle_id % 2 for vehicle_id in positions}
+    # Vehicle 5 leaves after frame 40, long enough to be cleaned up; 6 only shows up later
+    visible = {
+        vehicle_id: (lambda f: f < 40) if vehicle_id == 5 else (lambda f: f >= 90) if vehicle_id == 6 else (lambda f: True)
+        for vehicle_id in positions
+    }
+    frames = []
+    for f in range(count):
+        rows = []
+        for vehicle_id, position in positions.items():
+            position += rng.normal(0, 12, 2)
+            np.clip(position, 30, 570, out=position)
+            if visible[vehicle_id](f) and rng.random() > 0.1:
+                x, y = position
+                rows.append([x - 20, y - 15, x + 20, y + 15, vehicle_id, 0.9, classes[vehicle_id]])
+        frames.append(rows)
+    return frames
+
+
+def from_scratch(observations):
+    """Recompute every vehicle summary from its full list of (frame, position, area) observations"""
+    summaries = {}
+    for vehicle_id, seen in observations.items():
+        distance = sum(
+            float(np.hypot(b[1][0] - a[1][0], b[1][1] - a[1][1])) for a, b in zip(seen, seen[1:])
+        )
+        first, last = seen[0][0], seen[-1][0]
+        areas = Counter(area for _, _, area in seen if area is not None)
+        parked = sum(areas.values()) / len(seen) > 0.5
+        summaries[vehicle_id] = {
+            "first_seen": first,
+            "last_seen": last,
+            "total_distance": distance,
+            "avg_speed": distance / (last - first + 1) if len(seen) > 1 else 0,
+            "parked": parked,
+            "parking_area_id": max(areas, key=areas.get) if parked else None,
+        }
+    return summaries
+
+
+def assert_summary(actual, expected):
+    for key, value in expected.items():
+        assert actual[key] == pytest.approx(value), key
+
+
+def test_running_statistics_match_a_recomputation(detector):
+    rng = np.random.default_rng(3)
+    frames = random_frames(rng)
+    detector.model.frames.extend(frames)
+    observations = defaultdict(list)
+
+    for f in range(len(frames)):
+        for detection in detector.detect(None):
+            observations[detection["tracking_id"]].append((detector.frame_count, detection["position"], detection["in_parking"]))
+        if f % 25 == 0:
+            detector.cleanup_tracking()
+
+    stats = detector.get_statistics()
+    expected = from_scratch(observations)
+
+    # More than 50 detections per vehicle, so the trimmed position lists would not be enough
+    assert max(len(seen) for seen in observations.values()) > 50
+    for vehicle_id, vehicle in detector.tracked_vehicles.items():
+        assert_summary(detector._vehicle_summary(vehicle_id, vehicle), expected[vehicle_id])
+    history = {record["vehicle_id"]: record for record in detector.detection_history}
+    assert list(history) == [5]
+    assert_summary(history[5], expected[5])
+
+    active = detector.tracked_vehicles
+    assert stats["current_stats"]["vehicle_counts"] == dict(Counter(vehicle["class_name"] for vehicle in active.values()))
+    speeds = defaultdict(list)
+    for vehicle_id in active:
+        if len(observations[vehicle_id]) > 1:
+            speeds[active[vehicle_id]["class_name"]].append(expected[vehicle_id]["avg_speed"])
+    assert stats["current_stats"]["avg_speed_by_type"] == pytest.approx({k: np.mean(v) for k, v in speeds.items()})
+    occupancy = Counter(observations[vehicle_id][-1][2] for vehicle_id in active)
+    assert [area["occupied"] for area in stats["current_stats"]["parking"]] == [occupancy[0], occupancy[1]]
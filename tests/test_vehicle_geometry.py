@@ -0,0 +1,47 @@
+import numpy as np
+
+from services.vehicle_geometry import VehicleGeometry
+
+
+def square(x, y, size):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size]]
+
+
+def centre(box):
+    return ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+
+
+def locate(geometry, boxes):
+    return geometry.locate([centre(box) for box in boxes], boxes)
+
+
+def test_stall_goes_to_the_vehicle_covering_it_most():
+    geometry = VehicleGeometry()
+    geometry.add_area(0, (0, 0, 400, 400))
+    geometry.add_stall(1, square(100, 100, 100), min_overlap=0.3)
+
+    boxes = [(80, 80, 180, 180), (100, 100, 200, 200)]  # Both cover the stall enough
+
+    assert locate(geometry, boxes) == [0, 1]
+
+
+def test_stalls_are_assigned_one_to_one():
+    geometry = VehicleGeometry()
+    geometry.add_stall(1, square(0, 0, 100), min_overlap=0.3)
+    geometry.add_stall(2, square(100, 0, 100), min_overlap=0.3)
+
+    # The first vehicle covers stall 1 best but is the only one that can take stall 2
+    boxes = [(40, 0, 150, 100), (0, 0, 60, 100)]
+
+    assert locate(geometry, boxes) == [2, 1]
+
+
+def test_vehicles_outside_areas_and_stalls():
+    geometry = VehicleGeometry()
+    geometry.add_area(0, (0, 0, 50, 50))
+    geometry.add_stall(1, square(100, 100, 100), min_overlap=0.5)
+
+    boxes = [(300, 300, 320, 320), (150, 150, 230, 230)]  # The second covers only a quarter of the stall
+
+    assert locate(geometry, boxes) == [None, None]
+    assert geometry.crossings(np.zeros((2, 2)), np.ones((2, 2))).shape == (2, 0)
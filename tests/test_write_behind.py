@@ -0,0 +1,127 @@
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401
+import crud.heatmapCube as heatmap_cube
+from crud.heatmapCube import HeatmapCubeCRUD
+from models.exit_log import ExitLog
+from models.heatmapCube import HeatmapCube
+from services.write_behind import WriteBehindQueue
+
+T0 = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def Session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'queue.db'}", connect_args={"check_same_thread": False})
+    for model in (ExitLog, HeatmapCube):
+        model.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def queue(Session, tmp_path):
+    queue = WriteBehindQueue(
+        session_factory=Session, batch_size=50, flush_interval=60, max_retries=1,
+        dead_letter_path=str(tmp_path / "failed.jsonl")
+    )
+    yield queue
+    queue.stop()
+
+
+def exit_rows(n, start=0):
+    return [{"camera_id": "c", "timestamp": T0 + timedelta(seconds=start + i)} for i in range(n)]
+
+
+def test_flush_writes_everything_queued_before_it(queue, Session):
+    batches = []
+    queue.after_insert(ExitLog, lambda db, rows: batches.append(len(rows)))
+
+    queue.enqueue_many(ExitLog, exit_rows(120))
+    assert queue.flush(timeout=10)
+
+    with Session() as db:
+        assert db.query(ExitLog).count() == 120
+    assert sum(batches) == 120 and max(batches) <= 50
+    assert queue.stats() == {"pending": 0, "enqueued": 120, "written": 120, "failed": 0}
+
+
+def test_stop_drains_the_queue(queue, Session):
+    queue.enqueue_many(ExitLog, exit_rows(10))
+    queue.stop()
+
+    with Session() as db:
+        assert db.query(ExitLog).count() == 10
+
+
+def test_failed_call_is_dead_lettered_without_losing_inserts(queue, Session):
+    def failing(db, payload):
+        raise RuntimeError("boom")
+
+    queue.enqueue_many(ExitLog, exit_rows(3))
+    queue.enqueue_call(failing, {"timestamp": T0})
+    assert queue.flush(timeout=10)
+
+    with Session() as db:
+        assert db.query(ExitLog).count() == 3
+    with open(queue.dead_letter_path) as f:
+        entries = [json.loads(line) for line in f]
+    assert entries == [{"call": failing.__module__ + "." + failing.__qualname__, "payload": {"timestamp": T0.isoformat()}}]
+    assert queue.stats()["failed"] == 1
+
+
+def test_queued_heatmap_grids_merge_into_the_cube(queue, Session, monkeypatch):
+    monkeypatch.setattr(heatmap_cube, "write_queue", queue)
+    crud = HeatmapCubeCRUD(cell_size=10.0, bucket_seconds=3600)
+
+    counts = np.ones((2, 3), dtype=np.float32)
+    crud.enqueue_grid("z", "c", T0, counts, 10.0, 10.0)
+    counts[:] = 0  # The processor resets its grid right after queueing it
+    crud.enqueue_grid("z", "c", T0 + timedelta(minutes=5), np.ones((2, 3)), 10.0, 10.0)
+    assert queue.flush(timeout=10)
+
+    with Session() as db:
+        sums = crud.range_sums(db, ["z"], [(T0, T0 + timedelta(hours=1))])
+    assert float(sums[("z", "c")].sum()) == 12.0
+
+
+def test_bad_rows_are_isolated_from_the_rest_of_the_batch(queue, Session):
+    inserted = []
+    queue.after_insert(ExitLog, lambda db, rows: inserted.extend(row["id"] for row in rows))
+    rows = [{"id": i, **row} for i, row in enumerate(exit_rows(20), start=1)]
+    rows[7] = {**rows[7], "id": 3}  # Duplicate primary key
+    rows[15] = {**rows[15], "timestamp": "not a timestamp"}
+
+    queue.enqueue_many(ExitLog, rows)
+    assert queue.flush(timeout=10)
+
+    with Session() as db:
+        assert sorted(row.id for row in db.query(ExitLog)) == sorted(set(range(1, 21)) - {8, 16})
+        assert sorted(inserted) == sorted(row.id for row in db.query(ExitLog))  # Rollup callbacks saw the written rows only
+    with open(queue.dead_letter_path) as f:
+        assert [json.loads(line)["row"] for line in f] == [
+            {**rows[7], "timestamp": rows[7]["timestamp"].isoformat()}, rows[15]
+        ]
+    assert queue.stats()["written"] == 18 and queue.stats()["failed"] == 2
+
+
+def test_unreachable_database_dead_letters_the_batch_without_splitting(tmp_path):
+    empty = sessionmaker(bind=create_engine(f"sqlite:///{tmp_path / 'empty.db'}"))  # No tables: OperationalError
+    attempts = []
+    queue = WriteBehindQueue(
+        session_factory=lambda: attempts.append(1) or empty(), flush_interval=60, max_retries=2,
+        dead_letter_path=str(tmp_path / "failed.jsonl")
+    )
+    queue.enqueue_many(ExitLog, exit_rows(8))
+    assert queue.flush(timeout=10)
+    queue.stop()
+
+    assert len(attempts) == 2
+    with open(queue.dead_letter_path) as f:
+        assert len(f.readlines()) == 8
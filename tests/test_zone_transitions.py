@@ -0,0 +1,227 @@
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models  # noqa: F401  Registers every table the zone foreign keys point at
+import services.footpath.transitions as transitions
+from database import get_db
+from models.zone import Zone, ZoneType
+from routers import footpath
+from services.footpath.processor import CameraProcessor
+from services.footpath.transitions import ZoneTransitionGraph, ZoneTransitionRegistry, save_snapshot
+from utils.auth_middleware import verify_business_auth
+
+T0 = datetime(2024, 5, 1, 10, 0, 0)
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.rows = []
+
+    def enqueue_many(self, model, mappings):
+        mappings = list(mappings)
+        self.rows.extend(mappings)
+        return len(mappings)
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    recording = RecordingQueue()
+    monkeypatch.setattr(transitions, "write_queue", recording)
+    return recording
+
+
+def walk(graph, visitor, zones, start=T0, step=10):
+    for i, zone in enumerate(zones):
+        timestamp = start + timedelta(seconds=i * step)
+        graph.record_enter(visitor, zone, timestamp)
+        graph.record_exit(visitor, zone, timestamp + timedelta(seconds=step - 2))
+
+
+def test_transitions_paths_and_durations():
+    graph = ZoneTransitionGraph("p1")
+    walk(graph, "v1", ["entrance", "aisle", "checkout"])
+    walk(graph, "v2", ["entrance", "aisle"], start=T0 + timedelta(seconds=5))
+
+    assert graph.transitions[("entrance", "aisle")] == 2
+    assert graph.transitions[("aisle", "checkout")] == 1
+    assert graph.top_paths(1) == [{"path": ["entrance", "aisle"], "count": 2}]
+    assert {"path": ["entrance", "aisle", "checkout"], "count": 1} in graph.top_paths(10, length=3)
+
+    next_zones = graph.next_zones("entrance")
+    assert next_zones["aisle"]["probability"] == 1.0
+    # Exit after 8 s, enter the next zone at 10 s
+    assert next_zones["aisle"]["avg_duration"] == pytest.approx(2.0)
+
+
+def test_reentering_same_zone_is_not_a_transition():
+    graph = ZoneTransitionGraph("p1")
+    walk(graph, "v1", ["entrance", "entrance", "aisle"])
+
+    assert dict(graph.transitions) == {("entrance", "aisle"): 1}
+    assert graph.entries["entrance"] == 1
+
+
+def test_visitor_timeout_starts_a_new_path():
+    graph = ZoneTransitionGraph("p1", visitor_timeout=60)
+    graph.record_enter("v1", "entrance", T0)
+    graph.record_enter("v1", "aisle", T0 + timedelta(minutes=5))
+
+    assert not graph.transitions
+
+
+def test_transition_matrix_is_dense():
+    graph = ZoneTransitionGraph("p1")
+    walk(graph, "v1", ["a", "b", "a"])
+
+    zones, matrix = graph.transition_matrix()
+    assert zones == ["a", "b"]
+    assert matrix.tolist() == [[0, 1], [1, 0]]
+
+
+def test_claim_snapshot_once_per_window(queue):
+    graph = ZoneTransitionGraph("p1", business_id="b1")
+    graph.window_start = T0
+    walk(graph, "v1", ["a", "b"])
+
+    assert not graph.claim_snapshot(3600, T0 + timedelta(minutes=30))
+    assert graph.claim_snapshot(3600, T0 + timedelta(hours=1))
+    assert not graph.claim_snapshot(3600, T0 + timedelta(hours=1))
+
+    assert save_snapshot(graph, now=T0 + timedelta(hours=1)) == 1
+    row = queue.rows[0]
+    assert (row["zone_id"], row["business_id"], row["property_id"]) == ("a", "b1", "p1")
+    assert row["pattern_type"] == "zone_sequence"
+    assert row["frequency"] == 1
+    assert not graph.transitions
+    assert graph.window_start == T0 + timedelta(hours=1)
+
+
+def test_registry_evicts_and_persists_least_recently_used(queue):
+    registry = ZoneTransitionRegistry(max_graphs=2)
+    first = registry.get("p1", "b1")
+    walk(first, "v1", ["a", "b"])
+    registry.get("p2", "b1")
+    registry.get("p1")  # p1 is now the most recently used
+    registry.get("p3", "b1")
+
+    assert registry.find("p2") is None
+    assert registry.find("p1") is first
+    assert queue.rows == []  # p2 had nothing to persist
+
+    registry.get("p4", "b1")
+    assert registry.find("p1") is None
+    assert [row["property_id"] for row in queue.rows] == ["p1"]
+
+
+@pytest.fixture
+def client(queue, monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Zone.__table__.create(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        for zone_id, property_id, business_id in [("a", "p1", "b1"), ("b", "p1", "b1"), ("c", "p2", "other")]:
+            db.add(Zone(
+                id=zone_id, property_id=property_id, building_id="bd", name=zone_id,
+                type=ZoneType.RETAIL_SPACE, business_id=business_id
+            ))
+        db.commit()
+
+    def override_get_db():
+        with Session() as db:
+            yield db
+
+    registry = ZoneTransitionRegistry()
+    monkeypatch.setattr(footpath, "transition_graphs", registry)
+
+    app = FastAPI()
+    app.include_router(footpath.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[verify_business_auth] = lambda: SimpleNamespace(id="b1")
+    client = TestClient(app)
+    client.registry = registry
+    return client
+
+
+def event(zone_id, event="enter", property_id="p1", offset=0):
+    return {
+        "property_id": property_id, "zone_id": zone_id, "person_id": "v1",
+        "event": event, "timestamp": (T0 + timedelta(seconds=offset)).isoformat()
+    }
+
+
+def test_zone_events_feed_the_property_graph(client):
+    response = client.post("/vt/api/v1/footpath/zone-events", json=[event("a"), event("b", offset=5)])
+
+    assert response.status_code == 200
+    assert response.json() == {"recorded": 2}
+    assert client.registry.find("p1").transitions[("a", "b")] == 1
+    assert client.registry.find("p1").business_id == "b1"
+
+
+@pytest.mark.parametrize("bad", [
+    event("a", property_id="unknown"),  # Property not known at all
+    event("c", property_id="p2"),  # Another business's property
+    event("zzz"),  # Zone outside the property
+])
+def test_zone_events_reject_unknown_properties_and_zones(client, bad):
+    response = client.post("/vt/api/v1/footpath/zone-events", json=[event("a"), bad])
+
+    assert response.status_code == 404
+    assert client.registry.find("p1") is None
+    assert client.registry.find(bad["property_id"]) is None
+
+
+def test_zone_events_require_auth(client):
+    del client.app.dependency_overrides[verify_business_auth]
+
+    response = client.post("/vt/api/v1/footpath/zone-events", json=[event("a")])
+
+    assert response.status_code == 422  # Missing auth headers
+
+
+def test_endpoint_only_graph_is_persisted(client, queue):
+    client.post("/vt/api/v1/footpath/zone-events", json=[event("a"), event("b", offset=5)])
+    graph = client.registry.find("p1")
+    graph.window_start -= timedelta(hours=2)
+
+    client.post("/vt/api/v1/footpath/zone-events", json=[event("a", offset=10)])
+
+    # a -> b from the first call, b -> a from the second
+    assert sorted((row["zone_id"], row["business_id"]) for row in queue.rows) == [("a", "b1"), ("b", "b1")]
+    assert not graph.transitions
+
+
+def test_processor_tracks_zones_overlapping_its_coverage_area():
+    square = lambda x, y, size: [[x, y], [x + size, y], [x + size, y + size], [x, y + size]]
+    zones = [
+        SimpleNamespace(id="own", polygon=json.dumps(square(0, 0, 100))),
+        SimpleNamespace(id="neighbour", polygon=json.dumps(square(150, 0, 100))),
+        SimpleNamespace(id="far", polygon=json.dumps(square(1000, 1000, 10))),
+    ]
+
+    class FakeQuery:
+        def filter(self, *conditions):
+            return self
+
+        def all(self):
+            return zones
+
+    processor = CameraProcessor.__new__(CameraProcessor)
+    processor.db = SimpleNamespace(query=lambda model: FakeQuery())
+    processor.camera = SimpleNamespace(
+        zone=zones[0], property_id="p1", coverage_area={"polygon": square(-10, -10, 200)}
+    )
+    assert set(processor._tracked_zones()) == {"own", "neighbour"}
+
+    processor.camera.coverage_area = None
+    assert set(processor._tracked_zones()) == {"own"}
@@ -1,6 +1,8 @@
 from fastapi import Header, HTTPException, Depends
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db
 from models.business import Business
 import os
 from dotenv import load_dotenv
@@ -9,12 +11,13 @@ load_dotenv()
 
 SUPERADMIN_API_KEY = os.environ.get("SUPERADMIN_API_KEY")
 
-async def verify_business_auth(
+def verify_business_auth(
     db: Session = Depends(get_db),
     vt_platform_id: str = Header(..., alias="X-VT-Platform-ID"),
     api_key: str = Header(..., alias="X-VT-API-Key"),
     business_id: str = Header(..., alias="X-VT-Business-ID")
 ):
+    # Sync so it shares the route's get_db session and runs off the event loop
     business = db.query(Business).filter(
         Business.vt_platform_id == vt_platform_id,
         Business.api_key == api_key,
@@ -26,6 +29,24 @@ async def verify_business_auth(
         raise HTTPException(status_code=401, detail="Invalid or unauthorized business")
     return business
 
+async def verify_business_auth_async(
+    db: AsyncSession = Depends(get_async_db),
+    vt_platform_id: str = Header(..., alias="X-VT-Platform-ID"),
+    api_key: str = Header(..., alias="X-VT-API-Key"),
+    business_id: str = Header(..., alias="X-VT-Business-ID")
+):
+    # For async routes: shares the route's get_async_db session
+    business = (await db.execute(select(Business).filter(
+        Business.vt_platform_id == vt_platform_id,
+        Business.api_key == api_key,
+        Business.id == business_id,
+        Business.is_active == True,
+    ))).scalars().first()
+
+    if not business:
+        raise HTTPException(status_code=401, detail="Invalid or unauthorized business")
+    return business
+
 async def verify_superadmin_api_key(
     superadmin_api_key: str = Header(..., alias="X-VT-SUPERADMIN-API-KEY")
 ):
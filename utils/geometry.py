@@ -0,0 +1,278 @@
+"""Batched geometry kernels shared by the detector and analytics services.
+
+Boxes are (N, 4) arrays of x1, y1, x2, y2, points are (N, 2) arrays and
+polygons are sequences of (K, 2) vertex arrays. Every pairwise kernel
+returns an N x M matrix so callers test all pairs in one call instead of
+looping. `points_in_polygons` has a Numba JIT path that is used when Numba
+is installed; everything else is plain NumPy.
+"""
+import numpy as np
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:  # Optional dependency
+    numba = None
+    NUMBA_AVAILABLE = False
+
+
+def as_boxes(boxes):
+    return np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+
+def as_points(points):
+    return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+
+def box_areas(boxes, inclusive=False):
+    """Area of each box; `inclusive` counts pixel edges (+1), as in the old IoU helper"""
+    boxes = as_boxes(boxes)
+    extra = 1.0 if inclusive else 0.0
+    return np.clip(boxes[:, 2] - boxes[:, 0] + extra, 0, None) * np.clip(boxes[:, 3] - boxes[:, 1] + extra, 0, None)
+
+
+def box_centers(boxes):
+    boxes = as_boxes(boxes)
+    return (boxes[:, :2] + boxes[:, 2:]) / 2
+
+
+def intersection_areas(boxes_a, boxes_b, inclusive=False):
+    """N x M intersection areas"""
+    a = as_boxes(boxes_a)[:, None, :]
+    b = as_boxes(boxes_b)[None, :, :]
+    extra = 1.0 if inclusive else 0.0
+    widths = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]) + extra, 0, None)
+    heights = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]) + extra, 0, None)
+    return widths * heights
+
+
+def iou_matrix(boxes_a, boxes_b, inclusive=False):
+    """N x M intersection over union"""
+    inter = intersection_areas(boxes_a, boxes_b, inclusive)
+    union = box_areas(boxes_a, inclusive)[:, None] + box_areas(boxes_b, inclusive)[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def ioa_matrix(boxes_a, boxes_b, inclusive=False):
+    """N x M intersection over the area of each box in `boxes_a` (how much of a is covered by b)"""
+    inter = intersection_areas(boxes_a, boxes_b, inclusive)
+    areas = box_areas(boxes_a, inclusive)[:, None]
+    return np.divide(inter, areas, out=np.zeros_like(inter), where=areas > 0)
+
+
+def boxes_overlap(boxes_a, boxes_b):
+    """N x M mask of pairs whose interiors overlap (touching edges do not count)"""
+    a = as_boxes(boxes_a)[:, None, :]
+    b = as_boxes(boxes_b)[None, :, :]
+    return (
+        (np.maximum(a[..., 0], b[..., 0]) < np.minimum(a[..., 2], b[..., 2])) &
+        (np.maximum(a[..., 1], b[..., 1]) < np.minimum(a[..., 3], b[..., 3]))
+    )
+
+
+def points_in_boxes(points, boxes):
+    """N x M mask of points inside boxes (edges inclusive)"""
+    points = as_points(points)
+    boxes = as_boxes(boxes)
+    xs = points[:, 0:1]
+    ys = points[:, 1:2]
+    return (
+        (xs >= boxes[:, 0]) & (xs <= boxes[:, 2]) &
+        (ys >= boxes[:, 1]) & (ys <= boxes[:, 3])
+    )
+
+
+def _flatten_polygons(polygons):
+    """Concatenate polygons into one vertex array plus start offsets"""
+    polygons = [as_points(polygon) for polygon in polygons]
+    counts = np.array([len(polygon) for polygon in polygons], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    vertices = np.concatenate(polygons) if polygons else np.empty((0, 2))
+    return vertices, offsets
+
+
+def _polygon_edges(vertices, offsets):
+    """Edge end points: each vertex paired with the next one of its own polygon"""
+    following = np.arange(1, len(vertices) + 1)
+    following[offsets[1:] - 1] = offsets[:-1]  # Close every ring
+    return vertices, vertices[following]
+
+
+def _points_in_polygons_numpy(points, vertices, offsets):
+    starts, ends = _polygon_edges(vertices, offsets)
+    x, y = points[:, 0:1], points[:, 1:2]
+    x1, y1 = starts[:, 0], starts[:, 1]
+    x2, y2 = ends[:, 0], ends[:, 1]
+
+    # Crossing-number test: count edges a ray to +x crosses
+    straddles = (y1 > y) != (y2 > y)
+    dy = np.where(y2 == y1, 1.0, y2 - y1)
+    crosses = straddles & (x < (x2 - x1) * (y - y1) / dy + x1)
+
+    nonempty = offsets[:-1] < offsets[1:]
+    counts = np.zeros((len(points), len(offsets) - 1), dtype=np.int64)
+    if np.any(nonempty):
+        counts[:, nonempty] = np.add.reduceat(crosses, offsets[:-1][nonempty], axis=1)
+    return counts % 2 == 1
+
+
+if NUMBA_AVAILABLE:
+    @numba.njit(cache=True)
+    def _points_in_polygons_jit(points, vertices, offsets):
+        result = np.zeros((points.shape[0], offsets.shape[0] - 1), dtype=np.bool_)
+        for j in range(offsets.shape[0] - 1):
+            start, end = offsets[j], offsets[j + 1]
+            for i in range(points.shape[0]):
+                x, y = points[i, 0], points[i, 1]
+                inside = False
+                previous = end - 1
+                for k in range(start, end):
+                    x1, y1 = vertices[previous, 0], vertices[previous, 1]
+                    x2, y2 = vertices[k, 0], vertices[k, 1]
+                    if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                        inside = not inside
+                    previous = k
+                result[i, j] = inside
+        return result
+
+
+def points_in_polygons(points, polygons, use_numba=None):
+    """N x M mask of points inside polygons (crossing-number rule, polygons may differ in size).
+
+    `use_numba` defaults to using the JIT kernel when Numba is installed.
+    """
+    points = as_points(points)
+    vertices, offsets = _flatten_polygons(polygons)
+    if len(points) == 0 or len(offsets) == 1:
+        return np.zeros((len(points), len(offsets) - 1), dtype=bool)
+    if use_numba is None:
+        use_numba = NUMBA_AVAILABLE
+    if use_numba:
+        if not NUMBA_AVAILABLE:
+            raise RuntimeError("Numba is not installed")
+        return _points_in_polygons_jit(points, vertices, offsets)
+    return _points_in_polygons_numpy(points, vertices, offsets)
+
+
+def segments_intersect(starts, ends, line_starts, line_ends):
+    """N x M mask of segments starts->ends crossing segments line_starts->line_ends.
+
+    Parametric test with both segment parameters in [0, 1]; parallel (and
+    degenerate) pairs never intersect.
+    """
+    starts = as_points(starts)
+    ends = as_points(ends)
+    line_starts = as_points(line_starts)
+    line_ends = as_points(line_ends)
+
+    s1 = (ends - starts)[:, None, :]  # (N, 1, 2)
+    s2 = (line_ends - line_starts)[None, :, :]  # (1, M, 2)
+    offset = starts[:, None, :] - line_starts[None, :, :]  # (N, M, 2)
+
+    denom = -s2[..., 0] * s1[..., 1] + s1[..., 0] * s2[..., 1]
+    s_num = -s1[..., 1] * offset[..., 0] + s1[..., 0] * offset[..., 1]
+    t_num = s2[..., 0] * offset[..., 1] - s2[..., 1] * offset[..., 0]
+
+    valid = denom != 0
+    safe = np.where(valid, denom, 1.0)
+    s = s_num / safe
+    t = t_num / safe
+    return valid & (s >= 0) & (s <= 1) & (t >= 0) & (t <= 1)
+
+
+def polygons_overlap(polygons_a, polygons_b):
+    """N x M mask of polygon pairs that overlap or touch (a vertex of one inside the other, or meeting edges)"""
+    vertices_a, offsets_a = _flatten_polygons(polygons_a)
+    vertices_b, offsets_b = _flatten_polygons(polygons_b)
+    overlap = np.zeros((len(offsets_a) - 1, len(offsets_b) - 1), dtype=bool)
+    if len(vertices_a) == 0 or len(vertices_b) == 0:
+        return overlap
+
+    # Which polygon each vertex (and the edge starting at it) belongs to
+    owner_a = np.repeat(np.arange(len(offsets_a) - 1), np.diff(offsets_a))
+    owner_b = np.repeat(np.arange(len(offsets_b) - 1), np.diff(offsets_b))
+
+    np.logical_or.at(overlap, owner_a, points_in_polygons(vertices_a, polygons_b))
+    np.logical_or.at(overlap.T, owner_b, points_in_polygons(vertices_b, polygons_a))
+
+    starts_a, ends_a = _polygon_edges(vertices_a, offsets_a)
+    starts_b, ends_b = _polygon_edges(vertices_b, offsets_b)
+    crossing = segments_intersect(starts_a, ends_a, starts_b, ends_b)
+    rows, cols = np.nonzero(crossing)
+    overlap[owner_a[rows], owner_b[cols]] = True
+    return overlap
+
+
+def polygon_areas(polygons):
+    """Absolute area of each polygon (shoelace formula)"""
+    vertices, offsets = _flatten_polygons(polygons)
+    areas = np.zeros(len(offsets) - 1)
+    valid = (offsets[1:] - offsets[:-1]) >= 3
+    if not np.any(valid):
+        return areas
+    starts, ends = _polygon_edges(vertices, offsets)
+    cross = starts[:, 0] * ends[:, 1] - ends[:, 0] * starts[:, 1]
+    areas[valid] = 0.5 * np.abs(np.add.reduceat(cross, offsets[:-1][valid]))
+    return areas
+
+
+def polygon_centroids(polygons):
+    """Area centroid of each polygon (vertex mean for degenerate ones)"""
+    vertices, offsets = _flatten_polygons(polygons)
+    centroids = np.zeros((len(offsets) - 1, 2))
+    if len(vertices) == 0:
+        return centroids
+    starts, ends = _polygon_edges(vertices, offsets)
+    cross = starts[:, 0] * ends[:, 1] - ends[:, 0] * starts[:, 1]
+    nonempty = offsets[:-1] < offsets[1:]
+    index = offsets[:-1][nonempty]
+
+    signed = np.add.reduceat(cross, index) / 2
+    cx = np.add.reduceat((starts[:, 0] + ends[:, 0]) * cross, index)
+    cy = np.add.reduceat((starts[:, 1] + ends[:, 1]) * cross, index)
+    means = np.add.reduceat(vertices, index, axis=0) / (offsets[1:] - offsets[:-1])[nonempty, None]
+
+    degenerate = np.abs(signed) < 1e-12
+    safe = np.where(degenerate, 1.0, 6 * signed)
+    centroids[nonempty] = np.where(degenerate[:, None], means, np.stack([cx / safe, cy / safe], axis=1))
+    return centroids
+
+
+def polygon_area(polygon):
+    return float(polygon_areas([polygon])[0])
+
+
+def polygon_centroid(polygon):
+    return tuple(polygon_centroids([polygon])[0].tolist())
+
+
+def clip_polygon_to_box(polygon, box):
+    """Clip a polygon to an axis-aligned box x1, y1, x2, y2 (Sutherland-Hodgman)"""
+    x1, y1, x2, y2 = box
+    # Each edge keeps the points where inside(p) >= 0
+    edges = (
+        (lambda p: p[0] - x1, 0, x1),
+        (lambda p: x2 - p[0], 0, x2),
+        (lambda p: p[1] - y1, 1, y1),
+        (lambda p: y2 - p[1], 1, y2),
+    )
+    output = [tuple(p) for p in as_points(polygon)]
+    for inside, axis, bound in edges:
+        if not output:
+            break
+        points, output = output, []
+        previous = points[-1]
+        for current in points:
+            current_in = inside(current) >= 0
+            previous_in = inside(previous) >= 0
+            if current_in != previous_in:
+                # Point where the segment meets the clip edge
+                t = (bound - previous[axis]) / (current[axis] - previous[axis])
+                output.append((
+                    previous[0] + t * (current[0] - previous[0]),
+                    previous[1] + t * (current[1] - previous[1])
+                ))
+            if current_in:
+                output.append(current)
+            previous = current
+    return np.asarray(output, dtype=np.float64).reshape(-1, 2)
@@ -1,6 +1,14 @@
 import json
 from datetime import datetime
 
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from utils.geometry import iou_matrix
+
+# Dialects with INSERT ... ON CONFLICT, used by upsert_increment
+_UPSERT_INSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
 def parse_bbox(bbox_str: str) -> dict:
     """Parse a bbox string into a dictionary."""
     try:
@@ -14,14 +22,27 @@ def format_datetime(dt: datetime) -> str:
 
 def calculate_intersection_over_union(boxA, boxB):
     """Calculate the Intersection over Union (IoU) of two bounding boxes."""
-    xA = max(boxA[0], boxB[0])
-    yA = max(boxA[1], boxB[1])
-    xB = min(boxA[2], boxB[2])
-    yB = min(boxA[3], boxB[3])
-
-    interArea = max(0, xB - xA + 1) * max(0, yB - yA + 1)
-    boxAArea = (boxA[2] - boxA[0] + 1) * (boxA[3] - boxA[1] + 1)
-    boxBArea = (boxB[2] - boxB[0] + 1) * (boxB[3] - boxB[1] + 1)
-    
-    iou = interArea / float(boxAArea + boxBArea - interArea)
-    return iou
\ No newline at end of file
+    return float(iou_matrix([boxA], [boxB], inclusive=True)[0, 0])
+
+def upsert_increment(db, model, rows, key_columns, counter_columns):
+    """Insert rows, or add their counters to the existing rows with the same key.
+
+    One INSERT ... ON CONFLICT DO UPDATE SET c = c + excluded.c, so
+    concurrent writers creating the same key never hit its unique
+    constraint. Rows must have distinct keys.
+    """
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect not in _UPSERT_INSERTS:
+        raise NotImplementedError(f"Upserts are not supported on {dialect}")
+    insert = _UPSERT_INSERTS[dialect]
+
+    # A fixed key order keeps concurrent batches from deadlocking on each other's rows
+    rows = sorted(rows, key=lambda row: tuple(row[name] for name in key_columns))
+    statement = insert(model).values(rows)
+    table = model.__table__
+    db.execute(statement.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={name: table.c[name] + statement.excluded[name] for name in counter_columns}
+    ))